@@ -22,6 +22,8 @@ from bot.src.api.models import (
     AntiSpamSettingsResponse, AutoResponsePatternResponse, AutoResponseSettingsResponse
 )
 from bot.src.db.database import get_db_session
+from bot.src.db import instrumentation
+from bot.src.db.engine import connection_report
 from bot.src.utils.config import get_config
 
 # ロガーの設定
@@ -56,6 +58,11 @@ async def add_process_time_header(request: Request, call_next):
     response.headers["X-Process-Time"] = str(process_time)
     return response
 
+# SIGUSR1 でデータベースの計測結果をログに出力する
+@app.on_event("startup")
+async def install_instrumentation_signal():
+    instrumentation.install_signal_handler()
+
 # エラーハンドラー
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -87,7 +94,22 @@ async def root():
 async def health_check():
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        # 接続プールの状態（SQLの集計は /health/database で取得する）
+        "database": {
+            name: {"pool": data["pool"], "slow_queries": data["slow_queries"], "errors": data["errors"]}
+            for name, data in instrumentation.snapshot(top=0).items()
+        },
+        # 接続数の予算と実際の同時使用数のピーク
+        "connections": connection_report(),
+    }
+
+# データベースの計測結果（クエリごとの実行時間と接続プール）
+@app.get("/health/database")
+async def database_health(top: int = 20, current_user: dict = Depends(get_current_user)):
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "engines": instrumentation.snapshot(top=top),
     }
 
 # ルートのインポート
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Response
 from fastapi.security import OAuth2PasswordBearer
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -7,6 +7,8 @@ import logging
 
 from bot.src.db.database import get_db_session
 from bot.src.db.models import Guild, ModerationSettings, UserInfraction, ModerationAction
+from bot.src.db.pagination import InvalidCursorError, keyset_page, next_cursor
+from bot.src.db.repository import GuildRepository
 from bot.src.modules.moderation.infractions import InfractionManager
 from bot.src.api.auth import get_current_user, verify_guild_access
 from bot.src.api.models import (
@@ -141,27 +143,40 @@ async def update_moderation_settings(
 # ユーザーの違反履歴の取得
 @router.get("/guilds/{guild_id}/users/{user_id}/infractions", response_model=List[InfractionResponse])
 async def get_user_infractions(
+    response: Response,
     guild_id: str = Path(..., description="Discord Guild ID"),
     user_id: str = Path(..., description="Discord User ID"),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="前のページの X-Next-Cursor"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     指定されたサーバーとユーザーの違反履歴を取得
+    次のページがある場合は X-Next-Cursor ヘッダーにカーソルを返します
     """
     # ギルドへのアクセス権を確認
     await verify_guild_access(current_user, guild_id)
     
     try:
         with get_db_session() as session:
-            # ユーザーの違反履歴を取得
-            infractions = session.query(UserInfraction).filter(
-                UserInfraction.guild.has(discord_id=guild_id),
+            guild_pk = GuildRepository(session).get_guild_pk(guild_id)
+            if guild_pk is None:
+                return []
+            
+            # ユーザーの違反履歴を取得（カーソル指定時は OFFSET を使わない）
+            query = session.query(UserInfraction).filter(
+                UserInfraction.guild_id == guild_pk,
                 UserInfraction.user_id == user_id
-            ).order_by(
-                UserInfraction.created_at.desc()
-            ).offset(offset).limit(limit).all()
+            )
+            query = keyset_page(query, UserInfraction, cursor)
+            if not cursor:
+                query = query.offset(offset)
+            infractions = query.limit(limit).all()
+            
+            following = next_cursor(infractions, limit)
+            if following:
+                response.headers["X-Next-Cursor"] = following
             
             # レスポンスリストを構築
             result = []
@@ -183,6 +198,8 @@ async def get_user_infractions(
             
     except HTTPException as he:
         raise he
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"違反履歴取得エラー: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -335,25 +352,36 @@ async def delete_infraction(
 # モデレーションアクションログの取得
 @router.get("/guilds/{guild_id}/actions", response_model=List[dict])
 async def get_moderation_actions(
+    response: Response,
     guild_id: str = Path(..., description="Discord Guild ID"),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="前のページの X-Next-Cursor"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     指定されたサーバーのモデレーションアクションログを取得
+    次のページがある場合は X-Next-Cursor ヘッダーにカーソルを返します
     """
     # ギルドへのアクセス権を確認
     await verify_guild_access(current_user, guild_id)
     
     try:
         with get_db_session() as session:
-            # モデレーションアクションを取得
-            actions = session.query(ModerationAction).filter(
-                ModerationAction.guild.has(discord_id=guild_id)
-            ).order_by(
-                ModerationAction.created_at.desc()
-            ).offset(offset).limit(limit).all()
+            guild_pk = GuildRepository(session).get_guild_pk(guild_id)
+            if guild_pk is None:
+                return []
+            
+            # モデレーションアクションを取得（カーソル指定時は OFFSET を使わない）
+            query = session.query(ModerationAction).filter(ModerationAction.guild_id == guild_pk)
+            query = keyset_page(query, ModerationAction, cursor)
+            if not cursor:
+                query = query.offset(offset)
+            actions = query.limit(limit).all()
+            
+            following = next_cursor(actions, limit)
+            if following:
+                response.headers["X-Next-Cursor"] = following
             
             # レスポンスリストを構築
             result = []
@@ -361,10 +389,10 @@ async def get_moderation_actions(
                 result.append({
                     "id": action.id,
                     "guild_id": guild_id,
-                    "user_id": action.user_id,
+                    "user_id": action.target_id,
                     "moderator_id": action.moderator_id,
                     "action_type": action.action_type,
-                    "details": action.details,
+                    "details": action.reason,
                     "created_at": action.created_at
                 })
             
@@ -372,6 +400,8 @@ async def get_moderation_actions(
             
     except HTTPException as he:
         raise he
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"モデレーションアクション取得エラー: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
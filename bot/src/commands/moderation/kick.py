@@ -2,8 +2,7 @@ from discord.ext import commands
 from discord import app_commands
 import discord
 from typing import Optional
-from database.database_connection import get_db
-from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
 import logging
 
 logger = logging.getLogger('moderation.kick')
@@ -56,16 +55,14 @@ class Kick(commands.Cog):
             await member.kick(reason=f"{reason} (実行者: {interaction.user})")
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=interaction.guild.id,
-                    action_type="kick",
-                    user_id=interaction.user.id,
-                    target_id=member.id,
-                    reason=reason,
-                    details={}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=interaction.guild.id,
+                action_type="kick",
+                user_id=interaction.user.id,
+                target_id=member.id,
+                reason=reason,
+                details={}
+            )
 
             # 成功メッセージを送信
             embed = discord.Embed(
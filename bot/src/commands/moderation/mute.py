@@ -6,6 +6,9 @@ from datetime import datetime, timedelta
 import re
 from database.database_connection import get_db
 from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
+from modules.moderation.lockdown import apply_channel_overwrites, get_request_budget, lockable_channels
+from modules.utility.timer_service import get_timer_service
 import logging
 
 logger = logging.getLogger('moderation.mute')
@@ -100,32 +103,30 @@ class Mute(commands.Cog):
                 reason=f"{reason} (実行者: {interaction.user})"
             )
 
-            # タイマーを設定
+            # タイマーを設定（タイマーサービスのスケジュールにも登録する）
             unmute_time = datetime.utcnow() + timedelta(seconds=duration_seconds)
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_timer(
-                    guild_id=interaction.guild.id,
-                    channel_id=interaction.channel.id,
-                    user_id=member.id,
-                    expires_at=unmute_time,
-                    message=f"ミュート解除: {member.mention}",
-                    is_recurring=False
-                )
+            await get_timer_service(self.bot).create_timer(
+                guild_id=interaction.guild.id,
+                channel_id=interaction.channel.id,
+                user_id=member.id,
+                expires_at=unmute_time,
+                message=f"ミュート解除: {member.mention}",
+                is_recurring=False
+            )
 
-                # 監査ログに記録
-                await db.create_audit_log(
-                    guild_id=interaction.guild.id,
-                    action_type="mute",
-                    user_id=interaction.user.id,
-                    target_id=member.id,
-                    reason=reason,
-                    details={
-                        "duration": duration,
-                        "duration_seconds": duration_seconds,
-                        "unmute_time": unmute_time.isoformat()
-                    }
-                )
+            # 監査ログに記録
+            get_audit_sink(self.bot).record(
+                guild_id=interaction.guild.id,
+                action_type="mute",
+                user_id=interaction.user.id,
+                target_id=member.id,
+                reason=reason,
+                details={
+                    "duration": duration,
+                    "duration_seconds": duration_seconds,
+                    "unmute_time": unmute_time.isoformat()
+                }
+            )
 
             # 成功メッセージを送信
             embed = discord.Embed(
@@ -222,16 +223,14 @@ class Mute(commands.Cog):
                 )
 
                 # 監査ログに記録
-                async for session in get_db():
-                    db = DatabaseOperations(session)
-                    await db.create_audit_log(
-                        guild_id=interaction.guild.id,
-                        action_type="unmute",
-                        user_id=interaction.user.id,
-                        target_id=member.id,
-                        reason=reason,
-                        details={}
-                    )
+                get_audit_sink(self.bot).record(
+                    guild_id=interaction.guild.id,
+                    action_type="unmute",
+                    user_id=interaction.user.id,
+                    target_id=member.id,
+                    reason=reason,
+                    details={}
+                )
 
                 # 成功メッセージを送信
                 embed = discord.Embed(
@@ -335,17 +334,19 @@ class Mute(commands.Cog):
             permissions=discord.Permissions.none()
         )
 
-        # 全チャンネルの権限を設定
-        for channel in guild.channels:
-            if isinstance(channel, (discord.TextChannel, discord.VoiceChannel)):
-                await channel.set_permissions(
-                    mute_role,
-                    send_messages=False,
-                    speak=False,
-                    stream=False,
-                    add_reactions=False,
-                    reason="ミュートロールの権限を設定"
-                )
+        # 全チャンネルの権限を並行して設定
+        await apply_channel_overwrites(
+            lockable_channels(guild),
+            mute_role,
+            lambda channel: discord.PermissionOverwrite(
+                send_messages=False,
+                speak=False,
+                stream=False,
+                add_reactions=False
+            ),
+            reason="ミュートロールの権限を設定",
+            budget=get_request_budget(self.bot)
+        )
 
         return mute_role
 
@@ -4,6 +4,7 @@ import discord
 from typing import Optional, List
 from database.database_connection import get_db
 from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
 import logging
 
 logger = logging.getLogger('moderation.warn')
@@ -54,9 +55,8 @@ class Warn(commands.Cog):
                     reason=reason
                 )
 
-                # 警告回数を取得
-                warnings = await db.get_warnings(member.id, interaction.guild.id)
-                warning_count = len(warnings)
+                # 警告回数を取得（履歴ではなく件数の1行を読む）
+                warning_count = await db.get_infraction_count(member.id, interaction.guild.id, 'warning')
 
                 # 成功メッセージを送信
                 embed = discord.Embed(
@@ -185,14 +185,11 @@ class Warn(commands.Cog):
         try:
             async for session in get_db():
                 db = DatabaseOperations(session)
-                # 警告を削除
-                await session.execute(
-                    f"DELETE FROM warnings WHERE user_id = {member.id} AND guild_id = {interaction.guild.id}"
-                )
-                await session.commit()
+                # 警告と警告の件数を削除
+                await db.clear_warnings(member.id, interaction.guild.id)
 
                 # 監査ログに記録
-                await db.create_audit_log(
+                get_audit_sink(self.bot).record(
                     guild_id=interaction.guild.id,
                     action_type="clear_warnings",
                     user_id=interaction.user.id,
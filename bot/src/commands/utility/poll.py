@@ -13,6 +13,12 @@ class Poll(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.poll_service = PollService(bot)
+        # 進行中の投票を復元
+        self.bot.loop.create_task(self.poll_service.start())
+
+    async def cog_unload(self):
+        """Cogがアンロードされるときの処理（反映していない投票の保存を待つ）"""
+        await self.poll_service.stop()
 
     @app_commands.command(name="poll", description="投票を作成します")
     @app_commands.describe(
@@ -192,11 +198,8 @@ class Poll(commands.Cog):
                 user_id=payload.user_id,
                 emoji=str(payload.emoji)
             ):
-                # メッセージを更新
-                channel = self.bot.get_channel(payload.channel_id)
-                if channel:
-                    message = await channel.fetch_message(payload.message_id)
-                    await self.poll_service.update_poll_message(message)
+                # メッセージの更新を予約（連続した投票は1回の編集にまとめる）
+                self.poll_service.schedule_update(payload.message_id)
 
         except Exception as e:
             logger.error(f"Failed to handle reaction add: {e}")
@@ -214,11 +217,8 @@ class Poll(commands.Cog):
                 user_id=payload.user_id,
                 emoji=str(payload.emoji)
             ):
-                # メッセージを更新
-                channel = self.bot.get_channel(payload.channel_id)
-                if channel:
-                    message = await channel.fetch_message(payload.message_id)
-                    await self.poll_service.update_poll_message(message)
+                # メッセージの更新を予約（連続した投票は1回の編集にまとめる）
+                self.poll_service.schedule_update(payload.message_id)
 
         except Exception as e:
             logger.error(f"Failed to handle reaction remove: {e}")
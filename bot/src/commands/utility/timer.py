@@ -4,7 +4,7 @@ import discord
 from typing import Optional
 from datetime import datetime, timedelta
 import re
-from modules.utility.timer_service import TimerService
+from modules.utility.timer_service import get_timer_service
 import logging
 
 logger = logging.getLogger('utility.timer')
@@ -12,14 +12,14 @@ logger = logging.getLogger('utility.timer')
 class Timer(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.timer_service = TimerService(bot)
+        self.timer_service = get_timer_service(bot)
         # タイマーサービスを開始
         self.bot.loop.create_task(self.timer_service.start())
 
-    def cog_unload(self):
+    async def cog_unload(self):
         """Cogがアンロードされるときの処理"""
         # タイマーサービスを停止
-        self.bot.loop.create_task(self.timer_service.stop())
+        await self.timer_service.stop()
 
     @app_commands.command(name="timer", description="タイマーを設定します")
     @app_commands.describe(
@@ -3,17 +3,22 @@ from discord import app_commands
 import discord
 from typing import Optional, List
 import logging
-from modules.utility.translation_service import TranslationService
+from modules.utility.translation_service import get_translation_service
 
 logger = logging.getLogger('utility.translate')
 
 class Translate(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.translation_service = TranslationService()
+        self.translation_service = get_translation_service(bot)
         # 翻訳用の絵文字
         self.translation_emoji = "🌐"
 
+    async def cog_unload(self):
+        """Cogがアンロードされるときの処理"""
+        # 共有のセッションとキャッシュを閉じる
+        await self.translation_service.close()
+
     @app_commands.command(name="translate", description="テキストを翻訳します")
     @app_commands.describe(
         text="翻訳するテキスト",
@@ -12,6 +12,17 @@ DATABASE_CONFIG = {
     'database': os.getenv('DB_NAME', 'shardbot'),
     'user': os.getenv('DB_USER', 'postgres'),
     'password': os.getenv('DB_PASSWORD', ''),
+    # 1プロセスが使ってよい接続数（同期・非同期のプールの合計。レプリカ数を掛けた値が max_connections に収まるようにする）
+    'max_connections': int(os.getenv('DB_MAX_CONNECTIONS', 20)),
+    # そのうち同期の処理（スレッドプール）に割り当てる接続数
+    'sync_connections': int(os.getenv('DB_SYNC_CONNECTIONS', 4)),
+    'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    # この時間（ミリ秒）を超えたクエリをパラメータを伏せてログに出力する
+    'slow_query_ms': float(os.getenv('DB_SLOW_QUERY_MS', 200)),
+    # 監査ログ・スパムログ・モデレーション履歴の保持期間（日、0 は無期限）。月ごとのパーティション単位で削除する
+    'log_retention_days': int(os.getenv('DB_LOG_RETENTION_DAYS', 365)),
+    # 事前に作成しておく月のパーティションの数
+    'partition_months_ahead': int(os.getenv('DB_PARTITION_MONTHS_AHEAD', 3)),
 }
 
 # ボット設定
@@ -104,6 +115,11 @@ RAID_PROTECTION = {
     'lockdown_channels': True,  # チャンネルをロックダウンするか
     'recovery_mode': True,  # 自動復旧モード（レイド終了後に設定を戻す）
     'ip_logging': False,  # IPアドレスログ記録（法的要件に注意）
+    'cohort_window_seconds': 600,  # 類似アカウント検出で比較する参加者の時間窓（秒）
+    'cohort_max_size': 5000,  # 類似アカウント検出で保持する参加者の最大数
+    'cohort_creation_window': 3600,  # アカウント作成日時が近いとみなす差（秒）
+    'cohort_similarity_threshold': 0.6,  # 類似とみなすスコア（0-1）
+    'cohort_min_cluster_size': 5,  # 検出する類似アカウント群の最小人数
 }
 
 # リアクションロール設定
@@ -0,0 +1,357 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+logger = logging.getLogger('database.audit_sink')
+
+# audit_logs に書き込む列（COPY の列順）
+AUDIT_COLUMNS = ('guild_id', 'action_type', 'user_id', 'target_id', 'reason', 'details', 'created_at')
+
+
+def is_outage(error: BaseException) -> bool:
+    """データベースに接続できない種類のエラーかどうか（データの問題によるエラーは False）"""
+    if isinstance(error, (OSError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def _encode(record: Dict[str, Any]) -> str:
+    data = dict(record)
+    data['created_at'] = record['created_at'].isoformat()
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _decode(line: str) -> Dict[str, Any]:
+    data = json.loads(line)
+    data['created_at'] = datetime.fromisoformat(data['created_at'])
+    return data
+
+
+class AuditSink:
+    """
+    監査ログの書き込みをまとめる write-behind キュー
+
+    record() はデータベースを待たずにメモリ上のキューへ追加するだけで、
+    バックグラウンドのタスクが batch_size 件たまるか flush_interval 秒ごとに
+    writer へ一括で渡します。データベースに接続できない間はキューから溢れた分と
+    書き込めなかったバッチを spill_path（JSON Lines）へ退避し、復旧後に
+    記録順のまま書き戻します。close() で残りを書き込みます。
+    """
+
+    def __init__(self, writer: Callable[[List[Dict[str, Any]]], Awaitable[None]], spill_path: str,
+                 max_queue: int = 10_000, batch_size: int = 500, flush_interval: float = 2.0,
+                 retry_interval: float = 30.0, max_spill_bytes: int = 64 * 1024 * 1024):
+        self.writer = writer
+        self.spill_path = spill_path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_spill_bytes = max_spill_bytes
+
+        self.queue: Deque[Dict[str, Any]] = deque()
+        self.stats = {
+            "recorded": 0, "written": 0, "batches": 0, "failures": 0,
+            "spilled": 0, "replayed": 0, "rejected": 0, "dropped": 0,
+        }
+        self._retry_at = 0.0  # 障害中は次の再試行までデータベースに書き込まない
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def record(self, guild_id: Optional[int], action_type: str, user_id: Optional[int] = None,
+               target_id: Optional[int] = None, reason: Optional[str] = None,
+               details: Optional[Dict[str, Any]] = None, created_at: Optional[datetime] = None) -> None:
+        """
+        監査ログを1件追加します（DatabaseOperations.create_audit_log と同じ引数）。
+        データベースへの書き込みは待ちません。
+        """
+        record = {
+            'guild_id': guild_id,
+            'action_type': action_type,
+            'user_id': user_id,
+            'target_id': target_id,
+            'reason': reason,
+            'details': details,
+            'created_at': created_at or datetime.utcnow(),
+        }
+        self.stats["recorded"] += 1
+        if self._closed:
+            self._spill([record])
+            return
+
+        if len(self.queue) >= self.max_queue:
+            # 書き込みが追いつかない場合は古い記録からディスクへ退避する
+            self._spill([self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))])
+        self.queue.append(record)
+
+        self._ensure_task()
+        if len(self.queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_task(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"監査ログの書き込み処理でエラーが発生しました: {e}")
+
+    async def flush(self, force: bool = False) -> int:
+        """
+        退避分とキューの記録をデータベースへ書き込みます。
+
+        Args:
+            force (bool): 障害中の再試行待ちを無視して書き込むかどうか
+
+        Returns:
+            int: 書き込んだ件数
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not force and time.monotonic() < self._retry_at:
+                return 0
+
+            before = self.stats["written"]
+            # 記録順を保つため、退避した記録を先に書き戻す
+            while self._has_spill():
+                if not await self._replay():
+                    return self.stats["written"] - before
+
+            while self.queue:
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+                consumed = await self._write(batch)
+                if consumed < len(batch):
+                    self._spill(batch[consumed:])
+                    break
+            return self.stats["written"] - before
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        バッチを書き込み、先頭から処理した件数を返す。
+        len(batch) 未満の場合、残りはデータベースに接続できず書き込めていない。
+        """
+        try:
+            await self.writer(batch)
+        except Exception as e:
+            if is_outage(e):
+                self._mark_outage(e)
+                return 0
+            # データの問題は1件ずつ書き込んで、問題のある記録だけを除外する
+            logger.error(f"監査ログのバッチ書き込みに失敗しました: {e}")
+            return await self._write_one_by_one(batch)
+
+        self._retry_at = 0.0
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        return len(batch)
+
+    async def _write_one_by_one(self, batch: List[Dict[str, Any]]) -> int:
+        for index, record in enumerate(batch):
+            try:
+                await self.writer([record])
+                self.stats["written"] += 1
+            except Exception as e:
+                if is_outage(e):
+                    self._mark_outage(e)
+                    return index
+                self.stats["rejected"] += 1
+                logger.error(f"監査ログを破棄しました ({record.get('action_type')}): {e}")
+        self.stats["batches"] += 1
+        return len(batch)
+
+    def _mark_outage(self, error: BaseException) -> None:
+        self.stats["failures"] += 1
+        self._retry_at = time.monotonic() + self.retry_interval
+        logger.error(f"監査ログを書き込めません（{self.retry_interval:.0f}秒後に再試行）: {error}")
+
+    @property
+    def _replay_path(self) -> str:
+        return self.spill_path + '.replay'
+
+    def _has_spill(self) -> bool:
+        return any(
+            os.path.exists(path) and os.path.getsize(path) > 0
+            for path in (self._replay_path, self.spill_path)
+        )
+
+    def _spill(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+            size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+            if size >= self.max_spill_bytes:
+                self.stats["dropped"] += len(records)
+                logger.error(f"監査ログの退避ファイルが上限に達したため {len(records)}件を破棄しました")
+                return
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(_encode(record) + '\n' for record in records))
+            self.stats["spilled"] += len(records)
+        except (OSError, TypeError, ValueError) as e:
+            self.stats["dropped"] += len(records)
+            logger.error(f"監査ログの退避に失敗しました: {e}")
+
+    def _read_spill(self, path: str) -> List[Dict[str, Any]]:
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(_decode(line))
+                except (ValueError, KeyError):
+                    # 書き込み途中で終了した行
+                    self.stats["dropped"] += 1
+        return records
+
+    async def _replay(self) -> bool:
+        """
+        退避ファイルを書き戻す。途中で接続できなくなった場合は残りを退避し直して False を返す。
+        書き戻し中に新しく退避された記録と混ざらないよう、ファイルを .replay に移してから読む。
+        """
+        if not os.path.exists(self._replay_path):
+            os.replace(self.spill_path, self._replay_path)
+        loop = asyncio.get_running_loop()
+        records = await loop.run_in_executor(None, self._read_spill, self._replay_path)
+
+        for start in range(0, len(records), self.batch_size):
+            batch = records[start:start + self.batch_size]
+            consumed = await self._write(batch)
+            self.stats["replayed"] += consumed
+            if consumed < len(batch):
+                # 書き戻せなかった分を、その間に退避された記録より前に戻す
+                remaining = records[start + consumed:] + self._read_spill(self.spill_path)
+                tmp_path = self.spill_path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(''.join(_encode(record) + '\n' for record in remaining))
+                os.replace(tmp_path, self.spill_path)
+                os.remove(self._replay_path)
+                return False
+
+        os.remove(self._replay_path)
+        if records:
+            logger.info(f"退避していた監査ログ {len(records)}件を書き込みました")
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        """書き込みの状況（キューの長さ、退避中かどうかなど）を返す"""
+        metrics = dict(self.stats)
+        metrics["pending"] = len(self.queue)
+        metrics["spill_bytes"] = sum(
+            os.path.getsize(path) for path in (self._replay_path, self.spill_path) if os.path.exists(path)
+        )
+        metrics["outage"] = time.monotonic() < self._retry_at
+        return metrics
+
+    async def close(self) -> None:
+        """残りの記録を書き込み、書き込めなかった分は退避ファイルに残す"""
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.flush(force=True)
+        if self.queue:
+            self._spill(list(self.queue))
+            self.queue.clear()
+
+
+class AuditLogWriter:
+    """
+    audit_logs テーブルへの一括書き込み
+
+    asyncpg では COPY、それ以外のドライバーでは複数行 INSERT を使います。
+    audit_logs.guild_id は guilds.id を参照するため、初めて見るギルドの行を
+    まとめて作成し、作成済みのギルドIDはキャッシュして問い合わせを省きます。
+    """
+
+    def __init__(self, engine, audit_table, guild_table, max_known_guilds: int = 100_000):
+        self.engine = engine
+        self.audit_table = audit_table
+        self.guild_table = guild_table
+        self.max_known_guilds = max_known_guilds
+        self.known_guilds = set()
+
+    async def __call__(self, records: List[Dict[str, Any]]) -> None:
+        async with self.engine.begin() as conn:
+            await self._ensure_guilds(conn, {r['guild_id'] for r in records if r['guild_id'] is not None})
+            if conn.dialect.driver == 'asyncpg':
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    self.audit_table.name,
+                    records=[self._copy_row(record) for record in records],
+                    columns=AUDIT_COLUMNS
+                )
+            else:
+                await conn.execute(insert(self.audit_table), records)
+
+    @staticmethod
+    def _copy_row(record: Dict[str, Any]) -> tuple:
+        row = [record[column] for column in AUDIT_COLUMNS]
+        # COPY では json 列に文字列を渡す
+        row[AUDIT_COLUMNS.index('details')] = (
+            json.dumps(record['details'], ensure_ascii=False, default=str)
+            if record['details'] is not None else None
+        )
+        return tuple(row)
+
+    async def _ensure_guilds(self, conn, guild_ids: Iterable[int]) -> None:
+        missing = [guild_id for guild_id in guild_ids if guild_id not in self.known_guilds]
+        if not missing:
+            return
+        dialect = sqlite if conn.dialect.name == 'sqlite' else postgresql
+        stmt = dialect.insert(self.guild_table).on_conflict_do_nothing(index_elements=[self.guild_table.c.id])
+        await conn.execute(stmt, [{'id': guild_id} for guild_id in missing])
+        if len(self.known_guilds) + len(missing) > self.max_known_guilds:
+            self.known_guilds.clear()
+        self.known_guilds.update(missing)
+
+
+def get_audit_sink(bot) -> AuditSink:
+    """ボットに紐づいた共有 AuditSink を取得する（なければ作成する）"""
+    sink = getattr(bot, 'audit_sink', None)
+    if sink is None:
+        from database.database_connection import async_engine
+        from database.models import AuditLog, Guild
+
+        spill_path = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'modules', 'logs', 'audit_spill.jsonl'
+        )
+        sink = AuditSink(AuditLogWriter(async_engine, AuditLog.__table__, Guild.__table__), spill_path)
+        bot.audit_sink = sink
+    return sink
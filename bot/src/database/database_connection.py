@@ -1,21 +1,19 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import declarative_base
 from typing import AsyncGenerator
 import logging
-from config import DATABASE_CONFIG
 
 # ロガーの設定
 logger = logging.getLogger('database')
 
-# 同期エンジンの作成
-DATABASE_URL = f"postgresql://{DATABASE_CONFIG['user']}:{DATABASE_CONFIG['password']}@{DATABASE_CONFIG['host']}:{DATABASE_CONFIG['port']}/{DATABASE_CONFIG['database']}"
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-
-# 非同期エンジンの作成
-ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DATABASE_CONFIG['user']}:{DATABASE_CONFIG['password']}@{DATABASE_CONFIG['host']}:{DATABASE_CONFIG['port']}/{DATABASE_CONFIG['database']}"
-async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True)
+# 同期・非同期エンジン（bot.src.db と同じエンジンと接続プールを共有する）
+try:
+    from bot.src.db.engine import get_async_engine, get_sync_engine
+except ImportError:
+    from db.engine import get_async_engine, get_sync_engine
+engine = get_sync_engine()
+async_engine = get_async_engine()
 
 # セッションの作成
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -2,9 +2,10 @@ from typing import Optional, List, Any, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
 from sqlalchemy.future import select as future_select
-from .models import Guild, User, Warning, SpamLog, Timer, CustomCommand, AutoMod, AuditLog, SupportTicket
+from .models import Guild, User, Warning, SpamLog, Timer, TempBan, PendingVerification, LockdownSnapshot, CustomCommand, AutoMod, AuditLog, SupportTicket, InfractionCounter, Poll
+from .infraction_counters import get_infraction_counters
 import logging
-from sqlalchemy import or_
+from sqlalchemy import or_, tuple_
 
 logger = logging.getLogger('database_operations')
 
@@ -39,6 +40,13 @@ class DatabaseOperations:
             logger.error(f"Failed to update guild {guild_id}: {e}")
             return False
 
+    async def get_guild_log_channels(self) -> Dict[int, int]:
+        """ログチャンネルが設定されている全ギルドの {guild_id: log_channel_id} を取得します"""
+        result = await self.session.execute(
+            select(Guild.id, Guild.log_channel_id).where(Guild.log_channel_id.isnot(None))
+        )
+        return {guild_id: channel_id for guild_id, channel_id in result.all()}
+
     # User操作
     async def get_user(self, user_id: int) -> Optional[User]:
         """ユーザー情報を取得します"""
@@ -62,6 +70,10 @@ class DatabaseOperations:
             reason=reason
         )
         self.session.add(warning)
+        # 警告の件数も同じトランザクションで更新する
+        await get_infraction_counters(InfractionCounter.__table__).increment(
+            self.session, guild_id, user_id, 'warning'
+        )
         await self.session.commit()
         return warning
 
@@ -74,6 +86,33 @@ class DatabaseOperations:
         )
         return result.scalars().all()
 
+    async def clear_warnings(self, user_id: int, guild_id: int) -> None:
+        """ユーザーの警告履歴と警告の件数を削除します"""
+        await self.session.execute(
+            delete(Warning)
+            .where(Warning.user_id == user_id)
+            .where(Warning.guild_id == guild_id)
+        )
+        await get_infraction_counters(InfractionCounter.__table__).reset(
+            self.session, guild_id, user_id, 'warning'
+        )
+        await self.session.commit()
+
+    # 違反件数の操作
+    async def get_infraction_count(self, user_id: int, guild_id: int, infraction_type: str) -> int:
+        """集計期間内の違反件数を取得します（履歴は読まない）"""
+        return await get_infraction_counters(InfractionCounter.__table__).get_count(
+            self.session, guild_id, user_id, infraction_type
+        )
+
+    async def record_infraction(self, user_id: int, guild_id: int, infraction_type: str) -> int:
+        """違反を1件記録し、集計期間内の件数を返します"""
+        count = await get_infraction_counters(InfractionCounter.__table__).increment(
+            self.session, guild_id, user_id, infraction_type
+        )
+        await self.session.commit()
+        return count
+
     # SpamLog操作
     async def log_spam(self, user_id: int, guild_id: int, channel_id: int,
                       message_content: str, detection_type: str, action_taken: str) -> SpamLog:
@@ -105,17 +144,175 @@ class DatabaseOperations:
             interval=interval
         )
         self.session.add(timer)
+        await self.session.flush()
+        # コミット後も id などの属性を読めるようにセッションから切り離す
+        self.session.expunge(timer)
         await self.session.commit()
         return timer
 
-    async def get_expired_timers(self) -> List[Timer]:
-        """期限切れのタイマーを取得します"""
-        from datetime import datetime
+    async def get_pending_timers(self) -> List[Any]:
+        """全てのタイマーの (id, expires_at, channel_id, message, is_recurring, interval) を取得します"""
+        result = await self.session.execute(
+            select(Timer.id, Timer.expires_at, Timer.channel_id, Timer.message, Timer.is_recurring, Timer.interval)
+        )
+        return result.all()
+
+    async def get_user_timers(self, user_id: int, guild_id: int) -> List[Timer]:
+        """ユーザーのタイマーを期限の早い順に取得します"""
+        result = await self.session.execute(
+            select(Timer)
+            .where(Timer.user_id == user_id)
+            .where(Timer.guild_id == guild_id)
+            .order_by(Timer.expires_at)
+        )
+        return result.scalars().all()
+
+    async def complete_timers(self, deleted_ids: List[int], rescheduled: List[Any]) -> None:
+        """
+        期限が来たタイマーをまとめて処理します（1回のコミット）
+
+        Args:
+            deleted_ids (List[int]): 削除するタイマーのID
+            rescheduled (List): 次回の期限を設定する (id, expires_at) のリスト
+        """
+        if deleted_ids:
+            await self.session.execute(delete(Timer).where(Timer.id.in_(list(deleted_ids))))
+        if rescheduled:
+            await self.session.execute(
+                update(Timer),
+                [{'id': timer_id, 'expires_at': expires_at} for timer_id, expires_at in rescheduled]
+            )
+        await self.session.commit()
+
+    # TempBan操作
+    async def add_temp_bans(self, guild_id: int, user_ids: List[int],
+                            expires_at: Any, reason: Optional[str] = None) -> None:
+        """期限付きBANをまとめて登録します（既存の記録は期限を上書きします）"""
+        if not user_ids:
+            return
+        await self.session.execute(
+            delete(TempBan)
+            .where(TempBan.guild_id == guild_id)
+            .where(TempBan.user_id.in_(user_ids))
+        )
+        self.session.add_all([
+            TempBan(guild_id=guild_id, user_id=user_id, expires_at=expires_at, reason=reason)
+            for user_id in user_ids
+        ])
+        await self.session.commit()
+
+    async def get_temp_bans(self) -> List[TempBan]:
+        """全ての期限付きBANを期限の早い順に取得します"""
+        result = await self.session.execute(
+            select(TempBan).order_by(TempBan.expires_at)
+        )
+        return result.scalars().all()
+
+    async def delete_temp_bans(self, keys: List[Any]) -> None:
+        """(guild_id, user_id) の組で指定した期限付きBANをまとめて削除します"""
+        if not keys:
+            return
+        await self.session.execute(
+            delete(TempBan).where(tuple_(TempBan.guild_id, TempBan.user_id).in_(list(keys)))
+        )
+        await self.session.commit()
+
+    # Poll操作
+    async def create_poll(self, message_id: int, guild_id: int, channel_id: int, title: str,
+                          options: Optional[List[str]], multiple_choice: bool, expires_at: Any) -> None:
+        """進行中の投票を保存します"""
+        self.session.add(Poll(
+            message_id=message_id, guild_id=guild_id, channel_id=channel_id, title=title,
+            options=options, multiple_choice=multiple_choice, expires_at=expires_at,
+            voter_ids=b'', choices=b''
+        ))
+        await self.session.commit()
+
+    async def update_poll_votes(self, message_id: int, voter_ids: bytes, choices: bytes) -> None:
+        """投票の状態を更新します"""
+        await self.session.execute(
+            update(Poll)
+            .where(Poll.message_id == message_id)
+            .values(voter_ids=voter_ids, choices=choices)
+        )
+        await self.session.commit()
+
+    async def get_polls(self) -> List[Poll]:
+        """全ての進行中の投票を取得します"""
+        result = await self.session.execute(select(Poll))
+        return result.scalars().all()
+
+    async def delete_poll(self, message_id: int) -> None:
+        """終了した投票を削除します"""
+        await self.session.execute(delete(Poll).where(Poll.message_id == message_id))
+        await self.session.commit()
+
+    # PendingVerification操作
+    async def save_pending_verification(self, guild_id: int, user_id: int, code: str,
+                                        expires_at: Any, attempts: int = 0) -> None:
+        """キャプチャ認証の待ち状態を保存します（既存の記録は上書きします）"""
+        await self.session.execute(
+            delete(PendingVerification)
+            .where(PendingVerification.guild_id == guild_id)
+            .where(PendingVerification.user_id == user_id)
+        )
+        self.session.add(PendingVerification(
+            guild_id=guild_id, user_id=user_id, code=code,
+            expires_at=expires_at, attempts=attempts
+        ))
+        await self.session.commit()
+
+    async def update_pending_verification_attempts(self, guild_id: int, user_id: int,
+                                                   attempts: int) -> None:
+        """キャプチャ認証の試行回数を更新します"""
+        await self.session.execute(
+            update(PendingVerification)
+            .where(PendingVerification.guild_id == guild_id)
+            .where(PendingVerification.user_id == user_id)
+            .values(attempts=attempts)
+        )
+        await self.session.commit()
+
+    async def get_pending_verifications(self) -> List[PendingVerification]:
+        """全てのキャプチャ認証の待ち状態を期限の早い順に取得します"""
         result = await self.session.execute(
-            select(Timer).filter(Timer.expires_at <= datetime.utcnow())
+            select(PendingVerification).order_by(PendingVerification.expires_at)
         )
         return result.scalars().all()
 
+    async def delete_pending_verifications(self, keys: List[Any]) -> None:
+        """(guild_id, user_id) の組で指定したキャプチャ認証の待ち状態をまとめて削除します"""
+        if not keys:
+            return
+        await self.session.execute(
+            delete(PendingVerification).where(
+                tuple_(PendingVerification.guild_id, PendingVerification.user_id).in_(list(keys))
+            )
+        )
+        await self.session.commit()
+
+    # LockdownSnapshot操作
+    async def save_lockdown_snapshot(self, guild_id: int, overwrites: List[Any],
+                                     restore_at: Any = None) -> None:
+        """ロックダウン前の権限上書き (channel_id, allow, deny) を保存します（ギルドの既存の記録は置き換えます）"""
+        await self.session.execute(delete(LockdownSnapshot).where(LockdownSnapshot.guild_id == guild_id))
+        self.session.add_all([
+            LockdownSnapshot(guild_id=guild_id, channel_id=channel_id, allow=allow, deny=deny,
+                             restore_at=restore_at)
+            for channel_id, allow, deny in overwrites
+        ])
+        await self.session.commit()
+
+    async def get_lockdown_snapshots(self) -> List[LockdownSnapshot]:
+        """全てのロック中のギルドの権限上書きを取得します"""
+        result = await self.session.execute(select(LockdownSnapshot))
+        return result.scalars().all()
+
+    async def delete_lockdown_snapshot(self, guild_id: int) -> None:
+        """解除したギルドの権限上書きを削除します"""
+        await self.session.execute(delete(LockdownSnapshot).where(LockdownSnapshot.guild_id == guild_id))
+        await self.session.commit()
+
     # CustomCommand操作
     async def create_custom_command(self, guild_id: int, name: str,
                                   response: str, created_by: int) -> CustomCommand:
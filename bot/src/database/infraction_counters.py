@@ -0,0 +1,195 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, delete, event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger('database.infraction_counters')
+
+# 種類ごとの集計期間（秒）。None は期限なし（リセットされるまで数える）
+#   warning: 警告の回数（/clearwarnings まで累計）
+#   automod: 自動モデレーションの違反回数（最初の違反から1時間で数え直す）
+WINDOWS: Dict[str, Optional[int]] = {
+    'warning': None,
+    'automod': 3600,
+}
+
+# 期限なしの種類で使う、集計期間の開始がこれより前になることのない日時
+_NEVER = datetime(1970, 1, 1)
+
+# session.info に保存する、コミット後に反映するキャッシュの更新
+_PENDING_KEY = 'infraction_counters_pending'
+
+
+class InfractionCounters:
+    """
+    infraction_counters テーブルの更新と読み取り
+
+    警告や違反を記録するたびに同じトランザクションで件数を1つの UPSERT で更新し、
+    エスカレーションの判定では履歴を読まずに件数の1行（またはキャッシュ）だけを参照します。
+    キャッシュはコミットされた値だけを保持し、他のプロセスの更新を取り込むため
+    cache_ttl 秒で期限切れにします。
+    """
+
+    def __init__(self, table, windows: Dict[str, Optional[int]] = WINDOWS,
+                 cache_ttl: float = 60.0, max_cached: int = 100_000):
+        """
+        コンストラクタ
+
+        Args:
+            table: infraction_counters の Table
+            windows (Dict): 種類 → 集計期間（秒、None は期限なし）
+            cache_ttl (float): キャッシュの有効期間（秒）
+            max_cached (int): キャッシュする件数の上限（超えた分は古いものから捨てる）
+        """
+        self.table = table
+        self.windows = windows
+        self.cache_ttl = cache_ttl
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[Tuple[int, int, str], Tuple[int, int, datetime, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _cutoff(self, infraction_type: str, now: datetime) -> datetime:
+        window = self.windows.get(infraction_type)
+        return _NEVER if window is None else now - timedelta(seconds=window)
+
+    def _current(self, infraction_type: str, window_count: int, window_started_at: datetime, now: datetime) -> int:
+        """集計期間が過ぎていれば0、そうでなければ期間内の件数"""
+        return window_count if window_started_at > self._cutoff(infraction_type, now) else 0
+
+    async def increment(self, session, guild_id: int, user_id: int, infraction_type: str,
+                        now: Optional[datetime] = None) -> int:
+        """
+        件数を1つ増やします（コミットは呼び出し側で行う）。
+
+        Args:
+            session: AsyncSession
+            guild_id (int): ギルドID
+            user_id (int): ユーザーID
+            infraction_type (str): 種類（warning, automod）
+            now (datetime, optional): 現在時刻（テスト用）
+
+        Returns:
+            int: 増やした後の集計期間内の件数
+        """
+        now = now or datetime.utcnow()
+        table = self.table
+        dialect = sqlite if session.get_bind().dialect.name == 'sqlite' else postgresql
+        expired = table.c.window_started_at <= self._cutoff(infraction_type, now)
+        stmt = dialect.insert(table).values(
+            guild_id=guild_id, user_id=user_id, infraction_type=infraction_type,
+            total=1, window_count=1, window_started_at=now, last_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.guild_id, table.c.user_id, table.c.infraction_type],
+            set_={
+                'total': table.c.total + 1,
+                'window_count': case((expired, 1), else_=table.c.window_count + 1),
+                'window_started_at': case((expired, now), else_=table.c.window_started_at),
+                'last_at': now,
+            },
+        ).returning(table.c.total, table.c.window_count, table.c.window_started_at)
+        total, window_count, window_started_at = (await session.execute(stmt)).one()
+        self._on_commit(session, (guild_id, user_id, infraction_type), (total, window_count, window_started_at))
+        return window_count
+
+    async def get_count(self, session, guild_id: int, user_id: int, infraction_type: str,
+                        now: Optional[datetime] = None) -> int:
+        """
+        集計期間内の件数を返します（キャッシュにあればクエリを実行しない）。
+
+        Args:
+            session: AsyncSession
+            guild_id (int): ギルドID
+            user_id (int): ユーザーID
+            infraction_type (str): 種類（warning, automod）
+            now (datetime, optional): 現在時刻（テスト用）
+
+        Returns:
+            int: 件数
+        """
+        now = now or datetime.utcnow()
+        key = (guild_id, user_id, infraction_type)
+        cached = self._cached(key)
+        if cached is None:
+            table = self.table
+            row = (await session.execute(
+                select(table.c.total, table.c.window_count, table.c.window_started_at).where(
+                    table.c.guild_id == guild_id,
+                    table.c.user_id == user_id,
+                    table.c.infraction_type == infraction_type,
+                )
+            )).one_or_none()
+            cached = tuple(row) if row is not None else (0, 0, _NEVER)
+            self._store(key, cached)
+        _, window_count, window_started_at = cached
+        return self._current(infraction_type, window_count, window_started_at, now)
+
+    async def reset(self, session, guild_id: int, user_id: int, infraction_type: str) -> None:
+        """件数を消去します（コミットは呼び出し側で行う）"""
+        table = self.table
+        await session.execute(delete(table).where(
+            table.c.guild_id == guild_id,
+            table.c.user_id == user_id,
+            table.c.infraction_type == infraction_type,
+        ))
+        self._on_commit(session, (guild_id, user_id, infraction_type), (0, 0, _NEVER))
+
+    def _cached(self, key: Tuple[int, int, str]) -> Optional[Tuple[int, int, datetime]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[3] > time.monotonic():
+                self.stats['hits'] += 1
+                return entry[:3]
+            self.stats['misses'] += 1
+            return None
+
+    def _store(self, key: Tuple[int, int, str], value: Tuple[int, int, datetime]) -> None:
+        with self._lock:
+            self._cache[key] = (*value, time.monotonic() + self.cache_ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+    def _on_commit(self, session, key, value) -> None:
+        # コミットされるまでは他のセッションに見えないため、キャッシュはコミット後に更新する
+        with self._lock:
+            self._cache.pop(key, None)
+        sync_session = getattr(session, 'sync_session', session)
+        sync_session.info.setdefault(_PENDING_KEY, []).append((self, key, value))
+
+    def clear(self) -> None:
+        """キャッシュを消去します"""
+        with self._lock:
+            self._cache.clear()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session: Session) -> None:
+    for counters, key, value in session.info.pop(_PENDING_KEY, ()):
+        counters._store(key, value)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+_counters: Optional[InfractionCounters] = None
+
+
+def get_infraction_counters(table=None) -> InfractionCounters:
+    """共有の InfractionCounters を取得する（なければ作成する）"""
+    global _counters
+    if _counters is None:
+        if table is None:
+            from database.models import InfractionCounter
+            table = InfractionCounter.__table__
+        _counters = InfractionCounters(table)
+    return _counters
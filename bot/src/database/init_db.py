@@ -1,6 +1,6 @@
 import os
 import logging
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
@@ -14,11 +14,14 @@ logger = logging.getLogger('ShardBot.Database')
 # データベースのベースクラスを定義
 Base = declarative_base()
 
-# データベースのURL
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite+aiosqlite:///bot.db')
+# エンジン（bot.src.db と同じエンジンと接続プールを共有する。DATABASE_URL があればその接続先を使う）
+try:
+    from bot.src.db.engine import get_async_engine
+except ImportError:
+    from db.engine import get_async_engine
+engine = get_async_engine()
 
-# エンジンとセッションファクトリの作成
-engine = create_async_engine(DATABASE_URL, echo=False)
+# セッションファクトリの作成
 async_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
@@ -36,7 +39,7 @@ async def init_db():
 def init_database():
     """データベースエンジンとセッションファクトリを作成"""
     try:
-        logger.info(f"データベースに接続: {DATABASE_URL}")
+        logger.info(f"データベースに接続: {engine.url.render_as_string(hide_password=True)}")
         return engine, async_session
     except Exception as e:
         logger.error(f"データベースの初期化に失敗: {e}")
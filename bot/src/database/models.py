@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, BigInteger
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Text, BigInteger, UniqueConstraint, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -47,6 +47,18 @@ class Warning(Base):
     reason = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class InfractionCounter(Base):
+    """メンバーごとの警告・違反の件数（エスカレーションの判定用。警告や違反の記録と同じトランザクションで更新する）"""
+    __tablename__ = 'infraction_counters'
+    
+    guild_id = Column(BigInteger, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    infraction_type = Column(String(32), primary_key=True)  # warning, automod
+    total = Column(Integer, nullable=False, default=0)  # 累計（リセットされるまで）
+    window_count = Column(Integer, nullable=False, default=0)  # window_started_at 以降の件数
+    window_started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_at = Column(DateTime, default=datetime.utcnow)
+
 class SpamLog(Base):
     """スパム検出ログを保存するテーブル"""
     __tablename__ = 'spam_logs'
@@ -74,6 +86,66 @@ class Timer(Base):
     interval = Column(Integer)  # 繰り返し間隔（秒）
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class TempBan(Base):
+    """期限付きBANを保存するテーブル（期限順に読み込んで解除する）"""
+    __tablename__ = 'temp_bans'
+    __table_args__ = (
+        UniqueConstraint('guild_id', 'user_id', name='uq_temp_bans_guild_user'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    reason = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PendingVerification(Base):
+    """キャプチャ認証の待ち状態を保存するテーブル（再起動後も認証を続けられるようにする）"""
+    __tablename__ = 'pending_verifications'
+    __table_args__ = (
+        UniqueConstraint('guild_id', 'user_id', name='uq_pending_verifications_guild_user'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
+    code = Column(String(32), nullable=False)
+    attempts = Column(Integer, default=0)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class LockdownSnapshot(Base):
+    """ロックダウン前の @everyone の権限上書きを保存するテーブル（再起動後も元の状態に戻せるようにする）"""
+    __tablename__ = 'lockdown_snapshots'
+    __table_args__ = (
+        UniqueConstraint('guild_id', 'channel_id', name='uq_lockdown_snapshots_guild_channel'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False, index=True)
+    channel_id = Column(BigInteger, nullable=False)
+    allow = Column(BigInteger)  # None は上書きがなかったチャンネル
+    deny = Column(BigInteger)
+    restore_at = Column(DateTime)  # 自動で解除する時刻（None は手動で解除する）
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Poll(Base):
+    """進行中の投票を保存するテーブル（再起動後も投票と終了時刻を引き継ぐ）"""
+    __tablename__ = 'polls'
+    
+    message_id = Column(BigInteger, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)
+    channel_id = Column(BigInteger, nullable=False)
+    title = Column(Text, nullable=False)
+    options = Column(JSON)  # 選択肢（None は賛成/反対の投票）
+    multiple_choice = Column(Boolean, default=False)
+    expires_at = Column(DateTime, index=True)
+    voter_ids = Column(LargeBinary)  # 投票者のユーザーID（昇順、8バイトずつ）
+    choices = Column(LargeBinary)  # 投票者ごとの選択肢のビットマスク（2バイトずつ）
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class CustomCommand(Base):
     """カスタムコマンドを保存するテーブル"""
     __tablename__ = 'custom_commands'
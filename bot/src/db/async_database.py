@@ -0,0 +1,337 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncGenerator, Callable, Optional, Tuple, Type, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from dotenv import load_dotenv
+
+from bot.src.db.identity_map import guild_ids, user_ids, remember_on_commit
+from bot.src.db import engine as engine_factory
+
+# 環境変数のロード
+load_dotenv()
+
+# ロガーの設定
+logger = logging.getLogger('bot.database.async')
+
+T = TypeVar('T')
+
+
+_session_factory: Optional[async_sessionmaker] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def configure_async_engine(url: Optional[str] = None, **engine_options) -> AsyncEngine:
+    """
+    共有の非同期エンジン（asyncpg）を作成します。
+    url を省略した場合は設定の接続情報と、接続数の予算から割り当てたプールを使用します。
+
+    Args:
+        url (str, optional): 接続URL（テストでは sqlite+aiosqlite など）
+        **engine_options: create_async_engine に渡す追加のオプション
+
+    Returns:
+        AsyncEngine: 作成したエンジン
+    """
+    global _session_factory
+    engine = engine_factory.configure_async_engine(url, **engine_options)
+    _session_factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    return engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """共有の非同期エンジンを取得します（未作成の場合は作成します）"""
+    return engine_factory.get_async_engine()
+
+
+def _get_session_factory() -> async_sessionmaker:
+    global _session_factory
+    engine = get_async_engine()
+    if _session_factory is None or _session_factory.kw.get('bind') is not engine:
+        _session_factory = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    return _session_factory
+
+
+@asynccontextmanager
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    非同期データベースセッションのコンテキストマネージャー。
+    正常に終了した場合はコミットし、例外の場合はロールバックします。
+
+    Example:
+        async with get_async_session() as session:
+            guild = await get_or_create_guild(session, guild_id)
+
+    Yields:
+        AsyncSession: SQLAlchemyの非同期セッション
+    """
+    session = _get_session_factory()()
+    try:
+        yield session
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"データベースセッション中にエラーが発生しました: {e}")
+        raise
+    finally:
+        await session.close()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # 同期エンジンのプールの大きさを超えてスレッドが接続を待たないようにする
+        _executor = ThreadPoolExecutor(
+            max_workers=engine_factory.sync_pool_size(),
+            thread_name_prefix='db-sync'
+        )
+    return _executor
+
+
+async def run_in_threadpool(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    同期のデータベース処理をスレッドプールで実行します。
+    非同期版に移行していない呼び出し元のための一時的な手段です。
+
+    Args:
+        func (Callable): 実行する同期関数
+        *args, **kwargs: func に渡す引数
+
+    Returns:
+        func の戻り値
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+async def get_or_create(session: AsyncSession, model: Type[T], **kwargs) -> Tuple[T, bool]:
+    """指定されたモデルのインスタンスを取得または作成"""
+    result = await session.execute(select(model).filter_by(**kwargs).limit(1))
+    instance = result.scalars().first()
+    if instance:
+        return instance, False
+    instance = model(**kwargs)
+    session.add(instance)
+    await session.flush()
+    return instance, True
+
+
+async def get_or_create_guild(session: AsyncSession, guild_id: str):
+    """
+    ギルドを取得し、存在しない場合は仮の名前で作成します。
+
+    Args:
+        session (AsyncSession): 非同期セッション
+        guild_id (str): DiscordギルドID
+
+    Returns:
+        Guild: ギルド
+    """
+    from bot.src.db.models import Guild
+
+    result = await session.execute(select(Guild).where(Guild.discord_id == str(guild_id)).limit(1))
+    guild = result.scalars().first()
+    if not guild:
+        guild = Guild(discord_id=str(guild_id), name=f"Guild-{guild_id}", owner_id="0")
+        session.add(guild)
+        await session.flush()  # IDを生成するためにフラッシュ
+        remember_on_commit(session, guild_ids, guild_id, guild.id)
+    else:
+        guild_ids.put(guild_id, guild.id)
+    return guild
+
+
+async def resolve_guild_pk(session: AsyncSession, guild_id: str) -> int:
+    """
+    ギルドの内部IDを返します。対応表に記憶していればクエリを実行しません。
+    ギルドが存在しない場合は仮の名前で作成します。
+
+    Args:
+        session (AsyncSession): 非同期セッション
+        guild_id (str): DiscordギルドID
+
+    Returns:
+        int: ギルドの内部ID
+    """
+    from bot.src.db.models import Guild
+
+    pk = guild_ids.get(guild_id)
+    if pk is not None:
+        return pk
+    result = await session.execute(select(Guild.id).where(Guild.discord_id == str(guild_id)).limit(1))
+    pk = result.scalar()
+    if pk is not None:
+        guild_ids.put(guild_id, pk)
+        return pk
+    return (await get_or_create_guild(session, guild_id)).id
+
+
+async def resolve_user_pk(session: AsyncSession, user_id: str) -> int:
+    """
+    ユーザーの内部IDを返します。対応表に記憶していればクエリを実行しません。
+    ユーザーが存在しない場合は仮の名前で作成します。
+
+    Args:
+        session (AsyncSession): 非同期セッション
+        user_id (str): DiscordユーザーID
+
+    Returns:
+        int: ユーザーの内部ID
+    """
+    from bot.src.db.models import User
+
+    pk = user_ids.get(user_id)
+    if pk is not None:
+        return pk
+    result = await session.execute(select(User.id).where(User.user_id == str(user_id)).limit(1))
+    pk = result.scalar()
+    if pk is not None:
+        user_ids.put(user_id, pk)
+        return pk
+    user = User(user_id=str(user_id), username=f"User-{user_id}")
+    session.add(user)
+    await session.flush()
+    remember_on_commit(session, user_ids, user_id, user.id)
+    return user.id
+
+
+async def _get_or_create_settings(model, guild_id: str):
+    """ギルドの設定を取得し、存在しない場合はデフォルト設定を作成します"""
+    async with get_async_session() as session:
+        guild_pk = await resolve_guild_pk(session, guild_id)
+        result = await session.execute(select(model).where(model.guild_id == guild_pk).limit(1))
+        settings = result.scalars().first()
+        if not settings:
+            settings = model(guild_id=guild_pk)
+            session.add(settings)
+            await session.flush()
+            # デフォルト値を読み込んでからセッションを閉じる
+            await session.refresh(settings)
+        return settings
+
+
+async def get_guild_settings(guild_id: str):
+    """
+    ギルドの設定を取得します。
+    存在しない場合はデフォルト設定を返します。
+
+    Args:
+        guild_id (str): DiscordギルドID
+
+    Returns:
+        GuildSettings: ギルドの設定
+    """
+    from bot.src.db.models import GuildSettings
+    return await _get_or_create_settings(GuildSettings, guild_id)
+
+
+async def get_ai_mod_settings(guild_id: str):
+    """
+    ギルドのAIモデレーション設定を取得します。
+    存在しない場合はデフォルト設定を返します。
+
+    Args:
+        guild_id (str): DiscordギルドID
+
+    Returns:
+        AIModSettings: AIモデレーション設定
+    """
+    from bot.src.db.models import AIModSettings
+    return await _get_or_create_settings(AIModSettings, guild_id)
+
+
+async def get_auto_response_settings(guild_id: str):
+    """
+    ギルドの自動応答設定を取得します。
+    存在しない場合はデフォルト設定を返します。
+
+    Args:
+        guild_id (str): DiscordギルドID
+
+    Returns:
+        AutoResponseSettings: 自動応答設定
+    """
+    from bot.src.db.models import AutoResponseSettings
+    return await _get_or_create_settings(AutoResponseSettings, guild_id)
+
+
+async def get_raid_settings(guild_id: str):
+    """
+    ギルドのレイド保護設定を取得します。
+    存在しない場合はデフォルト設定を返します。
+
+    Args:
+        guild_id (str): DiscordギルドID
+
+    Returns:
+        RaidSettings: レイド保護設定
+    """
+    from bot.src.db.models import RaidSettings
+    return await _get_or_create_settings(RaidSettings, guild_id)
+
+
+async def get_spam_settings(guild_id: str):
+    """
+    ギルドのスパム保護設定を取得します。
+    存在しない場合はデフォルト設定を返します。
+
+    Args:
+        guild_id (str): DiscordギルドID
+
+    Returns:
+        SpamSettings: スパム保護設定
+    """
+    from bot.src.db.models import SpamSettings
+    return await _get_or_create_settings(SpamSettings, guild_id)
+
+
+async def log_audit_event(guild_id: str, user_id: str, action: str, target_id: str = None,
+                          target_type: str = None, details: dict = None) -> int:
+    """
+    監査ログを記録します。
+
+    Args:
+        guild_id (str): DiscordギルドID
+        user_id (str): 実行者のDiscordユーザーID
+        action (str): 実行されたアクション
+        target_id (str, optional): 対象ID
+        target_type (str, optional): 対象タイプ
+        details (dict, optional): 詳細情報
+
+    Returns:
+        int: 監査ログのID
+    """
+    from bot.src.db.models import AuditLog
+
+    async with get_async_session() as session:
+        # ギルドとユーザーの内部IDを取得（なければ作成）
+        guild_pk = await resolve_guild_pk(session, guild_id)
+        user_pk = await resolve_user_pk(session, user_id)
+
+        # 監査ログを作成
+        log = AuditLog(
+            guild_id=guild_pk,
+            user_id=user_pk,
+            action=action,
+            target_id=target_id,
+            target_type=target_type,
+            details=details or {}
+        )
+        session.add(log)
+        await session.flush()
+        return log.id
+
+
+async def close_async_db() -> None:
+    """非同期エンジンとスレッドプールを閉じる"""
+    global _session_factory, _executor
+    await engine_factory.dispose_async_engine()
+    _session_factory = None
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+    logger.info("非同期データベース接続を閉じました")
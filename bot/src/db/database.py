@@ -1,43 +1,21 @@
 import os
 import logging
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
 from typing import Generator
 from dotenv import load_dotenv
 
+from bot.src.db.engine import get_sync_engine
+
 # 環境変数のロード
 load_dotenv()
 
 # ロガーの設定
 logger = logging.getLogger('bot.database')
 
-# 環境変数から接続情報を取得
-DB_HOST = os.getenv('DB_HOST', 'localhost')
-DB_PORT = os.getenv('DB_PORT', '5432')
-DB_NAME = os.getenv('DB_NAME', 'shardbot')
-DB_USER = os.getenv('DB_USER', 'postgres')
-DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
-DB_SSL_MODE = os.getenv('DB_SSL_MODE', 'disable')
-
-# SQLAlchemy接続URL
-DB_URL = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-
-# エンジンの作成
-engine = create_engine(
-    DB_URL,
-    pool_size=10,
-    max_overflow=20,
-    pool_recycle=3600,
-    pool_pre_ping=True,
-    poolclass=QueuePool,
-    connect_args={
-        'sslmode': 'disable',  # SSLを無効化
-        'connect_timeout': 10
-    }
-)
+# 共有の同期エンジン（接続情報とプールの大きさは bot.src.db.engine が設定から決める）
+engine = get_sync_engine()
 
 # セッションファクトリを作成
 SessionFactory = sessionmaker(bind=engine)
@@ -84,7 +62,49 @@ def get_db_session() -> Generator:
     finally:
         session.close()
 
-async def get_guild_settings(guild_id: str):
+def _resolve_guild_pk(session, guild_id: str) -> int:
+    """
+    ギルドの内部IDを返します（対応表に記憶していればクエリを実行しません）。
+    存在しない場合は仮の名前で作成し、コミット後に対応表へ記憶します。
+    """
+    from bot.src.db.models import Guild
+    from bot.src.db.identity_map import guild_ids, remember_on_commit
+    
+    pk = guild_ids.get(guild_id)
+    if pk is not None:
+        return pk
+    pk = session.query(Guild.id).filter(Guild.discord_id == str(guild_id)).scalar()
+    if pk is not None:
+        guild_ids.put(guild_id, pk)
+        return pk
+    guild = Guild(discord_id=str(guild_id), name=f"Guild-{guild_id}", owner_id="0")
+    session.add(guild)
+    session.flush()  # IDを生成するためにフラッシュ
+    remember_on_commit(session, guild_ids, guild_id, guild.id)
+    return guild.id
+
+def _resolve_user_pk(session, user_id: str) -> int:
+    """
+    ユーザーの内部IDを返します（対応表に記憶していればクエリを実行しません）。
+    存在しない場合は仮の名前で作成し、コミット後に対応表へ記憶します。
+    """
+    from bot.src.db.models import User
+    from bot.src.db.identity_map import user_ids, remember_on_commit
+    
+    pk = user_ids.get(user_id)
+    if pk is not None:
+        return pk
+    pk = session.query(User.id).filter(User.user_id == str(user_id)).scalar()
+    if pk is not None:
+        user_ids.put(user_id, pk)
+        return pk
+    user = User(user_id=str(user_id), username=f"User-{user_id}")
+    session.add(user)
+    session.flush()
+    remember_on_commit(session, user_ids, user_id, user.id)
+    return user.id
+
+def _get_guild_settings_sync(guild_id: str):
     """
     ギルドの設定を取得します。
     存在しない場合はデフォルト設定を返します。
@@ -95,34 +115,22 @@ async def get_guild_settings(guild_id: str):
     Returns:
         GuildSettings: ギルドの設定
     """
-    from bot.src.db.models import Guild, GuildSettings
+    from bot.src.db.models import GuildSettings
     
     with get_db_session() as session:
-        # ギルドを検索
-        guild = session.query(Guild).filter(Guild.discord_id == guild_id).first()
+        # ギルドの内部IDを取得（存在しない場合は新規作成）
+        guild_pk = _resolve_guild_pk(session, guild_id)
+        settings = session.query(GuildSettings).filter(GuildSettings.guild_id == guild_pk).first()
         
-        # ギルドが存在しない場合は新規作成
-        if not guild:
-            guild = Guild(discord_id=guild_id, name=f"Guild-{guild_id}", owner_id="0")
-            session.add(guild)
-            session.flush()  # IDを生成するためにフラッシュ
-            
-            # デフォルト設定を作成
-            settings = GuildSettings(guild_id=guild.id)
+        # 設定がない場合は新規作成
+        if not settings:
+            settings = GuildSettings(guild_id=guild_pk)
             session.add(settings)
             session.commit()
-            return settings
-        
-        # 既存のギルドに設定がない場合は新規作成
-        if not guild.settings:
-            settings = GuildSettings(guild_id=guild.id)
-            session.add(settings)
-            session.commit()
-            return settings
             
-        return guild.settings
+        return settings
 
-async def get_ai_mod_settings(guild_id: str):
+def _get_ai_mod_settings_sync(guild_id: str):
     """
     ギルドのAIモデレーション設定を取得します。
     存在しない場合はデフォルト設定を返します。
@@ -133,28 +141,22 @@ async def get_ai_mod_settings(guild_id: str):
     Returns:
         AIModSettings: AIモデレーション設定
     """
-    from bot.src.db.models import Guild, AIModSettings
+    from bot.src.db.models import AIModSettings
     
     with get_db_session() as session:
-        # ギルドを検索
-        guild = session.query(Guild).filter(Guild.discord_id == guild_id).first()
-        
-        # ギルドが存在しない場合は新規作成
-        if not guild:
-            guild = Guild(discord_id=guild_id, name=f"Guild-{guild_id}", owner_id="0")
-            session.add(guild)
-            session.flush()  # IDを生成するためにフラッシュ
+        # ギルドの内部IDを取得（存在しない場合は新規作成）
+        guild_pk = _resolve_guild_pk(session, guild_id)
+        settings = session.query(AIModSettings).filter(AIModSettings.guild_id == guild_pk).first()
         
-        # 既存のギルドにAIモデレーション設定がない場合は新規作成
-        if not guild.ai_mod_settings:
-            settings = AIModSettings(guild_id=guild.id)
+        # AIモデレーション設定がない場合は新規作成
+        if not settings:
+            settings = AIModSettings(guild_id=guild_pk)
             session.add(settings)
             session.commit()
-            return settings
             
-        return guild.ai_mod_settings
+        return settings
 
-async def get_auto_response_settings(guild_id: str):
+def _get_auto_response_settings_sync(guild_id: str):
     """
     ギルドの自動応答設定を取得します。
     存在しない場合はデフォルト設定を返します。
@@ -165,21 +167,16 @@ async def get_auto_response_settings(guild_id: str):
     Returns:
         AutoResponseSettings: 自動応答設定
     """
-    from bot.src.db.models import Guild, AutoResponseSettings
+    from bot.src.db.models import AutoResponseSettings
     
     with get_db_session() as session:
-        # ギルドを検索
-        guild = session.query(Guild).filter(Guild.discord_id == guild_id).first()
-        
-        # ギルドが存在しない場合は新規作成
-        if not guild:
-            guild = Guild(discord_id=guild_id, name=f"Guild-{guild_id}", owner_id="0")
-            session.add(guild)
-            session.flush()  # IDを生成するためにフラッシュ
+        # ギルドの内部IDを取得（存在しない場合は新規作成）
+        guild_pk = _resolve_guild_pk(session, guild_id)
+        settings = session.query(AutoResponseSettings).filter(AutoResponseSettings.guild_id == guild_pk).first()
         
-        # 既存のギルドに自動応答設定がない場合は新規作成
-        if not guild.auto_response_settings:
-            settings = AutoResponseSettings(guild_id=guild.id)
+        # 自動応答設定がない場合は新規作成
+        if not settings:
+            settings = AutoResponseSettings(guild_id=guild_pk)
             session.add(settings)
             session.commit()
             # オブジェクトをデタッチする前に必要な属性を全て読み込む
@@ -202,7 +199,6 @@ async def get_auto_response_settings(guild_id: str):
             return settings
             
         # 既存の設定を読み込んでデタッチ
-        settings = guild.auto_response_settings
         # オブジェクトをデタッチする前に必要な属性を全て読み込む
         settings_dict = {
             'id': settings.id,
@@ -222,7 +218,7 @@ async def get_auto_response_settings(guild_id: str):
         session.expunge(settings)
         return settings
 
-async def get_raid_settings(guild_id: str):
+def _get_raid_settings_sync(guild_id: str):
     """
     ギルドのレイド保護設定を取得します。
     存在しない場合はデフォルト設定を返します。
@@ -233,28 +229,22 @@ async def get_raid_settings(guild_id: str):
     Returns:
         RaidSettings: レイド保護設定
     """
-    from bot.src.db.models import Guild, RaidSettings
+    from bot.src.db.models import RaidSettings
     
     with get_db_session() as session:
-        # ギルドを検索
-        guild = session.query(Guild).filter(Guild.discord_id == guild_id).first()
-        
-        # ギルドが存在しない場合は新規作成
-        if not guild:
-            guild = Guild(discord_id=guild_id, name=f"Guild-{guild_id}", owner_id="0")
-            session.add(guild)
-            session.flush()  # IDを生成するためにフラッシュ
+        # ギルドの内部IDを取得（存在しない場合は新規作成）
+        guild_pk = _resolve_guild_pk(session, guild_id)
+        settings = session.query(RaidSettings).filter(RaidSettings.guild_id == guild_pk).first()
         
-        # 既存のギルドにレイド保護設定がない場合は新規作成
-        if not guild.raid_settings:
-            settings = RaidSettings(guild_id=guild.id)
+        # レイド保護設定がない場合は新規作成
+        if not settings:
+            settings = RaidSettings(guild_id=guild_pk)
             session.add(settings)
             session.commit()
-            return settings
             
-        return guild.raid_settings
+        return settings
 
-async def get_spam_settings(guild_id: str):
+def _get_spam_settings_sync(guild_id: str):
     """
     ギルドのスパム保護設定を取得します。
     存在しない場合はデフォルト設定を返します。
@@ -265,28 +255,22 @@ async def get_spam_settings(guild_id: str):
     Returns:
         SpamSettings: スパム保護設定
     """
-    from bot.src.db.models import Guild, SpamSettings
+    from bot.src.db.models import SpamSettings
     
     with get_db_session() as session:
-        # ギルドを検索
-        guild = session.query(Guild).filter(Guild.discord_id == guild_id).first()
-        
-        # ギルドが存在しない場合は新規作成
-        if not guild:
-            guild = Guild(discord_id=guild_id, name=f"Guild-{guild_id}", owner_id="0")
-            session.add(guild)
-            session.flush()  # IDを生成するためにフラッシュ
+        # ギルドの内部IDを取得（存在しない場合は新規作成）
+        guild_pk = _resolve_guild_pk(session, guild_id)
+        settings = session.query(SpamSettings).filter(SpamSettings.guild_id == guild_pk).first()
         
-        # 既存のギルドにスパム保護設定がない場合は新規作成
-        if not guild.spam_settings:
-            settings = SpamSettings(guild_id=guild.id)
+        # スパム保護設定がない場合は新規作成
+        if not settings:
+            settings = SpamSettings(guild_id=guild_pk)
             session.add(settings)
             session.commit()
-            return settings
             
-        return guild.spam_settings
+        return settings
 
-async def log_audit_event(guild_id: str, user_id: str, action: str, target_id: str = None, 
+def _log_audit_event_sync(guild_id: str, user_id: str, action: str, target_id: str = None, 
                         target_type: str = None, details: dict = None):
     """
     監査ログを記録します。
@@ -299,27 +283,17 @@ async def log_audit_event(guild_id: str, user_id: str, action: str, target_id: s
         target_type (str, optional): 対象タイプ
         details (dict, optional): 詳細情報
     """
-    from bot.src.db.models import AuditLog, Guild, User
+    from bot.src.db.models import AuditLog
     
     with get_db_session() as session:
-        # ギルドが存在するか確認
-        guild = session.query(Guild).filter(Guild.discord_id == guild_id).first()
-        if not guild:
-            guild = Guild(discord_id=guild_id, name=f"Guild-{guild_id}", owner_id="0")
-            session.add(guild)
-            session.flush()
-        
-        # ユーザーが存在するか確認
-        user = session.query(User).filter(User.discord_id == user_id).first()
-        if not user:
-            user = User(discord_id=user_id, username=f"User-{user_id}")
-            session.add(user)
-            session.flush()
+        # ギルドとユーザーの内部IDを取得（存在しない場合は新規作成）
+        guild_pk = _resolve_guild_pk(session, guild_id)
+        user_pk = _resolve_user_pk(session, user_id)
         
         # 監査ログを作成
         log = AuditLog(
-            guild_id=guild.id,
-            user_id=user.id,
+            guild_id=guild_pk,
+            user_id=user_pk,
             action=action,
             target_id=target_id,
             target_type=target_type,
@@ -331,6 +305,42 @@ async def log_audit_event(guild_id: str, user_id: str, action: str, target_id: s
         
         return log.id
 
+# 以下は同期版をスレッドプールで実行する一時的な互換関数です。
+# イベントループを止めないよう、新しいコードでは bot.src.db.async_database の非同期版を使用してください。
+
+async def get_guild_settings(guild_id: str):
+    """ギルドの設定を取得します（同期版をスレッドプールで実行）"""
+    from bot.src.db.async_database import run_in_threadpool
+    return await run_in_threadpool(_get_guild_settings_sync, guild_id)
+
+async def get_ai_mod_settings(guild_id: str):
+    """ギルドのAIモデレーション設定を取得します（同期版をスレッドプールで実行）"""
+    from bot.src.db.async_database import run_in_threadpool
+    return await run_in_threadpool(_get_ai_mod_settings_sync, guild_id)
+
+async def get_auto_response_settings(guild_id: str):
+    """ギルドの自動応答設定を取得します（同期版をスレッドプールで実行）"""
+    from bot.src.db.async_database import run_in_threadpool
+    return await run_in_threadpool(_get_auto_response_settings_sync, guild_id)
+
+async def get_raid_settings(guild_id: str):
+    """ギルドのレイド保護設定を取得します（同期版をスレッドプールで実行）"""
+    from bot.src.db.async_database import run_in_threadpool
+    return await run_in_threadpool(_get_raid_settings_sync, guild_id)
+
+async def get_spam_settings(guild_id: str):
+    """ギルドのスパム保護設定を取得します（同期版をスレッドプールで実行）"""
+    from bot.src.db.async_database import run_in_threadpool
+    return await run_in_threadpool(_get_spam_settings_sync, guild_id)
+
+async def log_audit_event(guild_id: str, user_id: str, action: str, target_id: str = None, 
+                        target_type: str = None, details: dict = None):
+    """監査ログを記録します（同期版をスレッドプールで実行）"""
+    from bot.src.db.async_database import run_in_threadpool
+    return await run_in_threadpool(
+        _log_audit_event_sync, guild_id, user_id, action, target_id, target_type, details
+    )
+
 def get_redis_url():
     """RedisのURLを取得"""
     redis_host = os.getenv('REDIS_HOST', 'localhost')
@@ -0,0 +1,253 @@
+import os
+import math
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from dotenv import load_dotenv
+
+try:
+    from bot.src.db import instrumentation
+except ImportError:
+    # bot/src をパスに入れて起動した場合（bot.py が bot パッケージを隠す）
+    from db import instrumentation
+
+# 環境変数のロード
+load_dotenv()
+
+# ロガーの設定
+logger = logging.getLogger('bot.database.engine')
+
+# プロセスで共有するエンジン（bot.src.db と bot.src.database の両方のモデルが使う）
+#
+# ドライバごとに1つずつ（同期は psycopg2、非同期は asyncpg）だけを作成し、
+# 両方のプールを合わせた接続数が max_connections（1プロセスの予算）を超えないようにします。
+_sync_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+
+# 同時に使用中の接続数（両方のプールの合計）
+_usage_lock = threading.Lock()
+_usage = {'in_use': 0, 'peak_in_use': 0}
+
+_ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def database_config() -> Dict[str, Any]:
+    """接続情報と接続数の予算を設定（なければ環境変数）から取得します"""
+    try:
+        from config import get_config
+        config = dict(get_config().get('database', {}))
+    except Exception:
+        config = {}
+    return {
+        'url': config.get('url', os.getenv('DATABASE_URL')),
+        'host': config.get('host', os.getenv('DB_HOST', 'localhost')),
+        'port': config.get('port', os.getenv('DB_PORT', '5432')),
+        'database': config.get('database', os.getenv('DB_NAME', 'shardbot')),
+        'user': config.get('user', os.getenv('DB_USER', 'postgres')),
+        'password': config.get('password', os.getenv('DB_PASSWORD', 'postgres')),
+        'ssl_mode': config.get('ssl_mode', os.getenv('DB_SSL_MODE', 'disable')),
+        'max_connections': int(config.get('max_connections', os.getenv('DB_MAX_CONNECTIONS', 20))),
+        'sync_connections': int(config.get('sync_connections', os.getenv('DB_SYNC_CONNECTIONS', 4))),
+        'pool_timeout': float(config.get('pool_timeout', os.getenv('DB_POOL_TIMEOUT', 30))),
+    }
+
+
+def plan_pools(max_connections: int, sync_connections: int) -> Dict[str, Dict[str, int]]:
+    """
+    1プロセスの接続数の予算を同期・非同期のプールに割り当てます。
+
+    同期のプールはスレッドプール（run_in_threadpool）の大きさと同じにし、オーバーフローは使いません。
+    残りを非同期のプールに割り当て、半分を常時保持、残りを負荷の高いときだけ開くオーバーフローにします。
+    どちらの場合も合計は max_connections を超えません。
+
+    Args:
+        max_connections (int): 1プロセスが使ってよい接続数
+        sync_connections (int): 同期の処理に割り当てる接続数
+
+    Returns:
+        Dict: {'sync': {...}, 'async': {...}}（pool_size と max_overflow）
+    """
+    max_connections = max(2, max_connections)
+    sync = max(1, min(sync_connections, max_connections - 1))
+    remaining = max_connections - sync
+    pool_size = max(1, math.ceil(remaining / 2))
+    return {
+        'sync': {'pool_size': sync, 'max_overflow': 0},
+        'async': {'pool_size': pool_size, 'max_overflow': remaining - pool_size},
+    }
+
+
+def _urls(config: Dict[str, Any]) -> Dict[str, URL]:
+    """同期・非同期それぞれの接続URL"""
+    if config['url']:
+        url = make_url(config['url'])
+    else:
+        url = URL.create(
+            'postgresql', username=config['user'], password=config['password'],
+            host=config['host'], port=int(config['port']), database=config['database'],
+        )
+    backend = url.get_backend_name()
+    return {
+        'sync': url.set(drivername=backend if backend != 'postgresql' else 'postgresql+psycopg2'),
+        'async': url.set(drivername=_ASYNC_DRIVERS.get(backend, url.drivername)),
+    }
+
+
+def _engine_options(url: URL, pool: Dict[str, int], config: Dict[str, Any], is_async: bool) -> Dict[str, Any]:
+    if url.get_backend_name() == 'sqlite':
+        return {}
+    options = {
+        **pool,
+        'pool_timeout': config['pool_timeout'],
+        'pool_recycle': 3600,
+        'pool_pre_ping': True,
+    }
+    if is_async:
+        options['connect_args'] = {'timeout': 10}
+    else:
+        options['connect_args'] = {'sslmode': config['ssl_mode'], 'connect_timeout': 10}
+    return options
+
+
+def _track_usage(engine: Engine) -> None:
+    """プールの貸し出し・返却から、両方のプールを合わせた同時使用数を記録する"""
+
+    @event.listens_for(engine.pool, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with _usage_lock:
+            _usage['in_use'] += 1
+            _usage['peak_in_use'] = max(_usage['peak_in_use'], _usage['in_use'])
+
+    @event.listens_for(engine.pool, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        with _usage_lock:
+            _usage['in_use'] = max(0, _usage['in_use'] - 1)
+
+
+def configure_sync_engine(url: Optional[str] = None, **engine_options) -> Engine:
+    """
+    共有の同期エンジンを作成します（既存のエンジンは置き換えます）。
+    url を省略した場合は設定の接続情報と予算から割り当てたプールを使用します。
+
+    Args:
+        url (str, optional): 接続URL（テストでは sqlite など）
+        **engine_options: create_engine に渡す追加のオプション
+
+    Returns:
+        Engine: 作成したエンジン
+    """
+    global _sync_engine
+    if url is None:
+        config = database_config()
+        target = _urls(config)['sync']
+        pools = plan_pools(config['max_connections'], config['sync_connections'])
+        engine_options = {**_engine_options(target, pools['sync'], config, False), **engine_options}
+        url = target
+    if _sync_engine is not None:
+        _sync_engine.dispose()
+    _sync_engine = create_engine(url, **engine_options)
+    _track_usage(_sync_engine)
+    instrumentation.instrument_engine(_sync_engine, 'sync')
+    logger.info(f"同期データベースエンジンを作成しました: {_describe(_sync_engine)}")
+    return _sync_engine
+
+
+def configure_async_engine(url: Optional[str] = None, **engine_options) -> AsyncEngine:
+    """
+    共有の非同期エンジンを作成します（既存のエンジンは dispose_async_engine で閉じてください）。
+    url を省略した場合は設定の接続情報と予算から割り当てたプールを使用します。
+
+    Args:
+        url (str, optional): 接続URL（テストでは sqlite+aiosqlite など）
+        **engine_options: create_async_engine に渡す追加のオプション
+
+    Returns:
+        AsyncEngine: 作成したエンジン
+    """
+    global _async_engine
+    if url is None:
+        config = database_config()
+        target = _urls(config)['async']
+        pools = plan_pools(config['max_connections'], config['sync_connections'])
+        engine_options = {**_engine_options(target, pools['async'], config, True), **engine_options}
+        url = target
+    _async_engine = create_async_engine(url, **engine_options)
+    _track_usage(_async_engine.sync_engine)
+    instrumentation.instrument_engine(_async_engine, 'async')
+    logger.info(f"非同期データベースエンジンを作成しました: {_describe(_async_engine.sync_engine)}")
+    return _async_engine
+
+
+def get_sync_engine() -> Engine:
+    """共有の同期エンジンを取得します（未作成の場合は作成します）"""
+    if _sync_engine is None:
+        configure_sync_engine()
+    return _sync_engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """共有の非同期エンジンを取得します（未作成の場合は作成します）"""
+    if _async_engine is None:
+        configure_async_engine()
+    return _async_engine
+
+
+def sync_pool_size() -> int:
+    """同期のプールの大きさ（スレッドプールの大きさに使う）"""
+    config = database_config()
+    return plan_pools(config['max_connections'], config['sync_connections'])['sync']['pool_size']
+
+
+async def dispose_async_engine() -> None:
+    """非同期エンジンを閉じます"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+def dispose_sync_engine() -> None:
+    """同期エンジンを閉じます"""
+    global _sync_engine
+    if _sync_engine is not None:
+        _sync_engine.dispose()
+        _sync_engine = None
+
+
+def _describe(engine: Engine) -> str:
+    pool = engine.pool
+    size = pool.size() if hasattr(pool, 'size') else '-'
+    overflow = getattr(pool, '_max_overflow', 0)
+    return f"{engine.url.render_as_string(hide_password=True)} (pool_size={size}, max_overflow={overflow})"
+
+
+def connection_report() -> Dict[str, Any]:
+    """
+    接続数の予算と実際の使用状況を返します。
+
+    Returns:
+        Dict[str, Any]: 予算、プールごとの大きさとピーク、両方を合わせた同時使用数のピーク
+    """
+    config = database_config()
+    pools = {}
+    for name, engine in (('sync', _sync_engine), ('async', _async_engine and _async_engine.sync_engine)):
+        if engine is None:
+            continue
+        pool = engine.pool
+        instrumented = instrumentation._instruments.get(name)
+        pools[name] = {
+            'pool_size': pool.size() if hasattr(pool, 'size') else None,
+            'max_overflow': getattr(pool, '_max_overflow', 0),
+            'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+            'peak_checked_out': instrumented.pool_stats['peak_checked_out'] if instrumented else None,
+        }
+    return {
+        'max_connections': config['max_connections'],
+        'in_use': _usage['in_use'],
+        'peak_in_use': _usage['peak_in_use'],
+        'pools': pools,
+    }
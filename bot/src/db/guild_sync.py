@@ -0,0 +1,205 @@
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from bot.src.db.models import (
+    Guild, GuildSettings, ModerationSettings,
+    AutoResponseSettings, RaidSettings, SpamSettings
+)
+from bot.src.db.identity_map import guild_ids
+
+# ロガーの設定
+logger = logging.getLogger('bot.database.guild_sync')
+
+# ギルドごとに1行ずつ作成する設定テーブル
+SETTINGS_MODELS = (GuildSettings, ModerationSettings, AutoResponseSettings, RaidSettings, SpamSettings)
+
+# 1回のINSERT/UPDATEで扱う行数
+CHUNK_SIZE = 1000
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _insert(conn: AsyncConnection, table):
+    """接続先の方言に合わせた ON CONFLICT 対応の INSERT を作成する"""
+    if conn.dialect.name == 'sqlite':
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
+def guild_row(guild) -> Dict[str, Any]:
+    """discord.Guild を guilds テーブルの行に変換する"""
+    return {
+        'discord_id': str(guild.id),
+        'name': guild.name or f"Guild-{guild.id}",
+        'icon': str(guild.icon.url) if guild.icon else None,
+        'member_count': guild.member_count or 0,
+        'owner_id': str(guild.owner_id) if guild.owner_id else "0",
+    }
+
+
+async def _upsert_guilds(conn: AsyncConnection, rows: List[Dict[str, Any]], now: datetime, chunk_size: int) -> None:
+    table = Guild.__table__
+    for chunk in _chunks(rows, chunk_size):
+        stmt = _insert(conn, table)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.discord_id],
+            set_={
+                'name': excluded.name,
+                'icon': excluded.icon,
+                'member_count': excluded.member_count,
+                'owner_id': excluded.owner_id,
+                'is_active': True,
+                'left_at': None,
+                'updated_at': now,
+            },
+            # 変更のない行は書き換えない
+            where=or_(
+                table.c.name.is_distinct_from(excluded.name),
+                table.c.icon.is_distinct_from(excluded.icon),
+                table.c.member_count.is_distinct_from(excluded.member_count),
+                table.c.owner_id.is_distinct_from(excluded.owner_id),
+                table.c.is_active.is_(False),
+            )
+        )
+        await conn.execute(stmt, [dict(row, is_active=True, created_at=now, updated_at=now) for row in chunk])
+
+
+async def _insert_missing_settings(conn: AsyncConnection, guild_pks: List[int], chunk_size: int) -> Dict[str, int]:
+    created = {}
+    for model in SETTINGS_MODELS:
+        table = model.__table__
+        query = select(table.c.guild_id)
+        if len(guild_pks) <= chunk_size:
+            query = query.where(table.c.guild_id.in_(guild_pks))
+        existing = set((await conn.execute(query)).scalars())
+        missing = [pk for pk in guild_pks if pk not in existing]
+        for chunk in _chunks(missing, chunk_size):
+            # 列のデフォルト値は行ごとに SQLAlchemy が補う
+            stmt = _insert(conn, table).on_conflict_do_nothing(index_elements=[table.c.guild_id])
+            await conn.execute(stmt, [{'guild_id': pk} for pk in chunk])
+        created[table.name] = len(missing)
+    return created
+
+
+async def mark_guilds_inactive(discord_ids: Iterable[Any], conn: Optional[AsyncConnection] = None,
+                               chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    退出したギルドを非アクティブにします（行と設定は残します）。
+
+    Args:
+        discord_ids (Iterable): DiscordギルドIDのリスト
+        conn (AsyncConnection, optional): 使用する接続（省略時は共有エンジンから取得）
+        chunk_size (int): 1回のUPDATEで扱うID数
+
+    Returns:
+        int: 非アクティブにしたギルド数
+    """
+    ids = [str(discord_id) for discord_id in discord_ids]
+    if conn is None:
+        from bot.src.db.async_database import get_async_engine
+        async with get_async_engine().begin() as conn:
+            return await mark_guilds_inactive(ids, conn, chunk_size)
+
+    table = Guild.__table__
+    now = datetime.utcnow()
+    count = 0
+    for chunk in _chunks(ids, chunk_size):
+        result = await conn.execute(
+            update(table)
+            .where(table.c.discord_id.in_(chunk), table.c.is_active.is_(True))
+            .values(is_active=False, left_at=now, updated_at=now)
+        )
+        count += result.rowcount
+    return count
+
+
+async def reconcile_guilds(guilds: Iterable[Any], conn: Optional[AsyncConnection] = None,
+                           mark_departed: bool = True, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    参加中のギルドと guilds テーブルを突き合わせ、まとめて登録・更新します。
+
+    ギルドの行は ON CONFLICT で一括 upsert し、足りない設定行だけを一括で作成します。
+    mark_departed が True の場合、一覧にないアクティブなギルドは非アクティブにします
+    （起動時の突き合わせ用。on_guild_join などで1件だけ登録する場合は False）。
+    利用できない（unavailable）ギルドは行を更新せず、退出扱いにもしません。
+    参加中のギルドの内部IDは stats['guild_pks'] に入り、接続を省略した場合は
+    コミット後にギルドの対応表（identity_map.guild_ids）へ読み込まれます。
+
+    Args:
+        guilds (Iterable): discord.Guild のリスト（bot.guilds）
+        conn (AsyncConnection, optional): 使用する接続（省略時は共有エンジンから取得）
+        mark_departed (bool): 一覧にないギルドを非アクティブにするかどうか
+        chunk_size (int): 1回のINSERT/UPDATEで扱う行数
+
+    Returns:
+        Dict[str, Any]: 件数と所要時間
+    """
+    if conn is None:
+        from bot.src.db.async_database import get_async_engine
+        async with get_async_engine().begin() as conn:
+            stats = await reconcile_guilds(guilds, conn, mark_departed, chunk_size)
+        guild_ids.preload(stats['guild_pks'])
+        return stats
+
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    table = Guild.__table__
+    guilds = list(guilds)
+    # 利用できないギルドは名前やメンバー数が取れないので、行を上書きしない
+    # （退出したギルドとしても扱わない）
+    present = {str(guild.id) for guild in guilds}
+    rows = {str(guild.id): guild_row(guild) for guild in guilds if not guild.unavailable}
+
+    # 現在の状態を取得して差分を求める（退出の確認が不要なら一覧のギルドだけ）
+    query = select(table.c.discord_id, table.c.is_active)
+    if mark_departed:
+        known = dict((await conn.execute(query)).all())
+    else:
+        known = {}
+        for chunk in _chunks(list(rows), chunk_size):
+            known.update((await conn.execute(query.where(table.c.discord_id.in_(chunk)))).all())
+    joined = [discord_id for discord_id in rows if discord_id not in known]
+    rejoined = [discord_id for discord_id in rows if known.get(discord_id) is False]
+    departed = [
+        discord_id for discord_id, is_active in known.items()
+        if is_active and discord_id not in present
+    ] if mark_departed else []
+
+    await _upsert_guilds(conn, list(rows.values()), now, chunk_size)
+    departed_count = await mark_guilds_inactive(departed, conn, chunk_size) if departed else 0
+
+    # 参加中のギルドの内部IDを取得して、足りない設定行を作成する
+    query = select(table.c.discord_id, table.c.id)
+    if len(rows) <= chunk_size:
+        query = query.where(table.c.discord_id.in_(list(rows)))
+    else:
+        query = query.where(table.c.is_active.is_(True))
+    guild_pks = dict((await conn.execute(query)).all())
+    settings_created = await _insert_missing_settings(conn, list(guild_pks.values()), chunk_size)
+
+    stats = {
+        'guilds': len(rows),
+        'unavailable': len(present) - len(rows),
+        'joined': len(joined),
+        'rejoined': len(rejoined),
+        'departed': departed_count,
+        'settings_created': settings_created,
+        'guild_pks': guild_pks,
+        'elapsed_ms': (time.perf_counter() - start) * 1000,
+    }
+    logger.info(
+        f"ギルドの突き合わせが完了しました: {stats['guilds']}件 "
+        f"(新規 {stats['joined']}, 再参加 {stats['rejoined']}, 退出 {stats['departed']}, "
+        f"設定作成 {sum(settings_created.values())}) {stats['elapsed_ms']:.0f}ms"
+    )
+    return stats
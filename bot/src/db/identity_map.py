@@ -0,0 +1,174 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# ロガーの設定
+logger = logging.getLogger('bot.database.identity_map')
+
+# session.info に保存する、コミット後に反映する対応のキー
+_PENDING_KEY = 'identity_map_pending'
+
+
+class IdentityMap:
+    """
+    Discord ID（スノーフレーク）から内部ID（主キー）への対応表
+
+    ギルドやユーザーの内部IDはほぼすべての書き込みで必要になるため、
+    一度引いた対応をプロセス全体で記憶し、同じ変換のクエリを省きます。
+    存在しないIDは negative_ttl 秒のあいだ「存在しない」ことを記憶します
+    （他のプロセスが作成した行を見落とさないよう、期限付きにしています）。
+    内部IDは一度割り当てられると変わらないため、削除時以外は無効化しません。
+    """
+
+    def __init__(self, name: str, max_size: int = 100_000, negative_ttl: float = 60.0):
+        """
+        コンストラクタ
+
+        Args:
+            name (str): 対応表の名前（ログ用）
+            max_size (int): 記憶する対応の上限（超えた分は古いものから捨てる）
+            negative_ttl (float): 存在しないことを記憶する秒数
+        """
+        self.name = name
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self._pks: "OrderedDict[str, int]" = OrderedDict()
+        self._missing: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0}
+
+    def lookup(self, discord_id: Any) -> Tuple[bool, Optional[int]]:
+        """
+        記憶している対応を引きます。
+
+        Args:
+            discord_id: DiscordのID
+
+        Returns:
+            Tuple[bool, Optional[int]]: (記憶していたか, 内部ID)。
+                存在しないと記憶している場合は (True, None)
+        """
+        key = str(discord_id)
+        with self._lock:
+            pk = self._pks.get(key)
+            if pk is not None:
+                self.stats['hits'] += 1
+                return True, pk
+            expires = self._missing.get(key)
+            if expires is not None:
+                if expires > time.monotonic():
+                    self.stats['negative_hits'] += 1
+                    return True, None
+                del self._missing[key]
+            self.stats['misses'] += 1
+            return False, None
+
+    def get(self, discord_id: Any) -> Optional[int]:
+        """記憶している内部IDを返します（なければNone）"""
+        return self._pks.get(str(discord_id))
+
+    def put(self, discord_id: Any, pk: Optional[int]) -> None:
+        """
+        対応を記憶します。pk が None の場合は存在しないことを記憶します。
+        """
+        key = str(discord_id)
+        with self._lock:
+            if pk is None:
+                if key not in self._pks:
+                    self._missing[key] = time.monotonic() + self.negative_ttl
+                    if len(self._missing) > self.max_size:
+                        self._prune_missing()
+                return
+            self._missing.pop(key, None)
+            self._pks[key] = pk
+            self._pks.move_to_end(key)
+            while len(self._pks) > self.max_size:
+                self._pks.popitem(last=False)
+
+    def preload(self, mapping: Dict[Any, int], missing: Iterable[Any] = ()) -> int:
+        """
+        まとめて対応を記憶します。
+
+        Args:
+            mapping (Dict): Discord ID → 内部ID
+            missing (Iterable): 存在しないことが分かっているDiscord ID
+
+        Returns:
+            int: 記憶した対応の数
+        """
+        for discord_id, pk in mapping.items():
+            self.put(discord_id, pk)
+        for discord_id in missing:
+            self.put(discord_id, None)
+        return len(mapping)
+
+    def evict(self, discord_id: Any) -> None:
+        """対応を忘れます（行を削除したとき）"""
+        key = str(discord_id)
+        with self._lock:
+            self._pks.pop(key, None)
+            self._missing.pop(key, None)
+
+    def clear(self) -> None:
+        """すべての対応を忘れます"""
+        with self._lock:
+            self._pks.clear()
+            self._missing.clear()
+
+    def _prune_missing(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, expires in self._missing.items() if expires <= now]:
+            del self._missing[key]
+        # 期限内のものだけで上限を超える場合は全て捨てる（次回はクエリで確認される）
+        if len(self._missing) > self.max_size:
+            self._missing.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """件数とヒット率を返します"""
+        lookups = sum(self.stats.values())
+        return {
+            'name': self.name,
+            'size': len(self._pks),
+            'negative_size': len(self._missing),
+            'hit_rate': (self.stats['hits'] + self.stats['negative_hits']) / lookups if lookups else 0.0,
+            **self.stats,
+        }
+
+    def __len__(self) -> int:
+        return len(self._pks)
+
+
+# プロセス全体で共有する対応表
+guild_ids = IdentityMap('guilds')
+user_ids = IdentityMap('users', max_size=200_000)
+
+
+def remember_on_commit(session: Any, identity_map: IdentityMap, discord_id: Any, pk: int) -> None:
+    """
+    セッション内で作成した行の対応を、コミットされた時点で記憶します。
+    ロールバックされた場合は記憶しません。
+
+    Args:
+        session: Session または AsyncSession
+        identity_map (IdentityMap): 記憶先の対応表
+        discord_id: DiscordのID
+        pk (int): flush で割り当てられた内部ID
+    """
+    session = getattr(session, 'sync_session', session)
+    session.info.setdefault(_PENDING_KEY, []).append((identity_map, discord_id, pk))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session: Session) -> None:
+    for identity_map, discord_id, pk in session.info.pop(_PENDING_KEY, ()):
+        identity_map.put(discord_id, pk)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
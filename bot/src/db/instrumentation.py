@@ -0,0 +1,407 @@
+import os
+import re
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+try:
+    from greenlet import getcurrent
+except ImportError:
+    getcurrent = None
+from sqlalchemy.engine import Engine
+
+# ロガーの設定
+logger = logging.getLogger('bot.database.instrumentation')
+
+# 遅いクエリとして記録する実行時間（ミリ秒）
+DEFAULT_SLOW_QUERY_MS = 200.0
+
+# ヒストグラムの区切り（ミリ秒）
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# 記録する (SQL, 呼び出し元) の組の上限（超えた分は1つにまとめる）
+MAX_QUERY_KEYS = 500
+
+# 呼び出し元を探すときに辿るフレームの上限
+MAX_STACK_DEPTH = 200
+
+# 呼び出し元として扱うソースのルート（bot/src）
+_SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_BIND_PARAM = re.compile(r"%\(\w+\)s|(?<!:):[A-Za-z_]\w*|\$\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _slow_query_ms() -> float:
+    try:
+        from config import get_config
+        return float(get_config().get('database', {}).get('slow_query_ms', DEFAULT_SLOW_QUERY_MS))
+    except Exception:
+        return float(os.getenv('DB_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS))
+
+
+def normalize_statement(statement: str, max_length: int = 300) -> str:
+    """
+    SQLを集計用に正規化します（リテラルとバインド変数を ? にし、IN のリストをまとめる）。
+
+    Args:
+        statement (str): SQL
+        max_length (int): 正規化後の最大の長さ
+
+    Returns:
+        str: 正規化したSQL
+    """
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _BIND_PARAM.sub('?', normalized)
+    normalized = _PLACEHOLDER_LIST.sub('(?, ...)', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    return normalized[:max_length]
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """パラメータの値を型名に置き換えます（ログに個人情報を出さないため）"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"<{len(parameters)} rows>"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+# ファイル名 → bot/src からの相対パス（対象外のファイルは None）
+_source_paths: Dict[str, Optional[str]] = {}
+
+
+def _source_path(filename: str) -> Optional[str]:
+    path = _source_paths.get(filename, '')
+    if path == '':
+        absolute = os.path.abspath(filename)
+        if absolute.startswith(_SOURCE_ROOT + os.sep) and absolute != _THIS_FILE:
+            path = os.path.relpath(absolute, _SOURCE_ROOT)
+        else:
+            path = None
+        _source_paths[filename] = path
+    return path
+
+
+def _format_frame(frame: Any, path: str) -> str:
+    return f"{path}:{frame.f_lineno} ({frame.f_code.co_name})"
+
+
+def call_site() -> str:
+    """
+    クエリを発行したボットのコードの位置を返します（最も内側のフレーム）。
+
+    非同期エンジンでは SQLAlchemy の処理が greenlet の中で動き、呼び出し元のコルーチンの
+    フレームは親の greenlet 側に残るため、そちらのスタックも辿ります。
+    """
+    frames = [sys._getframe(1)]
+    parent = getcurrent().parent if getcurrent is not None else None
+    if parent is not None:
+        frames.append(parent.gr_frame)
+    for frame in frames:
+        # greenlet はフレームの f_back を親につなぎ替えるため、辿る深さを制限する
+        for _ in range(MAX_STACK_DEPTH):
+            if frame is None:
+                break
+            path = _source_path(frame.f_code.co_filename)
+            if path is not None:
+                return _format_frame(frame, path)
+            frame = frame.f_back
+    return 'unknown'
+
+
+class LatencyHistogram:
+    """実行時間のヒストグラム（区切りは LATENCY_BUCKETS_MS）"""
+
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float) -> None:
+        index = 0
+        while index < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def percentile(self, fraction: float) -> float:
+        """区切りの上限で近似したパーセンタイル（ミリ秒）"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max_ms, 3),
+            'buckets': {
+                (f"le_{bound}" if i < len(LATENCY_BUCKETS_MS) else 'inf'): count
+                for i, (bound, count) in enumerate(zip((*LATENCY_BUCKETS_MS, None), self.counts))
+            },
+        }
+
+
+class EngineInstrumentation:
+    """
+    エンジンのクエリ実行時間と接続プールの状態を記録します。
+
+    クエリは (正規化したSQL, 呼び出し元) ごとにヒストグラムに集計し、
+    slow_query_ms を超えたものはパラメータを伏せてログに出力します。
+    プールは接続の取得にかかった時間（待ち・接続・pre-ping を含む）、
+    オーバーフローの使用、接続の作成・破棄の回数を記録します。
+    """
+
+    def __init__(self, name: str, engine: Engine, slow_query_ms: Optional[float] = None):
+        """
+        コンストラクタ
+
+        Args:
+            name (str): エンジンの名前（集計・ログ用）
+            engine (Engine): 対象のエンジン（非同期エンジンは sync_engine）
+            slow_query_ms (float, optional): 遅いクエリとして記録する時間（省略時は設定）
+        """
+        self.name = name
+        self.engine = engine
+        self.slow_query_ms = _slow_query_ms() if slow_query_ms is None else slow_query_ms
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._queries: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.slow_queries = 0
+        self.errors = 0
+        self.checkout = LatencyHistogram()
+        self.pool_stats = {
+            'connects': 0, 'closes': 0, 'invalidations': 0,
+            'checkouts': 0, 'checkins': 0, 'peak_checked_out': 0, 'peak_overflow': 0,
+        }
+        self._install()
+
+    def _install(self) -> None:
+        event.listen(self.engine, 'before_cursor_execute', self._before_execute)
+        event.listen(self.engine, 'after_cursor_execute', self._after_execute)
+        event.listen(self.engine, 'handle_error', self._on_error)
+        pool = self.engine.pool
+        event.listen(pool, 'connect', self._on_connect)
+        event.listen(pool, 'close', self._on_close)
+        event.listen(pool, 'close_detached', self._on_close)
+        event.listen(pool, 'invalidate', self._on_invalidate)
+        event.listen(pool, 'checkout', self._on_checkout)
+        event.listen(pool, 'checkin', self._on_checkin)
+
+        # 接続の取得（空きを待つ時間を含む）を計るため、プールの connect を包む
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                with self._lock:
+                    self.checkout.observe(elapsed)
+
+        pool.connect = timed_connect
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('instrumentation_started', []).append((time.perf_counter(), call_site()))
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get('instrumentation_started')
+        if not stack:
+            return
+        started, site = stack.pop()
+        elapsed = (time.perf_counter() - started) * 1000
+        key = (normalize_statement(statement), site)
+        with self._lock:
+            histogram = self._queries.get(key)
+            if histogram is None:
+                if len(self._queries) >= MAX_QUERY_KEYS:
+                    key = ('(other)', '(other)')
+                histogram = self._queries.setdefault(key, LatencyHistogram())
+            histogram.observe(elapsed)
+            if elapsed >= self.slow_query_ms:
+                self.slow_queries += 1
+        if elapsed >= self.slow_query_ms:
+            logger.warning(
+                f"遅いクエリ [{self.name}] {elapsed:.1f}ms at {site}: "
+                f"{_WHITESPACE.sub(' ', statement).strip()[:1000]} params={redact_parameters(parameters)}"
+            )
+
+    def _on_error(self, context):
+        conn = context.connection
+        stack = conn.info.get('instrumentation_started') if conn is not None else None
+        if stack:
+            stack.pop()
+        with self._lock:
+            self.errors += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.pool_stats['connects'] += 1
+
+    def _on_close(self, dbapi_connection, *args):
+        with self._lock:
+            self.pool_stats['closes'] += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.pool_stats['invalidations'] += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        pool = self.engine.pool
+        with self._lock:
+            self.pool_stats['checkouts'] += 1
+            if hasattr(pool, 'checkedout'):
+                self.pool_stats['peak_checked_out'] = max(self.pool_stats['peak_checked_out'], pool.checkedout())
+            if hasattr(pool, 'overflow'):
+                self.pool_stats['peak_overflow'] = max(self.pool_stats['peak_overflow'], pool.overflow())
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.pool_stats['checkins'] += 1
+
+    def pool_status(self) -> Dict[str, Any]:
+        """プールの現在の状態と累計"""
+        pool = self.engine.pool
+        uptime = max(time.time() - self.started, 1e-9)
+        status = {
+            'class': type(pool).__name__,
+            'uptime_s': round(uptime, 1),
+            **self.pool_stats,
+            'churn_per_hour': round((self.pool_stats['connects'] + self.pool_stats['closes']) * 3600 / uptime, 2),
+            'checkout': self.checkout.to_dict(),
+        }
+        for attribute in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(pool, attribute, None)
+            if callable(method):
+                status[attribute] = method()
+        return status
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        """
+        集計結果を返します。
+
+        Args:
+            top (int): 合計時間の長い順に返すクエリの数
+
+        Returns:
+            Dict[str, Any]: プールの状態とクエリごとの集計
+        """
+        # シグナルハンドラからも呼ばれるため、ロックは取らずに写しを作る
+        queries = list(self._queries.items())
+        queries.sort(key=lambda item: item[1].total_ms, reverse=True)
+        return {
+            'slow_query_ms': self.slow_query_ms,
+            'slow_queries': self.slow_queries,
+            'errors': self.errors,
+            'pool': self.pool_status(),
+            'queries': [
+                {'statement': statement, 'call_site': site, **histogram.to_dict()}
+                for (statement, site), histogram in queries[:top]
+            ],
+        }
+
+    def reset(self) -> None:
+        """クエリの集計を消去します"""
+        with self._lock:
+            self._queries.clear()
+            self.slow_queries = 0
+            self.errors = 0
+
+
+# 計測中のエンジン（名前 → 計測）
+_instruments: Dict[str, EngineInstrumentation] = {}
+
+
+def instrument_engine(engine: Any, name: str, slow_query_ms: Optional[float] = None) -> EngineInstrumentation:
+    """
+    エンジンに計測を取り付けます（同じエンジンに二重には取り付けない）。
+
+    Args:
+        engine: Engine または AsyncEngine
+        name (str): エンジンの名前
+        slow_query_ms (float, optional): 遅いクエリとして記録する時間
+
+    Returns:
+        EngineInstrumentation: 計測
+    """
+    engine = getattr(engine, 'sync_engine', engine)
+    existing = _instruments.get(name)
+    if existing is not None and existing.engine is engine:
+        return existing
+    for instrumentation in _instruments.values():
+        if instrumentation.engine is engine:
+            return instrumentation
+    instrumentation = EngineInstrumentation(name, engine, slow_query_ms)
+    _instruments[name] = instrumentation
+    return instrumentation
+
+
+def snapshot(top: int = 20) -> Dict[str, Any]:
+    """計測中の全エンジンの集計を返します"""
+    return {name: instrumentation.snapshot(top) for name, instrumentation in list(_instruments.items())}
+
+
+def dump_snapshot(top: int = 50) -> str:
+    """集計をJSONでログに出力します"""
+    dumped = json.dumps(snapshot(top), ensure_ascii=False, indent=2, default=str)
+    logger.info(f"データベースの計測結果:\n{dumped}")
+    return dumped
+
+
+def install_signal_handler(sig: int = getattr(signal, 'SIGUSR1', 0)) -> bool:
+    """
+    シグナル（既定は SIGUSR1）を受けたときに集計をログに出力するようにします。
+
+    実行中のイベントループがあればループのハンドラとして登録します。
+
+    Returns:
+        bool: 登録できた場合はTrue（SIGUSR1 のない環境ではFalse）
+    """
+    if not sig:
+        return False
+    try:
+        asyncio.get_running_loop().add_signal_handler(sig, dump_snapshot)
+        return True
+    except RuntimeError:
+        pass
+    except NotImplementedError:
+        return False
+    try:
+        signal.signal(sig, lambda signum, frame: dump_snapshot())
+        return True
+    except ValueError:
+        # メインスレッド以外からは登録できない
+        logger.warning("メインスレッド以外のため、シグナルハンドラを登録できませんでした")
+        return False
@@ -0,0 +1,15 @@
+-- 監査ログとモデレーション履歴の一覧（新しい順・キーセットページング）用の複合インデックス
+-- CONCURRENTLY はトランザクション内で実行できないため、psql などで1文ずつ実行してください
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_audit_logs_guild_created
+    ON audit_logs (guild_id, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_audit_logs_guild_action_created
+    ON audit_logs (guild_id, action, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_audit_logs_user_created
+    ON audit_logs (user_id, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_moderation_actions_guild_created
+    ON moderation_actions (guild_id, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_infractions_guild_user_created
+    ON user_infractions (guild_id, user_id, created_at DESC, id DESC);
+ANALYZE audit_logs;
+ANALYZE moderation_actions;
+ANALYZE user_infractions;
@@ -0,0 +1,3 @@
+-- 既存のデータベースにギルドの参加状態を追加する
+ALTER TABLE guilds ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE;
+ALTER TABLE guilds ADD COLUMN IF NOT EXISTS left_at TIMESTAMP NULL;
@@ -0,0 +1,18 @@
+-- メンバーごとの警告・違反の件数（エスカレーションの判定用）を追加し、既存の警告から件数を作成する
+CREATE TABLE IF NOT EXISTS infraction_counters (
+    guild_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    infraction_type VARCHAR(32) NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    window_count INTEGER NOT NULL DEFAULT 0,
+    window_started_at TIMESTAMP NOT NULL DEFAULT now(),
+    last_at TIMESTAMP NULL,
+    PRIMARY KEY (guild_id, user_id, infraction_type)
+);
+
+INSERT INTO infraction_counters (guild_id, user_id, infraction_type, total, window_count, window_started_at, last_at)
+SELECT guild_id, user_id, 'warning', count(*), count(*), COALESCE(min(created_at), now()), max(created_at)
+FROM warnings
+WHERE guild_id IS NOT NULL AND user_id IS NOT NULL
+GROUP BY guild_id, user_id
+ON CONFLICT (guild_id, user_id, infraction_type) DO NOTHING;
@@ -0,0 +1,2 @@
+-- 既存のデータベースにギルドごとのログ保持期間を追加する（NULL は全体の設定に従う）
+ALTER TABLE guild_settings ADD COLUMN IF NOT EXISTS log_retention_days INTEGER NULL;
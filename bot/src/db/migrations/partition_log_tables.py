@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ログテーブル（audit_logs, spam_logs, moderation_actions）を月ごとのパーティションに変換するスクリプト
+
+全行をコピーし直すため、ボットを停止したメンテナンス時間に実行してください。
+変換後はボットが毎日パーティションを作成し、保持期間を過ぎた月を削除します。
+"""
+
+import os
+import sys
+import asyncio
+import logging
+from dotenv import load_dotenv
+
+# ルートパスをPythonパスに追加
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../..")))
+
+# 環境変数のロード
+load_dotenv()
+
+from bot.src.db.async_database import close_async_db, get_async_engine
+from bot.src.db.partitions import PARTITIONED_TABLES, convert_to_partitioned, _partition_config
+
+# ロガーの設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('db_migration')
+
+
+async def partition_tables(tables):
+    """テーブルを1つずつ、それぞれ1つのトランザクションで変換する"""
+    engine = get_async_engine()
+    months_ahead = _partition_config()['partition_months_ahead']
+    try:
+        for table in tables:
+            async with engine.begin() as conn:
+                if await convert_to_partitioned(conn, table, months_ahead=months_ahead):
+                    logger.info(f"{table} を変換しました。")
+                else:
+                    logger.info(f"{table} は変換済みか存在しません。")
+    except Exception as e:
+        logger.error(f"パーティションへの変換中にエラーが発生しました: {e}")
+        sys.exit(1)
+    finally:
+        await close_async_db()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='ログテーブルのパーティション化')
+    parser.add_argument('tables', nargs='*', help=f"変換するテーブル（省略時は全て: {', '.join(PARTITIONED_TABLES)}）")
+    args = parser.parse_args()
+
+    unknown = [table for table in args.tables if table not in PARTITIONED_TABLES]
+    if unknown:
+        parser.error(f"対象外のテーブルです: {', '.join(unknown)}")
+    asyncio.run(partition_tables(args.tables or list(PARTITIONED_TABLES)))
@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, Float, Boolean, Text,
-    ForeignKey, Table, DateTime, JSON, Enum, ARRAY
+    ForeignKey, Table, DateTime, JSON, Enum, ARRAY, Index
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -76,6 +76,9 @@ class Guild(Base):
     owner_id = Column(String(20), nullable=False)
     joined_at = Column(DateTime, default=datetime.utcnow)
     premium_tier = Column(Integer, default=0)
+    # ボットが退出したギルドは削除せず非アクティブにする
+    is_active = Column(Boolean, default=True, nullable=False)
+    left_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -130,6 +133,8 @@ class GuildSettings(Base):
     log_member_join = Column(Boolean, default=True)
     log_member_leave = Column(Boolean, default=True)
     log_moderation_actions = Column(Boolean, default=True)
+    # ログの保持期間（日）。未設定の場合は全体の設定に従う
+    log_retention_days = Column(Integer, nullable=True)
     
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -306,6 +311,13 @@ class AuditLog(Base):
     details = Column(JSON)
     created_at = Column(DateTime, default=func.now())
     
+    # 新しい順の一覧とキーセットページング（created_at, id）用の複合インデックス
+    __table_args__ = (
+        Index('ix_audit_logs_guild_created', guild_id, created_at.desc(), id.desc()),
+        Index('ix_audit_logs_guild_action_created', guild_id, action, created_at.desc(), id.desc()),
+        Index('ix_audit_logs_user_created', user_id, created_at.desc(), id.desc()),
+    )
+    
     # リレーションシップ
     guild = relationship("Guild", back_populates="logs")
     user = relationship("User", back_populates="logs")
@@ -355,6 +367,10 @@ class ModerationAction(Base):
     action_metadata = Column(JSON, default={})
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_moderation_actions_guild_created', guild_id, created_at.desc(), id.desc()),
+    )
+    
     # リレーションシップ
     guild = relationship("Guild")
     infractions = relationship("UserInfraction", back_populates="action")
@@ -378,6 +394,10 @@ class UserInfraction(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=True)
     
+    __table_args__ = (
+        Index('ix_user_infractions_guild_user_created', guild_id, user_id, created_at.desc(), id.desc()),
+    )
+    
     # リレーションシップ
     guild = relationship("Guild")
     action = relationship("ModerationAction", back_populates="infractions")
@@ -0,0 +1,84 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+# キーセット（カーソル）ページング
+#
+# 一覧は (created_at DESC, id DESC) の順に並べ、前のページの最後の行の
+# (created_at, id) より後ろの行だけを取得します。OFFSET と違い読み飛ばす行がないため、
+# 複合インデックス（..., created_at DESC, id DESC）をそのまま辿るだけで済みます。
+
+
+class InvalidCursorError(ValueError):
+    """カーソルの形式が正しくない場合のエラー"""
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    行の (created_at, id) を URL に含められるカーソル文字列にします。
+
+    Args:
+        created_at (datetime): 行の作成日時
+        row_id (int): 行のID
+
+    Returns:
+        str: カーソル文字列
+    """
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    カーソル文字列を (created_at, id) に戻します。
+
+    Raises:
+        InvalidCursorError: 形式が正しくない場合
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorError(f"不正なカーソルです: {cursor}") from e
+
+
+def keyset_page(query: Any, model: Any, cursor: Optional[str] = None) -> Any:
+    """
+    クエリを新しい順に並べ、カーソルより後ろの行に絞り込みます。
+
+    Args:
+        query: Query または Select
+        model: created_at と id 列を持つモデル
+        cursor (str, optional): 前のページの next_cursor
+
+    Returns:
+        絞り込みと並べ替えを加えたクエリ（LIMIT は呼び出し側で付ける）
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # 行値の比較は (created_at, id) の複合インデックスの範囲条件として使われる
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+        # 同じ意味の単純な範囲条件も付け、月ごとのパーティションを計画時に絞り込めるようにする
+        query = query.filter(model.created_at <= created_at)
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
+
+def next_cursor(rows: List[Any], limit: int) -> Optional[str]:
+    """
+    取得したページの次のページのカーソルを返します（最後のページならNone）。
+
+    Args:
+        rows (List): 取得した行（created_at と id を持つ）
+        limit (int): ページの大きさ
+
+    Returns:
+        Optional[str]: 次のページのカーソル
+    """
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.created_at, last.id)
@@ -0,0 +1,356 @@
+import re
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# ロガーの設定
+logger = logging.getLogger('bot.database.partitions')
+
+# 月ごとにレンジパーティション化するテーブルと、guild_id が guilds のどの列を指すか
+# （audit_logs と moderation_actions は guilds.id への外部キー、spam_logs は Discord のギルドID）
+PARTITIONED_TABLES = {
+    'audit_logs': 'id',
+    'spam_logs': 'discord_id',
+    'moderation_actions': 'id',
+}
+
+# 1回のトランザクションで削除する行数（ギルドごとの保持期間の適用）
+PURGE_BATCH_SIZE = 5000
+
+# パーティションの保守を行う間隔（秒）
+MAINTENANCE_INTERVAL = 24 * 3600
+
+_PARTITION_NAME = re.compile(r'^(?P<table>\w+)_p(?P<year>\d{4})(?P<month>\d{2})$')
+
+
+def _partition_config() -> Dict[str, Any]:
+    """保持期間と事前作成する月数を設定（なければ既定値）から取得します"""
+    try:
+        from config import get_config
+        config = dict(get_config().get('database', {}))
+    except Exception:
+        config = {}
+    return {
+        'log_retention_days': int(config.get('log_retention_days', 365)),
+        'partition_months_ahead': int(config.get('partition_months_ahead', 3)),
+    }
+
+
+def month_start(value: Any) -> date:
+    """日時を含む月の1日を返す"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    """月の1日に count か月を足した月の1日を返す"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """月のパーティション名（例: audit_logs_p202405）"""
+    return f"{table}_p{month:%Y%m}"
+
+
+def parse_partition_name(table: str, name: str) -> Optional[date]:
+    """パーティション名から月を取り出す（月のパーティションでなければNone）"""
+    match = _PARTITION_NAME.match(name)
+    if not match or match.group('table') != table:
+        return None
+    return date(int(match.group('year')), int(match.group('month')), 1)
+
+
+def partition_ddl(table: str, month: date) -> str:
+    """月のパーティションを作成するDDL"""
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(table, month)}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def plan_retention(partitions: Dict[date, str], now: datetime, retention_days: Optional[int],
+                   overrides: Dict[Any, int]) -> Tuple[List[str], List[Tuple[str, List[Any], bool]]]:
+    """
+    保持期間から、丸ごと削除するパーティションと、ギルドごとに行を削除するパーティションを求めます。
+
+    パーティションは、最も長い保持期間（全体の設定とギルドごとの設定の最大値）を
+    過ぎた月だけを丸ごと削除します。それより短い保持期間のギルドの行は、
+    月全体が期限を過ぎたパーティションから行単位で削除します
+    （保持期間は月単位に切り上げられ、最大で1か月長く残ります）。
+
+    Args:
+        partitions (Dict[date, str]): 月 → パーティション名
+        now (datetime): 現在時刻
+        retention_days (int, optional): 全体の保持日数（None は無期限）
+        overrides (Dict[Any, int]): ギルドID（テーブルの guild_id の値）→ 保持日数
+
+    Returns:
+        Tuple: (削除するパーティション名のリスト,
+                [(パーティション名, ギルドIDのリスト, True なら一覧以外のギルドを削除)])
+    """
+    cutoffs = {guild_id: now - timedelta(days=days) for guild_id, days in overrides.items()}
+    default_cutoff = now - timedelta(days=retention_days) if retention_days else None
+    horizon = None
+    if default_cutoff is not None:
+        horizon = min([default_cutoff, *cutoffs.values()])
+
+    drop, purge = [], []
+    for month, name in sorted(partitions.items()):
+        end = datetime.combine(add_months(month, 1), datetime.min.time())
+        if horizon is not None and end <= horizon:
+            drop.append(name)
+        elif default_cutoff is not None and end <= default_cutoff:
+            # 全体の保持期間は過ぎたが、より長く残すギルドがある月
+            keep = [guild_id for guild_id, cutoff in cutoffs.items() if end > cutoff]
+            purge.append((name, keep, True))
+        else:
+            expired = [guild_id for guild_id, cutoff in cutoffs.items() if end <= cutoff]
+            if expired:
+                purge.append((name, expired, False))
+    return drop, purge
+
+
+async def _relkind(conn: AsyncConnection, table: str) -> Optional[str]:
+    result = await conn.execute(text(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = :table AND n.nspname = current_schema()"
+    ), {'table': table})
+    return result.scalar()
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> Dict[date, str]:
+    """テーブルの月のパーティションを返します（DEFAULT パーティションは含まない）"""
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {'table': table})
+    partitions = {}
+    for name in result.scalars():
+        month = parse_partition_name(table, name)
+        if month is not None:
+            partitions[month] = name
+    return partitions
+
+
+async def convert_to_partitioned(conn: AsyncConnection, table: str, now: Optional[datetime] = None,
+                                 months_ahead: int = 3) -> bool:
+    """
+    通常のテーブルを created_at による月ごとのレンジパーティションに変換します（PostgreSQL）。
+
+    主キーを (id, created_at) に変え、既存の行を移し、インデックスと外部キーを作り直します。
+    全行をコピーするため、大きなテーブルはメンテナンス時間に migrations/partition_log_tables.py で実行してください。
+    このテーブルを参照する外部キー（user_infractions.action_id など）は削除されます。
+
+    Returns:
+        bool: 変換した場合はTrue（既にパーティション化済み、またはテーブルがない場合はFalse）
+    """
+    if await _relkind(conn, table) != 'r':
+        return False
+    now = now or datetime.utcnow()
+    legacy = f"{table}_legacy"
+    await conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+
+    sequence = (await conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {'t': legacy})).scalar()
+    index_defs = list((await conn.execute(text(
+        "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+        "WHERE i.schemaname = current_schema() AND i.tablename = :t AND i.indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = CAST(:t AS regclass) AND contype IN ('p', 'u'))"
+    ), {'t': legacy})).all())
+    foreign_keys = list((await conn.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = CAST(:t AS regclass) AND contype = 'f'"
+    ), {'t': legacy})).all())
+    columns = list((await conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :t ORDER BY ordinal_position"
+    ), {'t': legacy})).scalars())
+    oldest = (await conn.execute(text(f'SELECT min(created_at) FROM "{legacy}"'))).scalar()
+
+    await conn.execute(text(
+        f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+    ))
+    await conn.execute(text(
+        f'ALTER TABLE "{table}" ALTER COLUMN created_at SET DEFAULT now(), '
+        f'ALTER COLUMN created_at SET NOT NULL'
+    ))
+
+    month = month_start(oldest or now)
+    last = add_months(month_start(now), months_ahead)
+    while month <= last:
+        await conn.execute(text(partition_ddl(table, month)))
+        month = add_months(month, 1)
+    await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT'))
+
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    select_list = ", ".join(
+        'COALESCE(created_at, now())' if column == 'created_at' else f'"{column}"' for column in columns
+    )
+    await conn.execute(text(f'INSERT INTO "{table}" ({column_list}) SELECT {select_list} FROM "{legacy}"'))
+    if sequence:
+        await conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id'))
+    await conn.execute(text(f'DROP TABLE "{legacy}" CASCADE'))
+
+    # 主キー・インデックスの名前は旧テーブルの削除後に空くため、ここで作り直す
+    await conn.execute(text(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, created_at)'))
+
+    for name, definition in index_defs:
+        if definition.startswith('CREATE UNIQUE'):
+            logger.warning(f"{table}: パーティションキーを含まない一意インデックス {name} は作り直しません")
+            continue
+        await conn.execute(text(definition.replace(f'.{legacy} ', f'."{table}" ', 1)))
+    for name, definition in foreign_keys:
+        await conn.execute(text(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'))
+
+    logger.info(f"{table} を月ごとのパーティションに変換しました（{len(columns)}列）")
+    return True
+
+
+async def ensure_partitions(engine: AsyncEngine, table: str, now: datetime, months_ahead: int) -> List[str]:
+    """今月から months_ahead か月先までのパーティションと DEFAULT パーティションを作成します"""
+    created = []
+    async with engine.connect() as conn:
+        existing = await list_partitions(conn, table)
+    month = month_start(now)
+    for offset in range(months_ahead + 1):
+        target = add_months(month, offset)
+        if target in existing:
+            continue
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(partition_ddl(table, target)))
+            created.append(partition_name(table, target))
+        except Exception as e:
+            # DEFAULT パーティションにその月の行が入っている場合は作成できない
+            logger.error(f"パーティション {partition_name(table, target)} の作成に失敗しました: {e}")
+    async with engine.begin() as conn:
+        await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT'))
+    return created
+
+
+async def _retention_overrides(engine: AsyncEngine, key: str) -> Dict[Any, int]:
+    """ギルドごとの保持日数（guild_settings.log_retention_days）を取得します"""
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text(
+                "SELECT g.id, g.discord_id, s.log_retention_days FROM guild_settings s "
+                "JOIN guilds g ON g.id = s.guild_id WHERE s.log_retention_days IS NOT NULL"
+            ))
+            rows = result.all()
+    except Exception as e:
+        logger.warning(f"ギルドごとの保持期間を取得できません（全体の設定のみ適用します）: {e}")
+        return {}
+    if key == 'discord_id':
+        return {int(discord_id): days for _, discord_id, days in rows}
+    return {pk: days for pk, _, days in rows}
+
+
+async def _purge(engine: AsyncEngine, partition: str, guild_ids: List[Any], exclude: bool,
+                 batch_size: int) -> int:
+    """パーティションからギルドの行を小分けに削除します（長いトランザクションを避ける）"""
+    if exclude:
+        condition = "guild_id IS NULL OR guild_id NOT IN :ids" if guild_ids else "TRUE"
+    else:
+        condition = "guild_id IN :ids"
+    # 行の識別子（SQLite では rowid）
+    row_id = 'rowid' if engine.dialect.name == 'sqlite' else 'ctid'
+    statement = text(
+        f'DELETE FROM "{partition}" WHERE {row_id} IN '
+        f'(SELECT {row_id} FROM "{partition}" WHERE {condition} LIMIT :batch)'
+    )
+    if guild_ids:
+        statement = statement.bindparams(bindparam('ids', expanding=True))
+    deleted = 0
+    while True:
+        async with engine.begin() as conn:
+            params = {'ids': list(guild_ids), 'batch': batch_size} if guild_ids else {'batch': batch_size}
+            result = await conn.execute(statement, params)
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+        await asyncio.sleep(0)
+
+
+async def apply_retention(engine: AsyncEngine, table: str, now: datetime, retention_days: Optional[int],
+                          batch_size: int = PURGE_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    保持期間を過ぎたパーティションを切り離して削除し、短い保持期間のギルドの行を削除します。
+
+    Returns:
+        Dict[str, Any]: 削除したパーティションと行数
+    """
+    overrides = await _retention_overrides(engine, PARTITIONED_TABLES.get(table, 'id'))
+    async with engine.connect() as conn:
+        partitions = await list_partitions(conn, table)
+    drop, purge = plan_retention(partitions, now, retention_days, overrides)
+
+    for name in drop:
+        # 切り離しと削除はそれぞれ短いトランザクションで行う（VACUUM の必要もない）
+        async with engine.begin() as conn:
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+        logger.info(f"保持期間を過ぎたパーティション {name} を削除しました")
+
+    purged = 0
+    for name, guild_ids, exclude in purge:
+        purged += await _purge(engine, name, guild_ids, exclude, batch_size)
+    return {'dropped': drop, 'purged_rows': purged}
+
+
+async def maintain_partitions(engine: Optional[AsyncEngine] = None, now: Optional[datetime] = None,
+                              tables: Iterable[str] = PARTITIONED_TABLES,
+                              retention_days: Optional[int] = None,
+                              months_ahead: Optional[int] = None) -> Dict[str, Any]:
+    """
+    パーティションを保守します（先の月の作成と保持期間の適用）。
+
+    空の通常テーブル（新しいデータベース）はその場でパーティションに変換します。
+    行のある通常テーブルは変換せず、migrations/partition_log_tables.py の実行を促します。
+
+    Args:
+        engine (AsyncEngine, optional): 使用するエンジン（省略時は共有エンジン）
+        now (datetime, optional): 現在時刻（テスト用）
+        tables (Iterable[str]): 対象のテーブル
+        retention_days (int, optional): 全体の保持日数（省略時は設定、0以下は無期限）
+        months_ahead (int, optional): 事前に作成する月数（省略時は設定）
+
+    Returns:
+        Dict[str, Any]: テーブルごとの結果
+    """
+    if engine is None:
+        from bot.src.db.async_database import get_async_engine
+        engine = get_async_engine()
+    if engine.dialect.name != 'postgresql':
+        return {}
+    config = _partition_config()
+    now = now or datetime.utcnow()
+    retention_days = config['log_retention_days'] if retention_days is None else retention_days
+    months_ahead = config['partition_months_ahead'] if months_ahead is None else months_ahead
+
+    stats = {}
+    for table in tables:
+        try:
+            async with engine.begin() as conn:
+                kind = await _relkind(conn, table)
+                if kind == 'r':
+                    has_rows = (await conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{table}")'))).scalar()
+                    if has_rows:
+                        logger.warning(
+                            f"{table} はパーティション化されていません。"
+                            f"migrations/partition_log_tables.py を実行してください"
+                        )
+                        continue
+                    await convert_to_partitioned(conn, table, now, months_ahead)
+                elif kind != 'p':
+                    continue
+            created = await ensure_partitions(engine, table, now, months_ahead)
+            retention = await apply_retention(engine, table, now, retention_days if retention_days > 0 else None)
+            stats[table] = {'created': created, **retention}
+        except Exception as e:
+            logger.error(f"{table} のパーティション保守中にエラーが発生しました: {e}")
+    return stats
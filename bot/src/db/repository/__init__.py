@@ -6,4 +6,15 @@ from .spam_settings_repository import SpamSettingsRepository
 from .ai_mod_settings_repository import AIModSettingsRepository
 from .auto_response_settings_repository import AutoResponseSettingsRepository
 from .user_repository import UserRepository
-from .audit_log_repository import AuditLogRepository 
\ No newline at end of file
+from .audit_log_repository import AuditLogRepository
+from .async_repository import (
+    AsyncBaseRepository,
+    AsyncGuildRepository,
+    AsyncGuildSettingsRepository,
+    AsyncRaidSettingsRepository,
+    AsyncSpamSettingsRepository,
+    AsyncAIModSettingsRepository,
+    AsyncAutoResponseSettingsRepository,
+    AsyncUserRepository,
+    AsyncAuditLogRepository
+)
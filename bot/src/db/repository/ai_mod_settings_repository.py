@@ -34,13 +34,13 @@ class AIModSettingsRepository(BaseRepository[AIModSettings]):
         """
         try:
             # ギルドの内部IDを取得
-            guild = self.guild_repo.get_guild_by_id(guild_id)
-            if not guild:
+            guild_pk = self.guild_repo.get_guild_pk(guild_id)
+            if guild_pk is None:
                 logger.warning(f"ギルド {guild_id} が存在しません")
                 return None
             
             # 設定を取得
-            return self.session.query(AIModSettings).filter(AIModSettings.guild_id == guild.id).first()
+            return self.session.query(AIModSettings).filter(AIModSettings.guild_id == guild_pk).first()
         except SQLAlchemyError as e:
             logger.error(f"AIモデレーション設定の取得中にエラー: {e}")
             return None
@@ -58,27 +58,20 @@ class AIModSettingsRepository(BaseRepository[AIModSettings]):
         """
         try:
             # ギルドの内部IDを取得、ない場合は作成
-            guild = self.guild_repo.get_guild_by_id(guild_id)
-            if not guild:
-                guild_data = {
-                    "discord_id": guild_id,
-                    "name": f"Guild-{guild_id}",
-                    "owner_id": "0"
-                }
-                guild = self.guild_repo.create_guild(guild_data)
-                if not guild:
-                    logger.error(f"ギルド {guild_id} の作成に失敗しました")
-                    return None
+            guild_pk = self.guild_repo.ensure_guild_pk(guild_id)
+            if guild_pk is None:
+                logger.error(f"ギルド {guild_id} の作成に失敗しました")
+                return None
             
             # 既存の設定をチェック
-            existing = self.session.query(AIModSettings).filter(AIModSettings.guild_id == guild.id).first()
+            existing = self.session.query(AIModSettings).filter(AIModSettings.guild_id == guild_pk).first()
             if existing:
                 logger.info(f"ギルド {guild_id} のAIモデレーション設定は既に存在します")
                 return existing
             
             # 設定を作成
             settings_data = data or {}
-            settings_data['guild_id'] = guild.id
+            settings_data['guild_id'] = guild_pk
             
             settings = AIModSettings(**settings_data)
             self.session.add(settings)
@@ -133,13 +126,13 @@ class AIModSettingsRepository(BaseRepository[AIModSettings]):
         """
         try:
             # ギルドの内部IDを取得
-            guild = self.guild_repo.get_guild_by_id(guild_id)
-            if not guild:
+            guild_pk = self.guild_repo.get_guild_pk(guild_id)
+            if guild_pk is None:
                 logger.warning(f"ギルド {guild_id} が存在しません")
                 return False
             
             # 設定を取得して削除
-            settings = self.session.query(AIModSettings).filter(AIModSettings.guild_id == guild.id).first()
+            settings = self.session.query(AIModSettings).filter(AIModSettings.guild_id == guild_pk).first()
             if not settings:
                 logger.warning(f"ギルド {guild_id} のAIモデレーション設定が存在しません")
                 return False
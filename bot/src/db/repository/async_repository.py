@@ -0,0 +1,786 @@
+from typing import TypeVar, Generic, Type, List, Dict, Any, Optional
+from datetime import datetime, timedelta
+import json
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from bot.src.db.models import (
+    Base, Guild, GuildSettings, RaidSettings, SpamSettings, AIModSettings,
+    AutoResponseSettings, User, AuditLog
+)
+from bot.src.db.identity_map import guild_ids, user_ids, remember_on_commit
+from bot.src.db.pagination import keyset_page
+
+logger = logging.getLogger('bot.repository.async')
+
+T = TypeVar('T', bound=Base)
+
+
+class AsyncBaseRepository(Generic[T]):
+    """
+    AsyncSession を使うリポジトリのベースクラス
+    同期版の BaseRepository と同じメソッドをコルーチンとして提供します
+    """
+
+    def __init__(self, session: AsyncSession, model_class: Type[T]):
+        """
+        コンストラクタ
+
+        Args:
+            session (AsyncSession): SQLAlchemyの非同期セッション
+            model_class (Type[T]): リポジトリで扱うモデルクラス
+        """
+        self.session = session
+        self.model_class = model_class
+
+    async def _first(self, statement) -> Optional[Any]:
+        result = await self.session.execute(statement.limit(1))
+        return result.scalars().first()
+
+    async def _all(self, statement) -> List[Any]:
+        result = await self.session.execute(statement)
+        return list(result.scalars().all())
+
+    async def get_by_id(self, id: int) -> Optional[T]:
+        """IDによるエンティティの取得"""
+        try:
+            return await self.session.get(self.model_class, id)
+        except SQLAlchemyError as e:
+            logger.error(f"{self.model_class.__name__}をIDで取得中にエラー: {e}")
+            return None
+
+    async def get_all(self) -> List[T]:
+        """全エンティティの取得"""
+        try:
+            return await self._all(select(self.model_class))
+        except SQLAlchemyError as e:
+            logger.error(f"{self.model_class.__name__}の全取得でエラー: {e}")
+            return []
+
+    async def create(self, data: Dict[str, Any]) -> Optional[T]:
+        """新規エンティティの作成"""
+        try:
+            entity = self.model_class(**data)
+            self.session.add(entity)
+            await self.session.commit()
+            return entity
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"{self.model_class.__name__}の作成でエラー: {e}")
+            return None
+
+    async def update(self, id: int, data: Dict[str, Any]) -> bool:
+        """エンティティの更新"""
+        try:
+            entity = await self.get_by_id(id)
+            if not entity:
+                return False
+
+            for key, value in data.items():
+                if hasattr(entity, key):
+                    setattr(entity, key, value)
+
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"{self.model_class.__name__}の更新でエラー: {e}")
+            return False
+
+    async def delete(self, id: int) -> bool:
+        """エンティティの削除"""
+        try:
+            entity = await self.get_by_id(id)
+            if not entity:
+                return False
+
+            await self.session.delete(entity)
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"{self.model_class.__name__}の削除でエラー: {e}")
+            return False
+
+    async def get_by_attribute(self, attr_name: str, attr_value: Any) -> List[T]:
+        """特定の属性値でエンティティを検索"""
+        try:
+            if not hasattr(self.model_class, attr_name):
+                logger.warning(f"{self.model_class.__name__}に属性{attr_name}がありません")
+                return []
+
+            return await self._all(
+                select(self.model_class).where(getattr(self.model_class, attr_name) == attr_value)
+            )
+        except SQLAlchemyError as e:
+            logger.error(f"{self.model_class.__name__}の属性検索でエラー: {e}")
+            return []
+
+
+class AsyncGuildRepository(AsyncBaseRepository[Guild]):
+    """ギルド情報に関する非同期リポジトリ"""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, Guild)
+
+    async def get_guild_by_id(self, discord_id: str) -> Optional[Guild]:
+        """Discord IDによるギルドの取得"""
+        try:
+            guild = await self._first(select(Guild).where(Guild.discord_id == str(discord_id)))
+            if guild:
+                guild_ids.put(discord_id, guild.id)
+            return guild
+        except SQLAlchemyError as e:
+            logger.error(f"Discord IDによるギルド取得中にエラー: {e}")
+            return None
+
+    async def get_guild_pk(self, discord_id: str) -> Optional[int]:
+        """Discord IDからギルドの内部IDを取得（対応表に記憶していればクエリを実行しない）"""
+        cached, pk = guild_ids.lookup(discord_id)
+        if cached:
+            return pk
+        try:
+            result = await self.session.execute(select(Guild.id).where(Guild.discord_id == str(discord_id)))
+            pk = result.scalar()
+            guild_ids.put(discord_id, pk)
+            return pk
+        except SQLAlchemyError as e:
+            logger.error(f"ギルドの内部ID取得中にエラー: {e}")
+            return None
+
+    async def ensure_guild_pk(self, discord_id: str) -> Optional[int]:
+        """ギルドの内部IDを取得し、ギルドがなければ仮の名前で作成"""
+        pk = guild_ids.get(discord_id)
+        if pk is not None:
+            return pk
+        guild = await self.create_guild({"discord_id": str(discord_id)})
+        return guild_ids.get(discord_id) if guild else None
+
+    async def preload(self, discord_ids: Optional[List[str]] = None) -> int:
+        """ギルドの内部IDをまとめて対応表に読み込む（省略時はアクティブな全ギルド）"""
+        try:
+            query = select(Guild.discord_id, Guild.id)
+            if discord_ids is None:
+                result = await self.session.execute(query.where(Guild.is_active.is_(True)))
+                return guild_ids.preload(dict(result.all()))
+            keys = [str(discord_id) for discord_id in discord_ids]
+            result = await self.session.execute(query.where(Guild.discord_id.in_(keys)))
+            found = dict(result.all())
+            return guild_ids.preload(found, missing=[key for key in keys if key not in found])
+        except SQLAlchemyError as e:
+            logger.error(f"ギルドの内部ID読み込み中にエラー: {e}")
+            return 0
+
+    async def create_guild(self, data: Dict[str, Any]) -> Optional[Guild]:
+        """ギルドの新規作成（既に存在する場合はそのギルドを返す）"""
+        try:
+            if 'discord_id' not in data or not data['discord_id']:
+                logger.error("ギルド作成にDiscord IDが必要です")
+                return None
+
+            existing = await self.get_guild_by_id(data['discord_id'])
+            if existing:
+                logger.info(f"ギルドID {data['discord_id']} は既に存在します")
+                return existing
+
+            data = dict(data)
+            if not data.get('name'):
+                data['name'] = f"Guild-{data['discord_id']}"
+            if not data.get('owner_id'):
+                data['owner_id'] = "0"
+
+            guild = Guild(**data)
+            self.session.add(guild)
+            await self.session.flush()
+            remember_on_commit(self.session, guild_ids, data['discord_id'], guild.id)
+            await self.session.commit()
+            return guild
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"ギルド作成中にエラー: {e}")
+            return None
+
+    async def update_guild(self, discord_id: str, data: Dict[str, Any]) -> bool:
+        """ギルド情報の更新"""
+        try:
+            guild = await self.get_guild_by_id(discord_id)
+            if not guild:
+                logger.warning(f"更新対象のギルド {discord_id} が見つかりません")
+                return False
+
+            # 更新可能なフィールドを制限
+            allowed_fields = [
+                'name', 'icon', 'member_count', 'owner_id',
+                'premium_tier', 'updated_at'
+            ]
+            for key, value in data.items():
+                if key in allowed_fields:
+                    setattr(guild, key, value)
+
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"ギルド更新中にエラー: {e}")
+            return False
+
+    async def delete_guild(self, discord_id: str) -> bool:
+        """ギルドの削除"""
+        try:
+            guild = await self.get_guild_by_id(discord_id)
+            if not guild:
+                logger.warning(f"削除対象のギルド {discord_id} が見つかりません")
+                return False
+
+            await self.session.delete(guild)
+            await self.session.commit()
+            guild_ids.evict(discord_id)
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"ギルド削除中にエラー: {e}")
+            return False
+
+    async def get_guilds_by_owner(self, owner_id: str) -> List[Guild]:
+        """オーナーIDによるギルド検索"""
+        try:
+            return await self._all(select(Guild).where(Guild.owner_id == owner_id))
+        except SQLAlchemyError as e:
+            logger.error(f"オーナーIDによるギルド検索中にエラー: {e}")
+            return []
+
+
+class AsyncGuildScopedSettingsRepository(AsyncBaseRepository[T]):
+    """
+    ギルドごとに1行の設定テーブルを扱う非同期リポジトリのベースクラス
+    同期版の各設定リポジトリの get/create/update/delete_settings に対応します
+    """
+
+    label = "設定"
+
+    def __init__(self, session: AsyncSession, model_class: Type[T]):
+        super().__init__(session, model_class)
+        self.guild_repo = AsyncGuildRepository(session)
+
+    def _prepare(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """保存前に設定データを整える（サブクラスで上書き）"""
+        return data
+
+    async def _settings_for(self, guild_pk: int) -> Optional[T]:
+        return await self._first(select(self.model_class).where(self.model_class.guild_id == guild_pk))
+
+    async def get_settings(self, guild_id: str) -> Optional[T]:
+        """
+        ギルドIDによる設定の取得
+
+        Args:
+            guild_id (str): DiscordのギルドID
+
+        Returns:
+            Optional[T]: 見つかった設定、なければNone
+        """
+        try:
+            guild_pk = await self.guild_repo.get_guild_pk(guild_id)
+            if guild_pk is None:
+                logger.warning(f"ギルド {guild_id} が存在しません")
+                return None
+            return await self._settings_for(guild_pk)
+        except SQLAlchemyError as e:
+            logger.error(f"{self.label}の取得中にエラー: {e}")
+            return None
+
+    async def create_settings(self, guild_id: str, data: Dict[str, Any] = None) -> Optional[T]:
+        """
+        設定の新規作成（ギルドがない場合はギルドも作成）
+
+        Args:
+            guild_id (str): DiscordのギルドID
+            data (Dict[str, Any], optional): 設定データ、デフォルトはNone
+
+        Returns:
+            Optional[T]: 作成された設定、失敗時はNone
+        """
+        try:
+            guild_pk = await self.guild_repo.ensure_guild_pk(guild_id)
+            if guild_pk is None:
+                logger.error(f"ギルド {guild_id} の作成に失敗しました")
+                return None
+
+            existing = await self._settings_for(guild_pk)
+            if existing:
+                logger.info(f"ギルド {guild_id} の{self.label}は既に存在します")
+                return existing
+
+            settings_data = self._prepare(dict(data or {}))
+            settings_data['guild_id'] = guild_pk
+
+            settings = self.model_class(**settings_data)
+            self.session.add(settings)
+            await self.session.commit()
+            return settings
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"{self.label}の作成中にエラー: {e}")
+            return None
+
+    async def update_settings(self, guild_id: str, data: Dict[str, Any]) -> bool:
+        """
+        設定の更新（設定がない場合は作成）
+
+        Args:
+            guild_id (str): DiscordのギルドID
+            data (Dict[str, Any]): 更新データ
+
+        Returns:
+            bool: 更新成功はTrue、失敗はFalse
+        """
+        try:
+            settings = await self.get_settings(guild_id)
+            if not settings:
+                created = await self.create_settings(guild_id, data)
+                return created is not None
+
+            for key, value in self._prepare(dict(data)).items():
+                if hasattr(settings, key):
+                    setattr(settings, key, value)
+
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"{self.label}の更新中にエラー: {e}")
+            return False
+
+    async def delete_settings(self, guild_id: str) -> bool:
+        """
+        設定の削除
+
+        Args:
+            guild_id (str): DiscordのギルドID
+
+        Returns:
+            bool: 削除成功はTrue、失敗はFalse
+        """
+        try:
+            guild_pk = await self.guild_repo.get_guild_pk(guild_id)
+            if guild_pk is None:
+                logger.warning(f"ギルド {guild_id} が存在しません")
+                return False
+
+            settings = await self._settings_for(guild_pk)
+            if not settings:
+                logger.warning(f"ギルド {guild_id} の{self.label}が存在しません")
+                return False
+
+            await self.session.delete(settings)
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"{self.label}の削除中にエラー: {e}")
+            return False
+
+    async def _update_fields(self, guild_id: str, data: Dict[str, Any], allowed_fields: List[str]) -> bool:
+        """許可されたフィールドだけを更新する（設定がない場合は作成）"""
+        try:
+            settings = await self.get_settings(guild_id)
+            if not settings:
+                return await self.create_settings(guild_id, data) is not None
+
+            for key, value in data.items():
+                if key in allowed_fields:
+                    setattr(settings, key, value)
+
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"{self.label}の更新中にエラー: {e}")
+            return False
+
+
+class AsyncGuildSettingsRepository(AsyncGuildScopedSettingsRepository[GuildSettings]):
+    """ギルド設定に関する非同期リポジトリ"""
+
+    label = "ギルド設定"
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, GuildSettings)
+
+
+class AsyncRaidSettingsRepository(AsyncGuildScopedSettingsRepository[RaidSettings]):
+    """レイド保護設定に関する非同期リポジトリ"""
+
+    label = "レイド保護設定"
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, RaidSettings)
+
+
+class AsyncSpamSettingsRepository(AsyncGuildScopedSettingsRepository[SpamSettings]):
+    """スパム設定に関する非同期リポジトリ"""
+
+    label = "スパム設定"
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, SpamSettings)
+
+    async def update_spam_limits(self, guild_id: str, limits: Dict[str, int]) -> bool:
+        """スパム制限値を更新"""
+        return await self._update_fields(guild_id, limits, [
+            'message_rate_limit', 'message_time_window',
+            'mention_limit', 'role_mention_limit',
+            'duplicate_limit', 'url_limit'
+        ])
+
+
+class AsyncAIModSettingsRepository(AsyncGuildScopedSettingsRepository[AIModSettings]):
+    """AIモデレーション設定に関する非同期リポジトリ"""
+
+    label = "AIモデレーション設定"
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, AIModSettings)
+
+    async def update_thresholds(self, guild_id: str, thresholds: Dict[str, float]) -> bool:
+        """AIモデレーションの閾値を更新"""
+        return await self._update_fields(guild_id, thresholds, [
+            'toxicity_threshold', 'identity_attack_threshold',
+            'insult_threshold', 'threat_threshold', 'sexual_threshold'
+        ])
+
+
+class AsyncAutoResponseSettingsRepository(AsyncGuildScopedSettingsRepository[AutoResponseSettings]):
+    """自動応答設定に関する非同期リポジトリ"""
+
+    label = "自動応答設定"
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, AutoResponseSettings)
+
+    def _prepare(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # JSON型フィールドを確認
+        if 'custom_responses' in data and not isinstance(data['custom_responses'], dict):
+            try:
+                data['custom_responses'] = json.loads(data['custom_responses'])
+            except (json.JSONDecodeError, TypeError):
+                data['custom_responses'] = {}
+        return data
+
+    async def add_custom_response(self, guild_id: str, trigger: str, responses: List[str]) -> bool:
+        """カスタム応答パターンを追加"""
+        try:
+            settings = await self.get_settings(guild_id)
+            if not settings:
+                data = {'custom_responses': {trigger: responses}}
+                return await self.create_settings(guild_id, data) is not None
+
+            # JSON列の変更を検知させるため新しい辞書を代入する
+            custom_responses = dict(settings.custom_responses or {})
+            custom_responses[trigger] = responses
+            settings.custom_responses = custom_responses
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"カスタム応答追加中にエラー: {e}")
+            return False
+
+    async def remove_custom_response(self, guild_id: str, trigger: str) -> bool:
+        """カスタム応答パターンを削除"""
+        try:
+            settings = await self.get_settings(guild_id)
+            if not settings or not settings.custom_responses:
+                logger.warning(f"ギルド {guild_id} にカスタム応答がありません")
+                return False
+
+            if trigger not in settings.custom_responses:
+                logger.warning(f"ギルド {guild_id} にトリガー '{trigger}' のカスタム応答がありません")
+                return False
+
+            custom_responses = dict(settings.custom_responses)
+            del custom_responses[trigger]
+            settings.custom_responses = custom_responses
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"カスタム応答削除中にエラー: {e}")
+            return False
+
+    async def get_all_custom_responses(self, guild_id: str) -> Dict[str, List[str]]:
+        """全てのカスタム応答パターンを取得"""
+        settings = await self.get_settings(guild_id)
+        if not settings:
+            return {}
+        return settings.custom_responses or {}
+
+
+class AsyncUserRepository(AsyncBaseRepository[User]):
+    """ユーザー情報に関する非同期リポジトリ"""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, User)
+
+    async def get_user_by_discord_id(self, discord_id: str) -> Optional[User]:
+        """Discord IDによるユーザーの取得"""
+        try:
+            user = await self._first(select(User).where(User.user_id == str(discord_id)))
+            if user:
+                user_ids.put(discord_id, user.id)
+            return user
+        except SQLAlchemyError as e:
+            logger.error(f"Discord IDによるユーザー取得中にエラー: {e}")
+            return None
+
+    async def get_user_pk(self, discord_id: str) -> Optional[int]:
+        """Discord IDからユーザーの内部IDを取得（対応表に記憶していればクエリを実行しない）"""
+        cached, pk = user_ids.lookup(discord_id)
+        if cached:
+            return pk
+        try:
+            result = await self.session.execute(select(User.id).where(User.user_id == str(discord_id)))
+            pk = result.scalar()
+            user_ids.put(discord_id, pk)
+            return pk
+        except SQLAlchemyError as e:
+            logger.error(f"ユーザーの内部ID取得中にエラー: {e}")
+            return None
+
+    async def ensure_user_pk(self, discord_id: str) -> Optional[int]:
+        """ユーザーの内部IDを取得し、ユーザーがなければ仮の名前で作成"""
+        pk = user_ids.get(discord_id)
+        if pk is not None:
+            return pk
+        user = await self.create_user({"user_id": str(discord_id)})
+        return user_ids.get(discord_id) if user else None
+
+    async def preload(self, discord_ids: List[str]) -> int:
+        """ユーザーの内部IDをまとめて対応表に読み込む"""
+        try:
+            keys = [str(discord_id) for discord_id in discord_ids]
+            result = await self.session.execute(select(User.user_id, User.id).where(User.user_id.in_(keys)))
+            found = dict(result.all())
+            return user_ids.preload(found, missing=[key for key in keys if key not in found])
+        except SQLAlchemyError as e:
+            logger.error(f"ユーザーの内部ID読み込み中にエラー: {e}")
+            return 0
+
+    async def create_user(self, data: Dict[str, Any]) -> Optional[User]:
+        """ユーザーの新規作成（既に存在する場合はそのユーザーを返す）"""
+        try:
+            if 'user_id' not in data or not data['user_id']:
+                logger.error("ユーザー作成にDiscord IDが必要です")
+                return None
+
+            existing = await self.get_user_by_discord_id(data['user_id'])
+            if existing:
+                logger.info(f"ユーザーID {data['user_id']} は既に存在します")
+                return existing
+
+            data = dict(data)
+            if not data.get('username'):
+                data['username'] = f"User-{data['user_id']}"
+            data['created_at'] = datetime.utcnow()
+            data['updated_at'] = datetime.utcnow()
+
+            user = User(**data)
+            self.session.add(user)
+            await self.session.flush()
+            remember_on_commit(self.session, user_ids, data['user_id'], user.id)
+            await self.session.commit()
+            return user
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"ユーザー作成中にエラー: {e}")
+            return None
+
+    async def update_user(self, discord_id: str, data: Dict[str, Any]) -> bool:
+        """ユーザー情報の更新"""
+        try:
+            user = await self.get_user_by_discord_id(discord_id)
+            if not user:
+                logger.warning(f"更新対象のユーザー {discord_id} が見つかりません")
+                return False
+
+            # 更新可能なフィールドを制限
+            allowed_fields = [
+                'username', 'email', 'avatar_url', 'is_admin',
+                'is_active', 'last_login'
+            ]
+            for key, value in data.items():
+                if key in allowed_fields:
+                    setattr(user, key, value)
+            user.updated_at = datetime.utcnow()
+
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"ユーザー更新中にエラー: {e}")
+            return False
+
+    async def delete_user(self, discord_id: str) -> bool:
+        """ユーザーの削除"""
+        try:
+            user = await self.get_user_by_discord_id(discord_id)
+            if not user:
+                logger.warning(f"削除対象のユーザー {discord_id} が見つかりません")
+                return False
+
+            await self.session.delete(user)
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"ユーザー削除中にエラー: {e}")
+            return False
+
+    async def set_last_login(self, discord_id: str) -> bool:
+        """最終ログイン時間を更新"""
+        try:
+            user = await self.get_user_by_discord_id(discord_id)
+            if not user:
+                logger.warning(f"ユーザー {discord_id} が見つかりません")
+                return False
+
+            user.last_login = datetime.utcnow()
+            user.updated_at = datetime.utcnow()
+            await self.session.commit()
+            return True
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"最終ログイン時間更新中にエラー: {e}")
+            return False
+
+    async def get_admins(self) -> List[User]:
+        """管理者ユーザーのリストを取得"""
+        try:
+            return await self._all(select(User).where(User.is_admin == True))
+        except SQLAlchemyError as e:
+            logger.error(f"管理者リスト取得中にエラー: {e}")
+            return []
+
+
+class AsyncAuditLogRepository(AsyncBaseRepository[AuditLog]):
+    """監査ログに関する非同期リポジトリ"""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, AuditLog)
+        self.guild_repo = AsyncGuildRepository(session)
+        self.user_repo = AsyncUserRepository(session)
+
+    async def add_log(self, guild_id: str, user_id: str, action: str,
+                      target_id: Optional[str] = None, target_type: Optional[str] = None,
+                      details: Optional[Dict[str, Any]] = None) -> Optional[AuditLog]:
+        """監査ログの追加（ギルドとユーザーがない場合は作成）"""
+        try:
+            guild_pk = await self.guild_repo.ensure_guild_pk(guild_id)
+            if guild_pk is None:
+                logger.error(f"ギルド {guild_id} の作成に失敗しました")
+                return None
+
+            user_pk = await self.user_repo.ensure_user_pk(user_id)
+            if user_pk is None:
+                logger.error(f"ユーザー {user_id} の作成に失敗しました")
+                return None
+
+            log = AuditLog(
+                guild_id=guild_pk,
+                user_id=user_pk,
+                action=action,
+                target_id=target_id,
+                target_type=target_type,
+                details=details or {},
+                created_at=datetime.utcnow()
+            )
+            self.session.add(log)
+            await self.session.commit()
+            return log
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            logger.error(f"監査ログ追加中にエラー: {e}")
+            return None
+
+    async def _guild_filter(self, query, guild_id: Optional[str]):
+        if guild_id:
+            guild_pk = await self.guild_repo.get_guild_pk(guild_id)
+            if guild_pk is not None:
+                query = query.where(AuditLog.guild_id == guild_pk)
+        return query
+
+    async def get_logs_by_guild(self, guild_id: str, limit: int = 100,
+                                action_type: Optional[str] = None,
+                                start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None,
+                                cursor: Optional[str] = None) -> List[AuditLog]:
+        """ギルドの監査ログを取得（新しい順、cursor は前のページの次ページカーソル）"""
+        try:
+            guild_pk = await self.guild_repo.get_guild_pk(guild_id)
+            if guild_pk is None:
+                logger.warning(f"ギルド {guild_id} が見つかりません")
+                return []
+
+            query = select(AuditLog).where(AuditLog.guild_id == guild_pk)
+            if action_type:
+                query = query.where(AuditLog.action == action_type)
+            if start_date:
+                query = query.where(AuditLog.created_at >= start_date)
+            if end_date:
+                query = query.where(AuditLog.created_at <= end_date)
+
+            return await self._all(keyset_page(query, AuditLog, cursor).limit(limit))
+        except SQLAlchemyError as e:
+            logger.error(f"ギルド監査ログ取得中にエラー: {e}")
+            return []
+
+    async def get_logs_by_user(self, user_id: str, limit: int = 100,
+                               guild_id: Optional[str] = None,
+                               cursor: Optional[str] = None) -> List[AuditLog]:
+        """ユーザーの監査ログを取得（新しい順）"""
+        try:
+            user_pk = await self.user_repo.get_user_pk(user_id)
+            if user_pk is None:
+                logger.warning(f"ユーザー {user_id} が見つかりません")
+                return []
+
+            query = await self._guild_filter(select(AuditLog).where(AuditLog.user_id == user_pk), guild_id)
+            return await self._all(keyset_page(query, AuditLog, cursor).limit(limit))
+        except SQLAlchemyError as e:
+            logger.error(f"ユーザー監査ログ取得中にエラー: {e}")
+            return []
+
+    async def get_logs_by_action(self, action: str, limit: int = 100,
+                                 guild_id: Optional[str] = None,
+                                 cursor: Optional[str] = None) -> List[AuditLog]:
+        """特定のアクションの監査ログを取得（新しい順）"""
+        try:
+            query = await self._guild_filter(select(AuditLog).where(AuditLog.action == action), guild_id)
+            return await self._all(keyset_page(query, AuditLog, cursor).limit(limit))
+        except SQLAlchemyError as e:
+            logger.error(f"アクション監査ログ取得中にエラー: {e}")
+            return []
+
+    async def get_logs_by_date_range(self, start_date: datetime, end_date: datetime,
+                                     guild_id: Optional[str] = None, limit: int = 100,
+                                     cursor: Optional[str] = None) -> List[AuditLog]:
+        """日付範囲での監査ログを取得（新しい順）"""
+        try:
+            query = select(AuditLog).where(
+                AuditLog.created_at >= start_date,
+                AuditLog.created_at <= end_date
+            )
+            query = await self._guild_filter(query, guild_id)
+            return await self._all(keyset_page(query, AuditLog, cursor).limit(limit))
+        except SQLAlchemyError as e:
+            logger.error(f"日付範囲での監査ログ取得中にエラー: {e}")
+            return []
+
+    async def get_recent_actions(self, guild_id: str, hours: int = 24,
+                                 limit: int = 50, cursor: Optional[str] = None) -> List[AuditLog]:
+        """最近のアクションを取得（新しい順）"""
+        start_date = datetime.utcnow() - timedelta(hours=hours)
+        return await self.get_logs_by_guild(guild_id, limit=limit, start_date=start_date, cursor=cursor)
@@ -5,6 +5,7 @@ import logging
 from datetime import datetime, timedelta
 
 from bot.src.db.models import AuditLog, Guild, User
+from bot.src.db.pagination import keyset_page
 from .base_repository import BaseRepository
 from .guild_repository import GuildRepository
 from .user_repository import UserRepository
@@ -43,35 +44,21 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             Optional[AuditLog]: 作成された監査ログ、失敗時はNone
         """
         try:
-            # ギルドの取得または作成
-            guild = self.guild_repo.get_guild_by_id(guild_id)
-            if not guild:
-                guild_data = {
-                    "discord_id": guild_id,
-                    "name": f"Guild-{guild_id}",
-                    "owner_id": "0"
-                }
-                guild = self.guild_repo.create_guild(guild_data)
-                if not guild:
-                    logger.error(f"ギルド {guild_id} の作成に失敗しました")
-                    return None
+            # ギルドとユーザーの内部IDを取得（なければ作成）
+            guild_pk = self.guild_repo.ensure_guild_pk(guild_id)
+            if guild_pk is None:
+                logger.error(f"ギルド {guild_id} の作成に失敗しました")
+                return None
             
-            # ユーザーの取得または作成
-            user = self.user_repo.get_user_by_discord_id(user_id)
-            if not user:
-                user_data = {
-                    "user_id": user_id,
-                    "username": f"User-{user_id}"
-                }
-                user = self.user_repo.create_user(user_data)
-                if not user:
-                    logger.error(f"ユーザー {user_id} の作成に失敗しました")
-                    return None
+            user_pk = self.user_repo.ensure_user_pk(user_id)
+            if user_pk is None:
+                logger.error(f"ユーザー {user_id} の作成に失敗しました")
+                return None
             
             # 監査ログの作成
             log_data = {
-                "guild_id": guild.id,
-                "user_id": user.id,
+                "guild_id": guild_pk,
+                "user_id": user_pk,
                 "action": action,
                 "target_id": target_id,
                 "target_type": target_type,
@@ -91,7 +78,8 @@ class AuditLogRepository(BaseRepository[AuditLog]):
     def get_logs_by_guild(self, guild_id: str, limit: int = 100, 
                         action_type: Optional[str] = None, 
                         start_date: Optional[datetime] = None,
-                        end_date: Optional[datetime] = None) -> List[AuditLog]:
+                        end_date: Optional[datetime] = None,
+                        cursor: Optional[str] = None) -> List[AuditLog]:
         """
         ギルドの監査ログを取得
         
@@ -101,19 +89,20 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             action_type (str, optional): フィルタするアクションタイプ
             start_date (datetime, optional): 開始日時
             end_date (datetime, optional): 終了日時
+            cursor (str, optional): 前のページの次ページカーソル（pagination.next_cursor）
             
         Returns:
             List[AuditLog]: 監査ログのリスト
         """
         try:
-            # ギルドを取得
-            guild = self.guild_repo.get_guild_by_id(guild_id)
-            if not guild:
+            # ギルドの内部IDを取得
+            guild_pk = self.guild_repo.get_guild_pk(guild_id)
+            if guild_pk is None:
                 logger.warning(f"ギルド {guild_id} が見つかりません")
                 return []
             
             # クエリの構築
-            query = self.session.query(AuditLog).filter(AuditLog.guild_id == guild.id)
+            query = self.session.query(AuditLog).filter(AuditLog.guild_id == guild_pk)
             
             if action_type:
                 query = query.filter(AuditLog.action == action_type)
@@ -124,14 +113,15 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             if end_date:
                 query = query.filter(AuditLog.created_at <= end_date)
             
-            # 結果を取得（降順）
-            return query.order_by(AuditLog.created_at.desc()).limit(limit).all()
+            # 結果を取得（新しい順、カーソル以降）
+            return keyset_page(query, AuditLog, cursor).limit(limit).all()
         except SQLAlchemyError as e:
             logger.error(f"ギルド監査ログ取得中にエラー: {e}")
             return []
     
     def get_logs_by_user(self, user_id: str, limit: int = 100,
-                        guild_id: Optional[str] = None) -> List[AuditLog]:
+                        guild_id: Optional[str] = None,
+                        cursor: Optional[str] = None) -> List[AuditLog]:
         """
         ユーザーの監査ログを取得
         
@@ -139,33 +129,35 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             user_id (str): DiscordのユーザーID
             limit (int, optional): 取得する最大数
             guild_id (str, optional): 特定のギルドでフィルタ
+            cursor (str, optional): 前のページの次ページカーソル
             
         Returns:
             List[AuditLog]: 監査ログのリスト
         """
         try:
-            # ユーザーを取得
-            user = self.user_repo.get_user_by_discord_id(user_id)
-            if not user:
+            # ユーザーの内部IDを取得
+            user_pk = self.user_repo.get_user_pk(user_id)
+            if user_pk is None:
                 logger.warning(f"ユーザー {user_id} が見つかりません")
                 return []
             
             # クエリの構築
-            query = self.session.query(AuditLog).filter(AuditLog.user_id == user.id)
+            query = self.session.query(AuditLog).filter(AuditLog.user_id == user_pk)
             
             if guild_id:
-                guild = self.guild_repo.get_guild_by_id(guild_id)
-                if guild:
-                    query = query.filter(AuditLog.guild_id == guild.id)
+                guild_pk = self.guild_repo.get_guild_pk(guild_id)
+                if guild_pk is not None:
+                    query = query.filter(AuditLog.guild_id == guild_pk)
             
-            # 結果を取得（降順）
-            return query.order_by(AuditLog.created_at.desc()).limit(limit).all()
+            # 結果を取得（新しい順、カーソル以降）
+            return keyset_page(query, AuditLog, cursor).limit(limit).all()
         except SQLAlchemyError as e:
             logger.error(f"ユーザー監査ログ取得中にエラー: {e}")
             return []
     
     def get_logs_by_action(self, action: str, limit: int = 100,
-                          guild_id: Optional[str] = None) -> List[AuditLog]:
+                          guild_id: Optional[str] = None,
+                          cursor: Optional[str] = None) -> List[AuditLog]:
         """
         特定のアクションの監査ログを取得
         
@@ -173,6 +165,7 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             action (str): アクション名
             limit (int, optional): 取得する最大数
             guild_id (str, optional): 特定のギルドでフィルタ
+            cursor (str, optional): 前のページの次ページカーソル
             
         Returns:
             List[AuditLog]: 監査ログのリスト
@@ -182,18 +175,19 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             query = self.session.query(AuditLog).filter(AuditLog.action == action)
             
             if guild_id:
-                guild = self.guild_repo.get_guild_by_id(guild_id)
-                if guild:
-                    query = query.filter(AuditLog.guild_id == guild.id)
+                guild_pk = self.guild_repo.get_guild_pk(guild_id)
+                if guild_pk is not None:
+                    query = query.filter(AuditLog.guild_id == guild_pk)
             
-            # 結果を取得（降順）
-            return query.order_by(AuditLog.created_at.desc()).limit(limit).all()
+            # 結果を取得（新しい順、カーソル以降）
+            return keyset_page(query, AuditLog, cursor).limit(limit).all()
         except SQLAlchemyError as e:
             logger.error(f"アクション監査ログ取得中にエラー: {e}")
             return []
     
     def get_logs_by_date_range(self, start_date: datetime, end_date: datetime,
-                              guild_id: Optional[str] = None, limit: int = 100) -> List[AuditLog]:
+                              guild_id: Optional[str] = None, limit: int = 100,
+                              cursor: Optional[str] = None) -> List[AuditLog]:
         """
         日付範囲での監査ログを取得
         
@@ -202,6 +196,7 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             end_date (datetime): 終了日時
             guild_id (str, optional): 特定のギルドでフィルタ
             limit (int, optional): 取得する最大数
+            cursor (str, optional): 前のページの次ページカーソル
             
         Returns:
             List[AuditLog]: 監査ログのリスト
@@ -213,18 +208,18 @@ class AuditLogRepository(BaseRepository[AuditLog]):
                 .filter(AuditLog.created_at <= end_date)
             
             if guild_id:
-                guild = self.guild_repo.get_guild_by_id(guild_id)
-                if guild:
-                    query = query.filter(AuditLog.guild_id == guild.id)
+                guild_pk = self.guild_repo.get_guild_pk(guild_id)
+                if guild_pk is not None:
+                    query = query.filter(AuditLog.guild_id == guild_pk)
             
-            # 結果を取得（降順）
-            return query.order_by(AuditLog.created_at.desc()).limit(limit).all()
+            # 結果を取得（新しい順、カーソル以降）
+            return keyset_page(query, AuditLog, cursor).limit(limit).all()
         except SQLAlchemyError as e:
             logger.error(f"日付範囲での監査ログ取得中にエラー: {e}")
             return []
     
     def get_recent_actions(self, guild_id: str, hours: int = 24, 
-                          limit: int = 50) -> List[AuditLog]:
+                          limit: int = 50, cursor: Optional[str] = None) -> List[AuditLog]:
         """
         最近のアクションを取得
         
@@ -232,14 +227,15 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             guild_id (str): DiscordのギルドID
             hours (int, optional): 過去X時間
             limit (int, optional): 取得する最大数
+            cursor (str, optional): 前のページの次ページカーソル
             
         Returns:
             List[AuditLog]: 監査ログのリスト
         """
         try:
-            # ギルドを取得
-            guild = self.guild_repo.get_guild_by_id(guild_id)
-            if not guild:
+            # ギルドの内部IDを取得
+            guild_pk = self.guild_repo.get_guild_pk(guild_id)
+            if guild_pk is None:
                 logger.warning(f"ギルド {guild_id} が見つかりません")
                 return []
             
@@ -248,11 +244,11 @@ class AuditLogRepository(BaseRepository[AuditLog]):
             
             # クエリの構築
             query = self.session.query(AuditLog)\
-                .filter(AuditLog.guild_id == guild.id)\
+                .filter(AuditLog.guild_id == guild_pk)\
                 .filter(AuditLog.created_at >= start_date)
             
-            # 結果を取得（降順）
-            return query.order_by(AuditLog.created_at.desc()).limit(limit).all()
+            # 結果を取得（新しい順、カーソル以降）
+            return keyset_page(query, AuditLog, cursor).limit(limit).all()
         except SQLAlchemyError as e:
             logger.error(f"最近のアクション取得中にエラー: {e}")
             return [] 
\ No newline at end of file
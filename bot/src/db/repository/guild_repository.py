@@ -4,6 +4,7 @@ from sqlalchemy.exc import SQLAlchemyError
 import logging
 
 from bot.src.db.models import Guild
+from bot.src.db.identity_map import guild_ids
 from .base_repository import BaseRepository
 
 logger = logging.getLogger('bot.repository.guild')
@@ -31,11 +32,78 @@ class GuildRepository(BaseRepository[Guild]):
             Optional[Guild]: 見つかったギルド、なければNone
         """
         try:
-            return self.session.query(Guild).filter(Guild.discord_id == discord_id).first()
+            guild = self.session.query(Guild).filter(Guild.discord_id == str(discord_id)).first()
+            if guild:
+                guild_ids.put(discord_id, guild.id)
+            return guild
         except SQLAlchemyError as e:
             logger.error(f"Discord IDによるギルド取得中にエラー: {e}")
             return None
     
+    def get_guild_pk(self, discord_id: str) -> Optional[int]:
+        """
+        Discord IDからギルドの内部IDを取得
+        対応表に記憶していればクエリを実行しません
+        
+        Args:
+            discord_id (str): DiscordのギルドID
+            
+        Returns:
+            Optional[int]: ギルドの内部ID、なければNone
+        """
+        cached, pk = guild_ids.lookup(discord_id)
+        if cached:
+            return pk
+        try:
+            pk = self.session.query(Guild.id).filter(Guild.discord_id == str(discord_id)).scalar()
+            guild_ids.put(discord_id, pk)
+            return pk
+        except SQLAlchemyError as e:
+            logger.error(f"ギルドの内部ID取得中にエラー: {e}")
+            return None
+    
+    def ensure_guild_pk(self, discord_id: str) -> Optional[int]:
+        """
+        ギルドの内部IDを取得し、ギルドがなければ仮の名前で作成
+        
+        Args:
+            discord_id (str): DiscordのギルドID
+            
+        Returns:
+            Optional[int]: ギルドの内部ID、作成失敗時はNone
+        """
+        pk = guild_ids.get(discord_id)
+        if pk is not None:
+            return pk
+        guild = self.create_guild({
+            "discord_id": str(discord_id),
+            "name": f"Guild-{discord_id}",
+            "owner_id": "0"
+        })
+        return guild_ids.get(discord_id) if guild else None
+    
+    def preload(self, discord_ids: Optional[List[str]] = None) -> int:
+        """
+        ギルドの内部IDをまとめて対応表に読み込む
+        
+        Args:
+            discord_ids (List[str], optional): 読み込むDiscord ID、省略時はアクティブな全ギルド
+            
+        Returns:
+            int: 読み込んだ件数
+        """
+        try:
+            query = self.session.query(Guild.discord_id, Guild.id)
+            if discord_ids is None:
+                query = query.filter(Guild.is_active.is_(True))
+                return guild_ids.preload(dict(query.all()))
+            keys = [str(discord_id) for discord_id in discord_ids]
+            found = dict(query.filter(Guild.discord_id.in_(keys)).all())
+            return guild_ids.preload(found, missing=[key for key in keys if key not in found])
+        except SQLAlchemyError as e:
+            logger.error(f"ギルドの内部ID読み込み中にエラー: {e}")
+            return 0
+    
     def create_guild(self, data: Dict[str, Any]) -> Optional[Guild]:
         """
         ギルドの新規作成
@@ -73,7 +141,11 @@ class GuildRepository(BaseRepository[Guild]):
             # ギルド作成
             guild = Guild(**data)
             self.session.add(guild)
+            self.session.flush()
+            # コミットで属性が失効する前に内部IDを控える
+            pk = guild.id
             self.session.commit()
+            guild_ids.put(data['discord_id'], pk)
             return guild
         except SQLAlchemyError as e:
             self.session.rollback()
@@ -133,6 +205,7 @@ class GuildRepository(BaseRepository[Guild]):
             
             self.session.delete(guild)
             self.session.commit()
+            guild_ids.evict(discord_id)
             return True
         except SQLAlchemyError as e:
             self.session.rollback()
@@ -5,6 +5,7 @@ import logging
 from datetime import datetime
 
 from bot.src.db.models import User
+from bot.src.db.identity_map import user_ids
 from .base_repository import BaseRepository
 
 logger = logging.getLogger('bot.repository.user')
@@ -32,11 +33,73 @@ class UserRepository(BaseRepository[User]):
             Optional[User]: 見つかったユーザー、なければNone
         """
         try:
-            return self.session.query(User).filter(User.user_id == discord_id).first()
+            user = self.session.query(User).filter(User.user_id == str(discord_id)).first()
+            if user:
+                user_ids.put(discord_id, user.id)
+            return user
         except SQLAlchemyError as e:
             logger.error(f"Discord IDによるユーザー取得中にエラー: {e}")
             return None
     
+    def get_user_pk(self, discord_id: str) -> Optional[int]:
+        """
+        Discord IDからユーザーの内部IDを取得
+        対応表に記憶していればクエリを実行しません
+        
+        Args:
+            discord_id (str): DiscordのユーザーID
+            
+        Returns:
+            Optional[int]: ユーザーの内部ID、なければNone
+        """
+        cached, pk = user_ids.lookup(discord_id)
+        if cached:
+            return pk
+        try:
+            pk = self.session.query(User.id).filter(User.user_id == str(discord_id)).scalar()
+            user_ids.put(discord_id, pk)
+            return pk
+        except SQLAlchemyError as e:
+            logger.error(f"ユーザーの内部ID取得中にエラー: {e}")
+            return None
+    
+    def ensure_user_pk(self, discord_id: str) -> Optional[int]:
+        """
+        ユーザーの内部IDを取得し、ユーザーがなければ仮の名前で作成
+        
+        Args:
+            discord_id (str): DiscordのユーザーID
+            
+        Returns:
+            Optional[int]: ユーザーの内部ID、作成失敗時はNone
+        """
+        pk = user_ids.get(discord_id)
+        if pk is not None:
+            return pk
+        user = self.create_user({
+            "user_id": str(discord_id),
+            "username": f"User-{discord_id}"
+        })
+        return user_ids.get(discord_id) if user else None
+    
+    def preload(self, discord_ids: List[str]) -> int:
+        """
+        ユーザーの内部IDをまとめて対応表に読み込む
+        
+        Args:
+            discord_ids (List[str]): 読み込むDiscord ID
+            
+        Returns:
+            int: 読み込んだ件数
+        """
+        try:
+            keys = [str(discord_id) for discord_id in discord_ids]
+            found = dict(self.session.query(User.user_id, User.id).filter(User.user_id.in_(keys)).all())
+            return user_ids.preload(found, missing=[key for key in keys if key not in found])
+        except SQLAlchemyError as e:
+            logger.error(f"ユーザーの内部ID読み込み中にエラー: {e}")
+            return 0
+    
     def create_user(self, data: Dict[str, Any]) -> Optional[User]:
         """
         ユーザーの新規作成
@@ -70,7 +133,11 @@ class UserRepository(BaseRepository[User]):
             # ユーザー作成
             user = User(**data)
             self.session.add(user)
+            self.session.flush()
+            # コミットで属性が失効する前に内部IDを控える
+            pk = user.id
             self.session.commit()
+            user_ids.put(data['user_id'], pk)
             return user
         except SQLAlchemyError as e:
             self.session.rollback()
@@ -131,6 +198,7 @@ class UserRepository(BaseRepository[User]):
             
             self.session.delete(user)
             self.session.commit()
+            user_ids.evict(discord_id)
             return True
         except SQLAlchemyError as e:
             self.session.rollback()
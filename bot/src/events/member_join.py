@@ -4,6 +4,7 @@ import logging
 from modules.moderation.raid_detection import RaidDetector
 from database.database_connection import get_db
 from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
 
 logger = logging.getLogger('events.member')
 
@@ -62,7 +63,7 @@ class MemberEvents(commands.Cog):
                             await welcome_channel.send(message)
 
                     # 監査ログに記録
-                    await db.create_audit_log(
+                    get_audit_sink(self.bot).record(
                         guild_id=member.guild.id,
                         action_type="member_join",
                         user_id=member.id,
@@ -103,7 +104,7 @@ class MemberEvents(commands.Cog):
                             await channel.send(message)
 
                     # 監査ログに記録
-                    await db.create_audit_log(
+                    get_audit_sink(self.bot).record(
                         guild_id=member.guild.id,
                         action_type="member_remove",
                         user_id=member.id,
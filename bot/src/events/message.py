@@ -320,6 +320,23 @@ class MessageEvents(commands.Cog):
         except Exception as e:
             logger.error(f"Error in bulk message delete event handler: {e}")
 
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        """ログチャンネルが削除された場合はキャッシュから外す"""
+        if logger_available and self.message_logger:
+            self.message_logger.on_channel_delete(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        """退出したサーバーのログチャンネルのキャッシュを削除"""
+        if logger_available and self.message_logger:
+            self.message_logger.log_channels.remove_guild(guild.id)
+
+    async def cog_unload(self):
+        """ログを書き出して閉じる（ボットの終了時にもHTTPセッションが閉じる前に呼ばれる）"""
+        if logger_available and self.message_logger:
+            await self.message_logger.close()
+
     async def cog_before_invoke(self, ctx):
         """コマンド実行前に初期化完了を待機"""
         await self.ready.wait()
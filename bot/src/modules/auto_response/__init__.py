@@ -13,8 +13,8 @@ from collections import defaultdict, deque
 import discord
 from discord.ext import commands
 
-from bot.src.db.database import get_auto_response_settings, get_db_session
-from bot.src.db.repository import AutoResponseSettingsRepository
+from bot.src.db.async_database import get_auto_response_settings, get_async_session
+from bot.src.db.repository import AsyncAutoResponseSettingsRepository
 from bot.src.db.models import AutoResponseSettings
 
 __all__ = ['AutoResponse']
@@ -677,8 +677,8 @@ class AutoResponse:
             # データベースに設定を保存
             if settings_updated:
                 try:
-                    with get_db_session() as session:
-                        repo = AutoResponseSettingsRepository(session)
+                    async with get_async_session() as session:
+                        repo = AsyncAutoResponseSettingsRepository(session)
                         
                         # 更新データの準備
                         update_data = {
@@ -698,7 +698,7 @@ class AutoResponse:
                             update_data['custom_responses'] = current_settings.custom_responses
                         
                         # データベースに保存
-                        success = repo.update_settings(guild_id, update_data)
+                        success = await repo.update_settings(guild_id, update_data)
                         if success:
                             self.logger.info(f"ギルド {guild_id} の自動応答設定を更新しました")
                         else:
@@ -9,10 +9,7 @@ from dotenv import load_dotenv
 
 # データベース関連のインポート
 from bot.src.db.database import create_tables_if_not_exist
-from bot.src.db.models import (
-    Guild, GuildSettings, ModerationSettings, 
-    AutoResponseSettings, RaidSettings, SpamSettings
-)
+from bot.src.db.models import Guild
 
 # モジュールのインポート
 from bot.src.modules.ai_moderation import AIModeration
@@ -44,6 +41,9 @@ class BotManager:
         self.auto_response = None
         # その他のモジュール...
         
+        # ログテーブルのパーティション保守タスク
+        self._partition_task: Optional[asyncio.Task] = None
+        
         # ボットのイベントハンドラを設定
         self._setup_event_handlers()
     
@@ -75,6 +75,13 @@ class BotManager:
             except Exception as e:
                 self.logger.error(f"データベース初期化中にエラーが発生しました: {e}")
             
+            # オフライン中に参加・退出したサーバーを反映
+            await self._reconcile_guilds()
+            
+            # ログテーブルのパーティション作成と保持期間の適用（再接続時は起動済みのタスクを使う）
+            if self._partition_task is None or self._partition_task.done():
+                self._partition_task = asyncio.create_task(self._maintain_partitions())
+            
             # モジュールを初期化
             await self._initialize_modules()
             
@@ -106,7 +113,12 @@ class BotManager:
             """サーバーから削除されたときに呼ばれる"""
             self.logger.info(f'サーバーから削除されました: {guild.name} (ID: {guild.id})')
             
-            # TODO: サーバーの設定を非アクティブにする処理
+            # サーバーの設定を非アクティブにする（設定は再参加に備えて残す）
+            try:
+                from bot.src.db.guild_sync import mark_guilds_inactive
+                await mark_guilds_inactive([guild.id])
+            except Exception as e:
+                self.logger.error(f'サーバーの非アクティブ化中にエラーが発生しました: {e}')
         
         @self.bot.event
         async def on_message(message: discord.Message):
@@ -148,53 +160,45 @@ class BotManager:
     
     async def _register_guild(self, guild: discord.Guild):
         """サーバーの設定をデータベースに登録"""
-        from sqlalchemy.orm import Session
-        from bot.src.db.database import get_db_session, get_or_create
+        from bot.src.db.guild_sync import reconcile_guilds
         
-        # セッション取得
         try:
-            with get_db_session() as session:
-                # ギルドを登録または取得
-                db_guild, created = get_or_create(
-                    session,
-                    Guild,
-                    discord_id=str(guild.id)
-                )
-                
-                # 既存のギルドの場合は情報を更新
-                db_guild.name = guild.name
-                db_guild.icon_url = str(guild.icon.url) if guild.icon else None
-                db_guild.owner_id = str(guild.owner_id) if guild.owner_id else None
-                db_guild.member_count = guild.member_count
-                
-                # 初回の場合は各種設定を作成
-                if created:
-                    # 基本設定
-                    guild_settings = GuildSettings(guild=db_guild)
-                    session.add(guild_settings)
-                    
-                    # モデレーション設定
-                    moderation_settings = ModerationSettings(guild=db_guild)
-                    session.add(moderation_settings)
-                    
-                    # 自動応答設定
-                    auto_response_settings = AutoResponseSettings(guild=db_guild)
-                    session.add(auto_response_settings)
-                    
-                    # Raid対策設定
-                    raid_settings = RaidSettings(guild=db_guild)
-                    session.add(raid_settings)
-                    
-                    # スパム対策設定
-                    spam_settings = SpamSettings(guild=db_guild)
-                    session.add(spam_settings)
-                    
-                    self.logger.info(f'サーバーの初期設定を作成しました: {guild.name}')
-                
-                # コミットはコンテキストマネージャが自動的に行います
+            stats = await reconcile_guilds([guild], mark_departed=False)
+            if stats['joined']:
+                self.logger.info(f'サーバーの初期設定を作成しました: {guild.name}')
         except Exception as e:
             self.logger.error(f'サーバー設定の登録中にエラーが発生しました: {e}')
     
+    async def _reconcile_guilds(self):
+        """参加中のサーバーとデータベースを突き合わせる（オフライン中の参加・退出を反映）"""
+        from bot.src.db.guild_sync import reconcile_guilds
+        
+        try:
+            stats = await reconcile_guilds(self.bot.guilds)
+            self.logger.info(
+                f"サーバーの突き合わせ: {stats['guilds']}件, 新規 {stats['joined']}件, "
+                f"退出 {stats['departed']}件 ({stats['elapsed_ms']:.0f}ms)"
+            )
+        except Exception as e:
+            self.logger.error(f'サーバーの突き合わせ中にエラーが発生しました: {e}')
+    
+    async def _maintain_partitions(self):
+        """ログテーブルのパーティションを毎日保守する（先の月の作成と古い月の削除）"""
+        from bot.src.db.partitions import MAINTENANCE_INTERVAL, maintain_partitions
+        
+        while True:
+            try:
+                stats = await maintain_partitions()
+                for table, result in stats.items():
+                    if result['created'] or result['dropped'] or result['purged_rows']:
+                        self.logger.info(
+                            f"{table}: パーティション作成 {len(result['created'])}件, "
+                            f"削除 {len(result['dropped'])}件, 期限切れの行 {result['purged_rows']}件"
+                        )
+            except Exception as e:
+                self.logger.error(f'パーティションの保守中にエラーが発生しました: {e}')
+            await asyncio.sleep(MAINTENANCE_INTERVAL)
+    
     async def load_extension(self, extension: str) -> bool:
         """拡張機能を読み込む"""
         try:
@@ -266,9 +270,45 @@ class BotManager:
         for extension in command_extensions:
             await self.load_extension(extension)
         
+        # SIGUSR1 でデータベースの計測結果をログに出力する
+        from bot.src.db.instrumentation import install_signal_handler
+        install_signal_handler()
+        
         # ボットを起動
         self.logger.info('ボットを起動しています...')
-        await self.bot.start(token)
+        try:
+            await self.bot.start(token)
+        finally:
+            if self._partition_task is not None:
+                self._partition_task.cancel()
+            # 接続数の予算に対して実際に使った接続数を記録する（プールの大きさの見直し用）
+            from bot.src.db.engine import connection_report
+            self.logger.info(f'データベース接続の使用状況: {connection_report()}')
+            # イベントログのキューとメッセージ履歴を書き出す（通常は MessageEvents の cog_unload で閉じている）
+            message_logger = getattr(self.bot, 'message_logger', None)
+            if message_logger is not None:
+                await message_logger.close()
+            # 未保存のエラー履歴を書き出す
+            error_logger = getattr(self.bot, 'error_logger', None)
+            if error_logger is not None:
+                await error_logger.close()
+            # 送信できなかったログチャンネルへの送信待ちを記録して止める
+            log_dispatcher = getattr(self.bot, 'log_dispatcher', None)
+            if log_dispatcher is not None:
+                await log_dispatcher.close()
+                self.logger.info(f'ログチャンネルへの送信状況: {log_dispatcher.metrics()}')
+            # 未書き込みの監査ログを書き出す（書けなかった分はファイルに退避される）
+            audit_sink = getattr(self.bot, 'audit_sink', None)
+            if audit_sink is not None:
+                await audit_sink.close()
+            # キャプチャを描画するワーカープロセスを終了する
+            captcha_pool = getattr(self.bot, 'captcha_pool', None)
+            if captcha_pool is not None:
+                captcha_pool.close()
+            # ロックダウンと自動解除のタスクを止める
+            lockdown_manager = getattr(self.bot, 'lockdown_manager', None)
+            if lockdown_manager is not None:
+                lockdown_manager.close()
     
     def run(self):
         """ボットを実行（同期版）"""
@@ -2,52 +2,198 @@ import discord
 from discord.ext import commands
 import traceback
 import sys
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 import platform
 import io
 import os
+import re
 import json
+import time
 import asyncio
-from collections import defaultdict, Counter
+import hashlib
+import logging
+from collections import defaultdict, deque, Counter
+
+logger = logging.getLogger('modules.logging.error_logger')
+
+# スタックフレームの正規化（メモリアドレスや数値を含む関数名を揃える）
+_ADDRESS_RE = re.compile(r'0x[0-9a-fA-F]+')
+
+
+def _normalize_path(filename: str) -> str:
+    """フレームのファイル名をインストール先に依存しない形にする"""
+    filename = filename.replace('\\', '/')
+    for marker in ('/site-packages/', '/dist-packages/', '/src/'):
+        if marker in filename:
+            return filename.rsplit(marker, 1)[1]
+    return os.path.basename(filename)
+
+
+def fingerprint_error(error: BaseException) -> str:
+    """例外の種類と正規化したスタックフレームからエラーの指紋を作る
+
+    行番号やメッセージ（IDなどを含む）は使わず、同じ箇所で起きた同じ種類の
+    エラーが同じ指紋になるようにします。
+    """
+    error_type = type(error)
+    parts = [f"{error_type.__module__}.{error_type.__qualname__}"]
+    for frame in traceback.extract_tb(error.__traceback__):
+        parts.append(f"{_normalize_path(frame.filename)}:{_ADDRESS_RE.sub('0x', frame.name)}")
+    # 原因となった例外の種類も含める（上流の障害の違いを区別する）
+    cause = error.__cause__ or error.__context__
+    if cause is not None:
+        parts.append(f"cause:{type(cause).__qualname__}")
+    return hashlib.sha1("\n".join(parts).encode('utf-8')).hexdigest()[:12]
+
+
+class ErrorGroup:
+    """同じ指紋のエラーの集計と通知用のトークンバケット"""
+
+    __slots__ = (
+        'fingerprint', 'error_type', 'message', 'last_message', 'count', 'first_seen', 'last_seen',
+        'guild_ids', 'commands', 'suppressed', 'tokens', 'updated'
+    )
+
+    def __init__(self, fingerprint: str, error: BaseException, burst: int, now: float):
+        self.fingerprint = fingerprint
+        self.error_type = type(error).__name__
+        self.message = str(error)[:500]
+        self.last_message = self.message
+        self.count = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.guild_ids: Counter = Counter()
+        self.commands: Counter = Counter()
+        self.suppressed = 0  # 前回のダイジェスト以降に通知を抑制した回数
+        self.tokens = float(burst)
+        self.updated = now
+
+    def record(self, error: BaseException, command: Optional[str], guild_id: Optional[int], now: float) -> None:
+        self.count += 1
+        self.last_seen = now
+        self.last_message = str(error)[:500]
+        if guild_id is not None and (guild_id in self.guild_ids or len(self.guild_ids) < 100):
+            self.guild_ids[guild_id] += 1
+        if command and (command in self.commands or len(self.commands) < 50):
+            self.commands[command] += 1
+
+    def allow(self, now: float, rate: float, burst: int) -> bool:
+        """通知を送ってよいか（per 秒あたり rate 件、最大 burst 件のトークンバケット）"""
+        self.tokens = min(float(burst), self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.suppressed += 1
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'fingerprint': self.fingerprint,
+            'error_type': self.error_type,
+            'message': self.message,
+            'last_message': self.last_message,
+            'count': self.count,
+            'first_seen': datetime.utcfromtimestamp(self.first_seen).isoformat(),
+            'last_seen': datetime.utcfromtimestamp(self.last_seen).isoformat(),
+            'guilds': len(self.guild_ids),
+            'top_commands': self.commands.most_common(3)
+        }
+
 
 class ErrorLogger:
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.error_history = defaultdict(list)  # エラー履歴の追跡用
+        self.error_history = defaultdict(lambda: deque(maxlen=100))  # エラー履歴の追跡用（タイプごとに最新100件）
         self.error_counter = Counter()  # エラータイプのカウント
         self.error_limit = 10  # エラー通知の閾値
         self.error_cooldown = 3600  # エラー通知クールダウン（秒）
-        self.last_notification = {}  # 最後の通知時間
+        self.last_notification = {}  # 最後の通知時間（指紋ごと）
+        self.groups: Dict[str, ErrorGroup] = {}  # 指紋ごとのエラーの集計
+        self.max_groups = 1000  # 保持する指紋の最大数
+        self.notify_burst = 3  # 指紋ごとに続けて送る詳細通知の最大数
+        self.notify_interval = 600  # 詳細通知のトークンが1つ回復するまでの秒数
+        self.digest_interval = 300  # 抑制したエラーのダイジェストを送る間隔（秒）
+        self.channel_cache_ttl = 600  # ギルドのエラーチャンネルIDをキャッシュする秒数
+        # {guild_id: (channel_id, 期限)}（チャンネル未設定やDB障害時は None をキャッシュする）
+        self.error_channels: Dict[int, Tuple[Optional[int], float]] = {}
+        self._global_channel_id: Optional[int] = None
+        self._global_channel_loaded = False
+        self._system_info: Optional[str] = None
+        self._history_dirty = False
+        self.history_path = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'error_history.json'
+        )
+        self._digest_task: Optional[asyncio.Task] = None
+        self.stats = {"logged": 0, "notified": 0, "suppressed": 0, "digests": 0, "channel_lookups": 0}
+        
+        try:
+            from config import get_config
+            log_config = get_config().get('logging', {})
+            self.notify_burst = log_config.get('error_notify_burst', self.notify_burst)
+            self.notify_interval = log_config.get('error_notify_interval', self.notify_interval)
+            self.digest_interval = log_config.get('error_digest_interval', self.digest_interval)
+        except Exception:
+            pass
+        
+    def get_global_error_channel_id(self) -> Optional[int]:
+        """グローバルエラーチャンネル（開発者用）のIDを取得（configは初回のみ読む）"""
+        error_channel_id = getattr(self.bot, 'error_channel_id', None)
+        if error_channel_id:
+            return error_channel_id
+        if not self._global_channel_loaded:
+            self._global_channel_loaded = True
+            try:
+                from config import get_config
+                config = get_config()
+                error_channel_id = config.get('bot', {}).get('error_log_channel_id')
+                if error_channel_id:
+                    self._global_channel_id = int(error_channel_id)
+            except:
+                pass
+        return self._global_channel_id
+        
+    async def get_guild_error_channel_id(self, guild: discord.Guild) -> Optional[int]:
+        """ギルド固有のエラーチャンネルIDを取得（一定時間キャッシュする）"""
+        now = time.monotonic()
+        cached = self.error_channels.get(guild.id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        channel_id = None
+        try:
+            self.stats["channel_lookups"] += 1
+            async with self.bot.db.acquire() as conn:
+                channel_id = await conn.fetchval(
+                    "SELECT error_log_channel_id FROM guilds WHERE id = $1",
+                    guild.id
+                )
+        except Exception as e:
+            # DBの障害時もキャッシュし、エラーのたびに問い合わせないようにする
+            logger.error(f"Error fetching error log channel for guild {guild.id}: {e}")
+        self.error_channels[guild.id] = (channel_id or None, now + self.channel_cache_ttl)
+        return channel_id or None
+        
+    def set_error_channel(self, guild_id: int, channel_id: Optional[int]) -> None:
+        """ギルドのエラーチャンネルの設定変更をキャッシュに反映する"""
+        self.error_channels[guild_id] = (channel_id, time.monotonic() + self.channel_cache_ttl)
         
     async def get_error_channel(self, guild: Optional[discord.Guild] = None) -> Optional[discord.TextChannel]:
         """エラーログ用のチャンネルを取得"""
         try:
             if guild:
                 # ギルド固有のエラーチャンネルを取得
-                async with self.bot.db.acquire() as conn:
-                    result = await conn.fetchval(
-                        "SELECT error_log_channel_id FROM guilds WHERE id = $1",
-                        guild.id
-                    )
-                    if result:
-                        return self.bot.get_channel(result)
+                channel_id = await self.get_guild_error_channel_id(guild)
+                if channel_id:
+                    channel = self.bot.get_channel(channel_id)
+                    if channel:
+                        return channel
             
             # グローバルエラーチャンネルを取得（開発者用）
-            error_channel_id = getattr(self.bot, 'error_channel_id', None)
+            error_channel_id = self.get_global_error_channel_id()
             if error_channel_id:
                 return self.bot.get_channel(error_channel_id)
                 
-            # configから取得を試みる
-            try:
-                from config import get_config
-                config = get_config()
-                error_channel_id = config.get('bot', {}).get('error_log_channel_id')
-                if error_channel_id:
-                    return self.bot.get_channel(int(error_channel_id))
-            except:
-                pass
-                
             return None
         except Exception:
             return None
@@ -77,20 +223,24 @@ class ErrorLogger:
         error: Exception,
         command: Optional[str] = None,
         guild: Optional[discord.Guild] = None,
-        user: Optional[discord.User] = None
+        user: Optional[discord.User] = None,
+        tb: Optional[str] = None,
+        group: Optional[ErrorGroup] = None
     ) -> discord.Embed:
         """エラー情報を含む埋め込みメッセージを作成"""
         
         # エラートレースバックの取得
-        tb = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+        if tb is None:
+            tb = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
         
-        # 基本的なシステム情報
-        system_info = (
-            f"Python: {sys.version}\n"
-            f"OS: {platform.system()} {platform.release()}\n"
-            f"Discord.py: {discord.__version__}\n"
-            f"Memory: {self.get_memory_usage()}"
-        )
+        # 基本的なシステム情報（変わらない部分は初回のみ取得する）
+        if self._system_info is None:
+            self._system_info = (
+                f"Python: {sys.version}\n"
+                f"OS: {platform.system()} {platform.release()}\n"
+                f"Discord.py: {discord.__version__}\n"
+            )
+        system_info = f"{self._system_info}Memory: {self.get_memory_usage()}"
         
         # エラー発生時の詳細情報
         timestamp = datetime.utcnow()
@@ -151,9 +301,15 @@ class ErrorLogger:
         # エラー頻度
         error_type = type(error).__name__
         error_count = self.error_counter[error_type]
+        stats_text = f"このタイプのエラー発生回数: {error_count}回"
+        if group is not None:
+            stats_text += (
+                f"\n同じ箇所のエラー（`{group.fingerprint}`）: {group.count}回"
+                f"（初回 <t:{int(group.first_seen)}:R>）"
+            )
         embed.add_field(
             name="エラー統計",
-            value=f"このタイプのエラー発生回数: {error_count}回",
+            value=stats_text,
             inline=False
         )
         
@@ -176,16 +332,25 @@ class ErrorLogger:
         guild: Optional[discord.Guild] = None,
         user: Optional[discord.User] = None
     ) -> None:
-        """エラーをログチャンネルに送信し、必要に応じて通知"""
+        """エラーを集計し、指紋ごとの上限の範囲でログチャンネルに送信する
+
+        同じ指紋のエラーが続く場合（上流の障害などで全てのハンドラーが失敗する場合）は
+        詳細な通知を抑制し、抑制した件数は定期的なダイジェストにまとめて送ります。
+        """
         try:
+            now = time.time()
+            self.stats["logged"] += 1
+            
             # エラー統計の更新
             error_type = type(error).__name__
             self.error_counter[error_type] += 1
+            group = self._record_group(error, command, guild, now)
             
             # エラー履歴の更新
             error_info = {
                 'timestamp': datetime.utcnow().isoformat(),
                 'error_type': error_type,
+                'fingerprint': group.fingerprint,
                 'error_msg': str(error),
                 'command': command,
                 'guild_id': guild.id if guild else None,
@@ -194,18 +359,27 @@ class ErrorLogger:
                 'user_name': str(user) if user else None
             }
             self.error_history[error_type].append(error_info)
+            self._history_dirty = True
+            self._ensure_digest_task()
+            
+            # 指紋ごとのトークンがなければ詳細な通知は送らない
+            if not group.allow(now, 1 / self.notify_interval, self.notify_burst):
+                self.stats["suppressed"] += 1
+                return
+            self.stats["notified"] += 1
             
             # エラーログチャンネルに送信
             channel = await self.get_error_channel(guild)
             if channel:
-                embed = self.create_error_embed(error, command, guild, user)
+                tb = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+                embed = self.create_error_embed(error, command, guild, user, tb=tb, group=group)
                 await channel.send(embed=embed)
                 
                 # エラーの詳細が長い場合はファイルとしても送信
-                tb = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
                 if len(tb) > 2000:
                     file_content = (
                         f"Error: {error_type}\n"
+                        f"Fingerprint: {group.fingerprint}\n"
                         f"Message: {str(error)}\n"
                         f"Command: {command}\n"
                         f"Guild: {guild.name if guild else 'N/A'} (ID: {guild.id if guild else 'N/A'})\n"
@@ -220,26 +394,122 @@ class ErrorLogger:
                     await channel.send(file=file)
             
             # 重大なエラーが頻発している場合は管理者に通知
-            await self.notify_admins_if_needed(error_type, error)
-            
-            # エラー履歴を定期的に保存
-            await self.save_error_history()
+            await self.notify_admins_if_needed(error_type, error, group)
             
         except Exception as e:
             print(f"エラーログの送信に失敗しました: {e}")
             traceback.print_exc()
             
-    async def notify_admins_if_needed(self, error_type: str, error: Exception) -> None:
+    def _record_group(
+        self,
+        error: Exception,
+        command: Optional[str],
+        guild: Optional[discord.Guild],
+        now: float
+    ) -> ErrorGroup:
+        """エラーを指紋ごとの集計に加える"""
+        fingerprint = fingerprint_error(error)
+        group = self.groups.get(fingerprint)
+        if group is None:
+            if len(self.groups) >= self.max_groups:
+                # 最も長く発生していない指紋を外す
+                oldest = min(self.groups.values(), key=lambda g: g.last_seen)
+                del self.groups[oldest.fingerprint]
+            group = ErrorGroup(fingerprint, error, self.notify_burst, now)
+            self.groups[fingerprint] = group
+        group.record(error, command, guild.id if guild else None, now)
+        return group
+        
+    def _ensure_digest_task(self) -> None:
+        if self._digest_task is None or self._digest_task.done():
+            self._digest_task = asyncio.get_running_loop().create_task(self._digest_loop())
+            
+    async def _digest_loop(self) -> None:
+        """抑制したエラーのダイジェストの送信とエラー履歴の保存を定期的に行う"""
+        while True:
+            try:
+                await asyncio.sleep(self.digest_interval)
+                await self.send_digest()
+                if self._history_dirty:
+                    await self.save_error_history()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in error digest loop: {e}")
+                
+    def create_digest_embed(self, groups: List[ErrorGroup]) -> discord.Embed:
+        """通知を抑制したエラーのダイジェストを作成"""
+        total = sum(group.suppressed for group in groups)
+        embed = discord.Embed(
+            title="📦 エラーダイジェスト",
+            description=f"直近{self.digest_interval // 60}分間に通知を抑制したエラー: {total}件（{len(groups)}種類）",
+            color=discord.Color.orange(),
+            timestamp=datetime.utcnow()
+        )
+        for group in groups[:10]:
+            embed.add_field(
+                name=f"{group.error_type} `{group.fingerprint}`",
+                value=(
+                    f"抑制: {group.suppressed}件 / 累計: {group.count}件 / サーバー数: {len(group.guild_ids)}\n"
+                    f"初回: <t:{int(group.first_seen)}:R> / 最終: <t:{int(group.last_seen)}:R>\n"
+                    f"```py\n{group.last_message[:200]}```"
+                ),
+                inline=False
+            )
+        if len(groups) > 10:
+            embed.set_footer(text=f"他 {len(groups) - 10} 種類")
+        return embed
+        
+    async def send_digest(self) -> bool:
+        """通知を抑制したエラーがあればグローバルエラーチャンネルにダイジェストを送る"""
+        groups = sorted(
+            (group for group in self.groups.values() if group.suppressed),
+            key=lambda g: g.suppressed,
+            reverse=True
+        )
+        if not groups:
+            return False
+        embed = self.create_digest_embed(groups)
+        for group in groups:
+            group.suppressed = 0
+        channel_id = self.get_global_error_channel_id()
+        channel = self.bot.get_channel(channel_id) if channel_id else None
+        if channel is None:
+            return False
+        try:
+            await channel.send(embed=embed)
+            self.stats["digests"] += 1
+            return True
+        except Exception as e:
+            logger.error(f"Error sending error digest: {e}")
+            return False
+            
+    async def close(self) -> None:
+        if self._digest_task:
+            self._digest_task.cancel()
+            self._digest_task = None
+        if self._history_dirty:
+            await self.save_error_history()
+            
+    async def notify_admins_if_needed(
+        self,
+        error_type: str,
+        error: Exception,
+        group: Optional[ErrorGroup] = None
+    ) -> None:
         """重大なエラーが頻発している場合に管理者に通知"""
         try:
             # エラーの閾値を超えているか確認
             if self.error_counter[error_type] < self.error_limit:
                 return
                 
-            # クールダウン期間中なら通知しない
+            # クールダウン期間中なら通知しない（指紋ごと）
+            key = group.fingerprint if group is not None else error_type
             now = datetime.utcnow().timestamp()
-            if error_type in self.last_notification and now - self.last_notification[error_type] < self.error_cooldown:
+            if key in self.last_notification and now - self.last_notification[key] < self.error_cooldown:
                 return
+            # 管理者の取得中に同じエラーが続いても重複して通知しない
+            self.last_notification[key] = now
                 
             # 管理者に通知
             admin_users = await self.get_admin_users()
@@ -268,33 +538,35 @@ class ErrorLogger:
                     await admin.send(embed=embed)
                 except:
                     pass
-                    
-            # 最後の通知時間を更新
-            self.last_notification[error_type] = now
         except:
             pass
             
     async def save_error_history(self) -> None:
-        """エラー履歴をJSONファイルに保存"""
+        """エラー履歴をJSONファイルに保存（書き込みはスレッドで行う）"""
         try:
-            # 保存先ディレクトリの確認
-            logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-            os.makedirs(logs_dir, exist_ok=True)
-            
             # エラー履歴をJSONに変換
             error_data = {
                 'last_updated': datetime.utcnow().isoformat(),
                 'error_counts': dict(self.error_counter),
-                'error_history': {k: v[-100:] for k, v in self.error_history.items()}  # 各タイプの最新100件のみ保存
+                'error_history': {k: list(v) for k, v in self.error_history.items()},  # 各タイプの最新100件のみ保存
+                'error_groups': [
+                    group.to_dict()
+                    for group in sorted(self.groups.values(), key=lambda g: g.count, reverse=True)[:100]
+                ]
             }
+            self._history_dirty = False
             
             # ファイルに保存
-            filename = os.path.join(logs_dir, 'error_history.json')
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(error_data, f, ensure_ascii=False, indent=2)
+            await asyncio.get_running_loop().run_in_executor(None, self._write_json, self.history_path, error_data)
         except:
             pass
             
+    @staticmethod
+    def _write_json(filename: str, data: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            
     async def analyze_errors(self) -> discord.Embed:
         """エラー分析レポートを生成"""
         embed = discord.Embed(
@@ -320,6 +592,19 @@ class ErrorLogger:
                 inline=False
             )
             
+        # 発生箇所（指紋）別の発生回数
+        top_groups = sorted(self.groups.values(), key=lambda g: g.count, reverse=True)[:5]
+        if top_groups:
+            group_stats = "\n".join([
+                f"{group.fingerprint} {group.error_type}: {group.count}回（サーバー数 {len(group.guild_ids)}）"
+                for group in top_groups
+            ])
+            embed.add_field(
+                name="最も多い発生箇所（上位5件）",
+                value=f"```{group_stats}```",
+                inline=False
+            )
+            
         # 全体のエラー数
         total_errors = sum(self.error_counter.values())
         embed.add_field(
@@ -335,4 +620,20 @@ class ErrorLogger:
             inline=True
         )
         
-        return embed 
\ No newline at end of file
+        # 通知の抑制状況
+        embed.add_field(
+            name="通知",
+            value=f"送信 {self.stats['notified']}回 / 抑制 {self.stats['suppressed']}回",
+            inline=True
+        )
+        
+        return embed 
+
+
+def get_error_logger(bot) -> ErrorLogger:
+    """ボットに紐づいた共有 ErrorLogger を取得する（なければ作成する）"""
+    error_logger = getattr(bot, 'error_logger', None)
+    if error_logger is None:
+        error_logger = ErrorLogger(bot)
+        bot.error_logger = error_logger
+    return error_logger
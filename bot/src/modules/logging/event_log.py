@@ -0,0 +1,319 @@
+import asyncio
+import gzip
+import heapq
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger('modules.logging.event_log')
+
+# 書き込み中のセグメントの拡張子
+OPEN_SUFFIX = '.ndjson'
+# 圧縮方式ごとの封印済みセグメントの拡張子
+SEALED_SUFFIXES = {'zstd': '.ndjson.zst', 'gzip': '.ndjson.gz', None: '.ndjson.log'}
+
+# (guild_id, event_type, record)
+Record = Tuple[int, str, Dict[str, Any]]
+
+
+class _Segment:
+    """書き込み中のセグメント（1つのギルド・イベント種別ごとに1つ）"""
+
+    __slots__ = ('path', 'file', 'started', 'ended', 'size')
+
+    def __init__(self, path: str, started: float):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.started = started
+        self.ended = started
+        self.size = self.file.tell()
+
+
+class EventLogWriter:
+    """イベントログを追記専用のセグメントファイルに書き込むクラス
+
+    イベントは asyncio のキューに積まれ、バッチにまとめてバックグラウンドの
+    書き込みスレッドに渡されます。セグメントはギルド・イベント種別ごとの
+    改行区切りJSONで、サイズまたは時間で切り替えられ、封印されたセグメントは
+    圧縮されます。保持期間を過ぎたログはセグメント単位で削除します。
+
+    ファイル名は {開始時刻}-{終了時刻} で、保持期間の判定はファイルを開かずに行います。
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 8 * 1024 * 1024,
+                 segment_seconds: float = 3600, retention_days: float = 30,
+                 max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 1.0,
+                 compression: Optional[str] = 'auto'):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if compression == 'auto':
+            compression = 'zstd' if zstandard is not None else 'gzip'
+        elif compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard is not installed, falling back to gzip")
+            compression = 'gzip'
+        self.compression = compression
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='event-log')
+        # 以下は書き込みスレッドだけが触る
+        self._segments: Dict[Tuple[int, str], _Segment] = {}
+        # (終了時刻, パス) の最小ヒープ（保持期間の判定用）
+        self._sealed: List[Tuple[float, str]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "enqueued": 0, "written": 0, "dropped": 0, "blocked": 0,
+            "batches": 0, "bytes": 0, "sealed": 0, "deleted": 0,
+            "queue_high_watermark": 0, "last_batch_size": 0, "last_flush_seconds": 0.0,
+            "max_flush_seconds": 0.0
+        }
+
+    # ---- イベントループ側 ----
+
+    async def start(self) -> None:
+        """前回の書き込み中セグメントを封印し、書き込みタスクを開始する"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._recover)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._pump())
+
+    def _record(self, guild_id: int, event_type: str, data: Dict[str, Any]) -> Record:
+        return (guild_id, event_type, {
+            'event_type': event_type,
+            'timestamp': datetime.utcnow().isoformat(),
+            'data': data
+        })
+
+    def _note_depth(self) -> None:
+        depth = self.queue.qsize()
+        if depth > self.stats["queue_high_watermark"]:
+            self.stats["queue_high_watermark"] = depth
+
+    async def write(self, guild_id: int, event_type: str, data: Dict[str, Any]) -> None:
+        """イベントをキューに積む（キューが一杯の場合は空くまで待つ）"""
+        record = self._record(guild_id, event_type, data)
+        if self.queue.full():
+            self.stats["blocked"] += 1
+        await self.queue.put(record)
+        self.stats["enqueued"] += 1
+        self._note_depth()
+
+    def write_nowait(self, guild_id: int, event_type: str, data: Dict[str, Any]) -> bool:
+        """イベントをキューに積む（キューが一杯の場合は破棄して False を返す）"""
+        try:
+            self.queue.put_nowait(self._record(guild_id, event_type, data))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        self._note_depth()
+        return True
+
+    async def _next_batch(self) -> List[Record]:
+        """最大 batch_size 件、または flush_interval 秒分のイベントを取り出す"""
+        batch: List[Record] = []
+        try:
+            batch.append(await asyncio.wait_for(self.queue.get(), self.flush_interval))
+        except asyncio.TimeoutError:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _pump(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                batch = await self._next_batch()
+                # イベントがなくても時間によるセグメントの切り替えは行う
+                await loop.run_in_executor(self._executor, self._write_batch, batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error writing event log batch: {e}")
+
+    async def flush(self) -> None:
+        """キューに残っているイベントを全て書き込む"""
+        loop = asyncio.get_running_loop()
+        while not self.queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await loop.run_in_executor(self._executor, self._write_batch, batch)
+
+    async def enforce_retention(self) -> int:
+        """保持期間を過ぎた封印済みセグメントを削除し、削除した数を返す"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._enforce_retention, time.time())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._close_segments)
+        self._executor.shutdown(wait=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """バックプレッシャーの指標（キューの深さ、破棄数、書き込み時間など）を返す"""
+        metrics = dict(self.stats)
+        metrics["queue_depth"] = self.queue.qsize()
+        metrics["queue_capacity"] = self.queue.maxsize
+        metrics["open_segments"] = len(self._segments)
+        metrics["sealed_segments"] = len(self._sealed)
+        metrics["compression"] = self.compression
+        return metrics
+
+    # ---- 書き込みスレッド側 ----
+
+    def _stream_dir(self, guild_id: int, event_type: str) -> str:
+        return os.path.join(self.directory, str(guild_id), event_type)
+
+    def _recover(self) -> None:
+        """起動時に既存のセグメントを走査する（書き込み中だったものは封印する）"""
+        os.makedirs(self.directory, exist_ok=True)
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                times = _parse_times(name)
+                if name.endswith(OPEN_SUFFIX):
+                    self._seal_file(path, times[0] if times else None, os.path.getmtime(path))
+                elif times:
+                    heapq.heappush(self._sealed, (times[1], path))
+
+    def _write_batch(self, batch: List[Record]) -> None:
+        start = time.perf_counter()
+        now = time.time()
+
+        # ストリームごとにまとめて1回の write にする
+        lines: Dict[Tuple[int, str], List[bytes]] = {}
+        for guild_id, event_type, record in batch:
+            line = json.dumps(record, ensure_ascii=False, default=str).encode('utf-8') + b'\n'
+            lines.setdefault((guild_id, event_type), []).append(line)
+
+        written = 0
+        for key, chunk in lines.items():
+            segment = self._segment(key, now)
+            data = b''.join(chunk)
+            segment.file.write(data)
+            segment.file.flush()
+            segment.size += len(data)
+            segment.ended = now
+            written += len(data)
+            if segment.size >= self.segment_bytes:
+                self._seal(key)
+
+        # 時間を過ぎたセグメントを封印する
+        for key in [k for k, s in self._segments.items() if now - s.started >= self.segment_seconds]:
+            self._seal(key)
+
+        elapsed = time.perf_counter() - start
+        if batch:
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["bytes"] += written
+            self.stats["last_batch_size"] = len(batch)
+            self.stats["last_flush_seconds"] = elapsed
+            self.stats["max_flush_seconds"] = max(self.stats["max_flush_seconds"], elapsed)
+
+    def _segment(self, key: Tuple[int, str], now: float) -> _Segment:
+        segment = self._segments.get(key)
+        if segment is None:
+            directory = self._stream_dir(*key)
+            os.makedirs(directory, exist_ok=True)
+            segment = _Segment(os.path.join(directory, f"{int(now * 1000)}{OPEN_SUFFIX}"), now)
+            self._segments[key] = segment
+        return segment
+
+    def _seal(self, key: Tuple[int, str]) -> None:
+        segment = self._segments.pop(key)
+        segment.file.close()
+        self._seal_file(segment.path, segment.started, segment.ended)
+
+    def _seal_file(self, path: str, started: Optional[float], ended: float) -> None:
+        """書き込みが終わったセグメントを圧縮し、開始・終了時刻の名前に変える"""
+        started = started if started is not None else ended
+        directory = os.path.dirname(path)
+        sealed_path = os.path.join(
+            directory, f"{int(started * 1000)}-{int(ended * 1000)}{SEALED_SUFFIXES[self.compression]}"
+        )
+        try:
+            if self.compression == 'zstd':
+                with open(path, 'rb') as src, open(sealed_path, 'wb') as dst:
+                    zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+                os.remove(path)
+            elif self.compression == 'gzip':
+                with open(path, 'rb') as src, gzip.open(sealed_path, 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(path)
+            else:
+                os.replace(path, sealed_path)
+        except Exception as e:
+            logger.error(f"Error sealing event log segment {path}: {e}")
+            return
+        heapq.heappush(self._sealed, (ended, sealed_path))
+        self.stats["sealed"] += 1
+
+    def _enforce_retention(self, now: float) -> int:
+        cutoff = now - self.retention_days * 86400
+        deleted = 0
+        while self._sealed and self._sealed[0][0] < cutoff:
+            _, path = heapq.heappop(self._sealed)
+            try:
+                os.remove(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Error deleting event log segment {path}: {e}")
+        self.stats["deleted"] += deleted
+        return deleted
+
+    def _close_segments(self) -> None:
+        for key in list(self._segments):
+            self._seal(key)
+
+
+def _parse_times(name: str) -> Optional[Tuple[Optional[float], float]]:
+    """セグメントのファイル名から (開始時刻, 終了時刻) を取り出す"""
+    stem = name.split('.', 1)[0]
+    try:
+        if '-' in stem:
+            started, ended = stem.split('-', 1)
+            return int(started) / 1000, int(ended) / 1000
+        return int(stem) / 1000, int(stem) / 1000
+    except ValueError:
+        return None
+
+
+def read_segment(path: str) -> List[Dict[str, Any]]:
+    """セグメント（圧縮済みを含む）のイベントを読み込む"""
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst segments")
+        with open(path, 'rb') as f:
+            data = zstandard.ZstdDecompressor().stream_reader(f).read()
+    elif path.endswith('.gz'):
+        with gzip.open(path, 'rb') as f:
+            data = f.read()
+    else:
+        with open(path, 'rb') as f:
+            data = f.read()
+    return [json.loads(line) for line in data.splitlines() if line]
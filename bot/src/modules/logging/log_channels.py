@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import discord
+
+logger = logging.getLogger('modules.logging.log_channels')
+
+
+class LogChannelCache:
+    """ギルドごとのログチャンネルIDをメモリにキャッシュするクラス
+
+    起動時に全ギルドのログチャンネルIDをまとめて読み込み、イベントごとの処理では
+    キャッシュしたIDからチャンネルを引くだけにします。キャッシュにない場合の
+    データベースの参照はギルドごとのロックの中で行います。ログチャンネルがない場合は
+    イベントの処理を待たせずに None を返し、チャンネルの作成はギルドごとに1つの
+    バックグラウンドのタスクで行うため、同時に届いたイベントが重複して mod-logs
+    チャンネルを作ることはありません。
+    ログチャンネルを解決できなかったギルドも missing_ttl 秒の間は記録しておき、
+    イベントごとにデータベースを参照しないようにします。
+    """
+
+    def __init__(self, channel_name: str = 'mod-logs', retry_after: float = 600, missing_ttl: float = 300):
+        self.channel_name = channel_name
+        # チャンネルの作成に失敗したギルドで再試行するまでの時間（秒）
+        self.retry_after = retry_after
+        # ログチャンネルを解決できなかったギルドでデータベースを参照し直すまでの時間（秒）
+        self.missing_ttl = missing_ttl
+        # {guild_id: log_channel_id}
+        self.channel_ids: Dict[int, int] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # {guild_id: 作成に失敗した時刻}
+        self._failed: Dict[int, float] = {}
+        # {guild_id: ログチャンネルを解決できなかった時刻}
+        self._missing: Dict[int, float] = {}
+        # {guild_id: ログチャンネルを作成中のタスク}
+        self.creating: Dict[int, asyncio.Task] = {}
+        self.stats = {"hits": 0, "misses": 0, "missing_hits": 0, "created": 0}
+
+    async def load(self) -> int:
+        """データベースから全ギルドのログチャンネルIDを読み込み、件数を返す"""
+        try:
+            self.channel_ids.update(await self._fetch_all())
+        except Exception as e:
+            logger.error(f"Error loading log channels: {e}")
+            return 0
+        logger.info(f"Loaded {len(self.channel_ids)} log channels")
+        return len(self.channel_ids)
+
+    async def get(self, guild: discord.Guild, create: bool = True) -> Optional[discord.TextChannel]:
+        """ログチャンネルを返す（キャッシュにない場合は解決し、なければ作成を予約して None を返す）"""
+        channel_id = self.channel_ids.get(guild.id)
+        if channel_id:
+            channel = guild.get_channel(channel_id)
+            if channel:
+                self.stats["hits"] += 1
+                return channel
+
+        if self._recently_missing(guild.id):
+            self.stats["missing_hits"] += 1
+            return None
+
+        self.stats["misses"] += 1
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            # ロック待ちの間に他のイベントが解決できなかった場合はデータベースを参照しない
+            if self._recently_missing(guild.id):
+                return None
+            channel = await self._resolve(guild)
+            if channel is None:
+                self._missing[guild.id] = time.monotonic()
+            else:
+                self._missing.pop(guild.id, None)
+        if channel is None and create:
+            self._schedule_create(guild)
+        return channel
+
+    def _recently_missing(self, guild_id: int) -> bool:
+        missing_at = self._missing.get(guild_id)
+        return missing_at is not None and time.monotonic() - missing_at < self.missing_ttl
+
+    async def _resolve(self, guild: discord.Guild) -> Optional[discord.TextChannel]:
+        # ロック待ちの間に他のイベントが解決した場合はそれを使う
+        channel_id = self.channel_ids.get(guild.id)
+        channel = guild.get_channel(channel_id) if channel_id else None
+        if channel:
+            return channel
+
+        try:
+            channel_id = await self._fetch(guild.id)
+        except Exception as e:
+            logger.error(f"Error getting log channel: {e}")
+            return None
+        channel = guild.get_channel(channel_id) if channel_id else None
+        if channel:
+            self.channel_ids[guild.id] = channel.id
+        return channel
+
+    def _schedule_create(self, guild: discord.Guild) -> None:
+        """ログチャンネルの作成をバックグラウンドのタスクに任せる（ギルドごとに1つ）"""
+        if guild.id in self.creating:
+            return
+        failed_at = self._failed.get(guild.id)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+            return
+        task = asyncio.get_running_loop().create_task(self._create_later(guild))
+        self.creating[guild.id] = task
+        task.add_done_callback(lambda done: self._created(guild.id, done))
+
+    def _created(self, guild_id: int, task: asyncio.Task) -> None:
+        if self.creating.get(guild_id) is task:
+            del self.creating[guild_id]
+
+    async def _create_later(self, guild: discord.Guild) -> None:
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            # 作成を待つ間に設定変更でログチャンネルが指定された場合はそれを使う
+            channel_id = self.channel_ids.get(guild.id)
+            channel = guild.get_channel(channel_id) if channel_id else None
+            if channel is None:
+                channel = await self._create(guild)
+        if channel is not None:
+            # 次のイベントからはキャッシュしたチャンネルを使う
+            self._missing.pop(guild.id, None)
+
+    async def _create(self, guild: discord.Guild) -> Optional[discord.TextChannel]:
+        try:
+            overwrites = {
+                guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
+            }
+            channel = await guild.create_text_channel(
+                self.channel_name,
+                overwrites=overwrites,
+                reason="Automatic log channel creation"
+            )
+        except Exception as e:
+            logger.error(f"Error creating log channel in guild {guild.id}: {e}")
+            self._failed[guild.id] = time.monotonic()
+            return None
+
+        self._failed.pop(guild.id, None)
+        self.channel_ids[guild.id] = channel.id
+        self.stats["created"] += 1
+
+        # データベースに保存
+        try:
+            await self._store(guild.id, channel.id)
+        except Exception as e:
+            logger.error(f"Error saving log channel: {e}")
+        return channel
+
+    def set(self, guild_id: int, channel_id: Optional[int]) -> None:
+        """設定変更で新しいログチャンネルが指定された時に呼び出す"""
+        self._failed.pop(guild_id, None)
+        self._missing.pop(guild_id, None)
+        if channel_id:
+            self.channel_ids[guild_id] = int(channel_id)
+        else:
+            self.channel_ids.pop(guild_id, None)
+
+    def invalidate(self, guild_id: int) -> None:
+        """ギルドのキャッシュを無効化する（次のイベントでデータベースから読み直す）"""
+        self.channel_ids.pop(guild_id, None)
+        self._failed.pop(guild_id, None)
+        self._missing.pop(guild_id, None)
+
+    def on_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        """削除されたチャンネルがログチャンネルならキャッシュから外す"""
+        if self.channel_ids.get(channel.guild.id) == channel.id:
+            self.invalidate(channel.guild.id)
+
+    def remove_guild(self, guild_id: int) -> None:
+        """サーバーから退出した時に呼び出す"""
+        self.invalidate(guild_id)
+        self._locks.pop(guild_id, None)
+        task = self.creating.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def _fetch_all(self) -> Dict[int, int]:
+        from database.database_connection import get_db
+        from database.database_operations import DatabaseOperations
+
+        async for session in get_db():
+            db = DatabaseOperations(session)
+            return await db.get_guild_log_channels()
+        return {}
+
+    async def _fetch(self, guild_id: int) -> Optional[int]:
+        from database.database_connection import get_db
+        from database.database_operations import DatabaseOperations
+
+        async for session in get_db():
+            db = DatabaseOperations(session)
+            guild_data = await db.get_guild(guild_id)
+            return guild_data.log_channel_id if guild_data else None
+        return None
+
+    async def _store(self, guild_id: int, channel_id: int) -> None:
+        from database.database_connection import get_db
+        from database.database_operations import DatabaseOperations
+
+        async for session in get_db():
+            db = DatabaseOperations(session)
+            await db.update_guild(guild_id, log_channel_id=channel_id)
+
+
+def get_log_channel_cache(bot) -> LogChannelCache:
+    """ボットに紐づいた共有 LogChannelCache を取得する（なければ作成する）"""
+    cache = getattr(bot, 'log_channel_cache', None)
+    if cache is None:
+        cache = LogChannelCache()
+        bot.log_channel_cache = cache
+    return cache
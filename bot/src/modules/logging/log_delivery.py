@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import discord
+
+logger = logging.getLogger('modules.logging.log_delivery')
+
+# 優先度（数字が小さいほど先に送る）
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+# Discordのメッセージの上限
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_CONTENT_CHARS = 2000
+# ダイジェストの1行あたりの最大文字数
+DIGEST_LINE_CHARS = 180
+
+
+class _LogItem:
+    __slots__ = ('content', 'embed', 'enqueued_at')
+
+    def __init__(self, content: Optional[str], embed: Optional[discord.Embed]):
+        self.content = content
+        self.embed = embed
+        self.enqueued_at = time.monotonic()
+
+
+def digest_line(item: _LogItem) -> str:
+    """ログ1件をダイジェストの1行に要約する"""
+    if item.embed is None:
+        text = item.content or ""
+    else:
+        embed = item.embed
+        parts = [f"**{embed.title}**" if embed.title else ""]
+        if embed.description:
+            parts.append(embed.description.splitlines()[0])
+        for field in embed.fields[:3]:
+            parts.append(f"{field.name}: {str(field.value).splitlines()[0] if field.value else ''}")
+        text = " | ".join(p for p in parts if p)
+    text = " ".join(text.split())
+    if len(text) > DIGEST_LINE_CHARS:
+        text = text[:DIGEST_LINE_CHARS - 1] + "…"
+    return text
+
+
+class _ChannelOutbox:
+    """1チャンネル分の送信待ちログ（優先度ごとのレーン）とレート制限"""
+
+    def __init__(self, channel, rate: int, per: float):
+        self.channel = channel
+        self.lanes: List[Deque[_LogItem]] = [deque(), deque()]
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        # チャンネルごとのメッセージ送信のレート制限（どの per 秒間でも rate 件まで）
+        self.rate = rate
+        self.per = per
+        self.sent_at: Deque[float] = deque()
+
+    def __len__(self) -> int:
+        return len(self.lanes[PRIORITY_HIGH]) + len(self.lanes[PRIORITY_NORMAL])
+
+    def oldest(self) -> Optional[float]:
+        heads = [lane[0].enqueued_at for lane in self.lanes if lane]
+        return min(heads) if heads else None
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self.sent_at and now - self.sent_at[0] >= self.per:
+                self.sent_at.popleft()
+            if len(self.sent_at) < self.rate:
+                self.sent_at.append(now)
+                return
+            await asyncio.sleep(self.sent_at[0] + self.per - now)
+
+
+class LogDispatcher:
+    """ログチャンネルへの送信をチャンネルごとにまとめるクラス
+
+    ログはチャンネルごとのバッファに積まれ、最大10件の埋め込みを1つのメッセージに
+    まとめて送信します。flush_interval 秒待つか、1メッセージ分たまった時点で送信し、
+    送信はチャンネルごとのレート制限（既定は5秒あたり5件）の範囲で行います。
+    送信待ちが digest_threshold 件を超えて遅れている場合は、埋め込みの代わりに
+    1行ずつの要約（ダイジェスト）にまとめて追いつきます。
+    レイド警告などの優先度の高いログは別のレーンに積まれ、待たずに先に送信されます。
+    """
+
+    def __init__(self, flush_interval: float = 2.0, rate: int = 5, per: float = 5.0,
+                 digest_threshold: int = 30, max_pending: int = 2000, idle_timeout: float = 60.0):
+        self.flush_interval = flush_interval
+        self.rate = rate
+        self.per = per
+        self.digest_threshold = digest_threshold
+        self.max_pending = max_pending
+        self.idle_timeout = idle_timeout
+        self.outboxes: Dict[int, _ChannelOutbox] = {}
+        # flush() 中は待たずに送信し、送信待ちがなくなったら終了する
+        self._draining = False
+        self.stats = {
+            "enqueued": 0, "delivered": 0, "messages": 0, "digests": 0, "dropped": 0,
+            "failed": 0, "last_lag": 0.0, "max_lag": 0.0, "avg_lag": 0.0
+        }
+
+    def enqueue(self, channel, embed: Optional[discord.Embed] = None, content: Optional[str] = None,
+                priority: int = PRIORITY_NORMAL) -> bool:
+        """ログを送信待ちに積む（送信待ちが上限を超えた場合は古い通常ログを破棄する）"""
+        if embed is None and not content:
+            return False
+        outbox = self.outboxes.get(channel.id)
+        if outbox is None:
+            outbox = _ChannelOutbox(channel, self.rate, self.per)
+            self.outboxes[channel.id] = outbox
+        outbox.channel = channel
+
+        outbox.lanes[priority].append(_LogItem(content, embed))
+        self.stats["enqueued"] += 1
+        normal = outbox.lanes[PRIORITY_NORMAL]
+        while len(outbox) > self.max_pending and normal:
+            normal.popleft()
+            self.stats["dropped"] += 1
+
+        if priority == PRIORITY_HIGH or len(normal) >= MAX_EMBEDS_PER_MESSAGE:
+            outbox.wakeup.set()
+        if outbox.task is None or outbox.task.done():
+            outbox.task = asyncio.get_running_loop().create_task(self._run(outbox))
+        return True
+
+    async def _run(self, outbox: _ChannelOutbox) -> None:
+        try:
+            while True:
+                if not len(outbox):
+                    if self._draining:
+                        break
+                    # 送信待ちがなくなったらしばらく待ち、何も来なければ終了する
+                    outbox.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(outbox.wakeup.wait(), self.idle_timeout)
+                    except asyncio.TimeoutError:
+                        if not len(outbox):
+                            break
+                    continue
+
+                # 優先度の高いログも1メッセージ分たまったログもなければ、最も古いログが
+                # flush_interval 秒待つまで後続のログを待ってまとめる
+                if (not self._draining and not outbox.lanes[PRIORITY_HIGH]
+                        and len(outbox.lanes[PRIORITY_NORMAL]) < MAX_EMBEDS_PER_MESSAGE):
+                    wait = outbox.oldest() + self.flush_interval - time.monotonic()
+                    if wait > 0:
+                        outbox.wakeup.clear()
+                        try:
+                            await asyncio.wait_for(outbox.wakeup.wait(), wait)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+
+                await outbox.acquire()
+                await self._send_next(outbox)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in log delivery for channel {outbox.channel.id}: {e}")
+        finally:
+            if self.outboxes.get(outbox.channel.id) is outbox and not len(outbox):
+                del self.outboxes[outbox.channel.id]
+
+    def _take(self, lane: Deque[_LogItem]) -> List[_LogItem]:
+        """1メッセージに収まる分のログを取り出す"""
+        items: List[_LogItem] = []
+        embeds = 0
+        embed_chars = 0
+        content_chars = 0
+        while lane:
+            item = lane[0]
+            size = len(item.embed) if item.embed is not None else 0
+            text = len(item.content) + 1 if item.content else 0
+            if items and (
+                embeds + (item.embed is not None) > MAX_EMBEDS_PER_MESSAGE
+                or embed_chars + size > MAX_EMBED_CHARS_PER_MESSAGE
+                or content_chars + text > MAX_CONTENT_CHARS
+            ):
+                break
+            items.append(lane.popleft())
+            embeds += item.embed is not None
+            embed_chars += size
+            content_chars += text
+        return items
+
+    def _take_digest(self, lane: Deque[_LogItem]) -> List[_LogItem]:
+        """ダイジェスト1メッセージに収まる分のログを取り出す"""
+        items: List[_LogItem] = []
+        chars = 0
+        while lane:
+            line = len(digest_line(lane[0])) + 1
+            if items and chars + line > MAX_CONTENT_CHARS:
+                break
+            items.append(lane.popleft())
+            chars += line
+        return items
+
+    async def _send_next(self, outbox: _ChannelOutbox) -> None:
+        high = outbox.lanes[PRIORITY_HIGH]
+        normal = outbox.lanes[PRIORITY_NORMAL]
+        digest = False
+        if high:
+            items = self._take(high)
+        elif len(normal) > self.digest_threshold:
+            items = self._take_digest(normal)
+            digest = True
+        else:
+            items = self._take(normal)
+        if not items:
+            return
+
+        try:
+            if digest:
+                await outbox.channel.send("\n".join(digest_line(item) for item in items))
+                self.stats["digests"] += 1
+            else:
+                content = "\n".join(item.content for item in items if item.content) or None
+                embeds = [item.embed for item in items if item.embed is not None]
+                await outbox.channel.send(content=content, embeds=embeds)
+        except (discord.Forbidden, discord.NotFound) as e:
+            # 送信できないチャンネルの送信待ちは破棄する
+            logger.error(f"Cannot deliver logs to channel {outbox.channel.id}: {e}")
+            self.stats["failed"] += len(items) + len(outbox)
+            for lane in outbox.lanes:
+                lane.clear()
+            return
+        except Exception as e:
+            logger.error(f"Error delivering logs to channel {outbox.channel.id}: {e}")
+            self.stats["failed"] += len(items)
+            return
+
+        now = time.monotonic()
+        lag = now - min(item.enqueued_at for item in items)
+        self.stats["delivered"] += len(items)
+        self.stats["messages"] += 1
+        self.stats["last_lag"] = lag
+        self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+        self.stats["avg_lag"] = lag if self.stats["messages"] == 1 else 0.9 * self.stats["avg_lag"] + 0.1 * lag
+
+    def metrics(self) -> Dict[str, Any]:
+        """送信の状況（配送遅延、送信待ち件数など）を返す"""
+        metrics = dict(self.stats)
+        metrics["pending"] = sum(len(outbox) for outbox in self.outboxes.values())
+        metrics["channels"] = len(self.outboxes)
+        now = time.monotonic()
+        oldest = [outbox.oldest() for outbox in self.outboxes.values()]
+        oldest = [o for o in oldest if o is not None]
+        metrics["oldest_pending_age"] = now - min(oldest) if oldest else 0.0
+        return metrics
+
+    async def flush(self, timeout: float = 5.0) -> bool:
+        """送信待ちのログを待たずに送信し、全て送信できたかを返す（終了前に呼び出す）"""
+        self._draining = True
+        try:
+            tasks = []
+            for outbox in list(self.outboxes.values()):
+                if outbox.task is None or outbox.task.done():
+                    outbox.task = asyncio.get_running_loop().create_task(self._run(outbox))
+                outbox.wakeup.set()
+                tasks.append(outbox.task)
+            if not tasks:
+                return True
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            return not pending
+        finally:
+            self._draining = False
+
+    async def close(self) -> None:
+        """送信タスクを止める（送信できなかったログは破棄して件数を記録する）"""
+        pending = 0
+        for outbox in list(self.outboxes.values()):
+            pending += len(outbox)
+            if outbox.task:
+                outbox.task.cancel()
+        self.outboxes.clear()
+        if pending:
+            self.stats["dropped"] += pending
+            logger.warning(f"Dropped {pending} undelivered log messages on shutdown")
+
+
+def get_log_dispatcher(bot) -> LogDispatcher:
+    """ボットに紐づいた共有 LogDispatcher を取得する（なければ作成する）"""
+    dispatcher = getattr(bot, 'log_dispatcher', None)
+    if dispatcher is None:
+        dispatcher = LogDispatcher()
+        bot.log_dispatcher = dispatcher
+    return dispatcher
@@ -0,0 +1,420 @@
+import logging
+import re
+from bisect import bisect_left
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('modules.logging.message_index')
+
+# CJK（ひらがな・カタカナ・漢字・ハングル・半角カナ）の文字範囲
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff66-\uff9f'
+# CJKの連続部分と、それ以外の単語（英数字など）の連続部分
+_TOKEN_RE = re.compile(f'([{_CJK}]+)|([^\\W{_CJK}]+)')
+
+# 行の状態
+_LIVE = 0
+_DELETED = 1
+_GONE = 2
+
+# 1970-01-01 は木曜日（weekday() == 3）
+_EPOCH_WEEKDAY = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """索引に登録するトークン（英数字は単語、CJKは2文字ずつのn-gram）を返す"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        cjk, word = match.groups()
+        if word:
+            tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+def _query_terms(term: str) -> List[Tuple[str, bool]]:
+    """検索語を (トークン, 完全一致でよいか) に分解する
+
+    検索語の途中にある単語は本文でも単語全体として現れますが、検索語の先頭・末尾の
+    単語は本文の単語の一部である可能性があるため、語彙から部分一致で探します。
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(term):
+        cjk, word = match.groups()
+        bounded = match.start() > 0 and match.end() < len(term)
+        if cjk and len(cjk) > 1:
+            terms.extend((cjk[i:i + 2], True) for i in range(len(cjk) - 1))
+        else:
+            terms.append((cjk or word, bounded))
+    return terms
+
+
+def _intersect(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """昇順で重複のない2つの行番号の配列の共通部分（a が小さい方）"""
+    if not len(a) or not len(b):
+        return a[:0]
+    positions = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[positions] == a]
+
+
+def _union(parts: List[np.ndarray]) -> np.ndarray:
+    """行番号の配列の和集合を昇順・重複なしで返す"""
+    if len(parts) == 1:
+        return parts[0]
+    rows = np.sort(np.concatenate(parts))
+    if len(rows):
+        rows = rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+    return rows
+
+
+class _Column:
+    """末尾に追加できる NumPy の配列（容量を倍々に増やす）"""
+
+    __slots__ = ('data', 'size')
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+
+    def append(self, value) -> None:
+        if self.size == len(self.data):
+            self.data = np.resize(self.data, len(self.data) * 2)
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+    def replace(self, values: np.ndarray) -> None:
+        self.data = np.array(values, dtype=self.data.dtype)
+        self.size = len(values)
+        if not self.size:
+            self.data = np.zeros(1024, dtype=self.data.dtype)
+
+
+class _Vocabulary:
+    """部分一致で探せる語彙（トークン一覧）
+
+    単語ごとに番号を振り、3文字のn-gramから単語番号の一覧（昇順）への索引を持ちます。
+    3文字以上の検索語は、そのn-gramの一覧の共通部分を候補にして単語で確認し、
+    2文字以下の検索語は、それを含むn-gram（3文字未満の単語はその単語自体）の一覧を
+    まとめます。語彙全体を走査しないので、語彙が十数万語でも検索は速く済みます。
+    """
+
+    __slots__ = ('words', 'grams')
+
+    def __init__(self, words: Iterable[str] = ()):
+        self.words: List[str] = []
+        self.grams: Dict[str, array] = {}
+        for word in words:
+            self.add(word)
+
+    @staticmethod
+    def _grams(word: str) -> Iterable[str]:
+        if len(word) < 3:
+            return (word,)
+        return {word[i:i + 3] for i in range(len(word) - 2)}
+
+    def add(self, word: str) -> None:
+        number = len(self.words)
+        self.words.append(word)
+        grams = self.grams
+        for gram in self._grams(word):
+            numbers = grams.get(gram)
+            if numbers is None:
+                grams[gram] = array('I', (number,))
+            else:
+                numbers.append(number)
+
+    def matching(self, token: str) -> List[str]:
+        """token を含む単語を返す"""
+        words = self.words
+        if len(token) < 3:
+            parts = [np.frombuffer(numbers, dtype=np.uint32) for gram, numbers in self.grams.items() if token in gram]
+            return [words[i] for i in _union(parts).tolist()] if parts else []
+        lists = []
+        for gram in self._grams(token):
+            numbers = self.grams.get(gram)
+            if numbers is None:
+                return []
+            lists.append(np.frombuffer(numbers, dtype=np.uint32))
+        lists.sort(key=len)
+        candidates = lists[0]
+        for numbers in lists[1:]:
+            candidates = _intersect(candidates, numbers)
+        # n-gramがすべて含まれていても連続しているとは限らないので、単語で確認する
+        return [word for word in (words[i] for i in candidates.tolist()) if token in word]
+
+
+class _GuildIndex:
+    """1ギルド分の列指向のメッセージ索引
+
+    行は追加順に並びます。peak は作成日時の累積最大値（単調増加）で、到着順の
+    ずれの最大値 disorder と合わせて、日時の範囲を二分探索で絞り込みます。
+    投稿者・チャンネル・トークンごとに行番号の一覧（転置索引）を持ち、一覧は常に
+    昇順で重複がありません。
+    """
+
+    def __init__(self):
+        self.ids = _Column(np.int64)
+        self.created = _Column(np.float64)
+        self.peak = _Column(np.float64)
+        self.author = _Column(np.int64)
+        self.channel = _Column(np.int64)
+        self.state = _Column(np.int8)
+        self.rows: Dict[int, int] = {}
+        self.by_author: Dict[int, array] = {}
+        self.by_channel: Dict[int, array] = {}
+        self.postings: Dict[str, array] = {}
+        self.vocabulary = _Vocabulary()
+        self.author_names: Dict[int, str] = {}
+        self.channel_names: Dict[int, str] = {}
+        self.disorder = 0.0
+        self.gone = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, record) -> None:
+        row = self.rows.get(record.id)
+        if row is not None:
+            # 編集・削除フラグの更新（古いトークンは残るが、検索時に本文で確認する）
+            self._add_tokens(row, record.content)
+            self.state.data[row] = _DELETED if record.deleted_at is not None else _LIVE
+            return
+
+        row = self.ids.size
+        peak = record.created_at
+        if row:
+            previous = self.peak.data[row - 1]
+            if peak < previous:
+                self.disorder = max(self.disorder, previous - peak)
+                peak = previous
+        self.rows[record.id] = row
+        self.ids.append(record.id)
+        self.created.append(record.created_at)
+        self.peak.append(peak)
+        self.author.append(record.author_id)
+        self.channel.append(record.channel_id)
+        self.state.append(_DELETED if record.deleted_at is not None else _LIVE)
+        self.by_author.setdefault(record.author_id, array('I')).append(row)
+        self.by_channel.setdefault(record.channel_id, array('I')).append(row)
+        self.author_names[record.author_id] = record.author_name
+        self.channel_names[record.channel_id] = record.channel_name
+        self._add_tokens(row, record.content)
+
+    def _add_tokens(self, row: int, content: str) -> None:
+        postings = self.postings
+        for token in set(tokenize(content)):
+            rows = postings.get(token)
+            if rows is None:
+                postings[token] = array('I', (row,))
+                self.vocabulary.add(token)
+            elif rows[-1] < row:
+                rows.append(row)
+            else:
+                # 編集で既存の行にトークンが増えた場合は昇順の位置に挿入する
+                position = bisect_left(rows, row)
+                if position == len(rows) or rows[position] != row:
+                    rows.insert(position, row)
+
+    def mark_deleted(self, message_id: int) -> None:
+        row = self.rows.get(message_id)
+        if row is not None:
+            self.state.data[row] = _DELETED
+
+    def discard(self, message_ids: Iterable[int]) -> None:
+        for message_id in message_ids:
+            row = self.rows.pop(message_id, None)
+            if row is not None:
+                self.state.data[row] = _GONE
+                self.gone += 1
+
+    def compact(self) -> None:
+        """消えた行が全体の1/4を超えたら行を詰める（追加順は保つ）"""
+        if self.gone * 4 <= self.ids.size:
+            return
+        keep = np.flatnonzero(self.state.view() != _GONE)
+        remap = np.full(self.ids.size, -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+
+        for column in (self.ids, self.created, self.author, self.channel, self.state):
+            column.replace(column.view()[keep])
+        self.peak.replace(np.maximum.accumulate(self.created.view()) if len(keep) else keep)
+        self.rows = dict(zip(self.ids.view().tolist(), range(len(keep))))
+        for lists in (self.by_author, self.by_channel, self.postings):
+            for key in list(lists):
+                rows = remap[np.frombuffer(lists[key], dtype=np.uint32)]
+                rows = rows[rows >= 0]
+                if len(rows):
+                    lists[key] = array('I', rows.astype(np.uint32).tobytes())
+                else:
+                    del lists[key]
+        # 行がなくなったトークンは語彙に残る（検索時に除く）ので、半分を超えたら作り直す
+        if len(self.vocabulary.words) > 2 * len(self.postings):
+            self.vocabulary = _Vocabulary(self.postings)
+        self.gone = 0
+
+    def _rows(self, lists: Dict[Any, array], key) -> np.ndarray:
+        rows = lists.get(key)
+        if rows is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.frombuffer(rows, dtype=np.uint32).astype(np.int64)
+
+    def _term_rows(self, token: str, exact: bool) -> np.ndarray:
+        if exact:
+            return self._rows(self.postings, token)
+        # 語彙から部分一致するトークンを探し、その行をまとめる
+        postings = self.postings
+        parts = [np.frombuffer(postings[word], dtype=np.uint32)
+                 for word in set(self.vocabulary.matching(token)) if word in postings]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return _union(parts).astype(np.int64)
+
+    def select(self, term: Optional[str] = None, author_id: Optional[int] = None,
+               channel_id: Optional[int] = None, after: Optional[float] = None,
+               before: Optional[float] = None, include_deleted: bool = False) -> np.ndarray:
+        """条件に合う行番号を追加順で返す（検索語は候補の絞り込みのみ）"""
+        self.compact()
+        # peak < after の行は作成日時も after より前、peak > before + disorder の行は
+        # 作成日時も before より後なので、その間だけを調べる
+        peak = self.peak.view()
+        lo = int(np.searchsorted(peak, after, 'left')) if after is not None else 0
+        hi = int(np.searchsorted(peak, before + self.disorder, 'right')) if before is not None else len(peak)
+
+        lists = []
+        if author_id is not None:
+            lists.append(self._rows(self.by_author, author_id))
+        if channel_id is not None:
+            lists.append(self._rows(self.by_channel, channel_id))
+        for token, exact in (_query_terms(term.lower()) if term else []):
+            lists.append(self._term_rows(token, exact))
+
+        if lists:
+            # 件数の少ない一覧から順に共通部分を取る
+            lists.sort(key=len)
+            candidates = lists[0]
+            candidates = candidates[np.searchsorted(candidates, lo):np.searchsorted(candidates, hi)]
+            for rows in lists[1:]:
+                candidates = _intersect(candidates, rows)
+        else:
+            candidates = np.arange(lo, hi)
+
+        created = self.created.view()[candidates]
+        mask = self.state.view()[candidates] != _GONE if include_deleted else self.state.view()[candidates] == _LIVE
+        if after is not None:
+            mask &= created >= after
+        if before is not None:
+            mask &= created <= before
+        return candidates[mask]
+
+
+class MessageIndex:
+    """ギルドごとのメッセージの二次索引と集計
+
+    MessageStore に追加された全てのメッセージ（メモリ上とスピルファイル）を対象に、
+    投稿者・チャンネル・日時・本文のトークンで候補を絞り込みます。
+    レポートの集計は行番号の配列に対して NumPy でまとめて行います。
+    """
+
+    def __init__(self):
+        self.guilds: Dict[int, _GuildIndex] = {}
+
+    def __len__(self) -> int:
+        return sum(len(guild) for guild in self.guilds.values())
+
+    def add(self, record) -> None:
+        guild = self.guilds.get(record.guild_id)
+        if guild is None:
+            guild = self.guilds[record.guild_id] = _GuildIndex()
+        guild.add(record)
+
+    def mark_deleted(self, guild_id: int, message_id: int) -> None:
+        guild = self.guilds.get(guild_id)
+        if guild is not None:
+            guild.mark_deleted(message_id)
+
+    def discard(self, guild_id: int, message_ids: Iterable[int]) -> None:
+        """スピルファイルから消えたメッセージを索引から外す"""
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return
+        guild.discard(message_ids)
+        if not len(guild):
+            del self.guilds[guild_id]
+
+    def search(self, guild_id: int, block: int = 256, **conditions) -> Iterator[int]:
+        """条件に合うメッセージIDを新しい順に返す（検索語は候補の絞り込みのみで、本文での確認は呼び出し側で行う）
+
+        候補は全件を並べ替えず、末尾（新しい行）から倍々に大きくなるブロックごとに
+        取り出します。ブロックより前の行の作成日時は peak 以下なので、それ以上の
+        候補はそのまま新しい順に返せます。
+        """
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return
+        rows = guild.select(**conditions)
+        created = guild.created.view()
+        peak = guild.peak.view()
+        ids = guild.ids.view()
+        pending = rows[:0]
+        end = len(rows)
+        while end > 0 or len(pending):
+            start = max(0, end - block)
+            block *= 2
+            chunk = np.concatenate((rows[start:end], pending))
+            times = created[chunk]
+            if start > 0:
+                ready = times >= peak[rows[start] - 1]
+                pending = chunk[~ready]
+                chunk, times = chunk[ready], times[ready]
+            else:
+                pending = rows[:0]
+            order = np.argsort(-times, kind='stable')
+            yield from ids[chunk[order]].tolist()
+            end = start
+
+    def report(self, guild_id: int, author_id: Optional[int] = None, channel_id: Optional[int] = None,
+               after: Optional[float] = None, before: Optional[float] = None, top: int = 5,
+               samples: int = 0) -> Dict[str, Any]:
+        """メッセージ統計（件数、時間帯・曜日別の活動、上位の投稿者・チャンネル）を集計する
+
+        samples を指定すると、対象のメッセージから無作為に選んだIDを sample_ids に入れます。
+        """
+        report = {
+            'total': 0, 'authors': 0, 'channels': 0,
+            'hourly': [0] * 24, 'daily': [0] * 7,
+            'top_authors': [], 'top_channels': [], 'sample_ids': []
+        }
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return report
+        rows = guild.select(author_id=author_id, channel_id=channel_id, after=after, before=before)
+        if not len(rows):
+            return report
+
+        # 時刻はUTC（従来の naive UTC の created_at と同じ）
+        created = guild.created.view()[rows]
+        days = np.floor_divide(created, 86400).astype(np.int64)
+        hours = np.floor_divide(created - days * 86400, 3600).astype(np.int64)
+        report['hourly'] = np.bincount(hours, minlength=24).tolist()
+        report['daily'] = np.bincount((days + _EPOCH_WEEKDAY) % 7, minlength=7).tolist()
+        report['total'] = int(len(rows))
+
+        for column, names, key in ((guild.author, guild.author_names, 'authors'),
+                                   (guild.channel, guild.channel_names, 'channels')):
+            ids, counts = np.unique(column.view()[rows], return_counts=True)
+            report[key] = int(len(ids))
+            order = np.argsort(-counts, kind='stable')[:top]
+            report[f'top_{key}'] = [
+                (int(ids[i]), names.get(int(ids[i]), str(ids[i])), int(counts[i])) for i in order
+            ]
+        if samples:
+            picked = np.random.default_rng().choice(rows, size=min(samples, len(rows)), replace=False)
+            report['sample_ids'] = guild.ids.view()[picked].tolist()
+        return report
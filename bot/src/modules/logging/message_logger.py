@@ -3,25 +3,31 @@ from discord.ext import commands
 import logging
 import io
 from typing import List, Dict, Any, Optional, Union
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
 import os
 import asyncio
 import re
-from collections import defaultdict
-import random
+import time
 
 from database.database_connection import get_db
 from database.database_operations import DatabaseOperations
+from .log_channels import get_log_channel_cache
+from .message_store import CachedMessage, MessageStore
+from .message_index import MessageIndex
+from .event_log import EventLogWriter
+from .log_delivery import get_log_dispatcher
 
 logger = logging.getLogger('modules.logging.message_logger')
 
 class MessageLogger:
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.message_cache = defaultdict(list)  # メッセージキャッシュ {guild_id: [messages]}
-        self.max_cache_size = 1000  # ギルドごとの最大キャッシュサイズ
-        self.message_history = {}  # 検索可能なメッセージ履歴
+        self.max_cache_size = 10000  # ギルドごとにメモリに保持する最大メッセージ数
+        self.max_cache_bytes = 64 * 1024 * 1024  # メモリに保持するメッセージ全体の上限
+        event_log_options = {}
+        self.log_channels = get_log_channel_cache(bot)  # ギルドごとのログチャンネルのキャッシュ（設定変更時に無効化される）
+        self.log_dispatcher = get_log_dispatcher(bot)  # ログチャンネルへの送信をまとめる
         
         # ログファイルパス
         logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
@@ -33,6 +39,13 @@ class MessageLogger:
             from config import get_config
             config = get_config()
             log_config = config.get('logging', {})
+            self.max_cache_size = log_config.get('message_cache_per_guild', self.max_cache_size)
+            self.max_cache_bytes = log_config.get('message_cache_bytes', self.max_cache_bytes)
+            event_log_options = {
+                key: log_config[f'event_log_{key}']
+                for key in ('segment_bytes', 'segment_seconds', 'max_queue', 'compression')
+                if f'event_log_{key}' in log_config
+            }
             self.log_retention_days = log_config.get('log_retention_days', 30)
             self.separate_log_files = log_config.get('separate_log_files', True)
             self.rich_embed_logs = log_config.get('rich_embed_logs', True)
@@ -49,57 +62,44 @@ class MessageLogger:
                 'channel_create', 'channel_delete'
             ]
         
+        # 検索可能なメッセージ履歴（メモリ上のLRUキャッシュとスピルファイル）
+        self.message_store = MessageStore(
+            os.path.join(logs_dir, 'message_store'),
+            max_bytes=self.max_cache_bytes,
+            max_per_guild=self.max_cache_size,
+            index=MessageIndex()  # 投稿者・チャンネル・日時・本文の二次索引
+        )
+        
+        # イベントログ（追記専用のセグメントファイル）
+        self.event_log = EventLogWriter(
+            os.path.join(logs_dir, 'events'),
+            retention_days=self.log_retention_days,
+            **event_log_options
+        )
+        
+        # 終了時に close() されるようボットに登録する
+        self._closed = False
+        self.bot.message_logger = self
+        
         # バックグラウンドタスクを開始
+        self.bot.loop.create_task(self.event_log.start())
         self.bot.loop.create_task(self.load_message_history())
+        self.bot.loop.create_task(self.load_log_channels())
         self.bot.loop.create_task(self.periodic_cleanup())
 
+    async def load_log_channels(self) -> None:
+        """全ギルドのログチャンネルをまとめて読み込む"""
+        await self.bot.wait_until_ready()
+        await self.log_channels.load()
+
     async def get_log_channel(self, guild: discord.Guild) -> Optional[discord.TextChannel]:
-        """ログチャンネルを取得または作成"""
-        try:
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                guild_data = await db.get_guild(guild.id)
-                
-                if guild_data and guild_data.log_channel_id:
-                    channel = guild.get_channel(guild_data.log_channel_id)
-                    if channel:
-                        return channel
-                        
-            # ログチャンネルが見つからない場合は作成
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            }
-            
-            channel = await guild.create_text_channel(
-                'mod-logs',
-                overwrites=overwrites,
-                reason="Automatic log channel creation"
-            )
-            
-            # データベースに保存
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.update_guild(guild.id, log_channel_id=channel.id)
-                
-            return channel
-            
-        except Exception as e:
-            logger.error(f"Error getting log channel: {e}")
-            return None
-            
-    async def get_log_file_path(self, guild_id: int, event_type: str) -> str:
-        """ログファイルのパスを取得"""
-        logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-        guild_logs_dir = os.path.join(logs_dir, str(guild_id))
-        
-        if self.separate_log_files:
-            os.makedirs(guild_logs_dir, exist_ok=True)
-            return os.path.join(guild_logs_dir, f"{event_type}.json")
-        else:
-            os.makedirs(logs_dir, exist_ok=True)
-            return os.path.join(logs_dir, f"{guild_id}_logs.json")
+        """ログチャンネルを取得または作成（通常はキャッシュから返す）"""
+        return await self.log_channels.get(guild)
 
+    def on_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        """チャンネル削除時にログチャンネルのキャッシュを更新する"""
+        self.log_channels.on_channel_delete(channel)
+            
     def create_embed(
         self,
         title: str,
@@ -138,32 +138,8 @@ class MessageLogger:
         if not message.guild:
             return
             
-        # メッセージデータを保存
-        message_data = {
-            'id': message.id,
-            'author_id': message.author.id,
-            'author_name': str(message.author),
-            'channel_id': message.channel.id,
-            'channel_name': message.channel.name,
-            'content': message.content,
-            'created_at': message.created_at.isoformat(),
-            'attachments': [{'url': a.url, 'filename': a.filename} for a in message.attachments],
-            'embeds': [e.to_dict() for e in message.embeds],
-            'mentions': [user.id for user in message.mentions],
-            'reference': message.reference.message_id if message.reference else None
-        }
-        
-        # キャッシュに追加
-        self.message_cache[message.guild.id].append(message_data)
-        
-        # キャッシュサイズを制限
-        if len(self.message_cache[message.guild.id]) > self.max_cache_size:
-            self.message_cache[message.guild.id].pop(0)  # 最も古いメッセージを削除
-            
-        # メッセージ履歴に追加
-        if message.guild.id not in self.message_history:
-            self.message_history[message.guild.id] = {}
-        self.message_history[message.guild.id][message.id] = message_data
+        # メッセージをキャッシュに追加（古いメッセージはスピルファイルから参照できる）
+        self.message_store.add(CachedMessage.from_message(message))
 
     async def log_message(self, message: discord.Message):
         """メッセージを記録"""
@@ -218,7 +194,7 @@ class MessageLogger:
                 )
                 
             if self.rich_embed_logs:
-                await log_channel.send(embed=embed)
+                self.log_dispatcher.enqueue(log_channel, embed)
                 
             # ファイルにも保存
             await self.save_to_log_file(message.guild.id, 'message_create', {
@@ -241,6 +217,10 @@ class MessageLogger:
             return
             
         try:
+            # キャッシュされている編集前の内容（discord側にない場合に使う）
+            cached = self.message_store.get(after.guild.id, after.id)
+            before_content = before.content or (cached.content if cached else "")
+            
             # メッセージをキャッシュ更新
             await self.add_to_cache(after)
                 
@@ -250,7 +230,7 @@ class MessageLogger:
                 return
                 
             # 内容が変更されていない場合は無視
-            if before.content == after.content:
+            if before_content == after.content:
                 return
                 
             # Embedを作成
@@ -276,7 +256,7 @@ class MessageLogger:
                     },
                     {
                         'name': "編集前",
-                        'value': before.content or "（本文なし）",
+                        'value': before_content or "（本文なし）",
                         'inline': False
                     },
                     {
@@ -290,7 +270,7 @@ class MessageLogger:
             )
             
             if self.rich_embed_logs:
-                await log_channel.send(embed=embed)
+                self.log_dispatcher.enqueue(log_channel, embed)
                 
             # ファイルにも保存
             await self.save_to_log_file(after.guild.id, 'message_edit', {
@@ -299,7 +279,7 @@ class MessageLogger:
                 'author_name': str(after.author),
                 'channel_id': after.channel.id,
                 'channel_name': after.channel.name,
-                'before_content': before.content,
+                'before_content': before_content,
                 'after_content': after.content,
                 'timestamp': datetime.utcnow().isoformat()
             })
@@ -357,16 +337,10 @@ class MessageLogger:
                 )
                 
             if self.rich_embed_logs:
-                await log_channel.send(embed=embed)
-                
-            # キャッシュからメッセージを削除
-            if message.guild.id in self.message_cache:
-                self.message_cache[message.guild.id] = [m for m in self.message_cache[message.guild.id] if m['id'] != message.id]
+                self.log_dispatcher.enqueue(log_channel, embed)
                 
-            # 履歴からも削除（削除フラグを立てる）
-            if message.guild.id in self.message_history and message.id in self.message_history[message.guild.id]:
-                self.message_history[message.guild.id][message.id]['deleted'] = True
-                self.message_history[message.guild.id][message.id]['deleted_at'] = datetime.utcnow().isoformat()
+            # 履歴に削除フラグを立てる
+            self.message_store.mark_deleted(message.guild.id, message.id, time.time())
                 
             # ファイルにも保存
             await self.save_to_log_file(message.guild.id, 'message_delete', {
@@ -384,50 +358,86 @@ class MessageLogger:
             logger.error(f"Error logging message delete: {e}")
 
     async def save_to_log_file(self, guild_id: int, event_type: str, data: Dict[str, Any]) -> None:
-        """ログをファイルに保存"""
+        """ログをイベントログに追記（書き込みはバックグラウンドのスレッドで行う）"""
         try:
-            log_file_path = await self.get_log_file_path(guild_id, event_type)
-            
-            # 既存のログを読み込み
-            logs = []
-            if os.path.exists(log_file_path):
-                try:
-                    with open(log_file_path, 'r', encoding='utf-8') as f:
-                        logs = json.load(f)
-                except:
-                    logs = []
-                    
-            # 新しいログを追加
-            logs.append({
-                'event_type': event_type,
-                'timestamp': datetime.utcnow().isoformat(),
-                'data': data
-            })
-            
-            # ログを保存
-            with open(log_file_path, 'w', encoding='utf-8') as f:
-                json.dump(logs, f, ensure_ascii=False, indent=2)
-                
+            stream = event_type if self.separate_log_files else 'all'
+            await self.event_log.write(guild_id, stream, data)
         except Exception as e:
             logger.error(f"Error saving log to file: {e}")
-            
-    async def load_message_history(self) -> None:
-        """メッセージ履歴を読み込む"""
+
+    def get_log_writer_stats(self) -> Dict[str, Any]:
+        """イベントログの書き込み状況（キューの深さ、破棄数など）を返す"""
+        return self.event_log.metrics()
+
+    def get_log_delivery_stats(self) -> Dict[str, Any]:
+        """ログチャンネルへの送信状況（配送遅延、送信待ち件数など）を返す"""
+        return self.log_dispatcher.metrics()
+
+    async def close(self) -> None:
+        """送信待ちのログとキューに残っているイベントを書き出し、ファイルを閉じる（終了時に呼び出す）"""
+        if self._closed:
+            return
+        self._closed = True
         try:
-            if os.path.exists(self.log_file_path):
-                with open(self.log_file_path, 'r', encoding='utf-8') as f:
-                    self.message_history = json.load(f)
+            if not await self.log_dispatcher.flush():
+                logger.warning(f"Log delivery did not finish before shutdown: {self.get_log_delivery_stats()}")
+            await self.event_log.close()
+            logger.info(f"Event log closed: {self.get_log_writer_stats()}")
         except Exception as e:
-            logger.error(f"Error loading message history: {e}")
-            self.message_history = {}
+            logger.error(f"Error closing event log: {e}")
+        self.message_store.close()
             
-    async def save_message_history(self) -> None:
-        """メッセージ履歴を保存"""
+    async def load_message_history(self) -> None:
+        """メッセージ履歴の索引を作り直す（スピルファイルのヘッダーだけを走査する）"""
         try:
-            with open(self.log_file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.message_history, f, ensure_ascii=False, indent=2)
+            count = await self.message_store.open_async()
+            migrated = await self._migrate_legacy_history()
+            logger.info(f"Indexed {count} cached messages ({migrated} migrated)")
         except Exception as e:
-            logger.error(f"Error saving message history: {e}")
+            logger.error(f"Error loading message history: {e}")
+
+    async def _migrate_legacy_history(self, chunk_size: int = 500) -> int:
+        """旧形式のメッセージ履歴（1つのJSONファイル）をスピルファイルに移す
+
+        ファイルの読み込みはスレッドで行い、MessageStore への追加はイベントループ上で
+        chunk_size 件ずつ行います（他のイベントと同じスレッドから追加する）。
+        """
+        if not os.path.exists(self.log_file_path):
+            return 0
+        
+        loop = asyncio.get_running_loop()
+        records = await loop.run_in_executor(None, self._read_legacy_history)
+        for start in range(0, len(records), chunk_size):
+            for record in records[start:start + chunk_size]:
+                self.message_store.add(record)
+            await asyncio.sleep(0)
+        
+        os.replace(self.log_file_path, self.log_file_path + '.migrated')
+        return len(records)
+
+    def _read_legacy_history(self) -> List[CachedMessage]:
+        with open(self.log_file_path, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+        
+        records = []
+        for guild_id, messages in history.items():
+            for message_id, data in messages.items():
+                try:
+                    created_at = datetime.fromisoformat(data['created_at'])
+                    if created_at.tzinfo is None:
+                        created_at = created_at.replace(tzinfo=timezone.utc)
+                    records.append(CachedMessage(
+                        int(message_id), int(guild_id), data['author_id'], data['author_name'],
+                        data['channel_id'], data['channel_name'], data.get('content', ''),
+                        created_at.timestamp(),
+                        tuple((a['url'], a['filename']) for a in data.get('attachments', [])),
+                        tuple(data.get('mentions', [])),
+                        data.get('reference'),
+                        len(data.get('embeds', []))
+                    ))
+                except Exception:
+                    continue
+        return records
             
     async def periodic_cleanup(self) -> None:
         """定期的なクリーンアップ処理"""
@@ -437,9 +447,6 @@ class MessageLogger:
                 # 古いログを削除
                 await self.cleanup_old_logs()
                 
-                # メッセージ履歴を保存
-                await self.save_message_history()
-                
                 # 24時間待機
                 await asyncio.sleep(86400)
             except Exception as e:
@@ -451,36 +458,14 @@ class MessageLogger:
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=self.log_retention_days)
             
-            # メッセージ履歴のクリーンアップ
-            for guild_id in list(self.message_history.keys()):
-                for message_id in list(self.message_history[guild_id].keys()):
-                    try:
-                        message_data = self.message_history[guild_id][message_id]
-                        created_at = datetime.fromisoformat(message_data['created_at'])
-                        
-                        if created_at < cutoff_date:
-                            del self.message_history[guild_id][message_id]
-                    except:
-                        # エラーが発生した場合はそのメッセージをスキップ
-                        continue
-                        
-                # 空のギルドエントリを削除
-                if not self.message_history[guild_id]:
-                    del self.message_history[guild_id]
+            # メッセージ履歴のクリーンアップ（全て期限切れの世代はファイルごと削除）
+            self.message_store.expire(cutoff_date.replace(tzinfo=timezone.utc).timestamp())
                     
-            # ログファイルのクリーンアップ
-            logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-            for guild_id in os.listdir(logs_dir):
-                guild_logs_dir = os.path.join(logs_dir, guild_id)
-                if os.path.isdir(guild_logs_dir):
-                    for log_file in os.listdir(guild_logs_dir):
-                        log_file_path = os.path.join(guild_logs_dir, log_file)
-                        if os.path.isfile(log_file_path):
-                            # ファイルの最終更新日を確認
-                            file_mod_time = datetime.fromtimestamp(os.path.getmtime(log_file_path))
-                            if file_mod_time < cutoff_date:
-                                os.remove(log_file_path)
-                                
+            # イベントログのクリーンアップ（保持期間を過ぎたセグメントを削除）
+            deleted = await self.event_log.enforce_retention()
+            if deleted:
+                logger.info(f"Deleted {deleted} expired event log segments")
+                
         except Exception as e:
             logger.error(f"Error cleaning up old logs: {e}")
             
@@ -494,62 +479,30 @@ class MessageLogger:
         after: datetime = None,
         limit: int = 100
     ) -> List[Dict[str, Any]]:
-        """メッセージを検索"""
-        results = []
-        
+        """メッセージを検索（新しい順）"""
         try:
-            if guild.id not in self.message_history:
-                return results
-                
-            guild_history = self.message_history[guild.id]
-            
-            # フィルタリング条件を適用
-            for message_id, message_data in guild_history.items():
-                # 削除されたメッセージはスキップ
-                if message_data.get('deleted', False):
-                    continue
-                    
-                # 検索条件に合致するか確認
-                matches = True
-                
-                # 著者でフィルタリング
-                if author and message_data['author_id'] != author.id:
-                    matches = False
-                    
-                # チャンネルでフィルタリング
-                if channel and message_data['channel_id'] != channel.id:
-                    matches = False
-                    
-                # 日時でフィルタリング
-                try:
-                    created_at = datetime.fromisoformat(message_data['created_at'])
-                    if before and created_at > before:
-                        matches = False
-                    if after and created_at < after:
-                        matches = False
-                except:
-                    # 日付解析エラーの場合はスキップ
-                    matches = False
-                    
-                # 検索語でフィルタリング
-                if search_term and search_term.lower() not in message_data.get('content', '').lower():
-                    matches = False
-                    
-                # 条件に合致する場合は結果に追加
-                if matches:
-                    results.append(message_data)
-                    
-                    # 上限に達したら終了
-                    if len(results) >= limit:
-                        break
-                        
-            # 結果を日時順にソート
-            results.sort(key=lambda m: m['created_at'], reverse=True)
-            
+            records = self.message_store.search(
+                guild.id,
+                term=search_term,
+                author_id=author.id if author else None,
+                channel_id=channel.id if channel else None,
+                after=self._to_timestamp(after),
+                before=self._to_timestamp(before),
+                limit=limit
+            )
+            return [record.to_dict() for record in records]
         except Exception as e:
             logger.error(f"Error finding messages: {e}")
+            return []
             
-        return results
+    @staticmethod
+    def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+        """日時をUNIX時間に変換（タイムゾーンがない場合はUTCとみなす）"""
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
         
     async def generate_message_report(
         self,
@@ -561,53 +514,27 @@ class MessageLogger:
     ) -> discord.Embed:
         """メッセージ統計レポートを生成"""
         try:
+            if self.message_store.loading:
+                return discord.Embed(
+                    title="準備中",
+                    description="メッセージ履歴の索引を作成中です。しばらくしてから再度お試しください。",
+                    color=discord.Color.orange()
+                )
             after = datetime.utcnow() - timedelta(days=days)
             
-            # メッセージを検索
-            messages = await self.find_messages(
-                guild=guild,
-                author=author,
-                channel=channel,
-                after=after,
-                limit=10000  # 十分大きな数字
+            # 索引の列に対してまとめて集計する
+            stats = self.message_store.index.report(
+                guild.id,
+                author_id=author.id if author else None,
+                channel_id=channel.id if channel else None,
+                after=self._to_timestamp(after),
+                samples=3 if include_content else 0
             )
-            
-            # 統計データを収集
-            total_messages = len(messages)
-            authors = {}
-            channels = {}
-            hourly_activity = [0] * 24
-            daily_activity = [0] * 7
-            
-            for message in messages:
-                # 著者の統計
-                author_id = message['author_id']
-                author_name = message['author_name']
-                if author_id not in authors:
-                    authors[author_id] = {
-                        'name': author_name,
-                        'count': 0
-                    }
-                authors[author_id]['count'] += 1
-                
-                # チャンネルの統計
-                channel_id = message['channel_id']
-                channel_name = message['channel_name']
-                if channel_id not in channels:
-                    channels[channel_id] = {
-                        'name': channel_name,
-                        'count': 0
-                    }
-                channels[channel_id]['count'] += 1
-                
-                # 時間帯別統計
-                created_at = datetime.fromisoformat(message['created_at'])
-                hourly_activity[created_at.hour] += 1
-                daily_activity[created_at.weekday()] += 1
-                
-            # 上位の著者とチャンネルを取得
-            top_authors = sorted(authors.items(), key=lambda x: x[1]['count'], reverse=True)[:5]
-            top_channels = sorted(channels.items(), key=lambda x: x[1]['count'], reverse=True)[:5]
+            total_messages = stats['total']
+            hourly_activity = stats['hourly']
+            daily_activity = stats['daily']
+            top_authors = stats['top_authors']
+            top_channels = stats['top_channels']
             
             # 最も活発な時間帯と曜日
             most_active_hour = hourly_activity.index(max(hourly_activity))
@@ -636,12 +563,12 @@ class MessageLogger:
             )
             embed.add_field(
                 name="ユニーク投稿者数",
-                value=f"{len(authors)}",
+                value=f"{stats['authors']}",
                 inline=True
             )
             embed.add_field(
                 name="投稿チャンネル数",
-                value=f"{len(channels)}",
+                value=f"{stats['channels']}",
                 inline=True
             )
             
@@ -659,7 +586,7 @@ class MessageLogger:
             
             # 上位投稿者
             if top_authors:
-                authors_text = "\n".join([f"{idx+1}. {data['name']}: {data['count']}件" for idx, (_, data) in enumerate(top_authors)])
+                authors_text = "\n".join([f"{idx+1}. {name}: {count}件" for idx, (_, name, count) in enumerate(top_authors)])
                 embed.add_field(
                     name="最もアクティブなユーザー",
                     value=authors_text,
@@ -668,7 +595,7 @@ class MessageLogger:
                 
             # 上位チャンネル
             if top_channels:
-                channels_text = "\n".join([f"{idx+1}. #{data['name']}: {data['count']}件" for idx, (_, data) in enumerate(top_channels)])
+                channels_text = "\n".join([f"{idx+1}. #{name}: {count}件" for idx, (_, name, count) in enumerate(top_channels)])
                 embed.add_field(
                     name="最もアクティブなチャンネル",
                     value=channels_text,
@@ -676,8 +603,12 @@ class MessageLogger:
                 )
                 
             # サンプルコンテンツ
-            if include_content and messages:
-                sample_messages = random.sample(messages, min(3, len(messages)))
+            sample_messages = [
+                record.to_dict() for record in
+                (self.message_store.get(guild.id, message_id) for message_id in stats['sample_ids'])
+                if record is not None
+            ]
+            if include_content and sample_messages:
                 samples_text = "\n\n".join([
                     f"**{msg['author_name']} in #{msg['channel_name']}**\n{msg.get('content', '(内容なし)')[:100]}..."
                     for msg in sample_messages
@@ -0,0 +1,557 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('modules.logging.message_store')
+
+# スピルファイルのレコードヘッダー: (ペイロード長, メッセージID, ギルドID, 作成日時)
+_HEADER = struct.Struct('<IQQd')
+# 位置情報 (世代 << _GEN_SHIFT) | オフセット を1つの整数で保持する
+_GEN_SHIFT = 40
+_OFFSET_MASK = (1 << _GEN_SHIFT) - 1
+# レコード1件あたりの固定のメモリ使用量の見積もり（オブジェクトと辞書のエントリ）
+_RECORD_OVERHEAD = 320
+
+
+class CachedMessage:
+    """キャッシュするメッセージの情報（埋め込みは件数のみ保持する）"""
+
+    __slots__ = (
+        'id', 'guild_id', 'author_id', 'author_name', 'channel_id', 'channel_name',
+        'content', 'created_at', 'attachments', 'mentions', 'reference', 'embed_count',
+        'deleted_at', 'size'
+    )
+
+    def __init__(self, id: int, guild_id: int, author_id: int, author_name: str,
+                 channel_id: int, channel_name: str, content: str, created_at: float,
+                 attachments: Tuple[Tuple[str, str], ...] = (), mentions: Tuple[int, ...] = (),
+                 reference: Optional[int] = None, embed_count: int = 0,
+                 deleted_at: Optional[float] = None):
+        self.id = id
+        self.guild_id = guild_id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.channel_id = channel_id
+        self.channel_name = channel_name
+        self.content = content or ''
+        self.created_at = created_at
+        self.attachments = attachments
+        self.mentions = mentions
+        self.reference = reference
+        self.embed_count = embed_count
+        self.deleted_at = deleted_at
+        self.size = (
+            _RECORD_OVERHEAD
+            + sys.getsizeof(self.content) + sys.getsizeof(author_name) + sys.getsizeof(channel_name)
+            + sum(sys.getsizeof(url) + sys.getsizeof(name) for url, name in attachments)
+            + 8 * len(mentions)
+        )
+
+    @classmethod
+    def from_message(cls, message) -> 'CachedMessage':
+        return cls(
+            message.id,
+            message.guild.id,
+            message.author.id,
+            str(message.author),
+            message.channel.id,
+            getattr(message.channel, 'name', ''),
+            message.content,
+            message.created_at.timestamp(),
+            tuple((a.url, a.filename) for a in message.attachments),
+            tuple(user.id for user in message.mentions),
+            message.reference.message_id if message.reference else None,
+            len(message.embeds),
+        )
+
+    @property
+    def deleted(self) -> bool:
+        return self.deleted_at is not None
+
+    def encode(self) -> bytes:
+        """スピルファイル用のペイロード（ID以外をJSON配列で）"""
+        return json.dumps([
+            self.author_id, self.author_name, self.channel_id, self.channel_name, self.content,
+            self.created_at, self.attachments, self.mentions, self.reference, self.embed_count,
+            self.deleted_at
+        ], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @classmethod
+    def decode(cls, message_id: int, guild_id: int, payload: bytes) -> 'CachedMessage':
+        (author_id, author_name, channel_id, channel_name, content, created_at,
+         attachments, mentions, reference, embed_count, deleted_at) = json.loads(payload)
+        return cls(
+            message_id, guild_id, author_id, author_name, channel_id, channel_name, content,
+            created_at, tuple(tuple(a) for a in attachments), tuple(mentions), reference,
+            embed_count, deleted_at
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """従来のメッセージ履歴と同じ形式の辞書に変換する"""
+        data = {
+            'id': self.id,
+            'author_id': self.author_id,
+            'author_name': self.author_name,
+            'channel_id': self.channel_id,
+            'channel_name': self.channel_name,
+            'content': self.content,
+            'created_at': _isoformat(self.created_at),
+            'attachments': [{'url': url, 'filename': name} for url, name in self.attachments],
+            'embed_count': self.embed_count,
+            'mentions': list(self.mentions),
+            'reference': self.reference
+        }
+        if self.deleted_at is not None:
+            data['deleted'] = True
+            data['deleted_at'] = _isoformat(self.deleted_at)
+        return data
+
+
+def _isoformat(timestamp: float) -> str:
+    """naive UTC の ISO 形式（従来の created_at / deleted_at と同じ形式）"""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class SpillFile:
+    """メッセージを追記専用のファイルに書き出し、mmap で読み出すクラス
+
+    ファイルは世代ごとに分かれ、現在の世代が segment_bytes を超えると次の世代に
+    切り替えます。max_generations を超えた古い世代はファイルごと削除します。
+    索引はギルドごとの {message_id: 位置} で、同じメッセージを再度書き込んだ場合は
+    新しい位置で上書きされます（編集・削除フラグの更新）。
+
+    追記はメモリ上のバッファにためておき、flush_bytes を超えるか flush_interval 秒が
+    経った時にまとめて書き込みます。まだ書き込んでいない位置を読む時は先に書き出します。
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 256 * 1024 * 1024,
+                 max_generations: int = 2, flush_bytes: int = 256 * 1024,
+                 flush_interval: float = 1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_generations = max_generations
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        # {guild_id: {message_id: (generation << _GEN_SHIFT) | offset}}
+        self.index: Dict[int, Dict[int, int]] = {}
+        # {generation: 最新の created_at}
+        self.newest: Dict[int, float] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+        # 世代の削除で索引から外れたメッセージを通知する (guild_id, message_ids)
+        self.on_drop: Optional[Callable[[int, Iterable[int]], None]] = None
+        self._generation = 0
+        self._file = None
+        self._size = 0
+        # 書き込み待ちのレコードと、現在の世代でファイルに書き込み済みのバイト数
+        self._buffer = bytearray()
+        self._flushed = 0
+        self._last_flush = 0.0
+        self.stats = {"flushes": 0}
+
+    def _path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"messages.{generation}.spill")
+
+    def generations(self) -> List[int]:
+        generations = []
+        for name in os.listdir(self.directory):
+            parts = name.split('.')
+            if len(parts) == 3 and parts[0] == 'messages' and parts[2] == 'spill' and parts[1].isdigit():
+                generations.append(int(parts[1]))
+        return sorted(generations)
+
+    def open(self) -> int:
+        """既存の世代を走査して索引を作り直し、索引に登録したメッセージ数を返す"""
+        os.makedirs(self.directory, exist_ok=True)
+        generations = self.generations()
+        for generation in generations:
+            self._scan(generation)
+        self._generation = generations[-1] if generations else 0
+        self._open_current()
+        self._enforce_generations()
+        return len(self)
+
+    def _scan(self, generation: int) -> None:
+        path = self._path(generation)
+        size = os.path.getsize(path)
+        offset = 0
+        newest = 0.0
+        if size:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                while offset + _HEADER.size <= size:
+                    length, message_id, guild_id, created_at = _HEADER.unpack_from(view, offset)
+                    end = offset + _HEADER.size + length
+                    if end > size:
+                        break
+                    newest = max(newest, created_at)
+                    self.index.setdefault(guild_id, {})[message_id] = (generation << _GEN_SHIFT) | offset
+                    offset = end
+        if offset < size:
+            # 書き込み途中で停止した末尾のレコードを切り詰める
+            logger.warning(f"Truncating incomplete record at {offset} in {path}")
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        self.newest[generation] = newest
+
+    def _open_current(self) -> None:
+        path = self._path(self._generation)
+        self._file = open(path, 'ab', buffering=0)
+        self._size = self._flushed = os.path.getsize(path)
+        self._last_flush = time.monotonic()
+        self.newest.setdefault(self._generation, 0.0)
+
+    def __len__(self) -> int:
+        return sum(len(messages) for messages in self.index.values())
+
+    def append(self, record: CachedMessage) -> None:
+        if self._size >= self.segment_bytes:
+            self._rotate()
+        payload = record.encode()
+        offset = self._size
+        self._buffer += _HEADER.pack(len(payload), record.id, record.guild_id, record.created_at)
+        self._buffer += payload
+        self._size += _HEADER.size + len(payload)
+        self.index.setdefault(record.guild_id, {})[record.id] = (self._generation << _GEN_SHIFT) | offset
+        if record.created_at > self.newest[self._generation]:
+            self.newest[self._generation] = record.created_at
+        if len(self._buffer) >= self.flush_bytes or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """バッファにたまったレコードをまとめてファイルに書き込む"""
+        self._last_flush = time.monotonic()
+        if not self._buffer or self._file is None:
+            return
+        self._file.write(self._buffer)
+        self._flushed += len(self._buffer)
+        self._buffer.clear()
+        self.stats["flushes"] += 1
+
+    def _rotate(self) -> None:
+        self.flush()
+        self._file.close()
+        self._close_map(self._generation)
+        self._generation += 1
+        self._open_current()
+        self._enforce_generations()
+
+    def _enforce_generations(self) -> None:
+        """max_generations を超えた古い世代を削除する"""
+        generations = [g for g in self.generations() if g != self._generation]
+        excess = len(generations) + 1 - self.max_generations
+        if excess > 0:
+            self.drop_generations(generations[:excess])
+
+    def drop_generations(self, generations: List[int]) -> None:
+        """世代をファイルごと削除し、その世代を指す索引を取り除く"""
+        dropped = set(generations) - {self._generation}
+        if not dropped:
+            return
+        for generation in dropped:
+            self._close_map(generation)
+            self.newest.pop(generation, None)
+            try:
+                os.remove(self._path(generation))
+            except FileNotFoundError:
+                pass
+        for guild_id in list(self.index):
+            messages = self.index[guild_id]
+            removed = [m for m, loc in messages.items() if loc >> _GEN_SHIFT in dropped]
+            for message_id in removed:
+                del messages[message_id]
+            if removed and self.on_drop is not None:
+                self.on_drop(guild_id, removed)
+            if not messages:
+                del self.index[guild_id]
+
+    def _close_map(self, generation: int) -> None:
+        view = self._maps.pop(generation, None)
+        if view is not None:
+            view.close()
+
+    def _view(self, generation: int, end: int) -> mmap.mmap:
+        if generation == self._generation and end > self._flushed:
+            self.flush()
+        view = self._maps.get(generation)
+        if view is None or len(view) < end:
+            # 現在の世代は追記されているので、必要になった時に大きさを合わせて作り直す
+            self._close_map(generation)
+            with open(self._path(generation), 'rb') as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[generation] = view
+        return view
+
+    def read(self, guild_id: int, message_id: int) -> Optional[CachedMessage]:
+        location = self.index.get(guild_id, {}).get(message_id)
+        if location is None:
+            return None
+        return self._read_at(location)
+
+    def _read_at(self, location: int) -> Optional[CachedMessage]:
+        generation, offset = location >> _GEN_SHIFT, location & _OFFSET_MASK
+        try:
+            view = self._view(generation, offset + _HEADER.size)
+            length, message_id, guild_id, _ = _HEADER.unpack_from(view, offset)
+            start = offset + _HEADER.size
+            view = self._view(generation, start + length)
+            return CachedMessage.decode(message_id, guild_id, view[start:start + length])
+        except Exception as e:
+            logger.error(f"Error reading spilled message at {generation}:{offset}: {e}")
+            return None
+
+    def iter_guild(self, guild_id: int, skip: Optional[Dict[int, Any]] = None) -> Iterator[CachedMessage]:
+        """ギルドのスピル済みメッセージを返す（skip に含まれるIDは読み飛ばす）"""
+        for message_id, location in list(self.index.get(guild_id, {}).items()):
+            if skip is not None and message_id in skip:
+                continue
+            record = self._read_at(location)
+            if record is not None:
+                yield record
+
+    def iter_guild_by_time(self, guild_id: int) -> Iterator[CachedMessage]:
+        """ギルドのスピル済みメッセージを作成日時順に返す（ヘッダーだけで並べ替える）"""
+        locations = []
+        for location in self.index.get(guild_id, {}).values():
+            generation, offset = location >> _GEN_SHIFT, location & _OFFSET_MASK
+            view = self._view(generation, offset + _HEADER.size)
+            locations.append((_HEADER.unpack_from(view, offset)[3], location))
+        locations.sort()
+        for _, location in locations:
+            record = self._read_at(location)
+            if record is not None:
+                yield record
+
+    def close(self) -> None:
+        for generation in list(self._maps):
+            self._close_map(generation)
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class MessageStore:
+    """メッセージをメモリ上のLRUキャッシュとスピルファイルで保持するクラス
+
+    全てのメッセージはスピルファイルに追記され（write-through）、メモリには
+    ギルドごとに最大 max_per_guild 件、全体で max_bytes までの最近のメッセージだけを
+    保持します。メモリから追い出されたメッセージも、スピルファイルの索引から
+    読み出せるため、編集・削除ログで古い内容を参照できます。
+
+    index（MessageIndex）を渡すと、スピルファイルを含む全てのメッセージを索引に登録し、
+    search() で索引を使った検索ができます。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, max_per_guild: int = 10000,
+                 segment_bytes: int = 256 * 1024 * 1024, max_generations: int = 2, index=None):
+        self.max_bytes = max_bytes
+        self.max_per_guild = max_per_guild
+        self.spill = SpillFile(directory, segment_bytes, max_generations)
+        # {guild_id: OrderedDict[message_id, CachedMessage]}（追加順のリング）
+        self.guilds: Dict[int, 'OrderedDict[int, CachedMessage]'] = {}
+        # 全ギルド共通のLRU順序 {(guild_id, message_id): None}
+        self._lru: 'OrderedDict[Tuple[int, int], None]' = OrderedDict()
+        self.used_bytes = 0
+        self.stats = {"hits": 0, "spill_hits": 0, "evicted": 0}
+        self.index = index
+        if index is not None:
+            self.spill.on_drop = index.discard
+        self._opened = False
+        # 起動時の走査中に追加されたメッセージ（走査中でなければ None）
+        self._pending: Optional[List[CachedMessage]] = None
+
+    def _load(self) -> int:
+        self.spill.open()
+        if self.index is not None:
+            # 索引は作成日時順に登録し直す
+            for guild_id in list(self.spill.index):
+                for record in self.spill.iter_guild_by_time(guild_id):
+                    self.index.add(record)
+        return len(self.spill)
+
+    def open(self) -> int:
+        """スピルファイルを開いて索引を作り直す"""
+        if not self._opened:
+            self._load()
+            self._opened = True
+        return len(self.spill)
+
+    async def open_async(self) -> int:
+        """スピルファイルの走査をスレッドで行い、イベントループを止めずに開く
+
+        走査中に add() されたメッセージはメモリにだけ追加し、スピルファイルと索引への
+        書き込みは走査の完了後にまとめて行います。
+        """
+        if self._opened or self._pending is not None:
+            return len(self.spill)
+        self._pending = []
+        try:
+            count = await asyncio.get_running_loop().run_in_executor(None, self._load)
+            self._opened = True
+        finally:
+            pending, self._pending = self._pending, None
+        for record in pending:
+            self._persist(record)
+        return count
+
+    @property
+    def loading(self) -> bool:
+        """起動時の走査中かどうか（走査中はスピルファイルと索引に触れない）"""
+        return self._pending is not None
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _persist(self, record: CachedMessage) -> None:
+        if self._pending is not None:
+            self._pending.append(record)
+            return
+        if not self._opened:
+            self.open()
+        self.spill.append(record)
+        if self.index is not None:
+            self.index.add(record)
+
+    def add(self, record: CachedMessage) -> None:
+        """メッセージを追加・更新する（イベントループのスレッドからのみ呼び出す）"""
+        self._persist(record)
+        messages = self.guilds.setdefault(record.guild_id, OrderedDict())
+        key = (record.guild_id, record.id)
+
+        previous = messages.pop(record.id, None)
+        if previous is not None:
+            self.used_bytes -= previous.size
+            self._lru.pop(key, None)
+
+        messages[record.id] = record
+        self._lru[key] = None
+        self.used_bytes += record.size
+
+        # ギルドごとの上限を超えたら最も古いメッセージをメモリから外す
+        while len(messages) > self.max_per_guild:
+            message_id, _ = next(iter(messages.items()))
+            self._evict(record.guild_id, message_id)
+
+        # 全体の上限を超えたら最も長く使われていないメッセージを外す
+        while self.used_bytes > self.max_bytes and self._lru:
+            guild_id, message_id = next(iter(self._lru))
+            self._evict(guild_id, message_id)
+
+    def _evict(self, guild_id: int, message_id: int) -> None:
+        messages = self.guilds.get(guild_id)
+        record = messages.pop(message_id, None) if messages is not None else None
+        self._lru.pop((guild_id, message_id), None)
+        if record is not None:
+            self.used_bytes -= record.size
+            self.stats["evicted"] += 1
+        if messages is not None and not messages:
+            del self.guilds[guild_id]
+
+    def get(self, guild_id: int, message_id: int) -> Optional[CachedMessage]:
+        """メッセージを返す（メモリになければスピルファイルから読む）"""
+        record = self.guilds.get(guild_id, {}).get(message_id)
+        if record is not None:
+            self._lru.move_to_end((guild_id, message_id))
+            self.stats["hits"] += 1
+            return record
+        if self.loading:
+            return None
+        record = self.spill.read(guild_id, message_id)
+        if record is not None:
+            self.stats["spill_hits"] += 1
+        return record
+
+    def mark_deleted(self, guild_id: int, message_id: int, deleted_at: float) -> Optional[CachedMessage]:
+        """メッセージに削除日時を記録する"""
+        record = self.get(guild_id, message_id)
+        if record is None:
+            return None
+        record.deleted_at = deleted_at
+        if message_id in self.guilds.get(guild_id, {}):
+            if self.loading:
+                self._pending.append(record)
+                return record
+            self.spill.append(record)
+            if self.index is not None:
+                self.index.mark_deleted(guild_id, message_id)
+        else:
+            self.add(record)
+        return record
+
+    def iter_guild(self, guild_id: int) -> Iterator[CachedMessage]:
+        """ギルドの全メッセージ（メモリとスピルファイル）を返す"""
+        messages = self.guilds.get(guild_id, {})
+        yield from list(messages.values())
+        if not self.loading:
+            yield from self.spill.iter_guild(guild_id, skip=messages)
+
+    def search(self, guild_id: int, term: Optional[str] = None, author_id: Optional[int] = None,
+               channel_id: Optional[int] = None, after: Optional[float] = None,
+               before: Optional[float] = None, limit: int = 100) -> List[CachedMessage]:
+        """索引で候補を絞り込み、条件に合う削除されていないメッセージを新しい順に返す"""
+        needle = term.lower() if term else None
+        if self.loading:
+            # 起動時の走査中は索引を使わず、メモリ上のメッセージだけを探す
+            records = reversed(list(self.guilds.get(guild_id, {}).values()))
+            return self._filter(records, needle, author_id, channel_id, after, before)[:limit]
+        if self.index is None:
+            # 索引がない場合はメモリとスピルファイルの全メッセージを順に調べる
+            records = sorted(self.iter_guild(guild_id), key=lambda record: record.created_at, reverse=True)
+            return self._filter(records, needle, author_id, channel_id, after, before)[:limit]
+        candidates = self.index.search(
+            guild_id, term=term, author_id=author_id, channel_id=channel_id, after=after, before=before
+        )
+        results = []
+        messages = self.guilds.get(guild_id, {})
+        for message_id in candidates:
+            # 検索でLRUの順序を変えないよう、メモリにあればそのまま使う
+            record = messages.get(message_id) or self.spill.read(guild_id, message_id)
+            if record is None or record.deleted:
+                continue
+            if needle and needle not in record.content.lower():
+                continue
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+    @staticmethod
+    def _filter(records: Iterable[CachedMessage], needle: Optional[str], author_id: Optional[int],
+                channel_id: Optional[int], after: Optional[float],
+                before: Optional[float]) -> List[CachedMessage]:
+        return [
+            record for record in records
+            if not record.deleted
+            and (needle is None or needle in record.content.lower())
+            and (author_id is None or record.author_id == author_id)
+            and (channel_id is None or record.channel_id == channel_id)
+            and (after is None or record.created_at >= after)
+            and (before is None or record.created_at <= before)
+        ]
+
+    def expire(self, cutoff: float) -> None:
+        """cutoff より古いメッセージをメモリから外し、全て古い世代のスピルファイルを削除する"""
+        for guild_id in list(self.guilds):
+            messages = self.guilds.get(guild_id)
+            while messages:
+                message_id, record = next(iter(messages.items()))
+                if record.created_at >= cutoff:
+                    break
+                self._evict(guild_id, message_id)
+                messages = self.guilds.get(guild_id)
+
+        if self.loading:
+            return
+        expired = [g for g, newest in self.spill.newest.items() if newest and newest < cutoff]
+        if expired:
+            self.spill.drop_generations(expired)
+
+    def close(self) -> None:
+        self.spill.close()
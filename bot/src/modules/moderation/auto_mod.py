@@ -5,7 +5,6 @@ import re
 import aiohttp
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
-from collections import defaultdict
 import asyncio
 
 from database.database_connection import get_db
@@ -17,13 +16,9 @@ logger = logging.getLogger('modules.moderation.auto_mod')
 class AutoModerator:
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.violation_counts = defaultdict(lambda: defaultdict(int))
         self.url_pattern = re.compile(r'https?://[^\s<>"]+|www\.[^\s<>"]+')
         self.invite_pattern = re.compile(r'discord\.gg/[a-zA-Z0-9]+')
         self.config = self.load_config()
-        
-        # クリーンアップタスクを開始
-        self.bot.loop.create_task(self.cleanup_violations())
 
     def load_config(self):
         """設定を読み込み"""
@@ -40,17 +35,6 @@ class AutoModerator:
             }
         }
 
-    async def cleanup_violations(self):
-        """違反カウントを定期的にリセット"""
-        while True:
-            try:
-                await asyncio.sleep(3600)  # 1時間ごとにリセット
-                self.violation_counts.clear()
-                logger.info("Cleaned up violation counts")
-            except Exception as e:
-                logger.error(f"Error in cleanup task: {e}")
-                await asyncio.sleep(60)
-
     async def check_content(self, message: discord.Message) -> Optional[str]:
         """メッセージの内容をチェック"""
         try:
@@ -90,9 +74,10 @@ class AutoModerator:
             guild_id = message.guild.id
             user_id = message.author.id
             
-            # 違反カウントを更新
-            self.violation_counts[guild_id][user_id] += 1
-            count = self.violation_counts[guild_id][user_id]
+            # 違反カウントを更新（最初の違反から1時間で数え直す。再起動しても失われない）
+            async for session in get_db():
+                db = DatabaseOperations(session)
+                count = await db.record_infraction(user_id, guild_id, 'automod')
             
             # 処罰を決定
             punishment = await self.get_punishment(count)
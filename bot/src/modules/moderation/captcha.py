@@ -2,16 +2,17 @@ import discord
 from discord.ext import commands
 import asyncio
 import logging
-import random
-import string
 import io
 import aiohttp
 from typing import Dict, List, Set, Any, Optional, Tuple
 import time
 import datetime
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageFont
 import os
 
+from .captcha_pool import get_captcha_pool
+from .verification_queue import PendingVerificationQueue
+
 logger = logging.getLogger('ShardBot.Captcha')
 
 class CaptchaVerification:
@@ -22,21 +23,28 @@ class CaptchaVerification:
         self.settings_cache = {}  # guild_id: settings
         self.cache_expire = {}    # guild_id: timestamp
         
-        # キャプチャコード保存用
-        self.pending_verifications = {}  # {guild_id: {user_id: {"code": "...", "expires": timestamp, "attempts": 0}}}
+        # キャプチャコード保存用（期限順のヒープで管理し、データベースにも保存する）
+        self.pending = PendingVerificationQueue()
+        self.pending_verifications = self.pending.entries  # {guild_id: {user_id: {"code": "...", "expires": timestamp, "attempts": 0}}}
+        self._pending_wakeup = asyncio.Event()
+        # 時間切れのキックの同時実行数
+        self.kick_concurrency = 5
         
         # キャプチャ関連ファイルのパス
         self.fonts_path = "data/fonts"
         self.default_font = "NotoSansJP-Regular.ttf"
         
+        # 描画済みキャプチャのプール（描画はワーカープロセスで行い、終了時に BotManager が閉じる）
+        self.captcha_pool = get_captcha_pool(bot)
+        
         # フォントが存在しない場合は初期化時にダウンロード
         self.bot.loop.create_task(self._ensure_fonts_exist())
         
         # 設定キャッシュの定期的なクリーンアップタスク
         self.bot.loop.create_task(self._cache_cleanup_task())
         
-        # 期限切れの認証を定期的にクリーンアップするタスク
-        self.bot.loop.create_task(self._verification_cleanup_task())
+        # 期限切れの認証を期限ちょうどに処理するタスク
+        self.bot.loop.create_task(self._verification_expiry_task())
     
     async def _ensure_fonts_exist(self):
         """必要なフォントが存在することを確認し、存在しない場合はダウンロード"""
@@ -75,7 +83,13 @@ class CaptchaVerification:
         except Exception as e:
             logger.error(f"Error ensuring fonts exist: {e}")
             self.default_font = None
-    
+
+        # フォントが決まってからワーカーを起動し、よく使う種類のバッファを用意しておく
+        font_path = os.path.join(self.fonts_path, self.default_font) if self.default_font else None
+        self.captcha_pool.start(font_path)
+        self.captcha_pool.warm("text", 6)
+        self.captcha_pool.warm("math")
+
     async def _cache_cleanup_task(self):
         """期限切れのキャッシュエントリを定期的にクリーンアップする"""
         await self.bot.wait_until_ready()
@@ -99,48 +113,103 @@ class CaptchaVerification:
             
             await asyncio.sleep(300)  # 5分ごとに実行
     
-    async def _verification_cleanup_task(self):
-        """期限切れの認証試行を定期的にクリーンアップする"""
+    async def _verification_expiry_task(self):
+        """保存されていた認証待ちを復元し、次の期限まで眠って期限切れの認証を処理する"""
         await self.bot.wait_until_ready()
+        await self.pending.load()
+        
         while not self.bot.is_closed():
             try:
-                current_time = time.time()
+                self._pending_wakeup.clear()
+                next_expiry = self.pending.next_expiry()
+                now = time.time()
                 
-                for guild_id in list(self.pending_verifications.keys()):
-                    for user_id in list(self.pending_verifications[guild_id].keys()):
-                        if current_time > self.pending_verifications[guild_id][user_id]["expires"]:
-                            # 期限切れのユーザーをキック（設定が有効な場合）
-                            settings = await self.get_guild_settings(guild_id)
-                            
-                            if settings.get("captchaEnabled", False) and settings.get("kickOnFailure", False):
-                                try:
-                                    guild = self.bot.get_guild(int(guild_id))
-                                    if guild:
-                                        member = guild.get_member(int(user_id))
-                                        if member:
-                                            await member.kick(reason="キャプチャ認証の時間切れ")
-                                            logger.info(f"Kicked {member} (ID: {member.id}) due to captcha timeout")
-                                            
-                                            # ログチャンネルに通知
-                                            log_channel_id = settings.get("logChannelId")
-                                            if log_channel_id:
-                                                log_channel = guild.get_channel(int(log_channel_id))
-                                                if log_channel:
-                                                    await log_channel.send(f"🔒 {member.mention} (ID: {member.id}) はキャプチャ認証の時間切れでキックされました。")
-                                except Exception as e:
-                                    logger.error(f"Failed to kick user for captcha timeout: {e}")
-                            
-                            # 期限切れエントリを削除
-                            del self.pending_verifications[guild_id][user_id]
-                            
-                    # ギルドの認証リストが空になった場合は削除
-                    if not self.pending_verifications[guild_id]:
-                        del self.pending_verifications[guild_id]
+                if next_expiry is None or next_expiry > now:
+                    # 次の期限まで（新しい認証待ちが登録されたら起きて再計算する）
+                    timeout = None if next_expiry is None else next_expiry - now
+                    try:
+                        await asyncio.wait_for(self._pending_wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                
+                expired = self.pending.pop_expired(now)
+                if expired:
+                    await self._process_expired(expired)
             
             except Exception as e:
-                logger.error(f"Error in verification cleanup task: {e}")
+                logger.error(f"Error in verification expiry task: {e}")
+                await asyncio.sleep(1)
+    
+    async def _process_expired(self, expired: List[Tuple[str, str]]) -> None:
+        """期限切れの認証待ちをギルドごとにまとめて処理する（設定の取得はギルドごとに1回）"""
+        by_guild: Dict[str, List[str]] = {}
+        for guild_id, user_id in expired:
+            by_guild.setdefault(guild_id, []).append(user_id)
+        
+        # 期限切れエントリを先にまとめて削除（キックの間に再参加したユーザーの記録は消さない）
+        await self.pending.delete(expired)
+        
+        semaphore = asyncio.Semaphore(self.kick_concurrency)
+        
+        async def _kick(member: discord.Member) -> Optional[discord.Member]:
+            async with semaphore:
+                try:
+                    await member.kick(reason="キャプチャ認証の時間切れ")
+                    logger.info(f"Kicked {member} (ID: {member.id}) due to captcha timeout")
+                    return member
+                except Exception as e:
+                    logger.error(f"Failed to kick user for captcha timeout: {e}")
+                    return None
+        
+        async def _expire_guild(guild_id: str, user_ids: List[str]) -> None:
+            # 期限切れのユーザーをキック（設定が有効な場合）
+            settings = await self.get_guild_settings(guild_id)
+            if not (settings.get("captchaEnabled", False) and settings.get("kickOnFailure", False)):
+                return
             
-            await asyncio.sleep(60)  # 1分ごとに実行
+            guild = self.bot.get_guild(int(guild_id))
+            if not guild:
+                return
+            
+            # キックまでの間に再参加して新しい認証待ちが登録されたユーザーは除く
+            members = [
+                m for m in (guild.get_member(int(user_id)) for user_id in user_ids
+                            if self.pending.get(guild_id, user_id) is None)
+                if m
+            ]
+            kicked = [m for m in await asyncio.gather(*(_kick(m) for m in members)) if m]
+            
+            # ログチャンネルにまとめて通知
+            log_channel_id = settings.get("logChannelId")
+            if kicked and log_channel_id:
+                log_channel = guild.get_channel(int(log_channel_id))
+                if log_channel:
+                    try:
+                        await self._send_timeout_log(log_channel, kicked)
+                    except Exception as e:
+                        logger.error(f"Failed to send captcha timeout log: {e}")
+        
+        await asyncio.gather(*(_expire_guild(g, u) for g, u in by_guild.items()))
+    
+    async def _send_timeout_log(self, log_channel: discord.abc.Messageable, kicked: List[discord.Member]) -> None:
+        """時間切れでキックしたユーザーをログチャンネルに通知する"""
+        if len(kicked) == 1:
+            member = kicked[0]
+            await log_channel.send(f"🔒 {member.mention} (ID: {member.id}) はキャプチャ認証の時間切れでキックされました。")
+            return
+        
+        # メッセージの文字数上限に収まるように分割して送信
+        header = f"🔒 {len(kicked)}人のユーザーがキャプチャ認証の時間切れでキックされました。\n"
+        lines = [f"{member.mention} (ID: {member.id})" for member in kicked]
+        chunk = header
+        for line in lines:
+            if len(chunk) + len(line) + 1 > 2000:
+                await log_channel.send(chunk)
+                chunk = ""
+            chunk += line + "\n"
+        if chunk:
+            await log_channel.send(chunk)
     
     async def get_guild_settings(self, guild_id: str) -> Dict[str, Any]:
         """ギルドのキャプチャ認証設定を取得する"""
@@ -183,72 +252,6 @@ class CaptchaVerification:
             "logChannelId": None
         }
     
-    def _generate_captcha_code(self, captcha_type: str, length: int = 6) -> Tuple[str, str]:
-        """キャプチャコードを生成する"""
-        if captcha_type == "math":
-            # 簡単な数学の問題を生成
-            a = random.randint(1, 20)
-            b = random.randint(1, 20)
-            op = random.choice(["+", "-", "*"])
-            
-            question = f"{a} {op} {b} = ?"
-            
-            if op == "+":
-                answer = str(a + b)
-            elif op == "-":
-                answer = str(a - b)
-            else:  # op == "*"
-                answer = str(a * b)
-            
-            return question, answer
-        
-        else:  # captcha_type == "text"
-            # ランダムな文字列を生成
-            chars = string.ascii_uppercase + string.digits
-            code = ''.join(random.choice(chars) for _ in range(length))
-            return code, code
-    
-    def _generate_captcha_image(self, text: str) -> discord.File:
-        """キャプチャ画像を生成する"""
-        width, height = 280, 120
-        image = Image.new("RGB", (width, height), color=(255, 255, 255))
-        draw = ImageDraw.Draw(image)
-        
-        # フォントの読み込み
-        font_path = os.path.join(self.fonts_path, self.default_font) if self.default_font else None
-        try:
-            font = ImageFont.truetype(font_path, 36) if font_path else ImageFont.load_default()
-        except Exception as e:
-            logger.error(f"Failed to load font: {e}")
-            font = ImageFont.load_default()
-        
-        # ノイズを追加（線）
-        for _ in range(8):
-            x1 = random.randint(0, width)
-            y1 = random.randint(0, height)
-            x2 = random.randint(0, width)
-            y2 = random.randint(0, height)
-            draw.line([(x1, y1), (x2, y2)], fill=(64, 64, 64), width=1)
-        
-        # ノイズを追加（点）
-        for _ in range(800):
-            x = random.randint(0, width)
-            y = random.randint(0, height)
-            draw.point((x, y), fill=(64, 64, 64))
-        
-        # テキストを描画
-        text_width, text_height = draw.textsize(text, font=font)
-        x = (width - text_width) // 2
-        y = (height - text_height) // 2
-        draw.text((x, y), text, font=font, fill=(0, 0, 0))
-        
-        # 画像をバイトストリームに変換
-        buffer = io.BytesIO()
-        image.save(buffer, format="PNG")
-        buffer.seek(0)
-        
-        return discord.File(buffer, filename="captcha.png")
-    
     async def start_verification(self, member: discord.Member) -> None:
         """新しいメンバーに対してキャプチャ認証を開始する"""
         if not member.guild:
@@ -280,25 +283,18 @@ class CaptchaVerification:
             captcha_type = settings.get("captchaType", "text")
             captcha_length = settings.get("captchaLength", 6)
             
-            # キャプチャコードを生成
-            question, answer = self._generate_captcha_code(captcha_type, captcha_length)
+            # 描画済みのキャプチャをプールから取り出す
+            question, answer, image = await self.captcha_pool.acquire(captcha_type, captcha_length)
             
             # 期限を設定
             timeout = settings.get("verificationTimeout", 300)
             expires = time.time() + timeout
             
-            # 認証情報を保存
-            if guild_id not in self.pending_verifications:
-                self.pending_verifications[guild_id] = {}
-                
-            self.pending_verifications[guild_id][user_id] = {
-                "code": answer,
-                "expires": expires,
-                "attempts": 0
-            }
+            # 認証情報を保存し、期限の処理タスクに次の期限を再計算させる
+            await self.pending.add(guild_id, user_id, answer, expires)
+            self._pending_wakeup.set()
             
-            # キャプチャ画像を生成
-            captcha_file = self._generate_captcha_image(question)
+            captcha_file = discord.File(io.BytesIO(image), filename="captcha.png")
             
             # 認証メッセージを送信
             timeout_time = datetime.datetime.utcnow() + datetime.timedelta(seconds=timeout)
@@ -335,13 +331,12 @@ class CaptchaVerification:
             return
         
         # ユーザーがキャプチャ認証待ちでない場合は無視
-        if guild_id not in self.pending_verifications or user_id not in self.pending_verifications[guild_id]:
+        verification = self.pending.get(guild_id, user_id)
+        if verification is None:
             return
         
-        verification = self.pending_verifications[guild_id][user_id]
-        
         # 試行回数を増やす
-        verification["attempts"] += 1
+        await self.pending.record_attempt(guild_id, user_id)
         max_attempts = settings.get("maxAttempts", 3)
         
         # キャプチャコードが一致するか確認
@@ -369,9 +364,7 @@ class CaptchaVerification:
                         await log_channel.send(f"🔓 {message.author.mention} (ID: {message.author.id}) がキャプチャ認証に成功しました。")
                 
                 # 認証情報を削除
-                del self.pending_verifications[guild_id][user_id]
-                if not self.pending_verifications[guild_id]:
-                    del self.pending_verifications[guild_id]
+                await self.pending.remove(guild_id, user_id)
                 
                 logger.info(f"Captcha verification successful for {message.author} (ID: {message.author.id}) in guild {message.guild.name}")
             
@@ -400,9 +393,7 @@ class CaptchaVerification:
                                 await log_channel.send(f"🔒 {message.author.mention} (ID: {message.author.id}) はキャプチャ認証の失敗でキックされました。")
                     
                     # 認証情報を削除
-                    del self.pending_verifications[guild_id][user_id]
-                    if not self.pending_verifications[guild_id]:
-                        del self.pending_verifications[guild_id]
+                    await self.pending.remove(guild_id, user_id)
                     
                     logger.info(f"Captcha verification failed (max attempts) for {message.author} (ID: {message.author.id}) in guild {message.guild.name}")
                 
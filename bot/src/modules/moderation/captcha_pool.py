@@ -0,0 +1,262 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import random
+import string
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger('ShardBot.CaptchaPool')
+
+# (問題文, 答え, PNGバイト列)
+Captcha = Tuple[str, str, bytes]
+
+# ワーカープロセスごとに一度だけ読み込むフォント
+_worker_font = None
+
+
+def _init_worker(font_path: Optional[str]) -> None:
+    """ワーカープロセスの初期化（フォントを一度だけ読み込む）"""
+    global _worker_font
+    try:
+        _worker_font = ImageFont.truetype(font_path, 36) if font_path else ImageFont.load_default()
+    except Exception:
+        _worker_font = ImageFont.load_default()
+
+
+def generate_captcha_code(captcha_type: str, length: int = 6) -> Tuple[str, str]:
+    """キャプチャコードを生成する（問題文と答えを返す）"""
+    if captcha_type == "math":
+        # 簡単な数学の問題を生成
+        a = random.randint(1, 20)
+        b = random.randint(1, 20)
+        op = random.choice(["+", "-", "*"])
+
+        question = f"{a} {op} {b} = ?"
+
+        if op == "+":
+            answer = str(a + b)
+        elif op == "-":
+            answer = str(a - b)
+        else:  # op == "*"
+            answer = str(a * b)
+
+        return question, answer
+
+    # ランダムな文字列を生成
+    chars = string.ascii_uppercase + string.digits
+    code = ''.join(random.choice(chars) for _ in range(length))
+    return code, code
+
+
+def render_captcha_image(text: str, font=None) -> bytes:
+    """キャプチャ画像をPNGのバイト列として描画する"""
+    if font is None:
+        font = _worker_font or ImageFont.load_default()
+
+    width, height = 280, 120
+    image = Image.new("RGB", (width, height), color=(255, 255, 255))
+    draw = ImageDraw.Draw(image)
+
+    # ノイズを追加（線）
+    for _ in range(8):
+        x1 = random.randint(0, width)
+        y1 = random.randint(0, height)
+        x2 = random.randint(0, width)
+        y2 = random.randint(0, height)
+        draw.line([(x1, y1), (x2, y2)], fill=(64, 64, 64), width=1)
+
+    # ノイズを追加（点）
+    draw.point(
+        [(random.randint(0, width), random.randint(0, height)) for _ in range(800)],
+        fill=(64, 64, 64)
+    )
+
+    # テキストを描画
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    x = (width - (right - left)) // 2 - left
+    y = (height - (bottom - top)) // 2 - top
+    draw.text((x, y), text, font=font, fill=(0, 0, 0))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_batch(captcha_type: str, length: int, count: int) -> List[Captcha]:
+    """ワーカープロセスでキャプチャをまとめて生成する"""
+    random.seed()
+    batch = []
+    for _ in range(count):
+        question, answer = generate_captcha_code(captcha_type, length)
+        batch.append((question, answer, render_captcha_image(question)))
+    return batch
+
+
+class CaptchaPool:
+    """描画済みキャプチャをキャプチャの種類ごとにバッファしておくプール
+
+    画像の描画は ProcessPoolExecutor のワーカープロセスで行い、イベントループでは
+    バッファから取り出すだけにします。バッファが低水位を下回るとバックグラウンドで
+    補充し、取り出しが補充に追いつかない場合は目標サイズを最大値まで倍増させます。
+    start() でフォントが決まるまでの取り出し要求は、描画せずに待たせておきます。
+    """
+
+    def __init__(self, workers: int = 2, min_size: int = 32, max_size: int = 1024,
+                 batch_size: int = 16):
+        self.workers = workers
+        self.min_size = min_size
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.font_path: Optional[str] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # start() でワーカープロセスが起動したらセットされる
+        self._ready = asyncio.Event()
+        # {(captcha_type, length): deque[Captcha]}
+        self.buffers: Dict[Tuple[str, int], Deque[Captcha]] = {}
+        # {(captcha_type, length): 目標サイズ}
+        self.targets: Dict[Tuple[str, int], int] = {}
+        self._refilling: Dict[Tuple[str, int], asyncio.Task] = {}
+        # バッファが空の時に補充を待っている取り出し要求
+        self._waiters: Dict[Tuple[str, int], Deque[asyncio.Future]] = {}
+        self._last_demand: Dict[Tuple[str, int], float] = {}
+        self.stats = {"hits": 0, "misses": 0, "rendered": 0, "grown": 0}
+
+    @staticmethod
+    def _key(captcha_type: str, length: int) -> Tuple[str, int]:
+        # 数学の問題は長さを使わない
+        return (captcha_type, 0) if captcha_type == "math" else ("text", int(length))
+
+    def start(self, font_path: Optional[str] = None) -> None:
+        """ワーカープロセスを起動する（フォントが変わった場合は作り直す）
+
+        作り直す場合も、描画中のバッチは古いワーカーで最後まで描画させ、
+        補充を待っている取り出し要求はそのまま残します。
+        """
+        if self._executor is not None and font_path == self.font_path:
+            return
+        previous = self._executor
+        self.font_path = font_path
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(font_path,)
+        )
+        if previous is not None:
+            previous.shutdown(wait=False)
+        # 古いフォントで描画したバッファは捨てる
+        for buffer in self.buffers.values():
+            buffer.clear()
+        self._ready.set()
+
+    def close(self) -> None:
+        """補充を止めてワーカープロセスを終了する（待っている取り出し要求はエラーで終わる）"""
+        self._ready.clear()
+        for task in self._refilling.values():
+            task.cancel()
+        self._refilling.clear()
+        for waiters in self._waiters.values():
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(RuntimeError("Captcha pool is closed"))
+        self._waiters.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _render(self, key: Tuple[str, int], count: int) -> List[Captcha]:
+        # フォントが決まって start() されるまで描画しない
+        await self._ready.wait()
+        loop = asyncio.get_running_loop()
+        batch = await loop.run_in_executor(self._executor, render_batch, key[0], key[1], count)
+        self.stats["rendered"] += len(batch)
+        return batch
+
+    def warm(self, captcha_type: str = "text", length: int = 6) -> None:
+        """指定した種類のバッファの補充を開始する"""
+        key = self._key(captcha_type, length)
+        self.buffers.setdefault(key, deque())
+        self.targets.setdefault(key, self.min_size)
+        self._schedule_refill(key)
+
+    def _schedule_refill(self, key: Tuple[str, int]) -> None:
+        task = self._refilling.get(key)
+        if task is None or task.done():
+            self._refilling[key] = asyncio.get_running_loop().create_task(self._refill(key))
+
+    async def _refill(self, key: Tuple[str, int]) -> None:
+        """目標サイズまでバッファを補充する（ワーカー数分のバッチを並行して描画する）
+
+        描画できたキャプチャは、バッファが空の間に待っていた取り出し要求に先に渡します。
+        """
+        buffer = self.buffers[key]
+        waiters = self._waiters.setdefault(key, deque())
+        try:
+            while waiters or len(buffer) < self.targets[key]:
+                missing = self.targets[key] - len(buffer) + len(waiters)
+                batches = min(self.workers, -(-missing // self.batch_size))
+                results = await asyncio.gather(
+                    *(self._render(key, self.batch_size) for _ in range(batches))
+                )
+                for batch in results:
+                    for captcha in batch:
+                        while waiters and waiters[0].done():
+                            waiters.popleft()
+                        if waiters:
+                            waiters.popleft().set_result(captcha)
+                        else:
+                            buffer.append(captcha)
+            self._shrink(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to refill captcha pool {key}: {e}")
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_exception(e)
+
+    def _shrink(self, key: Tuple[str, int]) -> None:
+        """しばらく需要がない種類の目標サイズを半分に戻す"""
+        if time.monotonic() - self._last_demand.get(key, 0) > 600 and self.targets[key] > self.min_size:
+            self.targets[key] = max(self.min_size, self.targets[key] // 2)
+
+    async def acquire(self, captcha_type: str = "text", length: int = 6) -> Captcha:
+        """描画済みのキャプチャを1つ取り出す（バッファが空の場合は補充を待つ）"""
+        key = self._key(captcha_type, length)
+        buffer = self.buffers.setdefault(key, deque())
+        target = self.targets.setdefault(key, self.min_size)
+        self._last_demand[key] = time.monotonic()
+
+        if buffer:
+            self.stats["hits"] += 1
+            captcha = buffer.popleft()
+            if len(buffer) < self.targets[key] // 2:
+                self._schedule_refill(key)
+            return captcha
+
+        # 補充が追いついていないので目標サイズを増やす
+        self.stats["misses"] += 1
+        if target < self.max_size:
+            self.targets[key] = min(self.max_size, target * 2)
+            self.stats["grown"] += 1
+            logger.info(f"Growing captcha pool {key} to {self.targets[key]}")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(waiter)
+        self._schedule_refill(key)
+        return await waiter
+
+
+def get_captcha_pool(bot) -> CaptchaPool:
+    """ボットに紐づいた共有 CaptchaPool を取得する（なければ作成する）"""
+    pool = getattr(bot, 'captcha_pool', None)
+    if pool is None:
+        pool = CaptchaPool()
+        bot.captcha_pool = pool
+    return pool
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import discord
+
+from .lockdown import RateBudget, get_request_budget
+
+logger = logging.getLogger('ShardBot.CohortEnforcer')
+
+# この人数に達したコホートは時間窓の経過を待たずに処理する
+COHORT_SIZE_LIMIT = 200
+
+ACTION_TEXT = {
+    "verify": "認証要求",
+    "kick": "キック",
+    "tempban": "一時BAN",
+    "ban": "BAN",
+}
+
+# 一時BANが適用されたユーザーを通知するコールバック: (guild, user_ids)
+TempBanCallback = Callable[[discord.Guild, List[int]], Optional[Awaitable[None]]]
+
+
+class CohortProgress:
+    """1つのコホート（まとめて処理する参加者の集団）の処理状況"""
+
+    def __init__(self, guild_id: int, total: int):
+        self.guild_id = guild_id
+        self.total = total
+        self.done = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.failed_ids: List[int] = []
+        self.by_action: Dict[str, Dict[str, int]] = {}
+        self.individual_requests = 0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def record(self, action: str, user_id: int, success: bool) -> None:
+        counts = self.by_action.setdefault(action, {"succeeded": 0, "failed": 0})
+        self.done += 1
+        if success:
+            self.succeeded += 1
+            counts["succeeded"] += 1
+        else:
+            self.failed += 1
+            self.failed_ids.append(user_id)
+            counts["failed"] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "guild_id": self.guild_id,
+            "total": self.total,
+            "done": self.done,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "failed_ids": list(self.failed_ids),
+            "by_action": {action: dict(counts) for action, counts in self.by_action.items()},
+            "individual_requests": self.individual_requests,
+            "elapsed": self.elapsed,
+            "finished": self.finished,
+        }
+
+
+class CohortEnforcer:
+    """レイド参加者をコホート単位でまとめて処理するクラス
+
+    参加者ごとにアクションを即時実行する代わりに、短い時間窓の間に検出された参加者を
+    集めてから処理します。BANを含む全てのアクションは、同時実行数とリクエスト予算を
+    守りながらメンバーごとのリクエストを並行して送ります。ログはコホートごとに1件です。
+    """
+
+    def __init__(self, bot, window: float = 3.0, concurrency: int = 5,
+                 budget: Optional[RateBudget] = None, on_tempban: Optional[TempBanCallback] = None):
+        self.bot = bot
+        self.window = window
+        self.concurrency = concurrency
+        self.budget = budget or get_request_budget(bot)
+        self.on_tempban = on_tempban
+        # {guild_id: {action: {member_id: member}}}
+        self.pending: Dict[int, Dict[str, Dict[int, discord.Member]]] = {}
+        # {guild_id: settings}  コホートごとの最新の設定
+        self._settings: Dict[int, Dict[str, Any]] = {}
+        self._flush_tasks: Dict[int, asyncio.Task] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # {guild_id: CohortProgress}  処理中または直近のコホート
+        self.progress: Dict[int, CohortProgress] = {}
+        self.stats = {"cohorts": 0, "members": 0, "succeeded": 0, "failed": 0}
+
+    def _guild_lock(self, guild_id: int) -> asyncio.Lock:
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[guild_id] = lock
+        return lock
+
+    def pending_count(self, guild_id) -> int:
+        return sum(len(members) for members in self.pending.get(int(guild_id), {}).values())
+
+    def get_progress(self, guild_id) -> Optional[Dict[str, Any]]:
+        progress = self.progress.get(int(guild_id))
+        result = progress.to_dict() if progress else {}
+        result["pending"] = self.pending_count(guild_id)
+        return result if progress or result["pending"] else None
+
+    async def submit(self, member: discord.Member, action: str, settings: Dict[str, Any]) -> None:
+        """レイド参加者をコホートに追加する（時間窓の経過または上限到達でまとめて処理する）"""
+        guild = member.guild
+        cohort = self.pending.setdefault(guild.id, {}).setdefault(action, {})
+        cohort[member.id] = member
+        self._settings[guild.id] = settings
+
+        if self.pending_count(guild.id) >= COHORT_SIZE_LIMIT:
+            task = self._flush_tasks.pop(guild.id, None)
+            if task:
+                task.cancel()
+            self.bot.loop.create_task(self.flush(guild))
+        elif guild.id not in self._flush_tasks:
+            self._flush_tasks[guild.id] = self.bot.loop.create_task(self._flush_later(guild))
+
+    async def _flush_later(self, guild: discord.Guild) -> None:
+        try:
+            await asyncio.sleep(self.window)
+        except asyncio.CancelledError:
+            return
+        self._flush_tasks.pop(guild.id, None)
+        await self.flush(guild)
+
+    async def flush(self, guild: discord.Guild) -> Optional[CohortProgress]:
+        """保留中のコホートを処理する"""
+        cohorts = self.pending.pop(guild.id, None)
+        settings = self._settings.pop(guild.id, {})
+        if not cohorts:
+            return None
+
+        async with self._guild_lock(guild.id):
+            total = sum(len(members) for members in cohorts.values())
+            progress = CohortProgress(guild.id, total)
+            self.progress[guild.id] = progress
+
+            for action, members in cohorts.items():
+                try:
+                    await self._enforce(guild, action, list(members.values()), settings, progress)
+                except Exception as e:
+                    logger.error(f"Failed to apply {action} to cohort in guild {guild.id}: {e}")
+
+            progress.finished_at = time.monotonic()
+            self.stats["cohorts"] += 1
+            self.stats["members"] += progress.total
+            self.stats["succeeded"] += progress.succeeded
+            self.stats["failed"] += progress.failed
+            logger.info(
+                f"Enforced raid cohort in guild {guild.id}: {progress.succeeded}/{progress.total} succeeded "
+                f"({progress.individual_requests} requests) "
+                f"in {progress.elapsed:.2f}s"
+            )
+
+            await self._send_summary(guild, settings, progress)
+            return progress
+
+    async def _enforce(self, guild: discord.Guild, action: str, members: List[discord.Member],
+                       settings: Dict[str, Any], progress: CohortProgress) -> None:
+        if action in ("ban", "tempban"):
+            reason = "レイド保護: 自動一時BAN" if action == "tempban" else "レイド保護: 自動BAN"
+            banned = await self._ban(guild, action, members, reason, progress)
+            if action == "tempban" and banned and self.on_tempban:
+                result = self.on_tempban(guild, banned)
+                if asyncio.iscoroutine(result):
+                    await result
+
+        elif action == "kick":
+            await self._run_individual(
+                action, members, lambda m: m.kick(reason="レイド保護: 自動キック"), progress
+            )
+
+        elif action == "verify":
+            verify_role_id = settings.get("verifyRoleId")
+            verify_role = guild.get_role(int(verify_role_id)) if verify_role_id else None
+            if verify_role is None:
+                for member in members:
+                    progress.record(action, member.id, False)
+                return
+            await self._run_individual(
+                action, members, lambda m: m.add_roles(verify_role, reason="レイド保護: 自動認証要求"), progress
+            )
+
+        else:
+            logger.warning(f"Unknown raid action type: {action}")
+            for member in members:
+                progress.record(action, member.id, False)
+
+    async def _ban(self, guild: discord.Guild, action: str, members: List[discord.Member],
+                   reason: str, progress: CohortProgress) -> List[int]:
+        """BANを適用し、BANできたユーザーIDのリストを返す"""
+        banned: List[int] = []
+
+        async def _ban_one(member: discord.Member):
+            await member.ban(reason=reason, delete_message_days=1)
+            banned.append(member.id)
+
+        await self._run_individual(action, members, _ban_one, progress)
+        return banned
+
+    async def _run_individual(self, action: str, members: Iterable[discord.Member],
+                              call: Callable[[discord.Member], Awaitable[Any]],
+                              progress: CohortProgress) -> None:
+        """同時実行数とリクエスト予算を守りながら個別リクエストを実行する"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _run(member: discord.Member) -> None:
+            async with semaphore:
+                await self.budget.acquire()
+                progress.individual_requests += 1
+                try:
+                    await call(member)
+                except Exception as e:
+                    logger.error(f"Failed to apply {action} to {member.id}: {e}")
+                    progress.record(action, member.id, False)
+                else:
+                    progress.record(action, member.id, True)
+
+        await asyncio.gather(*(_run(member) for member in members))
+
+    async def _send_summary(self, guild: discord.Guild, settings: Dict[str, Any],
+                            progress: CohortProgress) -> None:
+        """コホートごとに1件の要約をログチャンネルに送信する"""
+        log_channel_id = settings.get("logChannelId")
+        if not log_channel_id:
+            return
+        log_channel = guild.get_channel(int(log_channel_id))
+        if not log_channel:
+            return
+
+        lines = [f"🛡️ レイド保護: {progress.total}人の参加者を処理しました（{progress.elapsed:.1f}秒）"]
+        for action, counts in progress.by_action.items():
+            line = f"・{ACTION_TEXT.get(action, action)}: {counts['succeeded']}人"
+            if counts["failed"]:
+                line += f"（失敗 {counts['failed']}人）"
+            lines.append(line)
+        if progress.failed_ids:
+            shown = ", ".join(str(user_id) for user_id in progress.failed_ids[:20])
+            more = f" ほか{len(progress.failed_ids) - 20}人" if len(progress.failed_ids) > 20 else ""
+            lines.append(f"失敗したユーザーID: {shown}{more}")
+
+        try:
+            await log_channel.send("\n".join(lines))
+        except Exception as e:
+            logger.error(f"Error sending cohort summary: {e}")
@@ -0,0 +1,194 @@
+import hashlib
+import re
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# MinHash の署名長（ハッシュ関数の数）
+SIGNATURE_SIZE = 16
+# MinHash の計算に使うメルセンヌ素数
+_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(0x5A17D)
+_HASH_A = _rng.randint(1, 1 << 31, size=(SIGNATURE_SIZE, 1)).astype(np.uint64)
+_HASH_B = _rng.randint(0, 1 << 31, size=(SIGNATURE_SIZE, 1)).astype(np.uint64)
+_DIGITS = re.compile(r'\d+')
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def normalize_name(name: str) -> str:
+    """比較用にユーザー名を正規化する（NFKC、小文字化、連続する数字を1文字にまとめる）"""
+    name = unicodedata.normalize('NFKC', name or '').lower()
+    return _DIGITS.sub('0', name)
+
+
+def name_signature(name: str) -> np.ndarray:
+    """ユーザー名の文字3-gramから MinHash 署名を計算する"""
+    name = normalize_name(name)
+    padded = f"^{name}$"
+    grams = {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+    # 3-gram のハッシュを31ビットに収めてから (a*x + b) mod p で並べ替える
+    values = np.fromiter((_hash64(g) & 0x7FFFFFFF for g in grams), dtype=np.uint64, count=len(grams))
+    permuted = (_HASH_A * values + _HASH_B) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+class CohortMatch:
+    """新規参加者が属する類似アカウントのクラスター"""
+
+    __slots__ = ('member_id', 'member_ids', 'size', 'window_size')
+
+    def __init__(self, member_id: int, member_ids: List[int], window_size: int):
+        self.member_id = member_id
+        self.member_ids = member_ids
+        self.size = len(member_ids)
+        self.window_size = window_size
+
+
+class GuildJoinWindow:
+    """1ギルドの直近の参加者の特徴量を列ごとの NumPy 配列（リングバッファ）で保持するクラス
+
+    新しい参加者と窓内の全参加者との類似度を一度にベクトル演算で計算し、参加者ごとの
+    類似ペア数（近傍数）を増分で更新します。窓から外れる参加者の分は取り除く時に差し引きます。
+    """
+
+    def __init__(self, capacity: int, window_seconds: float, creation_window: float,
+                 threshold: float, min_cluster_size: int):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.creation_window = creation_window
+        self.threshold = threshold
+        self.min_cluster_size = min_cluster_size
+
+        self.member_ids = np.zeros(capacity, dtype=np.int64)
+        self.joined_at = np.zeros(capacity, dtype=np.float64)
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.signatures = np.zeros((capacity, SIGNATURE_SIZE), dtype=np.uint32)
+        self.avatars = np.zeros(capacity, dtype=np.uint64)
+        self.default_avatar = np.zeros(capacity, dtype=bool)
+        self.neighbors = np.zeros(capacity, dtype=np.int32)
+        self.valid = np.zeros(capacity, dtype=bool)
+
+        self._head = 0   # 次に書き込む位置
+        self._tail = 0   # 最も古い参加者の位置
+        self.size = 0
+
+    def similarity(self, created_at: float, signature: np.ndarray, avatar: int,
+                   default_avatar: bool) -> np.ndarray:
+        """窓内の全参加者との類似度（0〜1）を返す（無効な行は0）"""
+        name_sim = (self.signatures == signature).mean(axis=1)
+        created_close = np.abs(self.created_at - created_at) <= self.creation_window
+        if default_avatar:
+            avatar_score = self.default_avatar * 0.1
+        else:
+            avatar_score = (~self.default_avatar & (self.avatars == np.uint64(avatar))) * 0.25
+        score = 0.5 * name_sim + 0.25 * created_close + avatar_score
+        score[~self.valid] = 0.0
+        return score
+
+    def _evict(self, index: int) -> None:
+        """1件を窓から取り除き、その参加者と類似していた参加者の近傍数を減らす"""
+        if not self.valid[index]:
+            return
+        self.valid[index] = False
+        similar = self.similarity(
+            self.created_at[index], self.signatures[index],
+            int(self.avatars[index]), bool(self.default_avatar[index])
+        ) >= self.threshold
+        self.neighbors[similar] -= 1
+        self.neighbors[index] = 0
+        self.size -= 1
+
+    def expire(self, now: float) -> None:
+        """窓の時間を過ぎた参加者を古い順に取り除く"""
+        cutoff = now - self.window_seconds
+        while self.size and self.joined_at[self._tail] < cutoff:
+            self._evict(self._tail)
+            self._tail = (self._tail + 1) % self.capacity
+
+    def add(self, member_id: int, joined_at: float, created_at: float, signature: np.ndarray,
+            avatar: int, default_avatar: bool) -> Optional[CohortMatch]:
+        """参加者を追加し、密なクラスターに属する場合は CohortMatch を返す"""
+        self.expire(joined_at)
+        if self.size == self.capacity:
+            self._evict(self._tail)
+            self._tail = (self._tail + 1) % self.capacity
+
+        similar = self.similarity(created_at, signature, avatar, default_avatar) >= self.threshold
+        self.neighbors[similar] += 1
+
+        index = self._head
+        self.member_ids[index] = member_id
+        self.joined_at[index] = joined_at
+        self.created_at[index] = created_at
+        self.signatures[index] = signature
+        self.avatars[index] = np.uint64(avatar)
+        self.default_avatar[index] = default_avatar
+        self.neighbors[index] = int(similar.sum())
+        self.valid[index] = True
+        self._head = (self._head + 1) % self.capacity
+        self.size += 1
+
+        # 自分を含めたクラスターの大きさが閾値以上なら検出
+        if self.neighbors[index] + 1 >= self.min_cluster_size:
+            cluster = self.member_ids[similar].tolist()
+            cluster.append(member_id)
+            return CohortMatch(member_id, cluster, self.size)
+        return None
+
+
+class JoinCohortAnalyzer:
+    """ギルドごとの参加者の窓を管理し、名前・アバター・作成日時が類似したアカウント群を検出するクラス"""
+
+    def __init__(self, window_seconds: float = 600, capacity: int = 5000,
+                 creation_window: float = 3600, threshold: float = 0.6, min_cluster_size: int = 5):
+        self.window_seconds = window_seconds
+        self.capacity = capacity
+        self.creation_window = creation_window
+        self.threshold = threshold
+        self.min_cluster_size = min_cluster_size
+        self.windows: Dict[int, GuildJoinWindow] = {}
+
+    def _window(self, guild_id: int) -> GuildJoinWindow:
+        window = self.windows.get(guild_id)
+        if window is None:
+            window = GuildJoinWindow(
+                self.capacity, self.window_seconds, self.creation_window,
+                self.threshold, self.min_cluster_size
+            )
+            self.windows[guild_id] = window
+        return window
+
+    def observe(self, guild_id: int, member_id: int, name: str, created_at: float,
+                avatar_key: Optional[str] = None, joined_at: Optional[float] = None) -> Optional[CohortMatch]:
+        """参加者の特徴量を窓に追加し、類似アカウントのクラスターを検出した場合は CohortMatch を返す"""
+        joined_at = joined_at if joined_at is not None else time.time()
+        default_avatar = avatar_key is None
+        avatar = 0 if default_avatar else _hash64(avatar_key)
+        return self._window(int(guild_id)).add(
+            member_id, joined_at, created_at, name_signature(name), avatar, default_avatar
+        )
+
+    def observe_member(self, member) -> Optional[CohortMatch]:
+        """discord.Member から特徴量を取り出して observe する"""
+        avatar = getattr(member, 'avatar', None)
+        return self.observe(
+            member.guild.id,
+            member.id,
+            member.name,
+            member.created_at.timestamp(),
+            avatar.key if avatar is not None else None,
+        )
+
+    def cleanup(self, now: Optional[float] = None) -> None:
+        """参加者がいなくなったギルドの窓を削除する"""
+        now = now if now is not None else time.time()
+        for guild_id in list(self.windows):
+            window = self.windows[guild_id]
+            window.expire(now)
+            if not window.size:
+                del self.windows[guild_id]
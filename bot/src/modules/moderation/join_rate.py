@@ -0,0 +1,194 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+# 既定で集計する時間窓（秒）
+DEFAULT_WINDOWS: Tuple[int, ...] = (10, 60, 300)
+
+
+class JoinRateCounter:
+    """1秒単位の循環バケットで1ギルドの参加数を数えるカウンター
+
+    バケット数は最大の時間窓と同じで、各時間窓の合計はバケットが窓から
+    外れるときに差し引いて維持するため、参加の記録と件数の取得はどちらも O(1) です。
+    """
+
+    __slots__ = ('size', '_counts', '_totals', '_head', '_last_join', '_recent_members')
+
+    def __init__(self, windows: Iterable[int] = DEFAULT_WINDOWS):
+        windows = sorted({int(w) for w in windows if int(w) > 0})
+        if not windows:
+            raise ValueError("windows must contain at least one positive value")
+        self.size = windows[-1]
+        self._counts = [0] * self.size
+        self._totals: Dict[int, int] = {w: 0 for w in windows}
+        self._head: Optional[int] = None  # 最後に進めた秒
+        self._last_join: Optional[int] = None  # 最後に参加を記録した秒
+        # 同じ参加を二重に数えないための直近の参加者 {member_id: second}
+        self._recent_members: "OrderedDict[int, int]" = OrderedDict()
+
+    @property
+    def windows(self) -> Tuple[int, ...]:
+        return tuple(self._totals)
+
+    @property
+    def last_second(self) -> Optional[int]:
+        return self._head
+
+    def _advance(self, second: int) -> int:
+        """リングを指定した秒まで進め、窓から外れたバケットを合計から差し引く"""
+        head = self._head
+        if head is None:
+            self._head = second
+            return second
+        if second <= head:
+            # 時計の逆行や同一秒の記録は最新バケットにまとめる
+            return head
+
+        if second - head >= self.size:
+            # リング全体が期限切れ
+            for i in range(self.size):
+                self._counts[i] = 0
+            for w in self._totals:
+                self._totals[w] = 0
+        else:
+            counts = self._counts
+            totals = self._totals
+            size = self.size
+            for s in range(head + 1, second + 1):
+                for w in totals:
+                    expired = counts[(s - w) % size]
+                    if expired:
+                        totals[w] -= expired
+                counts[s % size] = 0
+
+        # 時間窓から外れた参加者の記録を削除
+        cutoff = second - self.size
+        recent = self._recent_members
+        while recent and next(iter(recent.values())) <= cutoff:
+            recent.popitem(last=False)
+
+        self._head = second
+        return second
+
+    def add_window(self, window: int) -> None:
+        """集計する時間窓を追加する（既存バケットから初期値を計算する）"""
+        window = int(window)
+        if window <= 0 or window > self.size:
+            raise ValueError(f"window must be between 1 and {self.size}")
+        if window in self._totals:
+            return
+        total = 0
+        if self._head is not None:
+            for s in range(self._head - window + 1, self._head + 1):
+                total += self._counts[s % self.size]
+        self._totals[window] = total
+
+    def record(self, now: Optional[float] = None, member_id: Optional[int] = None) -> bool:
+        """参加を1件記録する
+
+        member_id を指定した場合、最大の時間窓内で既に記録されている参加者は数えません。
+        記録した場合は True を返します。
+        """
+        second = self._advance(int(now if now is not None else time.time()))
+
+        if member_id is not None:
+            if member_id in self._recent_members:
+                return False
+            self._recent_members[member_id] = second
+
+        self._last_join = second
+        self._counts[second % self.size] += 1
+        for w in self._totals:
+            self._totals[w] += 1
+        return True
+
+    def count(self, window: int, now: Optional[float] = None) -> int:
+        """直近 window 秒間の参加数を返す（最大の時間窓を超える場合は最大の時間窓で数える）"""
+        if now is not None:
+            self._advance(int(now))
+        window = min(int(window), self.size)
+        if window not in self._totals:
+            self.add_window(window)
+        return self._totals[window]
+
+    def rates(self, now: Optional[float] = None) -> Dict[int, int]:
+        """集計中の全時間窓の参加数を返す"""
+        if now is not None:
+            self._advance(int(now))
+        return dict(self._totals)
+
+    def recent_members(self, window: int) -> Set[int]:
+        """直近 window 秒間に記録された参加者IDを返す（member_id 付きで記録したもののみ）"""
+        if self._head is None:
+            return set()
+        cutoff = self._head - int(window)
+        members = set()
+        for member_id in reversed(self._recent_members):
+            if self._recent_members[member_id] <= cutoff:
+                break
+            members.add(member_id)
+        return members
+
+    def is_idle(self, now: Optional[float] = None) -> bool:
+        """最大の時間窓内に参加が1件もない場合 True"""
+        now = now if now is not None else time.time()
+        return self._last_join is None or int(now) - self._last_join >= self.size
+
+
+class JoinRateMonitor:
+    """ギルドごとの JoinRateCounter を管理するクラス
+
+    RaidDetector と RaidProtection で同じインスタンスを共有します
+    （get_join_rate_monitor を参照）。
+    """
+
+    def __init__(self, windows: Iterable[int] = DEFAULT_WINDOWS):
+        self.windows = tuple(sorted({int(w) for w in windows}))
+        self.counters: Dict[int, JoinRateCounter] = {}
+
+    def get_counter(self, guild_id) -> JoinRateCounter:
+        guild_id = int(guild_id)
+        counter = self.counters.get(guild_id)
+        if counter is None:
+            counter = JoinRateCounter(self.windows)
+            self.counters[guild_id] = counter
+        return counter
+
+    def record_join(self, guild_id, member_id: Optional[int] = None,
+                    now: Optional[float] = None) -> JoinRateCounter:
+        """参加を記録し、そのギルドのカウンターを返す"""
+        counter = self.get_counter(guild_id)
+        counter.record(now, member_id)
+        return counter
+
+    def count(self, guild_id, window: int, now: Optional[float] = None) -> int:
+        """直近 window 秒間の参加数を返す"""
+        counter = self.counters.get(int(guild_id))
+        if counter is None:
+            return 0
+        return counter.count(window, now if now is not None else time.time())
+
+    def rates(self, guild_id, now: Optional[float] = None) -> Dict[int, int]:
+        """10秒/60秒/300秒などの全時間窓の参加数を返す"""
+        counter = self.counters.get(int(guild_id))
+        if counter is None:
+            return {w: 0 for w in self.windows}
+        return counter.rates(now if now is not None else time.time())
+
+    def cleanup(self, now: Optional[float] = None) -> int:
+        """最大の時間窓を過ぎても参加がないギルドのカウンターを削除する"""
+        now = now if now is not None else time.time()
+        idle = [guild_id for guild_id, counter in self.counters.items() if counter.is_idle(now)]
+        for guild_id in idle:
+            del self.counters[guild_id]
+        return len(idle)
+
+
+def get_join_rate_monitor(bot) -> JoinRateMonitor:
+    """ボットに紐づいた共有 JoinRateMonitor を取得する（なければ作成する）"""
+    monitor = getattr(bot, 'join_rate_monitor', None)
+    if monitor is None:
+        monitor = JoinRateMonitor()
+        bot.join_rate_monitor = monitor
+    return monitor
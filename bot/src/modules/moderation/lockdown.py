@@ -0,0 +1,446 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from ..record_store import database_operations, to_datetime, to_timestamp
+
+logger = logging.getLogger('ShardBot.Lockdown')
+
+# 進捗コールバック: (完了数, 全体数, 失敗数)
+ProgressCallback = Callable[[int, int, int], Optional[Awaitable[None]]]
+
+# Discordのグローバルレート制限（50リクエスト/秒）より少し低く抑える
+DEFAULT_REQUESTS_PER_SECOND = 40.0
+DEFAULT_CONCURRENCY = 10
+# 自動解除で復元できなかったチャンネルを再試行するまでの時間（秒）
+RESTORE_RETRY_SECONDS = 60.0
+
+# {channel_id: (allow, deny) or None}  None は上書きがなかったチャンネル
+Snapshot = Dict[int, Optional[Tuple[int, int]]]
+
+
+class RateBudget:
+    """トークンバケットによるリクエスト予算
+
+    チャンネルごとの権限更新は別々のルート（バケット）になるため、実際の上限は
+    グローバルレート制限になります。バーストを許しつつ平均レートを rate 以下に保ちます。
+    """
+
+    def __init__(self, rate: float = DEFAULT_REQUESTS_PER_SECOND, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """トークンを1つ取得する（不足している場合は補充されるまで待つ）"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class LockdownProgress:
+    """ロックダウン（または復元）の進捗"""
+
+    def __init__(self, guild_id: int, total: int, operation: str = "lock"):
+        self.guild_id = guild_id
+        self.operation = operation
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.failed_channels: List[int] = []
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "guild_id": self.guild_id,
+            "operation": self.operation,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "failed_channels": list(self.failed_channels),
+            "elapsed": self.elapsed,
+            "finished": self.finished,
+        }
+
+
+def lockable_channels(guild: discord.Guild) -> List[discord.abc.GuildChannel]:
+    """ロックダウン対象のチャンネル（テキスト・ボイス）を返す"""
+    return [
+        channel for channel in guild.channels
+        if isinstance(channel, (discord.TextChannel, discord.VoiceChannel))
+    ]
+
+
+async def apply_channel_overwrites(
+    channels: Iterable[Any],
+    target: Any,
+    overwrite_for: Callable[[Any], Optional[discord.PermissionOverwrite]],
+    reason: Optional[str] = None,
+    budget: Optional[RateBudget] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    progress: Optional[LockdownProgress] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> LockdownProgress:
+    """複数チャンネルの権限上書きを並行して設定する
+
+    overwrite_for(channel) が返す PermissionOverwrite を設定します（None の場合は上書きを削除）。
+    同時実行数は concurrency、リクエストレートは budget で制限します。
+    """
+    channels = list(channels)
+    budget = budget or RateBudget()
+    semaphore = asyncio.Semaphore(concurrency)
+    if progress is None:
+        guild_id = getattr(getattr(target, "guild", None), "id", 0)
+        progress = LockdownProgress(guild_id, len(channels))
+
+    async def _apply(channel) -> None:
+        async with semaphore:
+            await budget.acquire()
+            try:
+                await channel.set_permissions(target, overwrite=overwrite_for(channel), reason=reason)
+            except Exception as e:
+                progress.failed += 1
+                progress.failed_channels.append(channel.id)
+                logger.error(f"Failed to set permissions on channel {channel.id}: {e}")
+            finally:
+                progress.done += 1
+                if on_progress:
+                    result = on_progress(progress.done, progress.total, progress.failed)
+                    if asyncio.iscoroutine(result):
+                        await result
+
+    await asyncio.gather(*(_apply(channel) for channel in channels))
+    progress.finished_at = time.monotonic()
+    return progress
+
+
+class LockdownStore:
+    """ロックダウン前の権限上書きをデータベース（lockdown_snapshots テーブル）に保存するクラス"""
+
+    async def save(self, guild_id: int, snapshot: Snapshot, restore_at: Optional[float]) -> None:
+        overwrites = [
+            (channel_id, pair[0], pair[1]) if pair is not None else (channel_id, None, None)
+            for channel_id, pair in snapshot.items()
+        ]
+        async for db in database_operations():
+            await db.save_lockdown_snapshot(
+                guild_id, overwrites, to_datetime(restore_at) if restore_at is not None else None
+            )
+
+    async def load(self) -> Dict[int, Tuple[Snapshot, Optional[float]]]:
+        """{guild_id: (スナップショット, 自動で解除する時刻)} を返す"""
+        records: Dict[int, Tuple[Snapshot, Optional[float]]] = {}
+        async for db in database_operations():
+            for row in await db.get_lockdown_snapshots():
+                restore_at = to_timestamp(row.restore_at) if row.restore_at is not None else None
+                snapshot, _ = records.setdefault(row.guild_id, ({}, restore_at))
+                snapshot[row.channel_id] = (row.allow, row.deny) if row.allow is not None else None
+        return records
+
+    async def delete(self, guild_id: int) -> None:
+        async for db in database_operations():
+            await db.delete_lockdown_snapshot(guild_id)
+
+
+class LockdownManager:
+    """ギルドのロックダウンとスナップショットからの復元を管理するクラス
+
+    ロックダウン時に @everyone の既存の権限上書きを保存し、レイド警戒モードの
+    終了時に同じ状態へ戻します。restore_after を指定したロックダウンは、誰が開始した
+    ものでもこのクラスが期限に自動で解除します（レイド警戒モードの終了で先に解除することもできます）。
+    スナップショットと解除の時刻はチャンネルを変更する前にデータベースにも保存され、
+    再起動後に start() で読み込んで自動解除を再開します。
+    """
+
+    def __init__(self, bot, rate: float = DEFAULT_REQUESTS_PER_SECOND,
+                 concurrency: int = DEFAULT_CONCURRENCY, budget: Optional[RateBudget] = None,
+                 store: Optional[LockdownStore] = None):
+        self.bot = bot
+        self.budget = budget or RateBudget(rate)
+        self.concurrency = concurrency
+        self.store = store or LockdownStore()
+        # {guild_id: スナップショット}
+        self.snapshots: Dict[int, Snapshot] = {}
+        # {guild_id: 自動で解除する時刻（エポック秒）}
+        self.restore_at: Dict[int, float] = {}
+        # {guild_id: LockdownProgress}
+        self.progress: Dict[int, LockdownProgress] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # {guild_id: バックグラウンドで実行中のロックダウン}
+        self._lock_tasks: Dict[int, asyncio.Task] = {}
+        # {guild_id: 期限に自動で解除するタスク}
+        self._restore_tasks: Dict[int, asyncio.Task] = {}
+        self._started = False
+
+    def _guild_lock(self, guild_id: int) -> asyncio.Lock:
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[guild_id] = lock
+        return lock
+
+    def is_locked(self, guild_id) -> bool:
+        return int(guild_id) in self.snapshots
+
+    def get_progress(self, guild_id) -> Optional[Dict[str, Any]]:
+        progress = self.progress.get(int(guild_id))
+        return progress.to_dict() if progress else None
+
+    @staticmethod
+    def snapshot(channels: Iterable[Any], role: Any) -> Snapshot:
+        """チャンネルごとの role の権限上書きを (allow, deny) のビット値で保存する"""
+        snapshot = {}
+        for channel in channels:
+            if role in channel.overwrites:
+                allow, deny = channel.overwrites_for(role).pair()
+                snapshot[channel.id] = (allow.value, deny.value)
+            else:
+                snapshot[channel.id] = None
+        return snapshot
+
+    async def lock(
+        self,
+        guild: discord.Guild,
+        reason: str = "レイド対策: サーバーロックダウン",
+        channels: Optional[Iterable[Any]] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        restore_after: Optional[float] = None,
+    ) -> LockdownProgress:
+        """@everyone の発言・通話を禁止する（既存の上書きは保存して他の権限は維持する）
+
+        restore_after 秒を指定すると、その時間が経過した時に自動で解除します。
+        """
+        async with self._guild_lock(guild.id):
+            role = guild.default_role
+            channels = list(channels) if channels is not None else lockable_channels(guild)
+
+            # 既にロック中の場合は最初のスナップショットを保持する
+            snapshot = self.snapshots.get(guild.id)
+            if snapshot is None:
+                snapshot = self.snapshot(channels, role)
+                self.snapshots[guild.id] = snapshot
+            else:
+                for channel_id, pair in self.snapshot(
+                    [c for c in channels if c.id not in snapshot], role
+                ).items():
+                    snapshot[channel_id] = pair
+            if restore_after is not None:
+                self.restore_at[guild.id] = time.time() + restore_after
+            # 再起動しても元に戻せるよう、チャンネルを変更する前に保存する
+            await self._save(guild.id)
+
+            def _locked_overwrite(channel) -> discord.PermissionOverwrite:
+                overwrite = channel.overwrites_for(role)
+                overwrite.update(send_messages=False, speak=False)
+                return overwrite
+
+            progress = LockdownProgress(guild.id, len(channels), "lock")
+            self.progress[guild.id] = progress
+            await apply_channel_overwrites(
+                channels, role, _locked_overwrite, reason=reason, budget=self.budget,
+                concurrency=self.concurrency, progress=progress, on_progress=on_progress
+            )
+            logger.warning(
+                f"Locked down {progress.done - progress.failed}/{progress.total} channels "
+                f"in guild {guild.id} in {progress.elapsed:.2f}s"
+            )
+            if restore_after is not None:
+                self._schedule_restore(guild.id, max(0.0, self.restore_at[guild.id] - time.time()))
+            return progress
+
+    def start_lock(self, guild: discord.Guild, reason: str = "レイド対策: サーバーロックダウン",
+                   restore_after: Optional[float] = None) -> asyncio.Task:
+        """ロックダウンをバックグラウンドで開始する（実行中のタスクは完了まで保持する）"""
+        task = self._lock_tasks.get(guild.id)
+        if task is not None and not task.done():
+            return task
+        task = asyncio.get_running_loop().create_task(
+            self.lock(guild, reason=reason, restore_after=restore_after)
+        )
+        self._lock_tasks[guild.id] = task
+        task.add_done_callback(lambda t, guild_id=guild.id: self._lock_done(guild_id, t))
+        return task
+
+    def _lock_done(self, guild_id: int, task: asyncio.Task) -> None:
+        if self._lock_tasks.get(guild_id) is task:
+            del self._lock_tasks[guild_id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Lockdown failed in guild {guild_id}: {task.exception()}")
+
+    async def _save(self, guild_id: int) -> None:
+        try:
+            await self.store.save(guild_id, self.snapshots[guild_id], self.restore_at.get(guild_id))
+        except Exception as e:
+            logger.error(f"Failed to save lockdown snapshot for guild {guild_id}: {e}")
+
+    async def _delete(self, guild_id: int) -> None:
+        try:
+            await self.store.delete(guild_id)
+        except Exception as e:
+            logger.error(f"Failed to delete lockdown snapshot for guild {guild_id}: {e}")
+
+    async def start(self) -> None:
+        """データベースからロック中のギルドを読み込み、自動解除を再開する（2回目以降は何もしない）"""
+        if self._started:
+            return
+        self._started = True
+        await self.bot.wait_until_ready()
+        try:
+            records = await self.store.load()
+        except Exception as e:
+            logger.error(f"Failed to load lockdown snapshots: {e}")
+            return
+
+        now = time.time()
+        for guild_id, (snapshot, restore_at) in records.items():
+            async with self._guild_lock(guild_id):
+                # 読み込み中に始まったロックダウンは、ロック済みの状態を保存しているので
+                # 保存されていたスナップショットを優先する
+                current = self.snapshots.get(guild_id)
+                if current is not None:
+                    for channel_id, pair in current.items():
+                        snapshot.setdefault(channel_id, pair)
+                self.snapshots[guild_id] = snapshot
+                if guild_id not in self.restore_at and restore_at is not None:
+                    self.restore_at[guild_id] = restore_at
+                if current is not None:
+                    await self._save(guild_id)
+            if guild_id in self.restore_at:
+                self._schedule_restore(guild_id, max(0.0, self.restore_at[guild_id] - now))
+        if records:
+            logger.warning(f"Loaded {len(records)} guilds still locked down before restart")
+
+    def _schedule_restore(self, guild_id: int, delay: float) -> None:
+        task = self._restore_tasks.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+        self._restore_tasks[guild_id] = asyncio.get_running_loop().create_task(
+            self._restore_later(guild_id, delay)
+        )
+
+    async def _restore_later(self, guild_id: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._restore_tasks.pop(guild_id, None)
+        guild = self.bot.get_guild(guild_id)
+        if guild is None and self.bot.is_ready():
+            # 退出したギルドは元に戻せないので記録を消す
+            self.snapshots.pop(guild_id, None)
+            self.restore_at.pop(guild_id, None)
+            await self._delete(guild_id)
+            return
+        if guild is None or guild.unavailable:
+            # 障害中・再接続直後で読み込まれていないギルドは後で再試行する
+            self._schedule_restore(guild_id, RESTORE_RETRY_SECONDS)
+            return
+        try:
+            progress = await self.restore(guild, reason="レイド対策: ロックダウンの期限切れ")
+        except Exception as e:
+            logger.error(f"Error restoring expired lockdown in guild {guild.id}: {e}")
+            progress = None
+        if self.is_locked(guild.id):
+            # 復元できなかったチャンネルは後で再試行する
+            if progress and progress.failed:
+                logger.warning(f"Failed to restore {progress.failed} channels in guild {guild.id}, retrying")
+            self._schedule_restore(guild.id, RESTORE_RETRY_SECONDS)
+
+    def close(self) -> None:
+        """実行中のロックダウンと自動解除のタスクを止める"""
+        for task in list(self._lock_tasks.values()) + list(self._restore_tasks.values()):
+            task.cancel()
+        self._lock_tasks.clear()
+        self._restore_tasks.clear()
+
+    async def restore(
+        self,
+        guild: discord.Guild,
+        reason: str = "レイド対策: ロックダウン解除",
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Optional[LockdownProgress]:
+        """スナップショットから @everyone の権限上書きを復元する（ロック中でなければ None）"""
+        async with self._guild_lock(guild.id):
+            snapshot = self.snapshots.get(guild.id)
+            if snapshot is None:
+                return None
+
+            role = guild.default_role
+            channels = [
+                channel for channel in (guild.get_channel(cid) for cid in snapshot)
+                if channel is not None
+            ]
+
+            def _previous_overwrite(channel) -> Optional[discord.PermissionOverwrite]:
+                pair = snapshot[channel.id]
+                if pair is None:
+                    return None
+                allow, deny = pair
+                return discord.PermissionOverwrite.from_pair(
+                    discord.Permissions(allow), discord.Permissions(deny)
+                )
+
+            progress = LockdownProgress(guild.id, len(channels), "restore")
+            self.progress[guild.id] = progress
+            await apply_channel_overwrites(
+                channels, role, _previous_overwrite, reason=reason, budget=self.budget,
+                concurrency=self.concurrency, progress=progress, on_progress=on_progress
+            )
+
+            # 失敗したチャンネルは次回の復元で再試行できるよう残す
+            if progress.failed:
+                self.snapshots[guild.id] = {cid: snapshot[cid] for cid in progress.failed_channels}
+                await self._save(guild.id)
+            else:
+                del self.snapshots[guild.id]
+                self.restore_at.pop(guild.id, None)
+                await self._delete(guild.id)
+                # 期限前に解除した場合は自動解除の予定を取り消す
+                task = self._restore_tasks.pop(guild.id, None)
+                if task is not None and task is not asyncio.current_task():
+                    task.cancel()
+
+            logger.info(
+                f"Restored {progress.done - progress.failed}/{progress.total} channels "
+                f"in guild {guild.id} in {progress.elapsed:.2f}s"
+            )
+            return progress
+
+
+def get_request_budget(bot) -> RateBudget:
+    """ボットに紐づいた共有 RateBudget を取得する（ロックダウンや一括処理で共有する）"""
+    budget = getattr(bot, 'request_budget', None)
+    if budget is None:
+        budget = RateBudget()
+        bot.request_budget = budget
+    return budget
+
+
+def get_lockdown_manager(bot) -> LockdownManager:
+    """ボットに紐づいた共有 LockdownManager を取得する（なければ作成する）"""
+    manager = getattr(bot, 'lockdown_manager', None)
+    if manager is None:
+        manager = LockdownManager(bot, budget=get_request_budget(bot))
+        bot.lockdown_manager = manager
+    return manager
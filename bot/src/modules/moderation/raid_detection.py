@@ -2,30 +2,46 @@ from typing import Dict, List, Set, Optional, Tuple
 import discord
 from discord.ext import commands
 import asyncio
-from collections import defaultdict, deque
+from collections import defaultdict
 from datetime import datetime, timedelta
 import logging
 import re
-from database.database_connection import get_db
-from database.database_operations import DatabaseOperations
 from config import RAID_PROTECTION
+from modules.moderation.join_rate import get_join_rate_monitor
+from modules.moderation.lockdown import get_lockdown_manager
+from modules.moderation.join_cohort import JoinCohortAnalyzer
+from modules.logging.log_delivery import PRIORITY_HIGH, get_log_dispatcher
 
 logger = logging.getLogger('moderation.raid_detection')
 
+# アクションの重さ（複数の検出が重なった場合は最も重いアクションを実行する）
+ACTION_SEVERITY = {"": 0, "kick": 1, "lockdown": 2, "ban": 3}
+
 class RaidDetector:
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # 参加履歴を保持する辞書
-        # {guild_id: deque([join_timestamps])}
-        self.join_history: Dict[int, deque] = defaultdict(lambda: deque(maxlen=50))
+        # ギルドごとの参加レート（RaidProtection と共有）
+        self.join_rate = get_join_rate_monitor(bot)
+        # ロックダウンの実行と復元（RaidProtection と共有）
+        self.lockdown = get_lockdown_manager(bot)
         # 新規アカウントの追跡
         # {guild_id: {user_id: join_timestamp}}
         self.new_accounts: Dict[int, Dict[int, datetime]] = defaultdict(dict)
         # 同一IPからの参加を検出するための辞書
         # {guild_id: {ip_hash: set(user_ids)}}
         self.ip_tracking: Dict[int, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
-        # 不審なパターン
-        self.suspicious_patterns = [re.compile(pattern) for pattern in RAID_PROTECTION['suspicious_patterns']]
+        # 不審なパターン（1つの正規表現にまとめて1回の検索で判定する）
+        self.suspicious_pattern = re.compile(
+            '|'.join(f'(?:{pattern})' for pattern in RAID_PROTECTION['suspicious_patterns'])
+        ) if RAID_PROTECTION['suspicious_patterns'] else None
+        # 名前・アバター・作成日時が類似したアカウント群の検出
+        self.cohort_analyzer = JoinCohortAnalyzer(
+            window_seconds=RAID_PROTECTION['cohort_window_seconds'],
+            capacity=RAID_PROTECTION['cohort_max_size'],
+            creation_window=RAID_PROTECTION['cohort_creation_window'],
+            threshold=RAID_PROTECTION['cohort_similarity_threshold'],
+            min_cluster_size=RAID_PROTECTION['cohort_min_cluster_size']
+        )
 
     async def check_member_join(self, member: discord.Member) -> Tuple[bool, str, str]:
         """
@@ -40,33 +56,30 @@ class RaidDetector:
             return False, "", ""
 
         # ギルド設定を取得
-        async for session in get_db():
-            db = DatabaseOperations(session)
-            guild_data = await db.get_guild(member.guild.id)
-            if not guild_data or not guild_data.raid_protection:
-                return False, "", ""
+        if not await self._raid_protection_enabled(member.guild.id):
+            return False, "", ""
+
+        # 参加レートや類似アカウントの記録のため、全てのチェックを実行する
+        detections = [
+            # アカウント作成日時チェック
+            ("new_account", "kick", await self._check_account_age(member)),
+            # 短時間での大量参加チェック
+            ("mass_join", "lockdown", await self._check_join_rate(member)),
+            # 類似アカウント群チェック
+            ("similar_accounts", "kick", await self._check_join_cohort(member)),
+            # 不審なパターンチェック
+            ("suspicious_pattern", "ban", await self._check_suspicious_patterns(member)),
+        ]
 
         is_raid = False
         detection_type = ""
         action = ""
-
-        # アカウント作成日時チェック
-        if await self._check_account_age(member):
-            is_raid = True
-            detection_type = "new_account"
-            action = "kick"
-
-        # 短時間での大量参加チェック
-        if await self._check_join_rate(member):
-            is_raid = True
-            detection_type = "mass_join"
-            action = "lockdown"
-
-        # 不審なパターンチェック
-        if await self._check_suspicious_patterns(member):
-            is_raid = True
-            detection_type = "suspicious_pattern"
-            action = "ban"
+        for detected_type, detected_action, detected in detections:
+            # 重いアクションを軽いアクションで上書きしない
+            if detected and ACTION_SEVERITY[detected_action] > ACTION_SEVERITY[action]:
+                is_raid = True
+                detection_type = detected_type
+                action = detected_action
 
         # レイドを検出した場合、データベースに記録
         if is_raid:
@@ -74,6 +87,17 @@ class RaidDetector:
 
         return is_raid, detection_type, action
 
+    async def _raid_protection_enabled(self, guild_id: int) -> bool:
+        """ギルドでレイド保護が有効かどうか"""
+        from database.database_connection import get_db
+        from database.database_operations import DatabaseOperations
+
+        async for session in get_db():
+            db = DatabaseOperations(session)
+            guild_data = await db.get_guild(guild_id)
+            return bool(guild_data and guild_data.raid_protection)
+        return False
+
     async def _check_account_age(self, member: discord.Member) -> bool:
         """アカウントの作成日時をチェック"""
         account_age = datetime.utcnow() - member.created_at
@@ -84,19 +108,12 @@ class RaidDetector:
 
     async def _check_join_rate(self, member: discord.Member) -> bool:
         """参加レートをチェック"""
-        guild_id = member.guild.id
-        now = datetime.utcnow()
-
-        # 参加履歴を更新
-        self.join_history[guild_id].append(now)
+        counter = self.join_rate.record_join(member.guild.id, member.id)
 
         # 設定された時間内の参加数をカウント
-        recent_joins = [
-            ts for ts in self.join_history[guild_id]
-            if (now - ts).total_seconds() <= RAID_PROTECTION['join_rate_time']
-        ]
+        recent_joins = counter.count(RAID_PROTECTION['join_rate_time'])
 
-        return len(recent_joins) > RAID_PROTECTION['join_rate_limit']
+        return recent_joins > RAID_PROTECTION['join_rate_limit']
 
     async def _check_suspicious_patterns(self, member: discord.Member) -> bool:
         """不審なパターンをチェック"""
@@ -105,25 +122,35 @@ class RaidDetector:
         if member.nick:
             text_to_check += f" {member.nick}"
 
-        return any(pattern.search(text_to_check) for pattern in self.suspicious_patterns)
+        return self.suspicious_pattern is not None and self.suspicious_pattern.search(text_to_check) is not None
+
+    async def _check_join_cohort(self, member: discord.Member) -> bool:
+        """直近の参加者の中に名前・アバター・作成日時が類似したアカウント群があるかをチェック"""
+        match = self.cohort_analyzer.observe_member(member)
+        if match is None:
+            return False
+        logger.warning(
+            f"Similar account cluster in guild {member.guild.id}: "
+            f"{match.size} of {match.window_size} recent joins"
+        )
+        return True
 
     async def _log_raid(self, member: discord.Member, detection_type: str, action: str):
         """レイド検出をデータベースに記録"""
         try:
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=member.guild.id,
-                    action_type="raid_detection",
-                    user_id=member.id,
-                    target_id=member.guild.id,
-                    reason=f"レイド検出: {detection_type}",
-                    details={
-                        "detection_type": detection_type,
-                        "action_taken": action,
-                        "account_age": (datetime.utcnow() - member.created_at).days
-                    }
-                )
+            from database.audit_sink import get_audit_sink
+            get_audit_sink(self.bot).record(
+                guild_id=member.guild.id,
+                action_type="raid_detection",
+                user_id=member.id,
+                target_id=member.guild.id,
+                reason=f"レイド検出: {detection_type}",
+                details={
+                    "detection_type": detection_type,
+                    "action_taken": action,
+                    "account_age": (datetime.utcnow() - member.created_at).days
+                }
+            )
         except Exception as e:
             logger.error(f"Failed to log raid: {e}")
 
@@ -141,23 +168,24 @@ class RaidDetector:
                     delete_message_days=1
                 )
                 
-            elif action == "lockdown":
+            elif action == "lockdown" and RAID_PROTECTION['lockdown_channels']:
                 # サーバーをロックダウン
+                from database.database_connection import get_db
+                from database.database_operations import DatabaseOperations
+
                 guild_data = None
                 async for session in get_db():
                     db = DatabaseOperations(session)
                     guild_data = await db.get_guild(member.guild.id)
 
                 if guild_data:
-                    # 全チャンネルの権限を変更
-                    for channel in member.guild.channels:
-                        if isinstance(channel, (discord.TextChannel, discord.VoiceChannel)):
-                            await channel.set_permissions(
-                                member.guild.default_role,
-                                send_messages=False,
-                                speak=False,
-                                reason="レイド対策: サーバーロックダウン"
-                            )
+                    # 全チャンネルの権限を並行して変更（既存の権限はスナップショットに保存）
+                    # レイドモードの継続時間が過ぎたら LockdownManager が自動で解除する
+                    progress = await self.lockdown.lock(
+                        member.guild,
+                        reason="レイド対策: サーバーロックダウン",
+                        restore_after=RAID_PROTECTION['raid_mode_duration'] * 60
+                    )
 
                     # ログチャンネルに通知
                     if guild_data.log_channel_id:
@@ -173,7 +201,12 @@ class RaidDetector:
                                 value=detection_type,
                                 inline=False
                             )
-                            await log_channel.send(embed=embed)
+                            embed.add_field(
+                                name="ロックしたチャンネル",
+                                value=f"{progress.done - progress.failed}/{progress.total} ({progress.elapsed:.1f}秒)",
+                                inline=False
+                            )
+                            get_log_dispatcher(self.bot).enqueue(log_channel, embed, priority=PRIORITY_HIGH)
 
         except Exception as e:
             logger.error(f"Failed to take action against raid: {e}")
@@ -184,18 +217,9 @@ class RaidDetector:
         """
         now = datetime.utcnow()
         
-        # 参加履歴のクリーンアップ
-        for guild_id in list(self.join_history.keys()):
-            # 24時間以上前の参加履歴を削除
-            self.join_history[guild_id] = deque(
-                [ts for ts in self.join_history[guild_id]
-                 if (now - ts).total_seconds() <= 86400],
-                maxlen=50
-            )
-            
-            # 履歴が空の場合、ギルドのエントリを削除
-            if not self.join_history[guild_id]:
-                del self.join_history[guild_id]
+        # 参加のないギルドの参加レートカウンターと類似アカウント検出の窓を削除
+        self.join_rate.cleanup()
+        self.cohort_analyzer.cleanup()
 
         # 新規アカウント追跡のクリーンアップ
         for guild_id in list(self.new_accounts.keys()):
@@ -3,12 +3,21 @@ from discord.ext import commands
 import asyncio
 import logging
 import time
-from collections import deque
 import aiohttp
 from typing import Dict, List, Set, Any, Optional, Tuple
 
+from config import RAID_PROTECTION
+from .join_rate import get_join_rate_monitor
+from .lockdown import get_lockdown_manager
+from .cohort import CohortEnforcer
+from .temp_bans import TempBanScheduler
+from ..logging.log_delivery import PRIORITY_HIGH, get_log_dispatcher
+
 logger = logging.getLogger('ShardBot.RaidProtection')
 
+# 一時BANの期間（秒）
+TEMP_BAN_DURATION = 7 * 24 * 60 * 60
+
 class RaidProtection:
     """レイド保護機能を提供するクラス"""
     
@@ -17,8 +26,20 @@ class RaidProtection:
         self.settings_cache = {}  # guild_id: settings
         self.cache_expire = {}    # guild_id: timestamp
         
-        # 参加履歴を保持
-        self.join_history = {}  # {guild_id: deque(member, timestamp)}
+        # ギルドごとの参加レート（RaidDetector と共有）
+        self.join_rate = get_join_rate_monitor(bot)
+        
+        # ロックダウンの実行と復元（RaidDetector と共有）
+        self.lockdown = get_lockdown_manager(bot)
+        # 再起動前から続いているロックダウンを読み込み、自動解除を再開する
+        self.bot.loop.create_task(self.lockdown.start())
+        
+        # レイド参加者へのアクションをコホート単位でまとめて実行する
+        self.cohort = CohortEnforcer(bot, on_tempban=self._on_tempban)
+        
+        # 一時BANの期限管理（再起動後もデータベースから復元する）
+        self.temp_bans = TempBanScheduler(bot, on_unban=self._notify_unbanned)
+        self.bot.loop.create_task(self.temp_bans.start())
         
         # アクティブなレイド検出
         self.active_raids = {}  # {guild_id: {'start_time': timestamp, 'count': int, 'members': set()}}
@@ -59,16 +80,8 @@ class RaidProtection:
             try:
                 current_time = time.time()
                 
-                # 古い参加履歴をクリーンアップ
-                for guild_id in list(self.join_history.keys()):
-                    # 1時間以上古い参加履歴をクリア
-                    cutoff_time = current_time - 3600
-                    while self.join_history[guild_id] and self.join_history[guild_id][0][1] < cutoff_time:
-                        self.join_history[guild_id].popleft()
-                    
-                    # 空になった場合は削除
-                    if not self.join_history[guild_id]:
-                        del self.join_history[guild_id]
+                # 参加のないギルドの参加レートカウンターを削除
+                self.join_rate.cleanup(current_time)
                 
                 # 古いレイド検出状態をクリーンアップ
                 for guild_id in list(self.active_raids.keys()):
@@ -78,6 +91,7 @@ class RaidProtection:
                         # サーバーにレイド終了を通知
                         guild = self.bot.get_guild(int(guild_id))
                         if guild:
+                            await self._restore_lockdown(guild)
                             try:
                                 settings = await self.get_guild_settings(guild_id)
                                 log_channel_id = settings.get("logChannelId")
@@ -127,7 +141,8 @@ class RaidProtection:
             "timeThreshold": 60,  # 60秒以内
             "actionType": "tempban",  # verify, kick, tempban, ban
             "logChannelId": None,
-            "notifyRoleId": None
+            "notifyRoleId": None,
+            "lockdownChannels": False
         }
     
     async def process_member_join(self, member: discord.Member) -> Tuple[bool, int]:
@@ -151,19 +166,11 @@ class RaidProtection:
         # 現在の時刻
         current_time = time.time()
         
-        # 参加履歴に追加
-        if guild_id not in self.join_history:
-            self.join_history[guild_id] = deque()
-        
-        self.join_history[guild_id].append((member, current_time))
-        
-        # 古い参加履歴を削除
-        cutoff_time = current_time - time_threshold
-        while self.join_history[guild_id] and self.join_history[guild_id][0][1] < cutoff_time:
-            self.join_history[guild_id].popleft()
+        # 参加レートに記録
+        counter = self.join_rate.record_join(guild_id, member.id, current_time)
         
         # 閾値内の参加者数をカウント
-        recent_joins = len(self.join_history[guild_id])
+        recent_joins = counter.count(time_threshold)
         
         # アクティブなレイドがあるか確認
         is_raid_active = guild_id in self.active_raids
@@ -175,11 +182,17 @@ class RaidProtection:
                 self.active_raids[guild_id] = {
                     'start_time': current_time,
                     'count': recent_joins,
-                    'members': {m.id for m, _ in self.join_history[guild_id]}
+                    'members': counter.recent_members(time_threshold)
                 }
                 
                 # レイド検出の通知
                 await self._notify_raid_detected(member.guild, recent_joins)
+                
+                # ギルドの設定で有効な場合だけチャンネルをロックダウン（レイドモードの継続時間後に自動で解除される）
+                if settings.get("lockdownChannels", False):
+                    self.lockdown.start_lock(
+                        member.guild, restore_after=RAID_PROTECTION['raid_mode_duration'] * 60
+                    )
             else:
                 # 既存のレイド状態を更新
                 self.active_raids[guild_id]['count'] += 1
@@ -215,13 +228,14 @@ class RaidProtection:
                         if role:
                             message = f"{role.mention}\n{message}"
                     
-                    await log_channel.send(message)
+                    # 通常のログより先に送信する
+                    get_log_dispatcher(self.bot).enqueue(log_channel, content=message, priority=PRIORITY_HIGH)
                     logger.warning(f"Raid detected in guild {guild.name} (ID: {guild.id}): {join_count} joins")
             except Exception as e:
                 logger.error(f"Error sending raid notification: {e}")
     
     async def take_action(self, member: discord.Member) -> None:
-        """レイド参加者と思われるメンバーに対してアクションを実行する"""
+        """レイド参加者と思われるメンバーをコホートに追加する（まとめてアクションを実行する）"""
         if not member.guild:
             return
         
@@ -230,75 +244,40 @@ class RaidProtection:
         action_type = settings.get("actionType", "tempban")
         
         try:
-            if action_type == "verify":
-                # 認証ロールを剥奪（実装はサーバー固有の認証システムに依存）
-                # 実装例: 認証前ロールを付与して、通常チャンネルへのアクセスを制限
-                verify_role_id = settings.get("verifyRoleId")
-                if verify_role_id:
-                    verify_role = member.guild.get_role(int(verify_role_id))
-                    if verify_role:
-                        await member.add_roles(verify_role, reason="レイド保護: 自動認証要求")
-                        logger.info(f"Applied verification role to {member} (ID: {member.id}) due to raid protection")
-            
-            elif action_type == "kick":
-                # キック
-                await member.kick(reason="レイド保護: 自動キック")
-                logger.info(f"Kicked {member} (ID: {member.id}) due to raid protection")
-            
-            elif action_type == "tempban":
-                # 一時的なBAN（7日間）
-                await member.ban(reason="レイド保護: 自動一時BAN", delete_message_days=1)
-                # 7日後にアンバンするためのタスクをスケジュール（実際の実装では永続化が必要）
-                self.bot.loop.create_task(self._schedule_unban(member.guild.id, member.id, 7 * 24 * 60 * 60))
-                logger.info(f"Temporarily banned {member} (ID: {member.id}) due to raid protection")
-            
-            elif action_type == "ban":
-                # 永久BAN
-                await member.ban(reason="レイド保護: 自動BAN", delete_message_days=1)
-                logger.info(f"Banned {member} (ID: {member.id}) due to raid protection")
-            
-            # ログチャンネルに通知
-            log_channel_id = settings.get("logChannelId")
-            if log_channel_id:
-                log_channel = member.guild.get_channel(int(log_channel_id))
-                if log_channel:
-                    action_text = {
-                        "verify": "認証要求",
-                        "kick": "キック",
-                        "tempban": "一時BAN",
-                        "ban": "BAN"
-                    }.get(action_type, action_type)
-                    
-                    await log_channel.send(f"🛡️ レイド保護: {member.mention} ({member}) に対して {action_text} を適用しました。")
+            await self.cohort.submit(member, action_type, settings)
         except Exception as e:
-            logger.error(f"Failed to apply {action_type} action: {e}")
+            logger.error(f"Failed to queue {action_type} action: {e}")
+    
+    async def _on_tempban(self, guild: discord.Guild, user_ids: List[int]) -> None:
+        """一時BANしたユーザーを7日後に解除するよう登録する（データベースに保存する）"""
+        await self.temp_bans.add(guild.id, user_ids, TEMP_BAN_DURATION, reason="レイド保護: 自動一時BAN")
+    
+    async def _notify_unbanned(self, guild: Optional[discord.Guild], user_ids: List[int]) -> None:
+        """一時BANの期限切れによる解除をログチャンネルに通知する"""
+        if guild is None:
+            return
+        logger.info(f"Unbanned {len(user_ids)} users from guild {guild.name} (ID: {guild.id}) after temporary ban")
+        settings = await self.get_guild_settings(str(guild.id))
+        log_channel_id = settings.get("logChannelId")
+        if log_channel_id:
+            log_channel = guild.get_channel(int(log_channel_id))
+            if log_channel:
+                if len(user_ids) == 1:
+                    message = f"🛡️ レイド保護: ユーザーID {user_ids[0]} の一時BANが期限切れになりました。BANを解除しました。"
+                else:
+                    message = f"🛡️ レイド保護: {len(user_ids)}人の一時BANが期限切れになりました。BANを解除しました。"
+                await log_channel.send(message)
     
-    async def _schedule_unban(self, guild_id: int, user_id: int, delay: int):
-        """指定した時間後にユーザーのBANを解除する"""
-        await asyncio.sleep(delay)
+    async def _restore_lockdown(self, guild: discord.Guild) -> None:
+        """ロックダウン中であればチャンネルの権限をロックダウン前の状態に戻す"""
+        if not self.lockdown.is_locked(guild.id):
+            return
         try:
-            guild = self.bot.get_guild(guild_id)
-            if guild:
-                # BANリストからユーザーを取得
-                ban_entry = None
-                async for entry in guild.bans():
-                    if entry.user.id == user_id:
-                        ban_entry = entry
-                        break
-                
-                if ban_entry:
-                    await guild.unban(ban_entry.user, reason="レイド保護: 一時BANの期限切れ")
-                    logger.info(f"Unbanned user ID {user_id} from guild {guild.name} (ID: {guild.id}) after temporary ban")
-                    
-                    # ログチャンネルに通知
-                    settings = await self.get_guild_settings(str(guild_id))
-                    log_channel_id = settings.get("logChannelId")
-                    if log_channel_id:
-                        log_channel = guild.get_channel(int(log_channel_id))
-                        if log_channel:
-                            await log_channel.send(f"🛡️ レイド保護: ユーザーID {user_id} の一時BANが期限切れになりました。BANを解除しました。")
+            progress = await self.lockdown.restore(guild)
+            if progress and progress.failed:
+                logger.warning(f"Failed to restore {progress.failed} channels in guild {guild.id}")
         except Exception as e:
-            logger.error(f"Failed to unban user {user_id}: {e}")
+            logger.error(f"Error restoring lockdown: {e}")
     
     def is_raid_active(self, guild_id: str) -> bool:
         """指定したギルドでレイドが検出されているかを返す"""
@@ -311,6 +290,7 @@ class RaidProtection:
         
         raid_info = self.active_raids[guild_id].copy()
         raid_info['duration'] = time.time() - raid_info['start_time']
+        raid_info['enforcement'] = self.cohort.get_progress(guild_id)
         return raid_info
     
     async def end_raid_mode(self, guild_id: str) -> bool:
@@ -325,6 +305,7 @@ class RaidProtection:
         try:
             guild = self.bot.get_guild(int(guild_id))
             if guild:
+                await self._restore_lockdown(guild)
                 settings = await self.get_guild_settings(guild_id)
                 log_channel_id = settings.get("logChannelId")
                 if log_channel_id:
@@ -0,0 +1,226 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from ..record_store import database_operations, to_datetime, to_timestamp
+
+logger = logging.getLogger('ShardBot.TempBans')
+
+# 解除に失敗した記録を再試行するまでの時間（秒）
+RETRY_DELAY = 300
+
+# 解除したユーザーを通知するコールバック: (guild, user_ids)
+UnbanCallback = Callable[[discord.Guild, List[int]], Optional[Awaitable[None]]]
+
+
+class TempBanStore:
+    """期限付きBANの記録をデータベース（temp_bans テーブル）に保存するクラス"""
+
+    async def add(self, guild_id: int, user_ids: List[int], expires_at: float,
+                  reason: Optional[str] = None) -> None:
+        async for db in database_operations():
+            await db.add_temp_bans(guild_id, user_ids, to_datetime(expires_at), reason)
+
+    async def load(self) -> List[Tuple[float, int, int]]:
+        """(expires_at, guild_id, user_id) のリストを期限の早い順に返す"""
+        records = []
+        async for db in database_operations():
+            for temp_ban in await db.get_temp_bans():
+                records.append((to_timestamp(temp_ban.expires_at), temp_ban.guild_id, temp_ban.user_id))
+        return records
+
+    async def delete(self, keys: List[Tuple[int, int]]) -> None:
+        async for db in database_operations():
+            await db.delete_temp_bans(keys)
+
+
+class TempBanScheduler:
+    """期限付きBANを期限順のヒープで管理し、期限が来たらBANを解除するクラス
+
+    記録はデータベースに保存され、起動時にヒープへ読み込まれます。停止中に期限を
+    過ぎた記録は起動直後にまとめて解除されます。BANの解除はBANリストを参照せず
+    ユーザーIDで直接行い、期限が来た記録は同時実行数を制限したバッチで処理します。
+    """
+
+    def __init__(self, bot, store: Optional[TempBanStore] = None, concurrency: int = 5,
+                 batch_size: int = 100, on_unban: Optional[UnbanCallback] = None):
+        self.bot = bot
+        self.store = store or TempBanStore()
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.on_unban = on_unban
+        # (expires_at, guild_id, user_id) の最小ヒープ
+        self._heap: List[Tuple[float, int, int]] = []
+        # {(guild_id, user_id): expires_at}  ヒープ内の古い要素を無視するための現在の期限
+        self._entries: Dict[Tuple[int, int], float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"unbanned": 0, "failed": 0, "deferred": 0, "caught_up": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def next_expiry(self) -> Optional[float]:
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def _push(self, expires_at: float, guild_id: int, user_id: int) -> None:
+        self._entries[(guild_id, user_id)] = expires_at
+        heapq.heappush(self._heap, (expires_at, guild_id, user_id))
+        if self._heap[0][0] == expires_at:
+            self._wakeup.set()
+
+    def _discard_stale(self) -> None:
+        """取り消し・再登録された古いヒープ要素を先頭から取り除く"""
+        heap = self._heap
+        while heap and self._entries.get((heap[0][1], heap[0][2])) != heap[0][0]:
+            heapq.heappop(heap)
+
+    async def start(self) -> None:
+        """データベースから記録を読み込み、解除ループを開始する"""
+        await self.bot.wait_until_ready()
+        try:
+            records = await self.store.load()
+        except Exception as e:
+            logger.error(f"Failed to load temp bans: {e}")
+            records = []
+
+        now = time.time()
+        # 読み込み中に add() された記録はそのまま残す
+        for expires_at, guild_id, user_id in records:
+            self._entries.setdefault((guild_id, user_id), expires_at)
+        self._heap = [(expires_at, guild_id, user_id) for (guild_id, user_id), expires_at in self._entries.items()]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+        overdue = sum(1 for expires_at, _, _ in records if expires_at <= now)
+        if records:
+            logger.info(f"Loaded {len(records)} temp bans ({overdue} overdue)")
+        self.stats["caught_up"] += overdue
+
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def add(self, guild_id: int, user_ids: Iterable[int], duration: float,
+                  reason: Optional[str] = None) -> None:
+        """ユーザーを duration 秒後に解除する期限付きBANとして登録する"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        expires_at = time.time() + duration
+        try:
+            await self.store.add(guild_id, user_ids, expires_at, reason)
+        except Exception as e:
+            # 保存に失敗しても、プロセスが動いている間は解除できるようにヒープには登録する
+            logger.error(f"Failed to persist temp bans for guild {guild_id}: {e}")
+        for user_id in user_ids:
+            self._push(expires_at, guild_id, user_id)
+
+    async def cancel(self, guild_id: int, user_id: int) -> bool:
+        """期限付きBANの記録を取り消す（手動で解除した場合など）"""
+        if self._entries.pop((guild_id, user_id), None) is None:
+            return False
+        try:
+            await self.store.delete([(guild_id, user_id)])
+        except Exception as e:
+            logger.error(f"Failed to delete temp ban {guild_id}/{user_id}: {e}")
+        return True
+
+    def _pop_due(self, now: float) -> List[Tuple[int, int]]:
+        """期限が来た記録を最大 batch_size 件取り出す"""
+        due = []
+        while len(due) < self.batch_size:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            _, guild_id, user_id = heapq.heappop(self._heap)
+            del self._entries[(guild_id, user_id)]
+            due.append((guild_id, user_id))
+        return due
+
+    async def _run(self) -> None:
+        while not self.bot.is_closed():
+            self._wakeup.clear()
+            next_expiry = self.next_expiry()
+            now = time.time()
+
+            if next_expiry is None or next_expiry > now:
+                timeout = None if next_expiry is None else next_expiry - now
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(now)
+            if due:
+                try:
+                    await self.process_due(due)
+                except Exception as e:
+                    logger.error(f"Error processing expired temp bans: {e}")
+
+    async def process_due(self, due: List[Tuple[int, int]]) -> None:
+        """期限が来た記録をまとめて解除し、成功した記録を一括で削除する"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        done: List[Tuple[int, int]] = []
+        retry: List[Tuple[int, int]] = []
+        deferred: List[Tuple[int, int]] = []
+        unbanned: Dict[int, List[int]] = {}
+
+        async def _unban(guild_id: int, user_id: int) -> None:
+            guild = self.bot.get_guild(guild_id)
+            if guild is None and self.bot.is_ready():
+                # サーバーから退出している場合は記録だけ削除する
+                done.append((guild_id, user_id))
+                return
+            if guild is None or guild.unavailable:
+                # 障害中・再接続直後で読み込まれていないギルドは後で再試行する
+                deferred.append((guild_id, user_id))
+                return
+            async with semaphore:
+                try:
+                    await guild.unban(discord.Object(id=user_id), reason="レイド保護: 一時BANの期限切れ")
+                except discord.NotFound:
+                    # 既に解除されている
+                    done.append((guild_id, user_id))
+                except Exception as e:
+                    logger.error(f"Failed to unban user {user_id} in guild {guild_id}: {e}")
+                    retry.append((guild_id, user_id))
+                else:
+                    done.append((guild_id, user_id))
+                    unbanned.setdefault(guild_id, []).append(user_id)
+
+        await asyncio.gather(*(_unban(guild_id, user_id) for guild_id, user_id in due))
+
+        if done:
+            try:
+                await self.store.delete(done)
+            except Exception as e:
+                logger.error(f"Failed to delete expired temp bans: {e}")
+
+        retry_at = time.time() + RETRY_DELAY
+        for guild_id, user_id in retry + deferred:
+            self._push(retry_at, guild_id, user_id)
+
+        self.stats["unbanned"] += sum(len(user_ids) for user_ids in unbanned.values())
+        self.stats["failed"] += len(retry)
+        self.stats["deferred"] += len(deferred)
+
+        if self.on_unban:
+            for guild_id, user_ids in unbanned.items():
+                guild = self.bot.get_guild(guild_id)
+                try:
+                    result = self.on_unban(guild, user_ids)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"Error in unban callback: {e}")
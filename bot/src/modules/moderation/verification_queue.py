@@ -0,0 +1,155 @@
+import heapq
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..record_store import database_operations, to_datetime, to_timestamp
+
+logger = logging.getLogger('ShardBot.VerificationQueue')
+
+
+class PendingVerificationStore:
+    """キャプチャ認証の待ち状態をデータベース（pending_verifications テーブル）に保存するクラス"""
+
+    async def save(self, guild_id: int, user_id: int, code: str, expires_at: float,
+                   attempts: int = 0) -> None:
+        async for db in database_operations():
+            await db.save_pending_verification(guild_id, user_id, code, to_datetime(expires_at), attempts)
+
+    async def update_attempts(self, guild_id: int, user_id: int, attempts: int) -> None:
+        async for db in database_operations():
+            await db.update_pending_verification_attempts(guild_id, user_id, attempts)
+
+    async def load(self) -> List[Tuple[int, int, str, float, int]]:
+        """(guild_id, user_id, code, expires_at, attempts) のリストを期限の早い順に返す"""
+        records = []
+        async for db in database_operations():
+            for pending in await db.get_pending_verifications():
+                records.append((
+                    pending.guild_id, pending.user_id, pending.code,
+                    to_timestamp(pending.expires_at), pending.attempts or 0
+                ))
+        return records
+
+    async def delete(self, keys: List[Tuple[int, int]]) -> None:
+        async for db in database_operations():
+            await db.delete_pending_verifications(keys)
+
+
+class PendingVerificationQueue:
+    """キャプチャ認証の待ち状態を保持し、期限順の最小ヒープで管理するクラス
+
+    entries は従来の pending_verifications と同じ {guild_id: {user_id: {...}}} 形式
+    （キーは文字列）です。ヒープには (expires, guild_id, user_id) を積み、認証の完了や
+    再登録で古くなった要素は取り出す時に読み飛ばします。変更はデータベースにも保存され、
+    再起動後に load() で復元されます。
+    """
+
+    def __init__(self, store: Optional[PendingVerificationStore] = None):
+        self.store = store or PendingVerificationStore()
+        # {guild_id: {user_id: {"code": "...", "expires": timestamp, "attempts": 0}}}
+        self.entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # (expires, guild_id, user_id) の最小ヒープ
+        self._heap: List[Tuple[float, str, str]] = []
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self.entries.values())
+
+    def get(self, guild_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(guild_id, {}).get(user_id)
+
+    def _put(self, guild_id: str, user_id: str, code: str, expires: float, attempts: int) -> None:
+        self.entries.setdefault(guild_id, {})[user_id] = {
+            "code": code,
+            "expires": expires,
+            "attempts": attempts
+        }
+        heapq.heappush(self._heap, (expires, guild_id, user_id))
+
+    def _discard(self, guild_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        users = self.entries.get(guild_id)
+        if not users:
+            return None
+        verification = users.pop(user_id, None)
+        if not users:
+            del self.entries[guild_id]
+        return verification
+
+    def _is_current(self, expires: float, guild_id: str, user_id: str) -> bool:
+        verification = self.get(guild_id, user_id)
+        return verification is not None and verification["expires"] == expires
+
+    def _discard_stale(self) -> None:
+        """完了・再登録された古いヒープ要素を先頭から取り除く"""
+        heap = self._heap
+        while heap and not self._is_current(*heap[0]):
+            heapq.heappop(heap)
+
+    def next_expiry(self) -> Optional[float]:
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    async def load(self) -> int:
+        """データベースから待ち状態を復元し、復元した件数を返す"""
+        try:
+            records = await self.store.load()
+        except Exception as e:
+            logger.error(f"Failed to load pending verifications: {e}")
+            return 0
+
+        for guild_id, user_id, code, expires, attempts in records:
+            self._put(str(guild_id), str(user_id), code, expires, attempts)
+        if records:
+            logger.info(f"Restored {len(records)} pending captcha verifications")
+        return len(records)
+
+    async def add(self, guild_id: str, user_id: str, code: str, expires: float) -> None:
+        """認証待ちを登録する（既に登録されている場合は置き換える）"""
+        self._put(guild_id, user_id, code, expires, 0)
+        try:
+            await self.store.save(int(guild_id), int(user_id), code, expires)
+        except Exception as e:
+            # 保存に失敗しても、プロセスが動いている間は認証できるようにする
+            logger.error(f"Failed to persist pending verification {guild_id}/{user_id}: {e}")
+
+    async def record_attempt(self, guild_id: str, user_id: str) -> int:
+        """試行回数を1増やし、増やした後の回数を返す"""
+        verification = self.get(guild_id, user_id)
+        if verification is None:
+            return 0
+        verification["attempts"] += 1
+        try:
+            await self.store.update_attempts(int(guild_id), int(user_id), verification["attempts"])
+        except Exception as e:
+            logger.error(f"Failed to update verification attempts {guild_id}/{user_id}: {e}")
+        return verification["attempts"]
+
+    async def remove(self, guild_id: str, user_id: str) -> bool:
+        """認証待ちを取り除く（認証の成功・失敗時）"""
+        if self._discard(guild_id, user_id) is None:
+            return False
+        await self.delete([(guild_id, user_id)])
+        return True
+
+    async def delete(self, keys: List[Tuple[str, str]]) -> None:
+        """データベースから待ち状態をまとめて削除する（再登録されたものは残す）"""
+        keys = [(guild_id, user_id) for guild_id, user_id in keys if self.get(guild_id, user_id) is None]
+        if not keys:
+            return
+        try:
+            await self.store.delete([(int(guild_id), int(user_id)) for guild_id, user_id in keys])
+        except Exception as e:
+            logger.error(f"Failed to delete pending verifications: {e}")
+
+    def pop_expired(self, now: Optional[float] = None, limit: int = 100) -> List[Tuple[str, str]]:
+        """期限切れの認証待ちを最大 limit 件取り出す（データベースからの削除は呼び出し側で行う）"""
+        now = now if now is not None else time.time()
+        expired = []
+        while len(expired) < limit:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            _, guild_id, user_id = heapq.heappop(self._heap)
+            self._discard(guild_id, user_id)
+            expired.append((guild_id, user_id))
+        return expired
@@ -0,0 +1,37 @@
+"""
+期限付きの記録（期限付きBAN・キャプチャ認証の待ち状態・タイマー）を保存するストアの共通処理
+
+メモリ上では期限をエポック秒で扱い、データベースには naive UTC の datetime で保存します。
+database パッケージは接続の設定を読み込むため、使う時に読み込みます。
+"""
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Optional
+
+
+def to_timestamp(value: Optional[datetime]) -> float:
+    """naive UTC の datetime をエポック秒に変換する（期限がない場合は現在時刻）"""
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def to_datetime(timestamp: float) -> datetime:
+    """エポック秒を naive UTC の datetime に変換する（データベースの形式に合わせる）"""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+
+async def database_operations() -> AsyncIterator[Any]:
+    """
+    セッションごとの DatabaseOperations を返します（get_db と同じく async for で使います）。
+
+        async for db in database_operations():
+            await db.add_temp_bans(guild_id, user_ids, expires_at, reason)
+    """
+    from database.database_connection import get_db
+    from database.database_operations import DatabaseOperations
+
+    async for session in get_db():
+        yield DatabaseOperations(session)
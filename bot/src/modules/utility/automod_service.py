@@ -6,6 +6,7 @@ import re
 from datetime import datetime, timedelta
 from database.database_connection import get_db
 from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
 
 logger = logging.getLogger('utility.automod')
 
@@ -48,7 +49,7 @@ class AutoModService:
                 await db.update_automod_settings(guild_id, settings)
 
                 # 監査ログに記録
-                await db.create_audit_log(
+                get_audit_sink(self.bot).record(
                     guild_id=guild_id,
                     action_type="update_automod",
                     user_id=moderator.id if moderator else self.bot.user.id,
@@ -145,9 +146,8 @@ class AutoModService:
                     reason=f"自動モデレーション: {violation_type}"
                 )
 
-                # 警告回数を取得
-                warnings = await db.get_warnings(message.author.id, message.guild.id)
-                warning_count = len(warnings)
+                # 警告回数を取得（履歴ではなく件数の1行を読む）
+                warning_count = await db.get_infraction_count(message.author.id, message.guild.id, 'warning')
 
             # 警告回数に応じたアクション
             if warning_count >= settings.get('max_warnings', 5):
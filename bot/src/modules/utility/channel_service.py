@@ -2,8 +2,7 @@ from typing import Dict, List, Optional, Union, Tuple
 import discord
 from discord.ext import commands
 import logging
-from database.database_connection import get_db
-from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
 
 logger = logging.getLogger('utility.channel')
 
@@ -62,23 +61,21 @@ class ChannelService:
             )
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=guild.id,
-                    action_type="channel_create",
-                    user_id=self.bot.user.id,
-                    target_id=channel.id,
-                    reason=reason,
-                    details={
-                        'name': name,
-                        'type': str(channel_type),
-                        'category': category.id if category else None,
-                        'topic': topic,
-                        'nsfw': nsfw,
-                        'position': position
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=guild.id,
+                action_type="channel_create",
+                user_id=self.bot.user.id,
+                target_id=channel.id,
+                reason=reason,
+                details={
+                    'name': name,
+                    'type': str(channel_type),
+                    'category': category.id if category else None,
+                    'topic': topic,
+                    'nsfw': nsfw,
+                    'position': position
+                }
+            )
 
             return channel, "チャンネルを作成しました。"
 
@@ -110,19 +107,17 @@ class ChannelService:
         """
         try:
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=channel.guild.id,
-                    action_type="channel_delete",
-                    user_id=self.bot.user.id,
-                    target_id=channel.id,
-                    reason=reason,
-                    details={
-                        'name': channel.name,
-                        'type': str(channel.type)
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=channel.guild.id,
+                action_type="channel_delete",
+                user_id=self.bot.user.id,
+                target_id=channel.id,
+                reason=reason,
+                details={
+                    'name': channel.name,
+                    'type': str(channel.type)
+                }
+            )
 
             # チャンネルを削除
             await channel.delete(reason=reason)
@@ -198,16 +193,14 @@ class ChannelService:
             )
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=channel.guild.id,
-                    action_type="channel_modify",
-                    user_id=self.bot.user.id,
-                    target_id=channel.id,
-                    reason=reason,
-                    details=changes
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=channel.guild.id,
+                action_type="channel_modify",
+                user_id=self.bot.user.id,
+                target_id=channel.id,
+                reason=reason,
+                details=changes
+            )
 
             return "チャンネルの設定を変更しました。"
 
@@ -252,22 +245,20 @@ class ChannelService:
             )
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=channel.guild.id,
-                    action_type="channel_permissions",
-                    user_id=self.bot.user.id,
-                    target_id=target.id,
-                    reason=reason,
-                    details={
-                        'channel_id': channel.id,
-                        'channel_name': channel.name,
-                        'target_type': 'role' if isinstance(target, discord.Role) else 'member',
-                        'target_name': target.name,
-                        'permissions': overwrite.pair()[0].value if overwrite else None
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=channel.guild.id,
+                action_type="channel_permissions",
+                user_id=self.bot.user.id,
+                target_id=target.id,
+                reason=reason,
+                details={
+                    'channel_id': channel.id,
+                    'channel_name': channel.name,
+                    'target_type': 'role' if isinstance(target, discord.Role) else 'member',
+                    'target_name': target.name,
+                    'permissions': overwrite.pair()[0].value if overwrite else None
+                }
+            )
 
             action = "設定" if overwrite else "削除"
             return f"チャンネルの権限を{action}しました。"
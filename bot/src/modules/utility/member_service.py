@@ -5,6 +5,7 @@ import logging
 from datetime import datetime, timedelta
 from database.database_connection import get_db
 from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
 
 logger = logging.getLogger('utility.member')
 
@@ -44,8 +45,7 @@ class MemberService:
             # データベースから警告履歴を取得
             async for session in get_db():
                 db = DatabaseOperations(session)
-                warnings = await db.get_warnings(member.id, member.guild.id)
-                info['warning_count'] = len(warnings)
+                info['warning_count'] = await db.get_infraction_count(member.id, member.guild.id, 'warning')
 
             return info
 
@@ -67,16 +67,14 @@ class MemberService:
             await member.kick(reason=f"{reason} (実行者: {moderator})" if reason else f"実行者: {moderator}")
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=member.guild.id,
-                    action_type="kick",
-                    user_id=moderator.id if moderator else self.bot.user.id,
-                    target_id=member.id,
-                    reason=reason,
-                    details={}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=member.guild.id,
+                action_type="kick",
+                user_id=moderator.id if moderator else self.bot.user.id,
+                target_id=member.id,
+                reason=reason,
+                details={}
+            )
 
             return "メンバーをキックしました。"
 
@@ -104,16 +102,14 @@ class MemberService:
             )
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=member.guild.id,
-                    action_type="ban",
-                    user_id=moderator.id if moderator else self.bot.user.id,
-                    target_id=member.id,
-                    reason=reason,
-                    details={'delete_message_days': delete_message_days}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=member.guild.id,
+                action_type="ban",
+                user_id=moderator.id if moderator else self.bot.user.id,
+                target_id=member.id,
+                reason=reason,
+                details={'delete_message_days': delete_message_days}
+            )
 
             return "メンバーをBANしました。"
 
@@ -146,16 +142,14 @@ class MemberService:
             )
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=guild.id,
-                    action_type="unban",
-                    user_id=moderator.id if moderator else self.bot.user.id,
-                    target_id=user_id,
-                    reason=reason,
-                    details={}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=guild.id,
+                action_type="unban",
+                user_id=moderator.id if moderator else self.bot.user.id,
+                target_id=user_id,
+                reason=reason,
+                details={}
+            )
 
             return "メンバーのBANを解除しました。"
 
@@ -186,16 +180,14 @@ class MemberService:
             )
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=member.guild.id,
-                    action_type="timeout",
-                    user_id=moderator.id if moderator else self.bot.user.id,
-                    target_id=member.id,
-                    reason=reason,
-                    details={'duration': duration}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=member.guild.id,
+                action_type="timeout",
+                user_id=moderator.id if moderator else self.bot.user.id,
+                target_id=member.id,
+                reason=reason,
+                details={'duration': duration}
+            )
 
             return "メンバーをタイムアウトしました。"
 
@@ -222,16 +214,14 @@ class MemberService:
             )
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=member.guild.id,
-                    action_type="remove_timeout",
-                    user_id=moderator.id if moderator else self.bot.user.id,
-                    target_id=member.id,
-                    reason=reason,
-                    details={}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=member.guild.id,
+                action_type="remove_timeout",
+                user_id=moderator.id if moderator else self.bot.user.id,
+                target_id=member.id,
+                reason=reason,
+                details={}
+            )
 
             return "メンバーのタイムアウトを解除しました。"
 
@@ -261,9 +251,8 @@ class MemberService:
                     reason=reason
                 )
 
-                # 警告回数を取得
-                warnings = await db.get_warnings(member.id, member.guild.id)
-                warning_count = len(warnings)
+                # 警告回数を取得（履歴ではなく件数の1行を読む）
+                warning_count = await db.get_infraction_count(member.id, member.guild.id, 'warning')
 
             return "メンバーに警告を付与しました。", warning_count
 
@@ -311,14 +300,11 @@ class MemberService:
         try:
             async for session in get_db():
                 db = DatabaseOperations(session)
-                # 警告を削除
-                await session.execute(
-                    f"DELETE FROM warnings WHERE user_id = {member.id} AND guild_id = {member.guild.id}"
-                )
-                await session.commit()
+                # 警告と警告の件数を削除
+                await db.clear_warnings(member.id, member.guild.id)
 
                 # 監査ログに記録
-                await db.create_audit_log(
+                get_audit_sink(self.bot).record(
                     guild_id=member.guild.id,
                     action_type="clear_warnings",
                     user_id=moderator.id if moderator else self.bot.user.id,
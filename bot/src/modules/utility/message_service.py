@@ -5,6 +5,7 @@ import logging
 from datetime import datetime, timedelta
 from database.database_connection import get_db
 from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
 
 logger = logging.getLogger('utility.message')
 
@@ -88,21 +89,19 @@ class MessageService:
                     continue
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=channel.guild.id,
-                    action_type="bulk_delete",
-                    user_id=self.bot.user.id,
-                    target_id=channel.id,
-                    reason=reason or "一括削除",
-                    details={
-                        'deleted_count': deleted_count,
-                        'channel_name': channel.name,
-                        'user_filter': str(user) if user else None,
-                        'content_filter': contains
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=channel.guild.id,
+                action_type="bulk_delete",
+                user_id=self.bot.user.id,
+                target_id=channel.id,
+                reason=reason or "一括削除",
+                details={
+                    'deleted_count': deleted_count,
+                    'channel_name': channel.name,
+                    'user_filter': str(user) if user else None,
+                    'content_filter': contains
+                }
+            )
 
             return deleted_count, f"{deleted_count}件のメッセージを削除しました。"
 
@@ -136,19 +135,17 @@ class MessageService:
             await message.pin(reason=reason)
             
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=message.guild.id,
-                    action_type="pin_message",
-                    user_id=self.bot.user.id,
-                    target_id=message.id,
-                    reason=reason or "メッセージをピン留め",
-                    details={
-                        'channel_name': message.channel.name,
-                        'message_content': message.content[:100]
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=message.guild.id,
+                action_type="pin_message",
+                user_id=self.bot.user.id,
+                target_id=message.id,
+                reason=reason or "メッセージをピン留め",
+                details={
+                    'channel_name': message.channel.name,
+                    'message_content': message.content[:100]
+                }
+            )
 
             return "メッセージをピン留めしました。"
 
@@ -182,19 +179,17 @@ class MessageService:
             await message.unpin(reason=reason)
             
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=message.guild.id,
-                    action_type="unpin_message",
-                    user_id=self.bot.user.id,
-                    target_id=message.id,
-                    reason=reason or "ピン留めを解除",
-                    details={
-                        'channel_name': message.channel.name,
-                        'message_content': message.content[:100]
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=message.guild.id,
+                action_type="unpin_message",
+                user_id=self.bot.user.id,
+                target_id=message.id,
+                reason=reason or "ピン留めを解除",
+                details={
+                    'channel_name': message.channel.name,
+                    'message_content': message.content[:100]
+                }
+            )
 
             return "メッセージのピン留めを解除しました。"
 
@@ -261,20 +256,18 @@ class MessageService:
             await destination.send(embed=embed)
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=message.guild.id,
-                    action_type="move_message",
-                    user_id=self.bot.user.id,
-                    target_id=message.id,
-                    reason=reason or "メッセージを移動",
-                    details={
-                        'source_channel': message.channel.name,
-                        'destination_channel': destination.name,
-                        'message_content': message.content[:100]
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=message.guild.id,
+                action_type="move_message",
+                user_id=self.bot.user.id,
+                target_id=message.id,
+                reason=reason or "メッセージを移動",
+                details={
+                    'source_channel': message.channel.name,
+                    'destination_channel': destination.name,
+                    'message_content': message.content[:100]
+                }
+            )
 
             return f"メッセージを {destination.mention} に移動しました。"
 
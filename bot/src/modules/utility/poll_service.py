@@ -1,30 +1,234 @@
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Tuple
 import discord
+from array import array
+from bisect import bisect_left
 from datetime import datetime, timedelta
 import asyncio
+import heapq
+import time
 import logging
-from database.database_connection import get_db
-from database.database_operations import DatabaseOperations
 
 logger = logging.getLogger('utility.poll')
 
+# 投票メッセージを編集する最短の間隔（秒）。この間の投票はまとめて1回の編集で反映する
+EDIT_INTERVAL = 5.0
+
+
+class PollVotes:
+    """
+    投票者ごとの選択をコンパクトに保持するクラス
+
+    投票者のユーザーIDを昇順の整数配列に、選択した選択肢をビットマスク（最大16個）の
+    整数配列に格納します。選択肢ごとの投票数は投票のたびに更新するため、
+    集計に投票者を走査する必要はありません。
+    """
+
+    __slots__ = ('voter_ids', 'choices', 'counts')
+
+    def __init__(self, option_count: int, voter_ids: bytes = b'', choices: bytes = b''):
+        self.voter_ids = array('Q')
+        self.voter_ids.frombytes(voter_ids)
+        self.choices = array('H')
+        self.choices.frombytes(choices)
+        self.counts = [0] * option_count
+        for mask in self.choices:
+            for option in range(option_count):
+                if mask & (1 << option):
+                    self.counts[option] += 1
+
+    def __len__(self) -> int:
+        return len(self.voter_ids)
+
+    def add(self, user_id: int, option: int, exclusive: bool) -> bool:
+        """
+        投票を記録します（exclusive の場合は他の選択肢への投票を取り消します）。
+
+        Returns:
+            bool: 投票の状態が変わったかどうか
+        """
+        bit = 1 << option
+        index = bisect_left(self.voter_ids, user_id)
+        if index < len(self.voter_ids) and self.voter_ids[index] == user_id:
+            old = self.choices[index]
+            new = bit if exclusive else old | bit
+            if new == old:
+                return False
+            self._count(old, -1)
+            self._count(new, 1)
+            self.choices[index] = new
+        else:
+            self.voter_ids.insert(index, user_id)
+            self.choices.insert(index, bit)
+            self.counts[option] += 1
+        return True
+
+    def remove(self, user_id: int, option: int) -> bool:
+        """
+        投票を取り消します。
+
+        Returns:
+            bool: 投票の状態が変わったかどうか
+        """
+        bit = 1 << option
+        index = bisect_left(self.voter_ids, user_id)
+        if index >= len(self.voter_ids) or self.voter_ids[index] != user_id or not self.choices[index] & bit:
+            return False
+        self.counts[option] -= 1
+        remaining = self.choices[index] & ~bit
+        if remaining:
+            self.choices[index] = remaining
+        else:
+            del self.voter_ids[index]
+            del self.choices[index]
+        return True
+
+    def _count(self, mask: int, delta: int) -> None:
+        for option in range(len(self.counts)):
+            if mask & (1 << option):
+                self.counts[option] += delta
+
+    def to_bytes(self) -> Tuple[bytes, bytes]:
+        """(voter_ids, choices) をデータベースに保存する形式で返す"""
+        return self.voter_ids.tobytes(), self.choices.tobytes()
+
+
+class PollState:
+    """進行中の投票"""
+
+    __slots__ = ('message_id', 'guild_id', 'channel_id', 'title', 'options', 'expires_at',
+                 'multiple_choice', 'votes', 'dirty', 'last_edit')
+
+    def __init__(self, message_id: int, guild_id: int, channel_id: int, title: str,
+                 options: Optional[List[str]], expires_at: Optional[datetime],
+                 multiple_choice: bool, votes: Optional[PollVotes] = None):
+        self.message_id = message_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.title = title
+        # None は賛成/反対の投票
+        self.options = options
+        self.expires_at = expires_at
+        self.multiple_choice = multiple_choice
+        self.votes = votes or PollVotes(len(self.labels))
+        # メッセージに反映していない投票があるかどうか
+        self.dirty = False
+        self.last_edit = 0.0
+
+    @property
+    def labels(self) -> List[str]:
+        return self.options or ['yes', 'no']
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and datetime.utcnow() > self.expires_at
+
+
+class PollStore:
+    """進行中の投票をデータベース（polls テーブル）に保存するクラス"""
+
+    async def create(self, poll: PollState) -> None:
+        from database.database_connection import get_db
+        from database.database_operations import DatabaseOperations
+
+        async for session in get_db():
+            db = DatabaseOperations(session)
+            await db.create_poll(
+                poll.message_id, poll.guild_id, poll.channel_id, poll.title,
+                poll.options, poll.multiple_choice, poll.expires_at
+            )
+
+    async def save_votes(self, poll: PollState) -> None:
+        from database.database_connection import get_db
+        from database.database_operations import DatabaseOperations
+
+        voter_ids, choices = poll.votes.to_bytes()
+        async for session in get_db():
+            db = DatabaseOperations(session)
+            await db.update_poll_votes(poll.message_id, voter_ids, choices)
+
+    async def load(self) -> List[PollState]:
+        from database.database_connection import get_db
+        from database.database_operations import DatabaseOperations
+
+        polls = []
+        async for session in get_db():
+            db = DatabaseOperations(session)
+            for row in await db.get_polls():
+                options = row.options or None
+                votes = PollVotes(len(options or ['yes', 'no']), row.voter_ids or b'', row.choices or b'')
+                polls.append(PollState(
+                    row.message_id, row.guild_id, row.channel_id, row.title,
+                    options, row.expires_at, bool(row.multiple_choice), votes
+                ))
+        return polls
+
+    async def delete(self, message_id: int) -> None:
+        from database.database_connection import get_db
+        from database.database_operations import DatabaseOperations
+
+        async for session in get_db():
+            db = DatabaseOperations(session)
+            await db.delete_poll(message_id)
+
+
 class PollService:
-    def __init__(self, bot: discord.Client):
+    def __init__(self, bot: discord.Client, store: Optional[PollStore] = None,
+                 edit_interval: float = EDIT_INTERVAL):
         self.bot = bot
-        # アクティブな投票を保持する辞書
-        # {message_id: {
-        #     'title': str,
-        #     'options': List[str],
-        #     'votes': Dict[str, Set[int]],  # option: {user_ids}
-        #     'expires_at': datetime,
-        #     'multiple_choice': bool
-        # }}
-        self.active_polls: Dict[int, Dict] = {}
+        self.store = store or PollStore()
+        self.edit_interval = edit_interval
+        # アクティブな投票を保持する辞書 {message_id: PollState}
+        self.active_polls: Dict[int, PollState] = {}
         # デフォルトの絵文字リスト
         self.default_emojis = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
         # 投票用の特殊絵文字
         self.yes_emoji = "✅"
         self.no_emoji = "❌"
+        # (expires_at, message_id) の最小ヒープ（全ての投票の終了を1つのタスクで待つ）
+        self._deadlines: List[Tuple[datetime, int]] = []
+        self._wakeup = asyncio.Event()
+        self._expiry_task: Optional[asyncio.Task] = None
+        # {message_id: 投票メッセージの編集を待っているタスク}
+        self._flush_tasks: Dict[int, asyncio.Task] = {}
+
+    async def start(self):
+        """データベースから進行中の投票を読み込み、終了を待つタスクを開始します"""
+        await self.bot.wait_until_ready()
+        try:
+            polls = await self.store.load()
+        except Exception as e:
+            logger.error(f"Failed to load polls: {e}")
+            polls = []
+
+        for poll in polls:
+            if poll.message_id not in self.active_polls:
+                self._register(poll)
+        if polls:
+            logger.info(f"Restored {len(polls)} active polls")
+
+        if self._expiry_task is None or self._expiry_task.done():
+            self._expiry_task = asyncio.create_task(self._expiry_loop())
+
+    async def stop(self):
+        """タスクを停止し、反映していない投票を保存します"""
+        if self._expiry_task:
+            self._expiry_task.cancel()
+            self._expiry_task = None
+        for task in list(self._flush_tasks.values()):
+            task.cancel()
+        self._flush_tasks.clear()
+        for poll in self.active_polls.values():
+            if poll.dirty:
+                try:
+                    await self.store.save_votes(poll)
+                except Exception as e:
+                    logger.error(f"Failed to save poll {poll.message_id}: {e}")
+
+    def _register(self, poll: PollState) -> None:
+        self.active_polls[poll.message_id] = poll
+        if poll.expires_at is not None:
+            heapq.heappush(self._deadlines, (poll.expires_at, poll.message_id))
+            if self._deadlines[0][1] == poll.message_id:
+                self._wakeup.set()
 
     async def create_poll(
         self,
@@ -37,7 +241,7 @@ class PollService:
     ) -> Optional[discord.Message]:
         """
         新しい投票を作成します。
-        
+
         Parameters
         ----------
         channel : discord.TextChannel
@@ -52,53 +256,28 @@ class PollService:
             投票の期間（秒）
         multiple_choice : bool
             複数選択を許可するかどうか
-            
+
         Returns
         -------
         Optional[discord.Message]
             作成された投票のメッセージ
         """
         try:
-            # 投票の種類に応じてEmbedを作成
-            if options:
-                # 複数選択肢の投票
-                if len(options) > len(self.default_emojis):
-                    raise ValueError("選択肢が多すぎます（最大10個）")
-
-                embed = discord.Embed(
-                    title="📊 " + title,
-                    description="リアクションで投票してください",
-                    color=discord.Color.blue()
-                )
-
-                # 選択肢を追加
-                for i, option in enumerate(options):
-                    embed.add_field(
-                        name=f"{self.default_emojis[i]} {option}",
-                        value="投票数: 0",
-                        inline=False
-                    )
-
-            else:
-                # 賛成/反対の投票
-                embed = discord.Embed(
-                    title="📊 " + title,
-                    description="✅ 賛成 / ❌ 反対",
-                    color=discord.Color.blue()
-                )
-                embed.add_field(name="✅ 賛成", value="投票数: 0", inline=True)
-                embed.add_field(name="❌ 反対", value="投票数: 0", inline=True)
+            if options and len(options) > len(self.default_emojis):
+                raise ValueError("選択肢が多すぎます（最大10個）")
 
             # 期限を設定
             expires_at = None
             if duration:
                 expires_at = datetime.utcnow() + timedelta(seconds=duration)
-                embed.set_footer(text=f"期限: {expires_at.strftime('%Y-%m-%d %H:%M:%S')} UTC")
-            else:
-                embed.set_footer(text="期限なし")
+
+            poll = PollState(
+                0, channel.guild.id, channel.id, title, options or None, expires_at, multiple_choice
+            )
 
             # 投票メッセージを送信
-            message = await channel.send(embed=embed)
+            message = await channel.send(embed=self._build_embed(poll))
+            poll.message_id = message.id
 
             # リアクションを追加
             if options:
@@ -108,37 +287,29 @@ class PollService:
                 await message.add_reaction(self.yes_emoji)
                 await message.add_reaction(self.no_emoji)
 
-            # アクティブな投票として登録
-            self.active_polls[message.id] = {
-                'title': title,
-                'options': options or ['yes', 'no'],
-                'votes': {opt: set() for opt in (options or ['yes', 'no'])},
-                'expires_at': expires_at,
-                'multiple_choice': multiple_choice
-            }
+            # アクティブな投票として登録（期限付きの場合は終了時刻も登録）
+            self._register(poll)
+            try:
+                await self.store.create(poll)
+            except Exception as e:
+                # 保存に失敗しても、プロセスが動いている間は投票を続けられる
+                logger.error(f"Failed to persist poll {message.id}: {e}")
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=channel.guild.id,
-                    action_type="poll_create",
-                    user_id=author.id,
-                    target_id=message.id,
-                    reason=f"投票の作成: {title}",
-                    details={
-                        'title': title,
-                        'options': options,
-                        'duration': duration,
-                        'multiple_choice': multiple_choice
-                    }
-                )
-
-            # 期限付きの場合、終了タスクを設定
-            if duration:
-                self.bot.loop.create_task(
-                    self._end_poll_task(message, duration)
-                )
+            from database.audit_sink import get_audit_sink
+            get_audit_sink(self.bot).record(
+                guild_id=channel.guild.id,
+                action_type="poll_create",
+                user_id=author.id,
+                target_id=message.id,
+                reason=f"投票の作成: {title}",
+                details={
+                    'title': title,
+                    'options': options,
+                    'duration': duration,
+                    'multiple_choice': multiple_choice
+                }
+            )
 
             return message
 
@@ -146,6 +317,21 @@ class PollService:
             logger.error(f"Failed to create poll: {e}")
             raise
 
+    def _option_index(self, poll: PollState, emoji: str) -> Optional[int]:
+        """絵文字から選択肢の番号を特定する"""
+        emoji = str(emoji)
+        if poll.options:
+            try:
+                index = self.default_emojis.index(emoji)
+            except ValueError:
+                return None
+            return index if index < len(poll.options) else None
+        if emoji == self.yes_emoji:
+            return 0
+        if emoji == self.no_emoji:
+            return 1
+        return None
+
     async def handle_vote(
         self,
         message_id: int,
@@ -154,7 +340,7 @@ class PollService:
     ) -> bool:
         """
         投票を処理します。
-        
+
         Parameters
         ----------
         message_id : int
@@ -163,44 +349,22 @@ class PollService:
             投票したユーザーのID
         emoji : str
             投票に使用された絵文字
-            
+
         Returns
         -------
         bool
-            投票が成功したかどうか
+            投票の状態が変わったかどうか
         """
-        if message_id not in self.active_polls:
+        poll = self.active_polls.get(message_id)
+        if poll is None or poll.is_expired():
             return False
 
-        poll = self.active_polls[message_id]
-        
-        # 期限切れチェック
-        if poll['expires_at'] and datetime.utcnow() > poll['expires_at']:
+        option = self._option_index(poll, emoji)
+        if option is None:
             return False
 
-        # 絵文字から選択肢を特定
-        if len(poll['options']) > 2:
-            try:
-                index = self.default_emojis.index(str(emoji))
-                option = poll['options'][index]
-            except (ValueError, IndexError):
-                return False
-        else:
-            if str(emoji) == self.yes_emoji:
-                option = 'yes'
-            elif str(emoji) == self.no_emoji:
-                option = 'no'
-            else:
-                return False
-
-        # 複数選択が許可されていない場合、他の選択肢から削除
-        if not poll['multiple_choice']:
-            for opt in poll['votes']:
-                poll['votes'][opt].discard(user_id)
-
-        # 投票を記録
-        poll['votes'][option].add(user_id)
-        return True
+        # 複数選択が許可されていない場合は他の選択肢への投票を置き換える
+        return poll.votes.add(user_id, option, exclusive=not poll.multiple_choice)
 
     async def remove_vote(
         self,
@@ -210,7 +374,7 @@ class PollService:
     ) -> bool:
         """
         投票を取り消します。
-        
+
         Parameters
         ----------
         message_id : int
@@ -219,111 +383,165 @@ class PollService:
             投票を取り消すユーザーのID
         emoji : str
             取り消す投票の絵文字
-            
+
         Returns
         -------
         bool
-            取り消しが成功したかどうか
+            投票の状態が変わったかどうか
         """
-        if message_id not in self.active_polls:
+        poll = self.active_polls.get(message_id)
+        if poll is None or poll.is_expired():
             return False
 
-        poll = self.active_polls[message_id]
-
-        # 期限切れチェック
-        if poll['expires_at'] and datetime.utcnow() > poll['expires_at']:
+        option = self._option_index(poll, emoji)
+        if option is None:
             return False
 
-        # 絵文字から選択肢を特定
-        if len(poll['options']) > 2:
-            try:
-                index = self.default_emojis.index(str(emoji))
-                option = poll['options'][index]
-            except (ValueError, IndexError):
-                return False
-        else:
-            if str(emoji) == self.yes_emoji:
-                option = 'yes'
-            elif str(emoji) == self.no_emoji:
-                option = 'no'
-            else:
-                return False
+        return poll.votes.remove(user_id, option)
 
-        # 投票を削除
-        poll['votes'][option].discard(user_id)
-        return True
+    def schedule_update(self, message_id: int) -> None:
+        """
+        投票メッセージの更新を予約します。
+
+        投票ごとに編集は edit_interval 秒に1回までにまとめ、
+        最後の編集の後に変わった投票も必ず反映します。
+
+        Parameters
+        ----------
+        message_id : int
+            投票メッセージのID
+        """
+        poll = self.active_polls.get(message_id)
+        if poll is None:
+            return
+        poll.dirty = True
+        task = self._flush_tasks.get(message_id)
+        if task is None or task.done():
+            self._flush_tasks[message_id] = asyncio.create_task(self._flush_later(poll))
+
+    async def _flush_later(self, poll: PollState) -> None:
+        try:
+            while poll.dirty and self.active_polls.get(poll.message_id) is poll:
+                delay = poll.last_edit + self.edit_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    if self.active_polls.get(poll.message_id) is not poll:
+                        return
+                # 編集中に届いた投票は次の編集で反映する
+                poll.dirty = False
+                poll.last_edit = time.monotonic()
+                try:
+                    await self._edit_tally(poll)
+                except Exception as e:
+                    logger.error(f"Failed to update poll {poll.message_id}: {e}")
+                try:
+                    await self.store.save_votes(poll)
+                except Exception as e:
+                    logger.error(f"Failed to save poll {poll.message_id}: {e}")
+        finally:
+            if self._flush_tasks.get(poll.message_id) is asyncio.current_task():
+                del self._flush_tasks[poll.message_id]
+
+    async def _edit_tally(self, poll: PollState) -> None:
+        message = self._partial_message(poll)
+        if message is not None:
+            await message.edit(embed=self._build_embed(poll))
 
     async def update_poll_message(self, message: discord.Message):
         """
-        投票メッセージを更新します。
-        
+        投票メッセージをすぐに更新します（通常は schedule_update を使用してください）。
+
         Parameters
         ----------
         message : discord.Message
             更新する投票メッセージ
         """
-        if message.id not in self.active_polls:
+        poll = self.active_polls.get(message.id)
+        if poll is None:
             return
 
-        poll = self.active_polls[message.id]
-        embed = message.embeds[0]
-
-        # 投票結果を更新
-        if len(poll['options']) > 2:
-            for i, option in enumerate(poll['options']):
-                votes = len(poll['votes'][option])
-                embed.set_field_at(
-                    i,
+        poll.dirty = False
+        poll.last_edit = time.monotonic()
+        await message.edit(embed=self._build_embed(poll))
+
+    def _build_embed(self, poll: PollState) -> discord.Embed:
+        """投票中のEmbedを作成する"""
+        counts = poll.votes.counts
+        if poll.options:
+            # 複数選択肢の投票
+            embed = discord.Embed(
+                title="📊 " + poll.title,
+                description="リアクションで投票してください",
+                color=discord.Color.blue()
+            )
+            for i, option in enumerate(poll.options):
+                embed.add_field(
                     name=f"{self.default_emojis[i]} {option}",
-                    value=f"投票数: {votes}",
+                    value=f"投票数: {counts[i]}",
                     inline=False
                 )
         else:
-            yes_votes = len(poll['votes']['yes'])
-            no_votes = len(poll['votes']['no'])
-            embed.set_field_at(0, name="✅ 賛成", value=f"投票数: {yes_votes}", inline=True)
-            embed.set_field_at(1, name="❌ 反対", value=f"投票数: {no_votes}", inline=True)
+            # 賛成/反対の投票
+            embed = discord.Embed(
+                title="📊 " + poll.title,
+                description="✅ 賛成 / ❌ 反対",
+                color=discord.Color.blue()
+            )
+            embed.add_field(name="✅ 賛成", value=f"投票数: {counts[0]}", inline=True)
+            embed.add_field(name="❌ 反対", value=f"投票数: {counts[1]}", inline=True)
+
+        if poll.expires_at:
+            embed.set_footer(text=f"期限: {poll.expires_at.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+        else:
+            embed.set_footer(text="期限なし")
+        return embed
 
-        await message.edit(embed=embed)
+    def _partial_message(self, poll: PollState):
+        """投票メッセージを取得せずに編集するための PartialMessage"""
+        channel = self.bot.get_channel(poll.channel_id)
+        if channel is None:
+            return None
+        return channel.get_partial_message(poll.message_id)
 
     async def end_poll(self, message: discord.Message):
         """
         投票を終了します。
-        
+
         Parameters
         ----------
         message : discord.Message
             終了する投票メッセージ
         """
-        if message.id not in self.active_polls:
+        poll = self.active_polls.pop(message.id, None)
+        if poll is None:
             return
 
-        poll = self.active_polls[message.id]
-        embed = message.embeds[0]
+        # 予約済みの編集は取り消す（結果で上書きする）
+        task = self._flush_tasks.pop(message.id, None)
+        if task is not None:
+            task.cancel()
 
         # 結果を集計
-        results = []
-        total_votes = 0
-        for option in poll['options']:
-            votes = len(poll['votes'][option])
-            total_votes += votes
-            results.append((option, votes))
+        results = list(zip(poll.labels, poll.votes.counts, range(len(poll.labels))))
+        total_votes = sum(poll.votes.counts)
 
         # 結果を降順にソート
         results.sort(key=lambda x: x[1], reverse=True)
 
         # 結果を表示
-        embed.description = "投票は終了しました\n\n**結果**"
-        embed.clear_fields()
+        embed = discord.Embed(
+            title="📊 " + poll.title,
+            description="投票は終了しました\n\n**結果**",
+            color=discord.Color.blue()
+        )
 
-        for option, votes in results:
+        for option, votes, index in results:
             percentage = (votes / total_votes * 100) if total_votes > 0 else 0
-            if option in ['yes', 'no']:
+            if not poll.options:
                 name = "✅ 賛成" if option == 'yes' else "❌ 反対"
             else:
-                index = poll['options'].index(option)
                 name = f"{self.default_emojis[index]} {option}"
-            
+
             embed.add_field(
                 name=name,
                 value=f"投票数: {votes} ({percentage:.1f}%)",
@@ -331,21 +549,47 @@ class PollService:
             )
 
         embed.set_footer(text=f"総投票数: {total_votes}")
-        await message.edit(embed=embed)
-
-        # アクティブな投票から削除
-        del self.active_polls[message.id]
-
-    async def _end_poll_task(self, message: discord.Message, duration: int):
-        """
-        投票を自動的に終了するタスク
-        
-        Parameters
-        ----------
-        message : discord.Message
-            投票メッセージ
-        duration : int
-            投票の期間（秒）
-        """
-        await asyncio.sleep(duration)
-        await self.end_poll(message) 
\ No newline at end of file
+        try:
+            await message.edit(embed=embed)
+        finally:
+            try:
+                await self.store.delete(poll.message_id)
+            except Exception as e:
+                logger.error(f"Failed to delete poll {poll.message_id}: {e}")
+
+    async def _expiry_loop(self):
+        """次に期限が来る投票まで待機し、期限が来た投票を終了するループ"""
+        while True:
+            self._wakeup.clear()
+            # 終了済み・期限を変更した投票の古い要素を取り除く
+            while self._deadlines:
+                expires_at, message_id = self._deadlines[0]
+                poll = self.active_polls.get(message_id)
+                if poll is not None and poll.expires_at == expires_at:
+                    break
+                heapq.heappop(self._deadlines)
+
+            if not self._deadlines:
+                await self._wakeup.wait()
+                continue
+
+            delay = (self._deadlines[0][0] - datetime.utcnow()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, message_id = heapq.heappop(self._deadlines)
+            poll = self.active_polls[message_id]
+            message = self._partial_message(poll)
+            try:
+                if message is None:
+                    # チャンネルが削除されている場合は記録だけ削除する
+                    del self.active_polls[message_id]
+                    await self.store.delete(message_id)
+                else:
+                    await self.end_poll(message)
+            except Exception as e:
+                logger.error(f"Failed to end poll {message_id}: {e}")
@@ -2,8 +2,7 @@ import discord
 from discord.ext import commands
 from typing import Dict, List, Optional, Tuple
 import logging
-from database.database_connection import get_db
-from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
 
 logger = logging.getLogger('utility.role')
 
@@ -58,22 +57,20 @@ class RoleService:
             )
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=guild.id,
-                    action_type="role_create",
-                    user_id=self.bot.user.id,
-                    target_id=role.id,
-                    reason=reason,
-                    details={
-                        'name': name,
-                        'color': str(color) if color else None,
-                        'hoist': hoist,
-                        'mentionable': mentionable,
-                        'permissions': permissions.value
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=guild.id,
+                action_type="role_create",
+                user_id=self.bot.user.id,
+                target_id=role.id,
+                reason=reason,
+                details={
+                    'name': name,
+                    'color': str(color) if color else None,
+                    'hoist': hoist,
+                    'mentionable': mentionable,
+                    'permissions': permissions.value
+                }
+            )
 
             return role, "ロールを作成しました。"
 
@@ -111,16 +108,14 @@ class RoleService:
             await role.delete(reason=reason)
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=guild_id,
-                    action_type="role_delete",
-                    user_id=self.bot.user.id,
-                    target_id=role_id,
-                    reason=reason,
-                    details={}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=guild_id,
+                action_type="role_delete",
+                user_id=self.bot.user.id,
+                target_id=role_id,
+                reason=reason,
+                details={}
+            )
 
             return "ロールを削除しました。"
 
@@ -158,16 +153,14 @@ class RoleService:
             await member.add_roles(role, reason=reason)
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=member.guild.id,
-                    action_type="role_add",
-                    user_id=self.bot.user.id,
-                    target_id=member.id,
-                    reason=reason,
-                    details={'role_id': role.id}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=member.guild.id,
+                action_type="role_add",
+                user_id=self.bot.user.id,
+                target_id=member.id,
+                reason=reason,
+                details={'role_id': role.id}
+            )
 
             return f"{member.mention} にロール {role.name} を付与しました。"
 
@@ -205,16 +198,14 @@ class RoleService:
             await member.remove_roles(role, reason=reason)
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=member.guild.id,
-                    action_type="role_remove",
-                    user_id=self.bot.user.id,
-                    target_id=member.id,
-                    reason=reason,
-                    details={'role_id': role.id}
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=member.guild.id,
+                action_type="role_remove",
+                user_id=self.bot.user.id,
+                target_id=member.id,
+                reason=reason,
+                details={'role_id': role.id}
+            )
 
             return f"{member.mention} からロール {role.name} を削除しました。"
 
@@ -287,16 +278,14 @@ class RoleService:
             )
 
             # データベースに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=role.guild.id,
-                    action_type="role_modify",
-                    user_id=self.bot.user.id,
-                    target_id=role.id,
-                    reason=reason,
-                    details=changes
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=role.guild.id,
+                action_type="role_modify",
+                user_id=self.bot.user.id,
+                target_id=role.id,
+                reason=reason,
+                details=changes
+            )
 
             return "ロールの設定を変更しました。"
 
@@ -5,6 +5,8 @@ import logging
 from datetime import datetime, timedelta
 from database.database_connection import get_db
 from database.database_operations import DatabaseOperations
+from database.audit_sink import get_audit_sink
+from modules.logging.log_channels import get_log_channel_cache
 
 logger = logging.getLogger('utility.server')
 
@@ -108,6 +110,10 @@ class ServerService:
                     raid_protection=settings.get('raid_protection')
                 )
 
+            if 'log_channel_id' in settings:
+                # 次のイベントでデータベースから新しいログチャンネルを読み直す
+                get_log_channel_cache(self.bot).invalidate(guild.id)
+
             return "サーバー設定を更新しました。"
 
         except discord.Forbidden:
@@ -138,21 +144,19 @@ class ServerService:
             )
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=channel.guild.id,
-                    action_type="create_invite",
-                    user_id=self.bot.user.id,
-                    target_id=channel.id,
-                    reason=reason or "招待リンクを作成",
-                    details={
-                        'code': invite.code,
-                        'max_age': max_age,
-                        'max_uses': max_uses,
-                        'temporary': temporary
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=channel.guild.id,
+                action_type="create_invite",
+                user_id=self.bot.user.id,
+                target_id=channel.id,
+                reason=reason or "招待リンクを作成",
+                details={
+                    'code': invite.code,
+                    'max_age': max_age,
+                    'max_uses': max_uses,
+                    'temporary': temporary
+                }
+            )
 
             return invite, "招待リンクを作成しました。"
 
@@ -187,18 +191,16 @@ class ServerService:
             await invite.delete(reason=reason)
 
             # 監査ログに記録
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=invite.guild.id,
-                    action_type="delete_invite",
-                    user_id=self.bot.user.id,
-                    target_id=None,
-                    reason=reason or "招待リンクを削除",
-                    details={
-                        'code': invite.code
-                    }
-                )
+            get_audit_sink(self.bot).record(
+                guild_id=invite.guild.id,
+                action_type="delete_invite",
+                user_id=self.bot.user.id,
+                target_id=None,
+                reason=reason or "招待リンクを削除",
+                details={
+                    'code': invite.code
+                }
+            )
 
             return "招待リンクを削除しました。"
 
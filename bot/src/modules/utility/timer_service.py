@@ -1,22 +1,151 @@
 import asyncio
+import heapq
+import math
+import time
 from datetime import datetime
 import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import discord
 from discord.ext import commands
-from database.database_connection import get_db
-from database.database_operations import DatabaseOperations
+
+from ..record_store import database_operations, to_datetime, to_timestamp
 
 logger = logging.getLogger('utility.timer_service')
 
+# 送信に失敗したタイマーを再試行するまでの時間（秒）
+RETRY_DELAY = 60
+
+
+def next_occurrence(expires_at: float, interval: float, now: float) -> float:
+    """
+    繰り返しタイマーの、now より後の最初の期限を返します。
+
+    停止中に何回分も期限を過ぎていても、ループせずに1回の計算で求めます。
+    期限は expires_at + interval * n のまま（実行時刻のずれを蓄積しない）です。
+    """
+    if expires_at > now:
+        return expires_at
+    return expires_at + interval * (math.floor((now - expires_at) / interval) + 1)
+
+
+class PendingTimer(NamedTuple):
+    """メモリ上に保持するタイマー"""
+    expires_at: float
+    channel_id: int
+    message: str
+    interval: Optional[int]
+
+
+class TimerStore:
+    """タイマーをデータベース（timers テーブル）に保存するクラス"""
+
+    async def add(self, guild_id: int, channel_id: int, user_id: int, expires_at: float,
+                  message: str, is_recurring: bool, interval: Optional[int]) -> int:
+        """タイマーを保存し、IDを返す"""
+        async for db in database_operations():
+            timer = await db.create_timer(
+                guild_id=guild_id,
+                channel_id=channel_id,
+                user_id=user_id,
+                expires_at=to_datetime(expires_at),
+                message=message,
+                is_recurring=is_recurring,
+                interval=interval
+            )
+            return timer.id
+
+    async def load(self) -> List[Tuple[int, PendingTimer]]:
+        """全てのタイマーを (id, PendingTimer) のリストで返す"""
+        records = []
+        async for db in database_operations():
+            for timer_id, expires_at, channel_id, message, is_recurring, interval in await db.get_pending_timers():
+                records.append((timer_id, PendingTimer(
+                    to_timestamp(expires_at), channel_id, message,
+                    interval if is_recurring and interval else None
+                )))
+        return records
+
+    async def complete(self, deleted_ids: List[int], rescheduled: List[Tuple[int, float]]) -> None:
+        """使用済みのタイマーを削除し、繰り返しタイマーの次回の期限をまとめて保存する"""
+        async for db in database_operations():
+            await db.complete_timers(
+                deleted_ids,
+                [(timer_id, to_datetime(expires_at)) for timer_id, expires_at in rescheduled]
+            )
+
+    async def get_user_timers(self, user_id: int, guild_id: int):
+        async for db in database_operations():
+            return await db.get_user_timers(user_id, guild_id)
+
+
 class TimerService:
-    def __init__(self, bot: commands.Bot):
+    """タイマーを期限順のヒープで管理し、次の期限ちょうどに起きてメッセージを送信するクラス
+
+    タイマーはデータベースに保存され、起動時にヒープへ読み込まれます。作成したタイマーは
+    保存と同時にヒープへ追加されるため、データベースを定期的に検索することはありません。
+    期限が来たタイマーはバッチで処理し、削除と次回の期限の保存を1回のコミットで行います。
+    """
+
+    def __init__(self, bot: commands.Bot, store: Optional[TimerStore] = None,
+                 concurrency: int = 5, batch_size: int = 100):
         self.bot = bot
+        self.store = store or TimerStore()
+        self.concurrency = concurrency
+        self.batch_size = batch_size
         self.running = False
         self.current_task = None
+        # (expires_at, timer_id) の最小ヒープ
+        self._heap: List[Tuple[float, int]] = []
+        # {timer_id: PendingTimer}  ヒープ内の古い要素（キャンセル・再設定済み）を無視するための現在の状態
+        self._timers: Dict[int, PendingTimer] = {}
+        self._wakeup = asyncio.Event()
+        self.stats = {"fired": 0, "failed": 0, "caught_up": 0}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def next_expiry(self) -> Optional[float]:
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def _push(self, timer_id: int, timer: PendingTimer) -> None:
+        self._timers[timer_id] = timer
+        heapq.heappush(self._heap, (timer.expires_at, timer_id))
+        if self._heap[0][1] == timer_id:
+            self._wakeup.set()
+
+    def _discard_stale(self) -> None:
+        """キャンセル・再設定された古いヒープ要素を先頭から取り除く"""
+        heap = self._heap
+        while heap:
+            timer = self._timers.get(heap[0][1])
+            if timer is not None and timer.expires_at == heap[0][0]:
+                break
+            heapq.heappop(heap)
 
     async def start(self):
-        """タイマーサービスを開始します"""
+        """データベースからタイマーを読み込み、タイマーサービスを開始します"""
+        try:
+            records = await self.store.load()
+        except Exception as e:
+            logger.error(f"Failed to load timers: {e}")
+            records = []
+
+        # 読み込み中に作成されたタイマーはそのまま残す
+        for timer_id, timer in records:
+            self._timers.setdefault(timer_id, timer)
+        self._heap = [(timer.expires_at, timer_id) for timer_id, timer in self._timers.items()]
+        heapq.heapify(self._heap)
+
+        now = time.time()
+        overdue = sum(1 for _, timer in records if timer.expires_at <= now)
+        if records:
+            logger.info(f"Loaded {len(records)} timers ({overdue} overdue)")
+        self.stats["caught_up"] += overdue
+
         self.running = True
-        self.current_task = asyncio.create_task(self._timer_loop())
+        if self.current_task is None or self.current_task.done():
+            self.current_task = asyncio.create_task(self._timer_loop())
         logger.info("Timer service started")
 
     async def stop(self):
@@ -28,56 +157,91 @@ class TimerService:
                 await self.current_task
             except asyncio.CancelledError:
                 pass
+            self.current_task = None
         logger.info("Timer service stopped")
 
     async def _timer_loop(self):
-        """タイマーの監視ループ"""
+        """次の期限まで待機し、期限が来たタイマーを処理するループ"""
         while self.running:
-            try:
-                await self._check_timers()
-                # 1分ごとにチェック
-                await asyncio.sleep(60)
-            except Exception as e:
-                logger.error(f"Error in timer loop: {e}")
-                await asyncio.sleep(60)  # エラー時も1分待機
+            self._wakeup.clear()
+            next_expiry = self.next_expiry()
+            now = time.time()
 
-    async def _check_timers(self):
-        """期限切れのタイマーをチェックして処理します"""
-        async for session in get_db():
-            db = DatabaseOperations(session)
-            expired_timers = await db.get_expired_timers()
+            if next_expiry is None or next_expiry > now:
+                # 次の期限まで（タイマーが追加されたらその時点で）待機する
+                timeout = None if next_expiry is None else next_expiry - now
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
 
-            for timer in expired_timers:
+            due = self._pop_due(now)
+            if due:
                 try:
-                    # タイマーのメッセージを送信
-                    channel = self.bot.get_channel(timer.channel_id)
-                    if channel:
-                        await channel.send(timer.message)
-
-                    # 繰り返しタイマーの場合は次回の時刻を設定
-                    if timer.is_recurring and timer.interval:
-                        next_time = datetime.utcnow()
-                        while next_time <= datetime.utcnow():
-                            next_time = next_time + timedelta(seconds=timer.interval)
-
-                        await db.create_timer(
-                            guild_id=timer.guild_id,
-                            channel_id=timer.channel_id,
-                            user_id=timer.user_id,
-                            expires_at=next_time,
-                            message=timer.message,
-                            is_recurring=True,
-                            interval=timer.interval
-                        )
-
-                    # 使用済みタイマーを削除
-                    await session.execute(
-                        f"DELETE FROM timers WHERE id = {timer.id}"
-                    )
-                    await session.commit()
+                    await self._process_due(due, now)
+                except Exception as e:
+                    logger.error(f"Error in timer loop: {e}")
 
+    def _pop_due(self, now: float) -> List[Tuple[int, PendingTimer]]:
+        """期限が来たタイマーを最大 batch_size 件取り出す"""
+        due = []
+        while len(due) < self.batch_size:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            _, timer_id = heapq.heappop(self._heap)
+            due.append((timer_id, self._timers.pop(timer_id)))
+        return due
+
+    async def _process_due(self, due: List[Tuple[int, PendingTimer]], now: float) -> None:
+        """期限が来たタイマーのメッセージを送信し、削除・次回の期限をまとめて保存します"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        retry: List[Tuple[int, PendingTimer]] = []
+
+        async def _fire(timer_id: int, timer: PendingTimer) -> None:
+            channel = self.bot.get_channel(timer.channel_id)
+            if channel is None:
+                return
+            async with semaphore:
+                try:
+                    await channel.send(timer.message)
+                except (discord.Forbidden, discord.NotFound):
+                    # 送信できないチャンネルは再試行しない
+                    logger.warning(f"Cannot send timer {timer_id} to channel {timer.channel_id}")
                 except Exception as e:
-                    logger.error(f"Error processing timer {timer.id}: {e}")
+                    logger.error(f"Error processing timer {timer_id}: {e}")
+                    retry.append((timer_id, timer))
+
+        await asyncio.gather(*(_fire(timer_id, timer) for timer_id, timer in due))
+
+        retry_ids = {timer_id for timer_id, _ in retry}
+        deleted_ids: List[int] = []
+        rescheduled: List[Tuple[int, float]] = []
+        for timer_id, timer in due:
+            if timer_id in retry_ids:
+                continue
+            if timer.interval:
+                # 繰り返しタイマーの場合は次回の時刻を設定
+                next_time = next_occurrence(timer.expires_at, timer.interval, now)
+                rescheduled.append((timer_id, next_time))
+                self._push(timer_id, timer._replace(expires_at=next_time))
+            else:
+                deleted_ids.append(timer_id)
+
+        # 再試行するタイマーはデータベースの期限を変えない（再起動後は期限切れとして送信される）
+        retry_at = time.time() + RETRY_DELAY
+        for timer_id, timer in retry:
+            self._push(timer_id, timer._replace(expires_at=retry_at))
+
+        self.stats["fired"] += len(due) - len(retry)
+        self.stats["failed"] += len(retry)
+
+        if deleted_ids or rescheduled:
+            try:
+                await self.store.complete(deleted_ids, rescheduled)
+            except Exception as e:
+                logger.error(f"Failed to save processed timers: {e}")
 
     async def create_timer(
         self,
@@ -88,10 +252,10 @@ class TimerService:
         message: str,
         is_recurring: bool = False,
         interval: int = None
-    ):
+    ) -> int:
         """
         新しいタイマーを作成します
-        
+
         Parameters
         ----------
         guild_id : int
@@ -108,20 +272,22 @@ class TimerService:
             繰り返しタイマーかどうか
         interval : int, optional
             繰り返し間隔（秒）
+
+        Returns
+        -------
+        int
+            タイマーID
         """
         try:
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_timer(
-                    guild_id=guild_id,
-                    channel_id=channel_id,
-                    user_id=user_id,
-                    expires_at=expires_at,
-                    message=message,
-                    is_recurring=is_recurring,
-                    interval=interval
-                )
+            expires_ts = to_timestamp(expires_at)
+            timer_id = await self.store.add(
+                guild_id, channel_id, user_id, expires_ts, message, is_recurring, interval
+            )
+            self._push(timer_id, PendingTimer(
+                expires_ts, channel_id, message, interval if is_recurring and interval else None
+            ))
             logger.info(f"Created timer for user {user_id} in guild {guild_id}")
+            return timer_id
         except Exception as e:
             logger.error(f"Error creating timer: {e}")
             raise
@@ -129,18 +295,15 @@ class TimerService:
     async def cancel_timer(self, timer_id: int):
         """
         タイマーをキャンセルします
-        
+
         Parameters
         ----------
         timer_id : int
             タイマーID
         """
         try:
-            async for session in get_db():
-                await session.execute(
-                    f"DELETE FROM timers WHERE id = {timer_id}"
-                )
-                await session.commit()
+            self._timers.pop(timer_id, None)
+            await self.store.complete([timer_id], [])
             logger.info(f"Cancelled timer {timer_id}")
         except Exception as e:
             logger.error(f"Error cancelling timer {timer_id}: {e}")
@@ -149,25 +312,30 @@ class TimerService:
     async def get_user_timers(self, user_id: int, guild_id: int):
         """
         ユーザーのタイマー一覧を取得します
-        
+
         Parameters
         ----------
         user_id : int
             ユーザーID
         guild_id : int
             サーバーID
-            
+
         Returns
         -------
         List[Timer]
             タイマーのリスト
         """
         try:
-            async for session in get_db():
-                result = await session.execute(
-                    f"SELECT * FROM timers WHERE user_id = {user_id} AND guild_id = {guild_id}"
-                )
-                return result.fetchall()
+            return await self.store.get_user_timers(user_id, guild_id)
         except Exception as e:
             logger.error(f"Error getting timers for user {user_id}: {e}")
-            raise 
\ No newline at end of file
+            raise
+
+
+def get_timer_service(bot: commands.Bot) -> TimerService:
+    """ボットに紐づいた共有 TimerService を取得する（なければ作成する）"""
+    service = getattr(bot, 'timer_service', None)
+    if service is None:
+        service = TimerService(bot)
+        bot.timer_service = service
+    return service
@@ -1,19 +1,204 @@
+import abc
 import aiohttp
+import asyncio
 import logging
-from typing import Optional, Dict, List
 import os
-from database.database_connection import get_db
-from database.database_operations import DatabaseOperations
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple, Union
 
 logger = logging.getLogger('utility.translation')
 
+# (正規化したテキスト, 翻訳元の言語コード, 翻訳先の言語コード)
+CacheKey = Tuple[str, str, str]
+
+_HORIZONTAL_SPACE = re.compile(r'[ \t\u3000]+')
+
+
+def normalize_text(text: str) -> str:
+    """キャッシュのキーに使うテキスト（Unicode正規化・連続する空白の統一・前後の空白の除去）
+
+    翻訳APIには元のテキストを送ります（コードブロックや書式を崩さないため）。
+    """
+    text = unicodedata.normalize('NFC', text)
+    return '\n'.join(_HORIZONTAL_SPACE.sub(' ', line).strip() for line in text.strip().splitlines())
+
+
+class TranslationBackend(abc.ABC):
+    """
+    翻訳APIのインターフェース
+
+    translate を実装したクラスを TranslationService に渡すと、翻訳APIを差し替えられます
+    （テストやベンチマークではローカルのスタブサーバーを使います）。
+    """
+
+    @abc.abstractmethod
+    async def translate(self, session: aiohttp.ClientSession, text: str,
+                        source_lang: Optional[str], target_lang: str) -> str:
+        """text を翻訳して返す（source_lang が None の場合は自動検出）"""
+
+
+class MyMemoryBackend(TranslationBackend):
+    """MyMemory Translation API"""
+
+    def __init__(self, base_url: str = "https://api.mymemory.translated.net/get"):
+        self.base_url = base_url
+
+    async def translate(self, session: aiohttp.ClientSession, text: str,
+                        source_lang: Optional[str], target_lang: str) -> str:
+        params = {
+            'q': text,
+            'langpair': f"{source_lang or 'auto'}|{target_lang}"
+        }
+        async with session.get(self.base_url, params=params) as response:
+            if response.status != 200:
+                raise Exception(f"翻訳APIエラー: {response.status}")
+
+            data = await response.json()
+            if data['responseStatus'] != 200:
+                raise Exception(f"翻訳APIエラー: {data['responseStatus']}")
+
+            return data['responseData']['translatedText']
+
+
+class TranslationCache:
+    """
+    翻訳結果をSQLiteのファイルに保存するキャッシュ（再起動後も同じ翻訳をAPIに送らない）
+
+    SQLiteへのアクセスは専用のスレッドで行い、イベントループを止めません。スレッドは
+    close() で停止し、閉じた後に使うと作り直すので、コグの再読み込み後も使えます。
+    保存件数が max_entries を超えたら、最後に使われた時刻が古いものから削除します。
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, max_age_days: float = 30):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS translations ('
+                ' source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, text TEXT NOT NULL,'
+                ' translated TEXT NOT NULL, created_at REAL NOT NULL, used_at REAL NOT NULL,'
+                ' PRIMARY KEY (source_lang, target_lang, text))'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS ix_translations_used_at ON translations (used_at)')
+        return self._conn
+
+    def _get(self, key: CacheKey) -> Optional[str]:
+        conn = self._connect()
+        text, source_lang, target_lang = key
+        now = time.time()
+        row = conn.execute(
+            'SELECT translated, created_at FROM translations WHERE source_lang = ? AND target_lang = ? AND text = ?',
+            (source_lang, target_lang, text)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < now - self.max_age_days * 86400:
+            return None
+        conn.execute(
+            'UPDATE translations SET used_at = ? WHERE source_lang = ? AND target_lang = ? AND text = ?',
+            (now, source_lang, target_lang, text)
+        )
+        conn.commit()
+        return row[0]
+
+    def _put(self, key: CacheKey, translated: str) -> None:
+        conn = self._connect()
+        text, source_lang, target_lang = key
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)',
+            (source_lang, target_lang, text, translated, now, now)
+        )
+        self._writes += 1
+        # 上限を超えた分は時々まとめて削除する
+        if self._writes % 1000 == 0:
+            conn.execute(
+                'DELETE FROM translations WHERE created_at < ? OR rowid IN ('
+                ' SELECT rowid FROM translations ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                (now - self.max_age_days * 86400, self.max_entries)
+            )
+        conn.commit()
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """SQLiteにアクセスするスレッド（初回と close() の後に作成する）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='translation-cache')
+        return self._executor
+
+    async def get(self, key: CacheKey) -> Optional[str]:
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._get, key)
+
+    async def put(self, key: CacheKey, translated: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._put, key, translated)
+
+    async def close(self) -> None:
+        """接続を閉じてスレッドを停止する"""
+        executor = self._executor
+        if executor is None:
+            return
+        self._executor = None
+        try:
+            # スレッドは1つなので、先に積まれた読み書きが終わってから接続を閉じる
+            await asyncio.get_running_loop().run_in_executor(executor, self._close)
+        finally:
+            executor.shutdown(wait=False)
+
+
 class TranslationService:
-    def __init__(self):
+    def __init__(self, bot, backend: Optional[TranslationBackend] = None,
+                 cache_path: Optional[str] = 'default', max_cached: int = 2048,
+                 max_concurrency: int = 8):
         """
         翻訳サービスを初期化します。
-        MyMemory Translation APIを使用します。
+        既定では MyMemory Translation APIを使用します。
+
+        翻訳結果はメモリ上のLRUキャッシュとSQLiteのキャッシュに保存し、
+        同じテキストの翻訳はAPIに送りません。APIへの接続は1つのセッションで使い回し、
+        同時に送るリクエストは max_concurrency 件までに制限します。
+
+        Parameters
+        ----------
+        bot : commands.Bot
+            ボットインスタンス
+        backend : TranslationBackend, optional
+            翻訳API（指定しない場合は MyMemory）
+        cache_path : str, optional
+            SQLiteのキャッシュのパス（None の場合はメモリ上のキャッシュだけを使う）
+        max_cached : int
+            メモリ上にキャッシュする翻訳の件数
+        max_concurrency : int
+            同時に送る翻訳リクエストの上限
         """
-        self.base_url = "https://api.mymemory.translated.net/get"
+        self.bot = bot
+        self.backend = backend or MyMemoryBackend()
+        if cache_path == 'default':
+            cache_path = os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'translation_cache.sqlite3'
+            )
+        self.disk_cache = TranslationCache(cache_path) if cache_path else None
+        self.max_cached = max_cached
+        self.max_concurrency = max_concurrency
         self.supported_languages = {
             'ja': '日本語',
             'en': '英語',
@@ -26,8 +211,46 @@ class TranslationService:
             'ru': 'ロシア語',
             'vi': 'ベトナム語'
         }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._cache: "OrderedDict[CacheKey, str]" = OrderedDict()
+        # {キー: 翻訳中のタスク}  同じテキストの同時の翻訳を1回のリクエストにまとめる
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "requests": 0}
         logger.info("Translation service initialized successfully")
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """接続を使い回す共有のセッション（初回に作成する）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=15)
+            )
+        return self._session
+
+    async def close(self):
+        """セッションとキャッシュを閉じます"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self.disk_cache is not None:
+            await self.disk_cache.close()
+
+    def _validate(self, target_lang: str, source_lang: Optional[str]) -> None:
+        # 言語コードを検証
+        if target_lang not in self.supported_languages:
+            raise ValueError(f"サポートされていない言語コードです: {target_lang}")
+
+        if source_lang and source_lang not in self.supported_languages:
+            raise ValueError(f"サポートされていない言語コードです: {source_lang}")
+
+    def _remember(self, key: CacheKey, translated: str) -> None:
+        self._cache[key] = translated
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
     async def translate(
         self,
         text: str,
@@ -52,34 +275,96 @@ class TranslationService:
             翻訳されたテキスト
         """
         try:
-            # 言語コードを検証
-            if target_lang not in self.supported_languages:
-                raise ValueError(f"サポートされていない言語コードです: {target_lang}")
+            self._validate(target_lang, source_lang)
 
-            if source_lang and source_lang not in self.supported_languages:
-                raise ValueError(f"サポートされていない言語コードです: {source_lang}")
+            key = (normalize_text(text), source_lang or 'auto', target_lang)
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached
 
-            # 翻訳リクエストを送信
-            params = {
-                'q': text,
-                'langpair': f"{source_lang or 'auto'}|{target_lang}"
-            }
+            # 同じテキストを翻訳中であれば、その結果を待つ
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return await asyncio.shield(future)
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.base_url, params=params) as response:
-                    if response.status != 200:
-                        raise Exception(f"翻訳APIエラー: {response.status}")
-
-                    data = await response.json()
-                    if data['responseStatus'] != 200:
-                        raise Exception(f"翻訳APIエラー: {data['responseStatus']}")
-
-                    return data['responseData']['translatedText']
+            future = asyncio.get_running_loop().create_task(self._fetch(key, text))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            # 呼び出し元がキャンセルされても、同じ結果を待つ他の呼び出しのために翻訳は続ける
+            return await asyncio.shield(future)
 
         except Exception as e:
             logger.error(f"Translation failed: {e}")
             raise
 
+    async def _fetch(self, key: CacheKey, text: str) -> str:
+        """SQLiteのキャッシュ、なければ翻訳APIから翻訳を取得する（APIには元の text を送る）"""
+        _, source_lang, target_lang = key
+        if self.disk_cache is not None:
+            try:
+                translated = await self.disk_cache.get(key)
+            except Exception as e:
+                logger.error(f"Failed to read translation cache: {e}")
+                translated = None
+            if translated is not None:
+                self.stats["disk_hits"] += 1
+                self._remember(key, translated)
+                return translated
+
+        self.stats["misses"] += 1
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.stats["requests"] += 1
+            translated = await self.backend.translate(
+                self._get_session(), text, None if source_lang == 'auto' else source_lang, target_lang
+            )
+
+        self._remember(key, translated)
+        if self.disk_cache is not None:
+            try:
+                await self.disk_cache.put(key, translated)
+            except Exception as e:
+                logger.error(f"Failed to write translation cache: {e}")
+        return translated
+
+    async def translate_many(
+        self,
+        texts: List[str],
+        target_lang: str,
+        source_lang: Optional[str] = None,
+        return_exceptions: bool = False
+    ) -> List[Union[str, BaseException]]:
+        """
+        複数のテキストをまとめて翻訳します。
+
+        同じテキストは1回だけ翻訳し、APIへのリクエストは max_concurrency 件ずつ並行して送ります。
+
+        Parameters
+        ----------
+        texts : List[str]
+            翻訳するテキストのリスト
+        target_lang : str
+            翻訳先の言語コード
+        source_lang : str, optional
+            翻訳元の言語コード
+        return_exceptions : bool
+            失敗した翻訳を例外として結果に含めるかどうか（False の場合は最初の例外を送出）
+
+        Returns
+        -------
+        List[str]
+            翻訳されたテキスト（texts と同じ順序）
+        """
+        self._validate(target_lang, source_lang)
+        return await asyncio.gather(
+            *(self.translate(text, target_lang, source_lang) for text in texts),
+            return_exceptions=return_exceptions
+        )
+
     def get_supported_languages(self) -> dict:
         """
         サポートされている言語の一覧を取得します。
@@ -221,20 +506,28 @@ class TranslationService:
             翻訳先言語
         """
         try:
-            async for session in get_db():
-                db = DatabaseOperations(session)
-                await db.create_audit_log(
-                    guild_id=guild_id,
-                    action_type="translation",
-                    user_id=user_id,
-                    target_id=None,
-                    reason="テキスト翻訳",
-                    details={
-                        'source_text': source_text,
-                        'translated_text': translated_text,
-                        'source_language': source_language,
-                        'target_language': target_language
-                    }
-                )
+            from database.audit_sink import get_audit_sink
+            get_audit_sink(self.bot).record(
+                guild_id=guild_id,
+                action_type="translation",
+                user_id=user_id,
+                target_id=None,
+                reason="テキスト翻訳",
+                details={
+                    'source_text': source_text,
+                    'translated_text': translated_text,
+                    'source_language': source_language,
+                    'target_language': target_language
+                }
+            )
         except Exception as e:
-            logger.error(f"Failed to log translation: {e}") 
\ No newline at end of file
+            logger.error(f"Failed to log translation: {e}") 
+
+
+def get_translation_service(bot) -> TranslationService:
+    """ボットに紐づいた共有 TranslationService を取得する（なければ作成する）"""
+    service = getattr(bot, 'translation_service', None)
+    if service is None:
+        service = TranslationService(bot)
+        bot.translation_service = service
+    return service
@@ -0,0 +1,133 @@
+"""
+キャプチャ発行のベンチマーク
+
+毎分 --rate 人の参加（既定は500人/分）と、--burst 人の同時参加に対して、従来と同じく
+イベントループ上で画像を描画する場合と CaptchaPool から取り出す場合の
+発行レイテンシ（p50/p99）とイベントループの遅延（最大値）を比較します。
+
+    python tests/bench_captcha.py [--rate 500] [--duration 10] [--burst 200] [--font path/to/font.ttf]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+moderation_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'moderation')
+if moderation_path not in sys.path:
+    sys.path.insert(0, moderation_path)
+
+from PIL import ImageFont
+
+from captcha_pool import CaptchaPool, generate_captcha_code, render_captcha_image
+
+
+class LoopLagMonitor:
+    """10msごとに起床し、予定時刻からの遅れを記録する"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.max_lag = max(self.max_lag, time.perf_counter() - start - self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+def inline_issue(font_path):
+    """従来の実装と同じく、ループ上でフォントを読み込んで描画する"""
+    async def issue():
+        question, answer = generate_captcha_code("text", 6)
+        font = ImageFont.truetype(font_path, 36) if font_path else ImageFont.load_default()
+        return question, answer, render_captcha_image(question, font)
+    return issue
+
+
+def pool_issue(pool):
+    async def issue():
+        return await pool.acquire("text", 6)
+    return issue
+
+
+async def replay(issue, joins, interval):
+    """interval 秒おきに参加を発生させ、各キャプチャの発行レイテンシを返す"""
+    latencies = []
+
+    async def join(arrived):
+        # 参加イベントが届いた時刻からキャプチャを送れるようになるまでの時間
+        await issue()
+        latencies.append(time.perf_counter() - arrived)
+
+    tasks = []
+    started = time.perf_counter()
+    for i in range(joins):
+        delay = started + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.get_running_loop().create_task(join(time.perf_counter())))
+    await asyncio.gather(*tasks)
+    return sorted(latencies)
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def measure(name, issue, joins, interval):
+    with LoopLagMonitor() as monitor:
+        latencies = await replay(issue, joins, interval)
+        # 最後にブロックされた分の遅延も記録させる
+        await asyncio.sleep(monitor.interval * 2)
+    print(f"{name:>14} {percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+          f"{monitor.max_lag * 1000:>12.2f}")
+
+
+async def run(rate, duration, burst, font_path, workers):
+    pool = CaptchaPool(workers=workers)
+    pool.start(font_path)
+    pool.warm("text", 6)
+    # ワーカーの起動と初回の補充を待つ
+    while len(pool.buffers[("text", 6)]) < pool.min_size:
+        await asyncio.sleep(0.05)
+
+    joins = int(rate * duration / 60)
+    interval = 60 / rate
+    print(f"font={font_path or 'default'} workers={workers}")
+    print(f"{'':>14} {'p50(ms)':>8} {'p99(ms)':>8} {'max lag(ms)':>12}")
+
+    print(f"-- {rate} joins/min for {duration}s ({joins} joins)")
+    await measure("inline", inline_issue(font_path), joins, interval)
+    await measure("pool", pool_issue(pool), joins, interval)
+
+    print(f"-- burst of {burst} joins")
+    await measure("inline", inline_issue(font_path), burst, 0)
+    await measure("pool", pool_issue(pool), burst, 0)
+
+    print(f"pool stats: {pool.stats} target={pool.targets[('text', 6)]}")
+    pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=500)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--burst', type=int, default=200)
+    parser.add_argument('--font', default=None)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(run(args.rate, args.duration, args.burst, args.font, args.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+データベースアクセスによるイベントループ遅延のベンチマーク
+
+ギルド設定の取得（ギルドと設定の2クエリ）を --concurrency 件同時に実行しながら、
+10ms ごとに起きるタスクの遅れ（ループ遅延）を測定します。
+SQLite に sleep_ms 関数を登録し、各クエリに --rtt ミリ秒の往復時間を加えて
+ネットワーク越しのデータベースを模擬します。
+
+    sync      : 従来の get_*_settings と同じく、同期セッションをイベントループ上で実行
+    threadpool: 同期セッションを run_in_threadpool で実行（移行前の呼び出し元）
+    async     : AsyncSession で実行（bot.src.db.async_database）
+
+    python tests/bench_db_loop_lag.py [--concurrency 50] [--rtt 2] [--rounds 3]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from bot.src.db import async_database
+from bot.src.db.models import Base, Guild, SpamSettings
+
+
+def _sleep_ms(ms):
+    time.sleep(ms / 1000)
+    return ms
+
+
+def _register_sleep(dbapi_connection, connection_record):
+    dbapi_connection.create_function('sleep_ms', 1, _sleep_ms)
+
+
+def sync_lookup(session_factory, guild_id, rtt):
+    with session_factory() as session:
+        guild = session.execute(
+            select(Guild).where(Guild.discord_id == guild_id, func.sleep_ms(rtt) >= 0)
+        ).scalars().first()
+        return session.execute(
+            select(SpamSettings).where(SpamSettings.guild_id == guild.id, func.sleep_ms(rtt) >= 0)
+        ).scalars().first()
+
+
+async def async_lookup(guild_id, rtt):
+    async with async_database.get_async_session() as session:
+        guild = (await session.execute(
+            select(Guild).where(Guild.discord_id == guild_id, func.sleep_ms(rtt) >= 0)
+        )).scalars().first()
+        return (await session.execute(
+            select(SpamSettings).where(SpamSettings.guild_id == guild.id, func.sleep_ms(rtt) >= 0)
+        )).scalars().first()
+
+
+async def measure(work, interval=0.01):
+    """work の実行中、interval ごとのタイマーがどれだけ遅れたかを記録する"""
+    lags = []
+    done = False
+
+    async def ticker():
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - start - interval) * 1000)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    done = True
+    await task
+    lags.sort()
+    return {
+        'elapsed_ms': elapsed * 1000,
+        'p50': statistics.median(lags),
+        'p99': lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+        'max': lags[-1],
+    }
+
+
+async def bench(concurrency, rtt, rounds):
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, 'bench.db')
+
+    sync_engine = create_engine(f'sqlite:///{path}')
+    event.listen(sync_engine, 'connect', _register_sleep)
+    Base.metadata.create_all(sync_engine)
+    session_factory = sessionmaker(bind=sync_engine)
+    guild_ids = [str(1000 + i) for i in range(concurrency)]
+    with session_factory() as session:
+        for guild_id in guild_ids:
+            guild = Guild(discord_id=guild_id, name=f"Guild-{guild_id}", owner_id="0")
+            session.add(guild)
+            session.flush()
+            session.add(SpamSettings(guild_id=guild.id))
+        session.commit()
+
+    engine = async_database.configure_async_engine(f'sqlite+aiosqlite:///{path}')
+    event.listen(engine.sync_engine, 'connect', _register_sleep)
+
+    async def run_sync():
+        async def one(guild_id):
+            return sync_lookup(session_factory, guild_id, rtt)
+        await asyncio.gather(*(one(g) for g in guild_ids))
+
+    async def run_threadpool():
+        await asyncio.gather(*(
+            async_database.run_in_threadpool(sync_lookup, session_factory, g, rtt) for g in guild_ids
+        ))
+
+    async def run_async():
+        await asyncio.gather(*(async_lookup(g, rtt) for g in guild_ids))
+
+    print(f"\n== {concurrency} concurrent settings lookups, {rtt}ms simulated RTT per query ==")
+    print(f"{'mode':<12}{'elapsed ms':>12}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}")
+    for name, work in (('sync', run_sync), ('threadpool', run_threadpool), ('async', run_async)):
+        results = [await measure(work) for _ in range(rounds)]
+        row = {key: statistics.median(r[key] for r in results) for key in results[0]}
+        print(f"{name:<12}{row['elapsed_ms']:>12.1f}{row['p50']:>10.2f}{row['p99']:>10.2f}{row['max']:>10.2f}")
+
+    await async_database.close_async_db()
+    sync_engine.dispose()
+    tmp.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--rtt', type=float, default=2.0)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(bench(args.concurrency, args.rtt, args.rounds))
+
+
+if __name__ == '__main__':
+    main()
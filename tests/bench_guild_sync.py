@@ -0,0 +1,94 @@
+"""
+起動時のギルド登録のベンチマーク
+
+従来の _register_guild と同じくギルドごとに get_or_create（コミット）と
+設定5行の作成（コミット）を行う方法と、reconcile_guilds による一括 upsert を
+SQLite ファイル上で比較します。
+
+    python tests/bench_guild_sync.py [--guilds 10000] [--legacy 1000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from bot.src.db import async_database
+from bot.src.db.guild_sync import SETTINGS_MODELS, reconcile_guilds
+from bot.src.db.models import Base, Guild
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.unavailable = False
+        self.name = f"guild{guild_id}"
+        self.icon = None
+        self.member_count = 100
+        self.owner_id = 1
+
+
+def legacy_register(session_factory, guild):
+    """従来の _register_guild と同じ処理（ギルドごとに2回コミット）"""
+    with session_factory() as session:
+        db_guild = session.query(Guild).filter_by(discord_id=str(guild.id)).first()
+        created = db_guild is None
+        if created:
+            db_guild = Guild(discord_id=str(guild.id), name=guild.name, owner_id=str(guild.owner_id))
+            session.add(db_guild)
+            session.commit()
+        db_guild.member_count = guild.member_count
+        if created:
+            for model in SETTINGS_MODELS:
+                session.add(model(guild=db_guild))
+        session.commit()
+
+
+async def bench(count, legacy_count):
+    tmp = tempfile.TemporaryDirectory()
+
+    path = os.path.join(tmp.name, 'legacy.db')
+    sync_engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(sync_engine)
+    session_factory = sessionmaker(bind=sync_engine)
+    start = time.perf_counter()
+    for i in range(legacy_count):
+        legacy_register(session_factory, FakeGuild(i + 1))
+    legacy = time.perf_counter() - start
+    sync_engine.dispose()
+    print(f"legacy per-guild     {legacy_count:>6} guilds  {legacy:8.2f}s  "
+          f"(~{legacy / legacy_count * count:.1f}s for {count})")
+
+    path = os.path.join(tmp.name, 'reconcile.db')
+    engine = async_database.configure_async_engine(f'sqlite+aiosqlite:///{path}')
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    guilds = [FakeGuild(i + 1) for i in range(count)]
+    for label, current in (("reconcile (cold)", guilds), ("reconcile (warm)", guilds),
+                           ("reconcile (1% churn)", guilds[count // 100:] + [FakeGuild(-i - 1) for i in range(count // 100)])):
+        stats = await reconcile_guilds(current)
+        print(f"{label:<21}{count:>6} guilds  {stats['elapsed_ms'] / 1000:8.2f}s  "
+              f"(joined {stats['joined']}, departed {stats['departed']})")
+    await async_database.close_async_db()
+    tmp.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--guilds', type=int, default=10_000)
+    parser.add_argument('--legacy', type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(bench(args.guilds, args.legacy))
+
+
+if __name__ == '__main__':
+    main()
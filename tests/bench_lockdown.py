@@ -0,0 +1,55 @@
+"""
+ロックダウンのベンチマーク
+
+モックしたHTTP層（1リクエストあたりの遅延を固定）に対して、従来の直列ロックダウンと
+LockdownManager によるロックダウン完了までの時間をチャンネル数ごとに比較します。
+
+    python tests/bench_lockdown.py [--latency 0.08] [--rate 40]
+"""
+import argparse
+import asyncio
+import time
+
+from test_lockdown import FakeBot, FakeChannel, FakeGuild, MemoryStore
+from modules.moderation.lockdown import LockdownManager
+
+
+async def serial_lock(guild):
+    """従来の実装と同じく1チャンネルずつ待つ"""
+    for channel in guild.channels:
+        overwrite = channel.overwrites_for(guild.default_role)
+        overwrite.update(send_messages=False, speak=False)
+        await channel.set_permissions(guild.default_role, overwrite=overwrite)
+
+
+async def run(channel_counts, latency, rate, concurrency):
+    print(f"latency={latency * 1000:.0f}ms rate={rate}/s concurrency={concurrency}")
+    print(f"{'channels':>8} {'serial(s)':>10} {'lock(s)':>8} {'restore(s)':>10} {'speedup':>8}")
+    for count in channel_counts:
+        guild = FakeGuild(count, [FakeChannel(i, latency=latency) for i in range(count)])
+        start = time.perf_counter()
+        await serial_lock(guild)
+        serial = time.perf_counter() - start
+
+        guild = FakeGuild(count, [FakeChannel(i, latency=latency) for i in range(count)])
+        manager = LockdownManager(FakeBot(), rate=rate, concurrency=concurrency, store=MemoryStore())
+        # バケットを空にして定常状態のレートで計測する
+        manager.budget._tokens = 0
+        locked = await manager.lock(guild, channels=guild.channels)
+        restored = await manager.restore(guild)
+        print(f"{count:>8} {serial:>10.2f} {locked.elapsed:>8.2f} {restored.elapsed:>10.2f} "
+              f"{serial / locked.elapsed:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.08)
+    parser.add_argument('--rate', type=float, default=40)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--channels', type=int, nargs='+', default=[25, 50, 100, 300])
+    args = parser.parse_args()
+    asyncio.run(run(args.channels, args.latency, args.rate, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+メッセージ検索・レポート集計のベンチマーク
+
+1つのギルドに --sizes 件（既定は10万件と100万件）のメッセージをキャッシュした状態で、
+従来の find_messages と同じ全件走査（to_dict・fromisoformat・lower）と、
+MessageIndex を使った検索・集計のレイテンシを比較します。本文は頻出語に加えて
+--vocabulary 語（既定は19万語）のランダムな単語を含み、部分一致の検索語について
+語彙の全件走査とn-gram索引（_Vocabulary.matching）の所要時間も比較します。
+
+    python tests/bench_message_index.py [--sizes 100000 1000000] [--vocabulary 190000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+logging_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'logging')
+if logging_path not in sys.path:
+    sys.path.insert(0, logging_path)
+
+from message_index import MessageIndex
+from message_store import CachedMessage
+
+WORDS = (
+    "hello world raid spam ban kick mute discord server bot role channel voice event "
+    "テスト こんにちは 荒らし 通報 ログ 削除 編集 参加 退出 お知らせ よろしく ありがとう"
+).split()
+NOW = 1_700_000_000.0
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_vocabulary(size, seed=1):
+    """ユーザー名・URL・typo などを想定したランダムな単語（3〜12文字）"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 12))))
+    return sorted(words)
+
+
+def make_messages(count, vocabulary=(), seed=1):
+    rng = random.Random(seed)
+    span = 30 * 86400
+    messages = []
+    for i in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(2, 12))]
+        if vocabulary:
+            # 語彙の各単語が少なくとも一度は現れるように順番に1語、さらにランダムに1語
+            words.append(vocabulary[i % len(vocabulary)])
+            words.append(rng.choice(vocabulary))
+        content = " ".join(words)
+        messages.append(CachedMessage(
+            i + 1, 1, rng.randint(1, 2000), f"user{i % 2000}", 100 + rng.randint(0, 49), "general",
+            content, NOW - span + span * i / count
+        ))
+    return messages
+
+
+def legacy_find(messages, search_term=None, author_id=None, after=None, limit=100):
+    """従来の find_messages と同じ全件走査"""
+    results = []
+    for record in messages:
+        message_data = record.to_dict()
+        if message_data.get('deleted', False):
+            continue
+        if author_id and message_data['author_id'] != author_id:
+            continue
+        created_at = datetime.fromisoformat(message_data['created_at'])
+        if after and created_at < after:
+            continue
+        if search_term and search_term.lower() not in message_data.get('content', '').lower():
+            continue
+        results.append(message_data)
+        if len(results) >= limit:
+            break
+    results.sort(key=lambda m: m['created_at'], reverse=True)
+    return results
+
+
+def legacy_report(messages, after):
+    """従来の generate_message_report の集計（limit=10000 の検索結果を走査）"""
+    found = legacy_find(messages, after=after, limit=10000)
+    authors, channels = {}, {}
+    hourly, daily = [0] * 24, [0] * 7
+    for message in found:
+        authors[message['author_id']] = authors.get(message['author_id'], 0) + 1
+        channels[message['channel_id']] = channels.get(message['channel_id'], 0) + 1
+        created_at = datetime.fromisoformat(message['created_at'])
+        hourly[created_at.hour] += 1
+        daily[created_at.weekday()] += 1
+    return len(found)
+
+
+def indexed_find(index, lookup, search_term=None, author_id=None, after=None, limit=100):
+    """MessageStore.search と同じく、索引の候補を本文で確認して limit 件まで取り出す"""
+    needle = search_term.lower() if search_term else None
+    results = []
+    for message_id in index.search(1, term=search_term, author_id=author_id, after=after):
+        record = lookup[message_id - 1]
+        if needle and needle not in record.content.lower():
+            continue
+        results.append(record.to_dict())
+        if len(results) >= limit:
+            break
+    return results
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def legacy_vocabulary_scan(index, token):
+    """従来の _term_rows と同じく、語彙全体を Python のループで走査する"""
+    return [word for word in index.guilds[1].postings if token in word]
+
+
+def bench(size, vocabulary, repeat):
+    messages = make_messages(size, make_vocabulary(vocabulary) if vocabulary else ())
+    start = time.perf_counter()
+    index = MessageIndex()
+    for message in messages:
+        index.add(message)
+    build = time.perf_counter() - start
+
+    after_dt = datetime.utcfromtimestamp(NOW) - timedelta(days=7)
+    # naive UTC の日時をUNIX時間に変換する
+    after = (after_dt - datetime(1970, 1, 1)).total_seconds()
+    cases = [
+        ("term 'raid' (limit 100)",
+         lambda: legacy_find(messages, search_term="raid"),
+         lambda: indexed_find(index, messages, search_term="raid")),
+        ("term '荒らし' + author",
+         lambda: legacy_find(messages, search_term="荒らし", author_id=7),
+         lambda: indexed_find(index, messages, search_term="荒らし", author_id=7)),
+        ("rare term 'zzz'",
+         lambda: legacy_find(messages, search_term="zzz"),
+         lambda: indexed_find(index, messages, search_term="zzz")),
+        ("partial term 'qxw'",
+         lambda: legacy_find(messages, search_term="qxw"),
+         lambda: indexed_find(index, messages, search_term="qxw")),
+        ("report 7 days",
+         lambda: legacy_report(messages, after_dt),
+         lambda: index.report(1, after=after)),
+    ]
+
+    print(f"\n== {size:,} messages (index build {build:.1f}s) ==")
+    print(f"{'query':<28}{'legacy ms':>12}{'indexed ms':>12}{'speedup':>10}")
+    for name, legacy, indexed in cases:
+        legacy_ms = timed(legacy, max(1, repeat // 2))
+        indexed_ms = timed(indexed, repeat)
+        print(f"{name:<28}{legacy_ms:>12.1f}{indexed_ms:>12.2f}{legacy_ms / indexed_ms:>9.0f}x")
+
+    guild = index.guilds[1]
+    print(f"\nvocabulary {len(guild.postings):,} tokens")
+    print(f"{'partial lookup':<28}{'scan ms':>12}{'indexed ms':>12}{'speedup':>10}")
+    for token in ("raid", "qxw", "ab", "zzzzzz"):
+        scan_ms = timed(lambda: legacy_vocabulary_scan(index, token), repeat)
+        indexed_ms = timed(lambda: guild.vocabulary.matching(token), repeat)
+        print(f"{repr(token):<28}{scan_ms:>12.2f}{indexed_ms:>12.3f}{scan_ms / indexed_ms:>9.0f}x")
+
+    report = index.report(1, after=after)
+    print(f"report covers {report['total']:,} messages "
+          f"(legacy stops at {legacy_report(messages, after_dt):,})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--vocabulary', type=int, default=190_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.vocabulary, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+翻訳のベンチマーク
+
+ローカルのスタブサーバー（応答の遅延は --latency 秒）に対して、--messages 件のメッセージ
+（種類は --distinct 件、同じお知らせが繰り返し翻訳される想定）を翻訳し、
+従来と同じく呼び出しごとにセッションを作る場合と TranslationService の
+translate_many を使う場合の所要時間とリクエスト数を比較します。
+
+    python tests/bench_translation.py [--messages 500] [--distinct 50] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+for path in (current_dir, src_path):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import aiohttp
+
+from modules.utility.translation_service import MyMemoryBackend, TranslationService
+from translation_stub import TranslationStubServer
+
+
+async def legacy_translate(base_url, text, target_lang):
+    """従来の実装と同じく、呼び出しごとにセッションを作成して翻訳する"""
+    async with aiohttp.ClientSession() as session:
+        return await MyMemoryBackend(base_url).translate(session, text, None, target_lang)
+
+
+async def run(messages, distinct, latency):
+    server = await TranslationStubServer(latency=latency).start()
+    texts = [f"お知らせ {i % distinct}" for i in range(messages)]
+    print(f"{messages} messages ({distinct} distinct), latency={latency * 1000:.0f}ms")
+    print(f"{'':>10} {'time(s)':>8} {'requests':>9}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(legacy_translate(server.base_url, text, 'en') for text in texts))
+    print(f"{'legacy':>10} {time.perf_counter() - started:>8.2f} {len(server.requests):>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'translations.sqlite3')
+        for name in ('service', 'restarted'):
+            server.requests.clear()
+            service = TranslationService(None, backend=MyMemoryBackend(server.base_url), cache_path=cache_path)
+            started = time.perf_counter()
+            await service.translate_many(texts, 'en')
+            print(f"{name:>10} {time.perf_counter() - started:>8.2f} {len(server.requests):>9}")
+            print(f"{'':>10} stats: {service.stats}")
+            await service.close()
+
+    await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--distinct', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.distinct, args.latency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""
+テストとベンチマークでモデルを SQLite（aiosqlite）上に作成するための補助
+
+PostgreSQL の ARRAY 列を JSON 文字列として保存します。
+"""
+import json
+import os
+import sqlite3
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_path = os.path.join(current_dir, '..')
+if root_path not in sys.path:
+    sys.path.insert(0, root_path)
+
+from sqlalchemy import ARRAY
+from sqlalchemy.ext.compiler import compiles
+
+
+@compiles(ARRAY, 'sqlite')
+def _compile_array(element, compiler, **kw):
+    return 'JSON'
+
+
+sqlite3.register_adapter(list, json.dumps)
@@ -0,0 +1,89 @@
+import sys
+import os
+import unittest
+
+# sys.pathにtestsを追加して、SQLite用の補助（リポジトリのルートも追加する）をインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from bot.src.db import async_database
+from bot.src.db.identity_map import guild_ids, user_ids
+from bot.src.db.models import Base, AuditLog, User
+from bot.src.db.repository import (
+    AsyncAuditLogRepository,
+    AsyncAutoResponseSettingsRepository,
+    AsyncGuildRepository,
+    AsyncSpamSettingsRepository
+)
+
+
+class TestAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # テストごとに新しいデータベースを使うため、内部IDの対応表も空にする
+        guild_ids.clear()
+        user_ids.clear()
+        engine = async_database.configure_async_engine('sqlite+aiosqlite://')
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def asyncTearDown(self):
+        await async_database.close_async_db()
+
+    async def test_settings_helpers_create_defaults_once(self):
+        first = await async_database.get_spam_settings("123")
+        second = await async_database.get_spam_settings("123")
+        self.assertEqual(first.id, second.id)
+        # セッションを閉じた後でもデフォルト値を読める
+        self.assertTrue(second.enabled)
+
+        settings = await async_database.get_auto_response_settings("123")
+        self.assertEqual(settings.guild_id, first.guild_id)
+
+        async with async_database.get_async_session() as session:
+            guild = await AsyncGuildRepository(session).get_guild_by_id("123")
+            self.assertEqual(guild.name, "Guild-123")
+
+    async def test_log_audit_event_uses_discord_user_id(self):
+        log_id = await async_database.log_audit_event("1", "42", "ban", target_id="7", details={"reason": "spam"})
+        await async_database.log_audit_event("1", "42", "kick")
+
+        async with async_database.get_async_session() as session:
+            log = await session.get(AuditLog, log_id)
+            user = await session.get(User, log.user_id)
+            self.assertEqual(user.user_id, "42")
+            self.assertEqual(log.details, {"reason": "spam"})
+
+            logs = await AsyncAuditLogRepository(session).get_logs_by_user("42")
+            self.assertEqual(sorted(l.action for l in logs), ["ban", "kick"])
+
+    async def test_repositories(self):
+        async with async_database.get_async_session() as session:
+            spam_repo = AsyncSpamSettingsRepository(session)
+            self.assertTrue(await spam_repo.update_settings("5", {'mention_threshold': 9, 'enabled': False}))
+            self.assertTrue(await spam_repo.update_settings("5", {'mention_threshold': 3}))
+            settings = await spam_repo.get_settings("5")
+            self.assertEqual(settings.mention_threshold, 3)
+            self.assertFalse(settings.enabled)
+
+            auto_repo = AsyncAutoResponseSettingsRepository(session)
+            self.assertTrue(await auto_repo.add_custom_response("5", "hi", ["hello"]))
+            self.assertTrue(await auto_repo.add_custom_response("5", "bye", ["see you"]))
+            self.assertTrue(await auto_repo.remove_custom_response("5", "hi"))
+            self.assertEqual(await auto_repo.get_all_custom_responses("5"), {"bye": ["see you"]})
+            self.assertTrue(await auto_repo.delete_settings("5"))
+            self.assertIsNone(await auto_repo.get_settings("5"))
+
+            audit_repo = AsyncAuditLogRepository(session)
+            self.assertIsNotNone(await audit_repo.add_log("5", "9", "warn"))
+            self.assertEqual(len(await audit_repo.get_recent_actions("5")), 1)
+
+    async def test_run_in_threadpool(self):
+        import threading
+        name = await async_database.run_in_threadpool(lambda: threading.current_thread().name)
+        self.assertTrue(name.startswith('db-sync'))
+
+
+if __name__ == '__main__':
+    unittest.main()
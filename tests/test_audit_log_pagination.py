@@ -0,0 +1,142 @@
+import sys
+import os
+import unittest
+from datetime import datetime, timedelta
+
+# sys.pathにtestsを追加して、SQLite用の補助（リポジトリのルートも追加する）をインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from bot.src.db.identity_map import guild_ids, user_ids
+from bot.src.db.models import AuditLog, Base, Guild, ModerationAction, User
+from bot.src.db.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_page, next_cursor
+from bot.src.db.repository import AuditLogRepository
+
+
+class TestAuditLogPagination(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        guild_ids.clear()
+        user_ids.clear()
+        cls.engine = create_engine('sqlite://')
+        Base.metadata.create_all(cls.engine)
+        cls.Session = sessionmaker(bind=cls.engine)
+
+        base = datetime(2024, 1, 1)
+        with cls.Session() as session:
+            guilds = [Guild(discord_id=str(i), name=f"g{i}", owner_id="0") for i in range(1, 21)]
+            users = [User(user_id=str(i), username=f"u{i}") for i in range(1, 51)]
+            session.add_all(guilds + users)
+            session.flush()
+            rows = []
+            for i in range(6000):
+                rows.append({
+                    'guild_id': guilds[i % 20].id,
+                    'user_id': users[i % 50].id,
+                    'action': ('ban', 'kick', 'warn')[i % 3],
+                    # 同じ時刻の行を混ぜて、id による並びの確定を確かめる
+                    'created_at': base + timedelta(minutes=i // 4),
+                    'details': {},
+                })
+            session.bulk_insert_mappings(AuditLog, rows)
+            session.add_all(
+                ModerationAction(guild_id=guilds[0].id, moderator_id="1", target_id="2",
+                                 action_type="warn", created_at=base + timedelta(minutes=i))
+                for i in range(500)
+            )
+            session.commit()
+        with cls.engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        guild_ids.clear()
+        user_ids.clear()
+
+    def setUp(self):
+        self.session = self.Session()
+        self.repo = AuditLogRepository(self.session)
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._capture)
+
+    def tearDown(self):
+        event.remove(self.engine, 'before_cursor_execute', self._capture)
+        self.session.close()
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            self.statements.append((statement, parameters))
+
+    def plans(self):
+        """実行されたSELECTの実行計画を返す"""
+        event.remove(self.engine, 'before_cursor_execute', self._capture)
+        try:
+            with self.engine.connect() as conn:
+                return [
+                    " / ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params))
+                    for sql, params in self.statements if 'audit_logs' in sql or 'moderation_actions' in sql
+                ]
+        finally:
+            event.listen(self.engine, 'before_cursor_execute', self._capture)
+
+    def assert_index_scan(self, index_name):
+        plans = self.plans()
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertIn(f"USING INDEX {index_name}", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+        self.statements = []
+
+    def walk(self, fetch, limit):
+        rows, cursor = [], None
+        while True:
+            page = fetch(cursor)
+            rows.extend(page)
+            cursor = next_cursor(page, limit)
+            if cursor is None:
+                return rows
+
+    def test_keyset_pages_cover_all_rows_in_order(self):
+        rows = self.walk(lambda cursor: self.repo.get_logs_by_guild("3", limit=37, cursor=cursor), 37)
+        self.assertEqual(len(rows), 300)
+        keys = [(row.created_at, row.id) for row in rows]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(len(set(keys)), 300)
+
+    def test_guild_queries_use_index(self):
+        first = self.repo.get_logs_by_guild("3", limit=20)
+        self.repo.get_logs_by_guild("3", limit=20, cursor=next_cursor(first, 20))
+        self.assert_index_scan("ix_audit_logs_guild_created")
+
+        first = self.repo.get_logs_by_guild("3", limit=20, action_type="ban")
+        self.repo.get_logs_by_action("ban", limit=20, guild_id="3", cursor=next_cursor(first, 20))
+        self.assert_index_scan("ix_audit_logs_guild_action_created")
+
+    def test_user_query_uses_index(self):
+        first = self.repo.get_logs_by_user("7", limit=10)
+        self.assertEqual(len(first), 10)
+        self.repo.get_logs_by_user("7", limit=10, cursor=next_cursor(first, 10))
+        self.assert_index_scan("ix_audit_logs_user_created")
+
+    def test_moderation_actions_use_index(self):
+        guild_pk = self.repo.guild_repo.get_guild_pk("1")
+        query = self.session.query(ModerationAction).filter(ModerationAction.guild_id == guild_pk)
+        page = keyset_page(query, ModerationAction).limit(50).all()
+        keyset_page(query, ModerationAction, next_cursor(page, 50)).limit(50).all()
+        self.assert_index_scan("ix_moderation_actions_guild_created")
+
+    def test_cursor_round_trip(self):
+        created_at = datetime(2024, 5, 6, 7, 8, 9, 123456)
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+        with self.assertRaises(InvalidCursorError):
+            decode_cursor("not-a-cursor")
+
+
+if __name__ == '__main__':
+    unittest.main()
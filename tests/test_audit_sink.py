@@ -0,0 +1,132 @@
+import sys
+import os
+import asyncio
+import tempfile
+import unittest
+
+# sys.pathにbot/src/databaseを追加して、audit_sinkをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+database_path = os.path.join(current_dir, '..', 'bot', 'src', 'database')
+if database_path not in sys.path:
+    sys.path.insert(0, database_path)
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from audit_sink import AuditSink, AuditLogWriter
+import models as database_models
+
+
+class FakeWriter:
+    def __init__(self):
+        self.rows = []
+        self.calls = 0
+        self.down = False
+
+    async def __call__(self, records):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.down:
+            raise ConnectionError("database unavailable")
+        if any(r['action_type'] == 'bad' for r in records):
+            raise ValueError("invalid record")
+        self.rows.extend(r['target_id'] for r in records)
+
+
+class TestAuditSink(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.tmp.name, 'spill', 'audit.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_batches_in_background(self):
+        writer = FakeWriter()
+        sink = AuditSink(writer, self.spill_path, batch_size=100, flush_interval=0.01)
+        for i in range(1050):
+            sink.record(guild_id=1, action_type="role_create", user_id=2, target_id=i)
+        # record() はデータベースを待たない
+        self.assertEqual(writer.calls, 0)
+        await asyncio.sleep(0.1)
+        self.assertEqual(writer.rows, list(range(1050)))
+        self.assertEqual(writer.calls, 11)
+        await sink.close()
+
+    async def test_outage_spills_and_replays_in_order(self):
+        writer = FakeWriter()
+        writer.down = True
+        sink = AuditSink(writer, self.spill_path, max_queue=20, batch_size=5, flush_interval=60)
+        for i in range(30):
+            sink.record(guild_id=1, action_type="kick", target_id=i, details={"n": i})
+        self.assertEqual(await sink.flush(), 0)
+        for i in range(30, 40):
+            sink.record(guild_id=1, action_type="kick", target_id=i)
+        # 障害中は再試行まで書き込まない
+        calls = writer.calls
+        self.assertEqual(await sink.flush(), 0)
+        self.assertEqual(writer.calls, calls)
+        self.assertTrue(sink.metrics()["outage"])
+        self.assertGreater(sink.metrics()["spill_bytes"], 0)
+
+        writer.down = False
+        self.assertEqual(await sink.flush(force=True), 40)
+        self.assertEqual(writer.rows, list(range(40)))
+        self.assertFalse(os.path.exists(self.spill_path))
+        await sink.close()
+
+    async def test_bad_record_is_rejected_alone(self):
+        writer = FakeWriter()
+        sink = AuditSink(writer, self.spill_path, flush_interval=60)
+        sink.record(guild_id=1, action_type="ban", target_id=1)
+        sink.record(guild_id=1, action_type="bad", target_id=2)
+        sink.record(guild_id=1, action_type="ban", target_id=3)
+        await sink.flush()
+        self.assertEqual(writer.rows, [1, 3])
+        self.assertEqual(sink.stats["rejected"], 1)
+        await sink.close()
+
+    async def test_close_keeps_unwritten_records_on_disk(self):
+        writer = FakeWriter()
+        writer.down = True
+        sink = AuditSink(writer, self.spill_path, flush_interval=60)
+        for i in range(5):
+            sink.record(guild_id=1, action_type="mute", target_id=i)
+        await sink.close()
+
+        # 再起動後の最初の書き込みで退避分を書き戻す
+        writer.down = False
+        restarted = AuditSink(writer, self.spill_path, flush_interval=60)
+        restarted.record(guild_id=1, action_type="mute", target_id=5)
+        await restarted.flush()
+        self.assertEqual(writer.rows, list(range(6)))
+        await restarted.close()
+
+
+class TestAuditLogWriter(unittest.IsolatedAsyncioTestCase):
+    async def test_multi_row_insert_creates_missing_guilds(self):
+        engine = create_async_engine('sqlite+aiosqlite://')
+        async with engine.begin() as conn:
+            await conn.run_sync(database_models.Base.metadata.create_all)
+        writer = AuditLogWriter(engine, database_models.AuditLog.__table__, database_models.Guild.__table__)
+
+        tmp = tempfile.TemporaryDirectory()
+        sink = AuditSink(writer, os.path.join(tmp.name, 'audit.jsonl'), flush_interval=60)
+        for i in range(10):
+            sink.record(guild_id=100 + i % 3, action_type="warn", user_id=7, target_id=i, details={"i": i})
+        self.assertEqual(await sink.flush(), 10)
+        self.assertEqual(writer.known_guilds, {100, 101, 102})
+
+        async with engine.connect() as conn:
+            self.assertEqual((await conn.execute(select(func.count()).select_from(database_models.Guild))).scalar(), 3)
+            details = (await conn.execute(
+                select(database_models.AuditLog.details).order_by(database_models.AuditLog.target_id)
+            )).scalars().all()
+        self.assertEqual(details[4], {"i": 4})
+        await sink.close()
+        await engine.dispose()
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+import os
+import io
+import asyncio
+import unittest
+
+# sys.pathにbot/src/modules/moderationを追加して、captcha_poolをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+moderation_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'moderation')
+if moderation_path not in sys.path:
+    sys.path.insert(0, moderation_path)
+
+from PIL import Image
+
+from captcha_pool import CaptchaPool, generate_captcha_code, render_batch
+
+
+class TestCaptchaPool(unittest.IsolatedAsyncioTestCase):
+    def test_generate_math_code(self):
+        for _ in range(50):
+            question, answer = generate_captcha_code("math")
+            self.assertEqual(str(eval(question.replace("= ?", ""))), answer)
+
+    def test_render_batch(self):
+        batch = render_batch("text", 8, 3)
+        self.assertEqual(len(batch), 3)
+        for question, answer, image in batch:
+            self.assertEqual(question, answer)
+            self.assertEqual(len(answer), 8)
+            self.assertEqual(Image.open(io.BytesIO(image)).size, (280, 120))
+
+    async def test_acquire_refills_and_grows(self):
+        pool = CaptchaPool(workers=1, min_size=4, max_size=16, batch_size=4)
+        pool.start(None)
+        try:
+            # バッファが空の状態で同時に取り出すと、補充を待ちつつ目標サイズが増える
+            results = await asyncio.gather(*(pool.acquire("text", 6) for _ in range(6)))
+            self.assertEqual(len({answer for _, answer, _ in results}), 6)
+            self.assertEqual(pool.stats["misses"], 6)
+            self.assertEqual(pool.targets[("text", 6)], 16)
+
+            # 補充が終わるとイベントループ上では取り出すだけになる
+            await pool._refilling[("text", 6)]
+            self.assertGreaterEqual(len(pool.buffers[("text", 6)]), 16)
+            question, answer, _ = await pool.acquire("text", 6)
+            self.assertEqual(pool.stats["hits"], 1)
+
+            # 数学の問題は長さに関係なく同じバッファを使う
+            question, answer, _ = await pool.acquire("math", 99)
+            self.assertIn(("math", 0), pool.buffers)
+            self.assertTrue(question.endswith("= ?"))
+        finally:
+            pool.close()
+
+
+    async def test_acquire_waits_for_font(self):
+        pool = CaptchaPool(workers=1, min_size=2, max_size=4, batch_size=2)
+        try:
+            # フォントが決まる前の取り出しは描画を始めずに待つ
+            waiting = asyncio.ensure_future(pool.acquire("text", 4))
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiting.done())
+            self.assertEqual(pool.stats["rendered"], 0)
+
+            pool.start(None)
+            question, answer, _ = await asyncio.wait_for(waiting, 30)
+            self.assertEqual(len(answer), 4)
+
+            # フォントが変わっても待っている取り出し要求は取り消されない
+            waiting = asyncio.ensure_future(pool.acquire("math"))
+            await asyncio.sleep(0)
+            pool.start("missing-font.ttf")
+            question, answer, _ = await asyncio.wait_for(waiting, 30)
+            self.assertTrue(question.endswith("= ?"))
+        finally:
+            pool.close()
+
+        # 閉じた後に残っていた取り出し要求は例外で終わる（CancelledError にはしない）
+        waiting = asyncio.ensure_future(pool.acquire("text", 5))
+        await asyncio.sleep(0)
+        pool.close()
+        with self.assertRaises(RuntimeError):
+            await waiting
+
+
+if __name__ == '__main__':
+    unittest.main()
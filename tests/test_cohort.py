@@ -0,0 +1,105 @@
+import sys
+import os
+import asyncio
+import unittest
+
+# sys.pathにbot/srcを追加して、CohortEnforcerをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from modules.moderation.cohort import CohortEnforcer
+from modules.moderation.lockdown import RateBudget
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.log_channel = FakeChannel()
+
+    def get_channel(self, channel_id):
+        return self.log_channel
+
+    def get_role(self, role_id):
+        return None
+
+
+class FakeMember:
+    def __init__(self, member_id, guild):
+        self.id = member_id
+        self.guild = guild
+        self.banned = False
+        self.kicked = False
+
+    async def ban(self, *, reason=None, delete_message_days=1):
+        # IDが7の倍数のユーザーは失敗扱い
+        if self.id % 7 == 0:
+            raise RuntimeError("forbidden")
+        self.banned = True
+
+    async def kick(self, *, reason=None):
+        if self.id % 5 == 0:
+            raise RuntimeError("forbidden")
+        self.kicked = True
+
+
+class FakeBot:
+    def __init__(self):
+        self.loop = asyncio.get_event_loop()
+
+
+class TestCohortEnforcer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bot = FakeBot()
+        self.tempbanned = []
+        self.enforcer = CohortEnforcer(
+            self.bot, window=0.05, budget=RateBudget(rate=100000),
+            on_tempban=lambda guild, ids: self.tempbanned.extend(ids)
+        )
+        self.settings = {"logChannelId": 1}
+
+    async def test_ban_cohort(self):
+        guild = FakeGuild(1)
+        members = [FakeMember(i, guild) for i in range(1, 451)]
+        for member in members:
+            await self.enforcer.submit(member, "tempban", self.settings)
+        for _ in range(100):
+            if self.enforcer.stats["members"] == 450:
+                break
+            await asyncio.sleep(0.05)
+
+        progress = self.enforcer.progress[guild.id]
+        # BANはメンバーごとのリクエストを並行して送る
+        self.assertEqual(progress.individual_requests, progress.total)
+        self.assertEqual(self.enforcer.stats["members"], 450)
+        self.assertEqual(self.enforcer.stats["failed"], 450 // 7)
+        self.assertEqual(len(self.tempbanned), 450 - 450 // 7)
+        self.assertEqual(sorted(self.tempbanned), [m.id for m in members if m.banned])
+        # ログはコホートごとに1件
+        self.assertEqual(len(guild.log_channel.sent), self.enforcer.stats["cohorts"])
+        self.assertIsNone(self.enforcer.get_progress(999))
+
+    async def test_kick_failures_counted(self):
+        guild = FakeGuild(3)
+        members = [FakeMember(i, guild) for i in range(1, 21)]
+        for member in members:
+            await self.enforcer.submit(member, "kick", self.settings)
+        progress = await self.enforcer.flush(guild)
+
+        self.assertEqual(progress.to_dict()["by_action"], {"kick": {"succeeded": 16, "failed": 4}})
+        self.assertEqual(sorted(progress.failed_ids), [5, 10, 15, 20])
+        self.assertEqual(len(guild.log_channel.sent), 1)
+        self.assertIn("失敗 4人", guild.log_channel.sent[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import os
+import unittest
+
+# sys.pathにtestsを追加して、SQLite用の補助（リポジトリのルートも追加する）をインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from sqlalchemy import text
+
+from bot.src.db import async_database, engine as engine_factory
+from bot.src.db.engine import _urls, connection_report, plan_pools
+
+
+class TestPoolPlan(unittest.TestCase):
+    def test_budget_is_never_exceeded(self):
+        for budget in range(2, 40):
+            for sync in range(0, 10):
+                pools = plan_pools(budget, sync)
+                total = sum(pool['pool_size'] + pool['max_overflow'] for pool in pools.values())
+                self.assertEqual(total, budget)
+                self.assertGreaterEqual(pools['sync']['pool_size'], 1)
+                self.assertGreaterEqual(pools['async']['pool_size'], 1)
+
+    def test_default_split(self):
+        self.assertEqual(plan_pools(20, 4), {
+            'sync': {'pool_size': 4, 'max_overflow': 0},
+            'async': {'pool_size': 8, 'max_overflow': 8},
+        })
+
+    def test_urls_share_one_database(self):
+        urls = _urls({
+            'url': None, 'host': 'db', 'port': '5432', 'database': 'shardbot',
+            'user': 'bot', 'password': 'p@ss',
+        })
+        self.assertEqual(urls['sync'].drivername, 'postgresql+psycopg2')
+        self.assertEqual(urls['async'].drivername, 'postgresql+asyncpg')
+        self.assertEqual(urls['async'].password, 'p@ss')
+
+        urls = _urls({'url': 'sqlite:///bot.db'})
+        self.assertEqual(str(urls['async']), 'sqlite+aiosqlite:///bot.db')
+
+
+class TestSharedEngine(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = async_database.configure_async_engine('sqlite+aiosqlite://')
+
+    async def asyncTearDown(self):
+        await async_database.close_async_db()
+
+    async def test_both_stacks_use_one_engine_and_peak_is_reported(self):
+        self.assertIs(async_database.get_async_engine(), engine_factory.get_async_engine())
+        before = connection_report()['peak_in_use']
+        async with self.engine.connect() as first:
+            await first.execute(text("SELECT 1"))
+            self.assertGreaterEqual(connection_report()['in_use'], 1)
+        report = connection_report()
+        self.assertGreaterEqual(report['peak_in_use'], max(before, 1))
+        self.assertIn('async', report['pools'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import sys
+import os
+import json
+import tempfile
+import unittest
+
+# sys.pathにbot/src/modules/loggingを追加して、error_loggerをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+logging_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'logging')
+if logging_path not in sys.path:
+    sys.path.insert(0, logging_path)
+
+from error_logger import ErrorLogger, fingerprint_error
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = []
+
+    async def send(self, content=None, embed=None, file=None):
+        self.sent.append(embed or file or content)
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    async def fetchval(self, query, guild_id):
+        return self.db.channels.get(guild_id)
+
+
+class FakeDB:
+    def __init__(self, channels, fail=False):
+        self.channels = channels
+        self.fail = fail
+        self.lookups = 0
+
+    def acquire(self):
+        db = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                db.lookups += 1
+                if db.fail:
+                    raise ConnectionError("database unavailable")
+                return FakeConnection(db)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Acquire()
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+
+
+class FakeBot:
+    def __init__(self, db, channels):
+        self.db = db
+        self.error_channel_id = 999
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+def fail_upstream(user_id):
+    raise ConnectionError(f"upstream timed out for user {user_id}")
+
+
+def fail_elsewhere():
+    raise ConnectionError("upstream timed out")
+
+
+def capture(func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        return e
+
+
+class TestFingerprint(unittest.TestCase):
+    def test_same_site_same_fingerprint(self):
+        first = capture(fail_upstream, 1)
+        second = capture(fail_upstream, 2)
+        self.assertEqual(fingerprint_error(first), fingerprint_error(second))
+        self.assertNotEqual(fingerprint_error(first), fingerprint_error(capture(fail_elsewhere)))
+        self.assertNotEqual(fingerprint_error(first), fingerprint_error(capture(int, "x")))
+
+
+class TestErrorLogger(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_storm_is_suppressed_and_digested(self):
+        guild_channel = FakeChannel(10)
+        global_channel = FakeChannel(999)
+        db = FakeDB({1: 10})
+        error_logger = ErrorLogger(FakeBot(db, [guild_channel, global_channel]))
+        error_logger.history_path = os.path.join(self.tmp.name, 'error_history.json')
+        guilds = [FakeGuild(i) for i in range(1, 6)]
+
+        for i in range(200):
+            await error_logger.log_error(capture(fail_upstream, i), command="ping", guild=guilds[i % 5])
+
+        # 詳細な通知は指紋ごとのバースト分だけ送られ、チャンネルIDはギルドごとに1回だけ問い合わせる
+        self.assertEqual(error_logger.stats["notified"], error_logger.notify_burst)
+        self.assertEqual(error_logger.stats["suppressed"], 200 - error_logger.notify_burst)
+        self.assertEqual(len(guild_channel.sent) + len(global_channel.sent), error_logger.notify_burst)
+        self.assertLessEqual(db.lookups, error_logger.notify_burst)
+
+        group = next(iter(error_logger.groups.values()))
+        self.assertEqual(len(error_logger.groups), 1)
+        self.assertEqual(group.count, 200)
+        self.assertEqual(len(group.guild_ids), 5)
+        self.assertLessEqual(group.first_seen, group.last_seen)
+
+        # 抑制したエラーはダイジェスト1件にまとめてグローバルチャンネルへ送る
+        before = len(global_channel.sent)
+        self.assertTrue(await error_logger.send_digest())
+        digest = global_channel.sent[before]
+        self.assertIn(f"{200 - error_logger.notify_burst}件", digest.description)
+        self.assertEqual(group.suppressed, 0)
+        self.assertFalse(await error_logger.send_digest())
+        await error_logger.close()
+
+        # 履歴は終了時にまとめて保存される
+        with open(error_logger.history_path, encoding='utf-8') as f:
+            history = json.load(f)
+        self.assertEqual(history['error_groups'][0]['count'], 200)
+        self.assertEqual(len(history['error_history']['ConnectionError']), 100)
+
+    async def test_channel_lookup_cached_when_db_is_down(self):
+        global_channel = FakeChannel(999)
+        db = FakeDB({}, fail=True)
+        error_logger = ErrorLogger(FakeBot(db, [global_channel]))
+        error_logger.history_path = os.path.join(self.tmp.name, 'error_history.json')
+        error_logger.notify_burst = 100
+        guild = FakeGuild(1)
+
+        await error_logger.log_error(capture(fail_upstream, 1), guild=guild)
+        await error_logger.log_error(capture(fail_elsewhere), guild=guild)
+        await error_logger.log_error(capture(int, "x"), guild=guild)
+
+        # DBの障害時もギルドごとに1回しか問い合わせず、グローバルチャンネルに送る
+        self.assertEqual(db.lookups, 1)
+        self.assertEqual(len(global_channel.sent), 3)
+
+        # 設定変更はキャッシュに反映される
+        guild_channel = FakeChannel(20)
+        error_logger.bot.channels[20] = guild_channel
+        error_logger.set_error_channel(1, 20)
+        await error_logger.log_error(capture(fail_upstream, 2), guild=guild)
+        self.assertEqual(len(guild_channel.sent), 1)
+        self.assertEqual(db.lookups, 1)
+        await error_logger.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
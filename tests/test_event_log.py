@@ -0,0 +1,96 @@
+import sys
+import os
+import asyncio
+import glob
+import tempfile
+import time
+import unittest
+
+# sys.pathにbot/src/modules/loggingを追加して、event_logをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+logging_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'logging')
+if logging_path not in sys.path:
+    sys.path.insert(0, logging_path)
+
+from event_log import EventLogWriter, read_segment
+
+
+def read_stream(directory, guild_id, event_type):
+    """ストリームの全セグメントを開始時刻順に読み込む"""
+    paths = glob.glob(os.path.join(directory, str(guild_id), event_type, '*'))
+    paths.sort(key=lambda p: int(os.path.basename(p).split('.')[0].split('-')[0]))
+    records = []
+    for path in paths:
+        records.extend(read_segment(path))
+    return records
+
+
+class TestEventLogWriter(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_batched_segmented_writes(self):
+        writer = EventLogWriter(self.directory, segment_bytes=20_000, flush_interval=0.01,
+                                compression='gzip')
+        await writer.start()
+        for i in range(3000):
+            await writer.write(i % 3, 'message_create' if i % 2 else 'message_delete', {'n': i, 'content': 'テスト'})
+        await writer.close()
+
+        for guild_id in range(3):
+            records = read_stream(self.directory, guild_id, 'message_create')
+            self.assertEqual([r['data']['n'] for r in records],
+                             [i for i in range(3000) if i % 3 == guild_id and i % 2])
+            self.assertEqual(records[0]['event_type'], 'message_create')
+
+        metrics = writer.metrics()
+        self.assertEqual(metrics['written'], 3000)
+        self.assertLess(metrics['batches'], 3000)
+        self.assertGreater(metrics['sealed'], 6)
+        self.assertEqual(glob.glob(os.path.join(self.directory, '*', '*', '*.ndjson')), [])
+
+    async def test_backpressure_drops_when_full(self):
+        writer = EventLogWriter(self.directory, max_queue=10)
+        # 書き込みタスクを開始せずにキューを一杯にする
+        results = [writer.write_nowait(1, 'message_create', {'n': i}) for i in range(15)]
+        self.assertEqual(results.count(False), 5)
+        self.assertEqual(writer.metrics()['dropped'], 5)
+        self.assertEqual(writer.metrics()['queue_depth'], 10)
+        await writer.close()
+        self.assertEqual(len(read_stream(self.directory, 1, 'message_create')), 10)
+
+    async def test_recovery_and_retention(self):
+        writer = EventLogWriter(self.directory, compression=None)
+        await writer.start()
+        await writer.write(1, 'member_join', {'n': 1})
+        await writer.flush()
+        # 停止せずに終了した状態を再現する（書き込み中のセグメントが残る）
+        writer._task.cancel()
+        await asyncio.sleep(0)
+        self.assertEqual(len(glob.glob(os.path.join(self.directory, '1', 'member_join', '*.ndjson'))), 1)
+
+        restarted = EventLogWriter(self.directory, compression=None, retention_days=1)
+        await restarted.start()
+        self.assertEqual(restarted.metrics()['sealed_segments'], 1)
+        self.assertEqual(read_stream(self.directory, 1, 'member_join')[0]['data'], {'n': 1})
+
+        # 保持期間を過ぎたセグメントはファイル名の終了時刻だけで判定して削除する
+        self.assertEqual(await restarted.enforce_retention(), 0)
+        old = os.path.join(self.directory, '1', 'member_join', f"1000-{int((time.time() - 3 * 86400) * 1000)}.ndjson.log")
+        with open(old, 'w') as f:
+            f.write('{}\n')
+        await restarted.close()
+        again = EventLogWriter(self.directory, compression=None, retention_days=1)
+        await again.start()
+        self.assertEqual(await again.enforce_retention(), 1)
+        self.assertFalse(os.path.exists(old))
+        await again.close()
+        writer._executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import sys
+import os
+import unittest
+
+# sys.pathにtestsを追加して、SQLite用の補助（リポジトリのルートも追加する）をインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from sqlalchemy import event, func, select
+
+from bot.src.db import async_database
+from bot.src.db.identity_map import guild_ids, user_ids
+from bot.src.db.guild_sync import SETTINGS_MODELS, mark_guilds_inactive, reconcile_guilds
+from bot.src.db.models import Base, Guild, SpamSettings
+
+
+class FakeGuild:
+    def __init__(self, guild_id, name=None, member_count=10, unavailable=False):
+        self.id = guild_id
+        self.unavailable = unavailable
+        # 利用できないギルドは discord.py でも名前・メンバー数・オーナーが None になる
+        self.name = None if unavailable else name or f"guild{guild_id}"
+        self.icon = None
+        self.member_count = None if unavailable else member_count
+        self.owner_id = None if unavailable else 1
+
+
+class TestGuildSync(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # テストごとに新しいデータベースを使うため、内部IDの対応表も空にする
+        guild_ids.clear()
+        user_ids.clear()
+        self.engine = async_database.configure_async_engine('sqlite+aiosqlite://')
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def asyncTearDown(self):
+        await async_database.close_async_db()
+
+    async def count(self, model, *where):
+        async with self.engine.connect() as conn:
+            return (await conn.execute(select(func.count()).select_from(model).where(*where))).scalar()
+
+    async def test_reconcile_upserts_in_chunks_and_marks_departed(self):
+        guilds = [FakeGuild(i) for i in range(1, 2501)]
+        stats = await reconcile_guilds(guilds, chunk_size=1000)
+        self.assertEqual(stats['joined'], 2500)
+        for model in SETTINGS_MODELS:
+            self.assertEqual(await self.count(model), 2500)
+
+        # 設定を変更したギルドは再実行でも上書きされない
+        async with self.engine.begin() as conn:
+            await conn.execute(SpamSettings.__table__.update().values(mention_threshold=42))
+
+        # 2件退出、1件の名前変更、1件の新規参加（オフライン中の変化）
+        current = guilds[2:] + [FakeGuild(9999)]
+        current[0] = FakeGuild(3, name="renamed")
+        stats = await reconcile_guilds(current, chunk_size=1000)
+        self.assertEqual((stats['joined'], stats['departed']), (1, 2))
+        self.assertEqual(sum(stats['settings_created'].values()), len(SETTINGS_MODELS))
+        self.assertEqual(await self.count(Guild, Guild.is_active.is_(False)), 2)
+        self.assertEqual(await self.count(Guild, Guild.name == "renamed"), 1)
+        self.assertEqual(await self.count(SpamSettings, SpamSettings.mention_threshold == 42), 2500)
+
+        # 退出したギルドの再参加
+        stats = await reconcile_guilds([guilds[0]], mark_departed=False)
+        self.assertEqual((stats['joined'], stats['rejoined']), (0, 1))
+        self.assertEqual(await self.count(Guild, Guild.is_active.is_(False)), 1)
+        self.assertEqual(await self.count(Guild), 2501)
+
+    async def test_unavailable_guilds_are_left_alone(self):
+        await reconcile_guilds([FakeGuild(1, name="real"), FakeGuild(2)])
+        stats = await reconcile_guilds([FakeGuild(1, unavailable=True), FakeGuild(2)])
+        self.assertEqual((stats['guilds'], stats['unavailable'], stats['departed']), (1, 1, 0))
+        self.assertEqual(await self.count(Guild, Guild.name == "real", Guild.member_count == 10), 1)
+        self.assertEqual(await self.count(Guild, Guild.is_active.is_(True)), 2)
+
+        stats = await reconcile_guilds([FakeGuild(3, unavailable=True)], mark_departed=False)
+        self.assertEqual((stats['guilds'], stats['joined']), (0, 0))
+        self.assertEqual(await self.count(Guild), 2)
+
+    async def test_single_join_reads_only_its_row(self):
+        await reconcile_guilds([FakeGuild(i) for i in range(1, 101)])
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(self.engine.sync_engine, 'before_cursor_execute', record)
+        try:
+            stats = await reconcile_guilds([FakeGuild(500)], mark_departed=False)
+        finally:
+            event.remove(self.engine.sync_engine, 'before_cursor_execute', record)
+        self.assertEqual(stats['joined'], 1)
+        # 差分のクエリはテーブル全体ではなく、登録するギルドのIDで絞り込む
+        diff = [(sql, params) for sql, params in statements if 'is_active' in sql and sql.startswith('SELECT')]
+        self.assertEqual(len(diff), 1)
+        self.assertIn('WHERE', diff[0][0])
+        self.assertEqual(list(diff[0][1]), ["500"])
+
+    async def test_mark_guilds_inactive(self):
+        await reconcile_guilds([FakeGuild(1), FakeGuild(2)])
+        self.assertEqual(await mark_guilds_inactive([1]), 1)
+        self.assertEqual(await mark_guilds_inactive([1]), 0)
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(select(Guild.is_active, Guild.left_at).where(Guild.discord_id == "1"))).one()
+        self.assertFalse(row.is_active)
+        self.assertIsNotNone(row.left_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
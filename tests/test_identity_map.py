@@ -0,0 +1,187 @@
+import sys
+import os
+import time
+import unittest
+
+# sys.pathにtestsを追加して、SQLite用の補助（リポジトリのルートも追加する）をインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from bot.src.db import async_database
+from bot.src.db.identity_map import IdentityMap, guild_ids, user_ids, remember_on_commit
+from bot.src.db.guild_sync import reconcile_guilds
+from bot.src.db.models import Base, Guild
+from bot.src.db.repository import (
+    AsyncAuditLogRepository, AsyncSpamSettingsRepository, AuditLogRepository, SpamSettingsRepository
+)
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        self.statements = []
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, *args):
+        self.count += 1
+        self.statements.append(statement)
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.unavailable = False
+        self.name = f"guild{guild_id}"
+        self.icon = None
+        self.member_count = 10
+        self.owner_id = 1
+
+
+class TestIdentityMap(unittest.TestCase):
+    def test_lookup_and_negative_ttl(self):
+        ids = IdentityMap('test', negative_ttl=0.05)
+        self.assertEqual(ids.lookup(1), (False, None))
+        ids.put(1, None)
+        self.assertEqual(ids.lookup("1"), (True, None))
+        time.sleep(0.06)
+        self.assertEqual(ids.lookup(1), (False, None))
+
+        # 作成されたら「存在しない」記憶は上書きされる
+        ids.put(1, None)
+        ids.put(1, 10)
+        self.assertEqual(ids.lookup(1), (True, 10))
+        ids.evict(1)
+        self.assertEqual(ids.lookup(1), (False, None))
+
+    def test_bounded_size(self):
+        ids = IdentityMap('test', max_size=2)
+        ids.preload({1: 10, 2: 20})
+        ids.put(3, 30)
+        self.assertEqual(len(ids), 2)
+        self.assertIsNone(ids.get(1))
+        self.assertEqual(ids.get(3), 30)
+
+
+class TestIdentityMapRepositories(unittest.TestCase):
+    def setUp(self):
+        guild_ids.clear()
+        user_ids.clear()
+        self.engine = create_engine('sqlite://')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.queries = QueryCounter(self.engine)
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        guild_ids.clear()
+        user_ids.clear()
+
+    def test_remember_on_commit_only(self):
+        guild = Guild(discord_id="1", name="g", owner_id="0")
+        self.session.add(guild)
+        self.session.flush()
+        remember_on_commit(self.session, guild_ids, "1", guild.id)
+        self.assertIsNone(guild_ids.get("1"))
+        self.session.rollback()
+        self.assertIsNone(guild_ids.get("1"))
+
+        guild = Guild(discord_id="1", name="g", owner_id="0")
+        self.session.add(guild)
+        self.session.flush()
+        remember_on_commit(self.session, guild_ids, "1", guild.id)
+        self.session.commit()
+        self.assertIsNotNone(guild_ids.get("1"))
+
+    def test_settings_lookup_is_one_round_trip(self):
+        repo = SpamSettingsRepository(self.session)
+        self.assertIsNotNone(repo.create_settings("100", {'mention_threshold': 7}))
+        self.assertIsNotNone(guild_ids.get(100))
+
+        self.session.expire_all()
+        self.queries.count = 0
+        self.assertEqual(repo.get_settings("100").mention_threshold, 7)
+        self.assertEqual(self.queries.count, 1)
+
+    def test_unknown_guild_is_negatively_cached(self):
+        repo = SpamSettingsRepository(self.session)
+        self.assertIsNone(repo.get_settings("404"))
+        self.queries.count = 0
+        self.assertIsNone(repo.get_settings("404"))
+        self.assertEqual(self.queries.count, 0)
+
+        # 作成すると「存在しない」記憶は上書きされる
+        self.assertTrue(repo.update_settings("404", {'mention_threshold': 3}))
+        self.assertIsNotNone(repo.get_settings("404"))
+
+    def test_audit_log_write_resolves_ids_from_map(self):
+        repo = AuditLogRepository(self.session)
+        self.assertIsNotNone(repo.add_log("1", "2", "warn"))
+        self.queries.count = 0
+        self.assertIsNotNone(repo.add_log("1", "2", "warn"))
+        # INSERT の1回だけ
+        self.assertEqual(self.queries.count, 1)
+        self.assertEqual(len(repo.get_logs_by_user("2", guild_id="1")), 2)
+
+    def test_preload(self):
+        for discord_id in ("1", "2"):
+            self.session.add(Guild(discord_id=discord_id, name="g", owner_id="0"))
+        self.session.commit()
+        repo = SpamSettingsRepository(self.session)
+        self.assertEqual(repo.guild_repo.preload(["1", "2", "3"]), 2)
+        self.queries.count = 0
+        self.assertIsNotNone(repo.guild_repo.get_guild_pk("2"))
+        self.assertIsNone(repo.guild_repo.get_guild_pk("3"))
+        self.assertEqual(self.queries.count, 0)
+
+
+class TestAsyncIdentityMap(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        guild_ids.clear()
+        user_ids.clear()
+        self.engine = async_database.configure_async_engine('sqlite+aiosqlite://')
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.queries = QueryCounter(self.engine.sync_engine)
+
+    async def asyncTearDown(self):
+        await async_database.close_async_db()
+        guild_ids.clear()
+        user_ids.clear()
+
+    async def test_reconcile_preloads_and_repositories_use_map(self):
+        stats = await reconcile_guilds([FakeGuild(1), FakeGuild(2)])
+        self.assertEqual(len(guild_ids), 2)
+        self.assertEqual(guild_ids.get(1), stats['guild_pks']['1'])
+
+        async with async_database.get_async_session() as session:
+            self.queries.count = 0
+            settings = await AsyncSpamSettingsRepository(session).get_settings("2")
+            self.assertEqual(settings.guild_id, guild_ids.get(2))
+            self.assertEqual(self.queries.count, 1)
+
+            log_repo = AsyncAuditLogRepository(session)
+            self.assertIsNotNone(await log_repo.add_log("2", "9", "ban"))
+            self.assertIsNotNone(user_ids.get(9))
+            self.queries.count = 0
+            self.assertIsNotNone(await log_repo.add_log("2", "9", "ban"))
+            self.assertEqual(self.queries.count, 1)
+
+    async def test_async_helpers_populate_after_commit(self):
+        await async_database.log_audit_event("5", "6", "kick")
+        self.assertIsNotNone(guild_ids.get(5))
+        self.assertIsNotNone(user_ids.get(6))
+        self.queries.statements = []
+        settings = await async_database.get_spam_settings("5")
+        self.assertEqual(settings.guild_id, guild_ids.get(5))
+        # ギルドの変換は対応表から引くため、guilds テーブルは参照しない
+        self.assertFalse([sql for sql in self.queries.statements if 'FROM guilds' in sql])
+
+
+if __name__ == '__main__':
+    unittest.main()
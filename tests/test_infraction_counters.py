@@ -0,0 +1,85 @@
+import sys
+import os
+import unittest
+from datetime import datetime, timedelta
+
+# sys.pathにbot/src/databaseを追加して、infraction_countersをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+database_path = os.path.join(current_dir, '..', 'bot', 'src', 'database')
+if database_path not in sys.path:
+    sys.path.insert(0, database_path)
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from infraction_counters import InfractionCounters
+import models as database_models
+
+
+class TestInfractionCounters(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine('sqlite+aiosqlite://')
+        async with self.engine.begin() as conn:
+            await conn.run_sync(database_models.Base.metadata.create_all)
+        self.counters = InfractionCounters(database_models.InfractionCounter.__table__)
+        self.statements = []
+        event.listen(self.engine.sync_engine, 'before_cursor_execute', self._record)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    async def test_increment_and_cached_read(self):
+        async with AsyncSession(self.engine) as session:
+            for expected in (1, 2, 3):
+                self.assertEqual(await self.counters.increment(session, 1, 2, 'warning'), expected)
+                await session.commit()
+            self.assertEqual(await self.counters.increment(session, 1, 3, 'warning'), 1)
+            await session.commit()
+
+            self.statements.clear()
+            self.assertEqual(await self.counters.get_count(session, 1, 2, 'warning'), 3)
+            # コミット後の値がキャッシュされているのでクエリを実行しない
+            self.assertEqual(self.statements, [])
+            self.assertEqual(self.counters.stats['hits'], 1)
+
+    async def test_window_resets_per_member(self):
+        start = datetime(2024, 1, 1, 12, 0)
+        async with AsyncSession(self.engine) as session:
+            for minutes in (0, 10, 20):
+                await self.counters.increment(session, 1, 2, 'automod', now=start + timedelta(minutes=minutes))
+            await session.commit()
+            self.assertEqual(await self.counters.get_count(session, 1, 2, 'automod', now=start + timedelta(minutes=30)), 3)
+            self.assertEqual(await self.counters.get_count(session, 1, 2, 'automod', now=start + timedelta(minutes=61)), 0)
+
+            # 最初の違反から1時間を過ぎると1から数え直す（累計は残る）
+            count = await self.counters.increment(session, 1, 2, 'automod', now=start + timedelta(minutes=70))
+            await session.commit()
+            self.assertEqual(count, 1)
+            row = (await session.execute(database_models.InfractionCounter.__table__.select())).one()
+            self.assertEqual((row.total, row.window_count), (4, 1))
+
+    async def test_rollback_does_not_update_cache(self):
+        async with AsyncSession(self.engine) as session:
+            await self.counters.increment(session, 1, 2, 'warning')
+            await session.commit()
+            await self.counters.increment(session, 1, 2, 'warning')
+            await session.rollback()
+            self.assertEqual(await self.counters.get_count(session, 1, 2, 'warning'), 1)
+
+    async def test_reset(self):
+        async with AsyncSession(self.engine) as session:
+            await self.counters.increment(session, 1, 2, 'warning')
+            await self.counters.increment(session, 1, 2, 'automod')
+            await session.commit()
+            await self.counters.reset(session, 1, 2, 'warning')
+            await session.commit()
+            self.assertEqual(await self.counters.get_count(session, 1, 2, 'warning'), 0)
+            self.assertEqual(await self.counters.get_count(session, 1, 2, 'automod'), 1)
+            self.assertEqual(await self.counters.increment(session, 1, 2, 'warning'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import sys
+import os
+import unittest
+
+# sys.pathにtestsを追加して、SQLite用の補助（リポジトリのルートも追加する）をインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from bot.src.db import async_database, instrumentation
+from bot.src.db.identity_map import guild_ids, user_ids
+from bot.src.db.instrumentation import LatencyHistogram, normalize_statement, redact_parameters
+from bot.src.db.models import Base
+from bot.src.db.repository import AuditLogRepository
+
+
+class TestNormalization(unittest.TestCase):
+    def test_normalize_statement(self):
+        self.assertEqual(
+            normalize_statement("SELECT *\n  FROM guilds WHERE id IN (?, ?, ?) AND name = 'x''y' LIMIT 10"),
+            "SELECT * FROM guilds WHERE id IN (?, ...) AND name = ? LIMIT ?"
+        )
+        self.assertEqual(
+            normalize_statement("SELECT id FROM users WHERE user_id = %(user_id_1)s AND CAST(x AS text)::text = :v"),
+            "SELECT id FROM users WHERE user_id = ? AND CAST(x AS text)::text = ?"
+        )
+
+    def test_redact_parameters(self):
+        self.assertEqual(redact_parameters(('secret', 1)), ['str', 'int'])
+        self.assertEqual(redact_parameters({'token': 'secret'}), {'token': 'str'})
+        self.assertEqual(redact_parameters([('a',), ('b',)]), '<2 rows>')
+
+    def test_histogram_percentiles(self):
+        histogram = LatencyHistogram()
+        for elapsed in [0.5] * 90 + [30] * 9 + [7000]:
+            histogram.observe(elapsed)
+        self.assertEqual(histogram.percentile(0.5), 1.0)
+        self.assertEqual(histogram.percentile(0.95), 50.0)
+        self.assertEqual(histogram.percentile(1.0), 7000)
+        self.assertEqual(histogram.to_dict()['buckets']['inf'], 1)
+
+
+class TestEngineInstrumentation(unittest.TestCase):
+    def setUp(self):
+        guild_ids.clear()
+        user_ids.clear()
+        self.engine = create_engine('sqlite://')
+        self.instrumentation = instrumentation.instrument_engine(self.engine, 'test.sync', slow_query_ms=0)
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+        instrumentation._instruments.pop('test.sync', None)
+        guild_ids.clear()
+        user_ids.clear()
+
+    def test_records_queries_by_call_site_and_logs_redacted(self):
+        repo = AuditLogRepository(self.session)
+        with self.assertLogs('bot.database.instrumentation', level='WARNING') as logs:
+            repo.add_log("1", "2", "warn", details={'reason': 'secret-reason'})
+        self.assertTrue(all('secret-reason' not in line for line in logs.output))
+
+        snapshot = instrumentation.snapshot(top=100)['test.sync']
+        self.assertGreater(snapshot['slow_queries'], 0)
+        sites = {query['call_site'] for query in snapshot['queries']}
+        self.assertTrue(any(site.startswith(os.path.join('db', 'repository')) for site in sites), sites)
+        inserts = [query for query in snapshot['queries'] if query['statement'].startswith('INSERT INTO audit_logs')]
+        self.assertEqual(inserts[0]['count'], 1)
+
+        pool = snapshot['pool']
+        self.assertGreaterEqual(pool['connects'], 1)
+        self.assertGreaterEqual(pool['checkouts'], 1)
+        self.assertGreaterEqual(pool['checkout']['count'], 1)
+
+    def test_instrument_engine_is_idempotent(self):
+        self.assertIs(instrumentation.instrument_engine(self.engine, 'other'), self.instrumentation)
+        self.assertNotIn('other', instrumentation._instruments)
+
+
+class TestAsyncInstrumentation(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        guild_ids.clear()
+        user_ids.clear()
+        self.engine = async_database.configure_async_engine('sqlite+aiosqlite://')
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def asyncTearDown(self):
+        await async_database.close_async_db()
+        guild_ids.clear()
+        user_ids.clear()
+
+    async def test_async_call_site_from_task(self):
+        await async_database.get_spam_settings("5")
+        snapshot = instrumentation.snapshot(top=100)['async']
+        sites = {
+            query['call_site'] for query in snapshot['queries']
+            if query['statement'].startswith(('SELECT spam_settings', 'INSERT INTO spam_settings'))
+        }
+        self.assertTrue(sites)
+        self.assertTrue(all(site.startswith(os.path.join('db', 'async_database.py')) for site in sites), sites)
+
+
+if __name__ == '__main__':
+    unittest.main()
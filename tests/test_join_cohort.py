@@ -0,0 +1,91 @@
+import sys
+import os
+import random
+import string
+import time
+import unittest
+
+# sys.pathにbot/src/modules/moderationを追加して、join_cohortをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+moderation_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'moderation')
+if moderation_path not in sys.path:
+    sys.path.insert(0, moderation_path)
+
+from join_cohort import JoinCohortAnalyzer, name_signature
+
+
+def random_name(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+
+
+class TestJoinCohortAnalyzer(unittest.TestCase):
+    def test_name_signature(self):
+        same = (name_signature("RaidBot123") == name_signature("raidbot987")).mean()
+        different = (name_signature("RaidBot123") == name_signature("sakura_chan")).mean()
+        self.assertEqual(same, 1.0)
+        self.assertLess(different, 0.3)
+
+    def test_detects_coordinated_accounts(self):
+        rng = random.Random(1)
+        analyzer = JoinCohortAnalyzer(min_cluster_size=5)
+        now = 1_700_000_000.0
+        created_base = now - 86400 * 2
+
+        # 通常の参加者: 名前・作成日時・アバターがばらばら
+        for i in range(200):
+            match = analyzer.observe(
+                1, i, random_name(rng), now - rng.randint(1, 1000) * 86400,
+                avatar_key=f"a{i}", joined_at=now + i
+            )
+            self.assertIsNone(match)
+
+        # レイド: ほぼ同じ名前・同じ時間帯に作成・デフォルトアバター
+        matches = []
+        for i in range(10):
+            match = analyzer.observe(
+                1, 1000 + i, f"free_nitro_{rng.randint(0, 9999)}", created_base + i * 60,
+                avatar_key=None, joined_at=now + 200 + i
+            )
+            matches.append(match)
+
+        self.assertIsNone(matches[3])
+        self.assertIsNotNone(matches[4])
+        self.assertEqual(sorted(matches[-1].member_ids), list(range(1000, 1010)))
+
+        # 窓の時間を過ぎると近傍数から差し引かれる
+        window = analyzer.windows[1]
+        analyzer.cleanup(now + 10_000)
+        self.assertNotIn(1, analyzer.windows)
+        self.assertEqual(window.neighbors.sum(), 0)
+
+    def test_capacity_eviction_keeps_counts_consistent(self):
+        analyzer = JoinCohortAnalyzer(capacity=50, min_cluster_size=1000)
+        now = 1_700_000_000.0
+        for i in range(500):
+            analyzer.observe(7, i, f"user{i % 3}", now - 86400, joined_at=now + i * 0.01)
+        window = analyzer.windows[7]
+        self.assertEqual(window.size, 50)
+        # 窓内は全員が類似しているので、各参加者の近傍数は49
+        self.assertTrue((window.neighbors[window.valid] == 49).all())
+
+    def test_latency_with_full_window(self):
+        rng = random.Random(2)
+        analyzer = JoinCohortAnalyzer(capacity=5000, window_seconds=3600)
+        now = 1_700_000_000.0
+        for i in range(5000):
+            analyzer.observe(1, i, random_name(rng), now - rng.randint(1, 1000) * 86400,
+                             avatar_key=f"a{i}", joined_at=now + i * 0.1)
+
+        samples = []
+        for i in range(200):
+            start = time.perf_counter()
+            analyzer.observe(1, 10_000 + i, random_name(rng), now - 86400,
+                             avatar_key=None, joined_at=now + 500 + i * 0.1)
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        # 5000件の窓（満杯のため毎回1件の追い出しを含む）で中央値が数ミリ秒以内
+        self.assertLess(samples[len(samples) // 2], 0.005)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import sys
+import os
+import unittest
+
+# sys.pathにbot/src/modules/moderationを追加して、join_rateをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+moderation_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'moderation')
+if moderation_path not in sys.path:
+    sys.path.insert(0, moderation_path)
+
+from join_rate import JoinRateCounter, JoinRateMonitor, get_join_rate_monitor
+
+
+class FakeBot:
+    pass
+
+
+class TestJoinRateCounter(unittest.TestCase):
+    def test_windows(self):
+        counter = JoinRateCounter()
+        start = 1_000_000
+        for second in range(300):
+            counter.record(start + second)
+
+        rates = counter.rates(start + 299)
+        self.assertEqual(rates, {10: 10, 60: 60, 300: 300})
+
+        # 5秒進めると各窓から5件ずつ外れる（300秒窓は新しい参加がないので5件減る）
+        self.assertEqual(counter.count(10, start + 304), 5)
+        self.assertEqual(counter.count(60, start + 304), 55)
+        self.assertEqual(counter.count(300, start + 304), 295)
+
+        # 最大の窓を過ぎるとすべて期限切れ
+        self.assertEqual(counter.rates(start + 1000), {10: 0, 60: 0, 300: 0})
+        self.assertTrue(counter.is_idle(start + 1000))
+
+    def test_untracked_window(self):
+        counter = JoinRateCounter()
+        start = 2_000_000
+        for second in range(100):
+            counter.record(start + second)
+        self.assertEqual(counter.count(30, start + 99), 30)
+        counter.record(start + 100)
+        self.assertEqual(counter.count(30, start + 100), 30)
+        # 最大の窓を超える窓は最大の窓で数える
+        self.assertEqual(counter.count(3600, start + 100), 101)
+
+    def test_duplicate_member(self):
+        counter = JoinRateCounter()
+        start = 3_000_000
+        self.assertTrue(counter.record(start, member_id=1))
+        self.assertFalse(counter.record(start + 1, member_id=1))
+        self.assertTrue(counter.record(start + 1, member_id=2))
+        self.assertEqual(counter.count(60, start + 1), 2)
+        self.assertEqual(counter.recent_members(60), {1, 2})
+        # 最大の窓を過ぎれば再参加として数える
+        self.assertTrue(counter.record(start + 400, member_id=1))
+
+
+class TestJoinRateMonitor(unittest.TestCase):
+    def test_synthetic_raid_10k_per_minute(self):
+        """1分間に1万人が参加するレイドを再生する"""
+        monitor = JoinRateMonitor()
+        guild_id = 1234
+        start = 5_000_000.0
+        threshold = 5000
+        triggered_at = None
+
+        for i in range(10000):
+            now = start + i * 0.006  # 60秒で10000人
+            counter = monitor.record_join(guild_id, member_id=i, now=now)
+            if triggered_at is None and counter.count(60) >= threshold:
+                triggered_at = i
+
+        self.assertEqual(triggered_at, threshold - 1)
+        self.assertEqual(monitor.count(guild_id, 60, start + 59), 10000)
+        self.assertGreaterEqual(monitor.count(guild_id, 10, start + 59), 1660)
+        self.assertLessEqual(monitor.count(guild_id, 10, start + 59), 1670)
+        self.assertEqual(monitor.count(guild_id, 300, start + 59), 10000)
+
+        # 同じ参加を別の検出器が記録しても二重に数えない
+        monitor.record_join(guild_id, member_id=42, now=start + 59)
+        self.assertEqual(monitor.count(guild_id, 60, start + 59), 10000)
+
+        # 5分後には全て期限切れになり、クリーンアップで削除される
+        self.assertEqual(monitor.rates(guild_id, start + 400), {10: 0, 60: 0, 300: 0})
+        self.assertEqual(monitor.cleanup(start + 400), 1)
+        self.assertEqual(monitor.count(guild_id, 60, start + 400), 0)
+
+    def test_shared_monitor(self):
+        bot = FakeBot()
+        monitor = get_join_rate_monitor(bot)
+        self.assertIs(get_join_rate_monitor(bot), monitor)
+        # ギルドIDは文字列でも整数でも同じカウンターを使う
+        monitor.record_join('99', now=100.0)
+        monitor.record_join(99, now=100.0)
+        self.assertEqual(monitor.count(99, 10, 100.0), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import sys
+import os
+import asyncio
+import unittest
+import discord
+
+# sys.pathにbot/srcを追加して、LockdownManagerをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from modules.moderation.lockdown import LockdownManager, RateBudget
+
+
+class FakeRole:
+    def __init__(self, role_id):
+        self.id = role_id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, FakeRole) and other.id == self.id
+
+
+class FakeChannel:
+    def __init__(self, channel_id, latency=0.0, fail=False):
+        self.id = channel_id
+        self.overwrites = {}
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    def overwrites_for(self, target):
+        overwrite = self.overwrites.get(target)
+        if overwrite is None:
+            return discord.PermissionOverwrite()
+        allow, deny = overwrite.pair()
+        return discord.PermissionOverwrite.from_pair(allow, deny)
+
+    async def set_permissions(self, target, *, overwrite=None, reason=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise discord.DiscordException("mocked failure")
+        if overwrite is None:
+            self.overwrites.pop(target, None)
+        else:
+            self.overwrites[target] = overwrite
+
+
+class FakeGuild:
+    def __init__(self, guild_id, channels):
+        self.id = guild_id
+        self.unavailable = False
+        self.default_role = FakeRole(guild_id)
+        self.channels = channels
+
+    def get_channel(self, channel_id):
+        return next((c for c in self.channels if c.id == channel_id), None)
+
+
+class FakeBot:
+    def __init__(self, guilds=()):
+        self.guilds = {guild.id: guild for guild in guilds}
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(guild_id)
+
+    def is_ready(self):
+        return True
+
+    async def wait_until_ready(self):
+        pass
+
+
+class MemoryStore:
+    """lockdown_snapshots テーブルの代わりにメモリ上にスナップショットを保持する"""
+
+    def __init__(self):
+        self.records = {}
+
+    async def save(self, guild_id, snapshot, restore_at):
+        self.records[guild_id] = (dict(snapshot), restore_at)
+
+    async def load(self):
+        return {guild_id: (dict(snapshot), restore_at) for guild_id, (snapshot, restore_at) in self.records.items()}
+
+    async def delete(self, guild_id):
+        self.records.pop(guild_id, None)
+
+
+class TestLockdownManager(unittest.IsolatedAsyncioTestCase):
+    async def test_lock_and_restore(self):
+        channels = [FakeChannel(i) for i in range(1, 21)]
+        guild = FakeGuild(1000, channels)
+        everyone = guild.default_role
+
+        # 既存の上書き: 1つ目は閲覧禁止、2つ目は発言許可、それ以外は上書きなし
+        channels[0].overwrites[everyone] = discord.PermissionOverwrite(view_channel=False)
+        channels[1].overwrites[everyone] = discord.PermissionOverwrite(send_messages=True)
+        before = {c.id: (c.overwrites_for(everyone).pair() if everyone in c.overwrites else None) for c in channels}
+
+        manager = LockdownManager(FakeBot([guild]), rate=1000, store=MemoryStore())
+        updates = []
+        progress = await manager.lock(
+            guild, channels=channels,
+            on_progress=lambda done, total, failed: updates.append((done, total, failed))
+        )
+
+        self.assertTrue(manager.is_locked(guild.id))
+        self.assertEqual((progress.done, progress.failed, progress.total), (20, 0, 20))
+        self.assertEqual(updates[-1], (20, 20, 0))
+        for channel in channels:
+            overwrite = channel.overwrites_for(everyone)
+            self.assertIs(overwrite.send_messages, False)
+            self.assertIs(overwrite.speak, False)
+        # ロック前の他の権限は維持される
+        self.assertIs(channels[0].overwrites_for(everyone).view_channel, False)
+
+        # 二重にロックしても最初のスナップショットを保持する
+        await manager.lock(guild, channels=channels)
+
+        await manager.restore(guild)
+        self.assertFalse(manager.is_locked(guild.id))
+        after = {c.id: (c.overwrites_for(everyone).pair() if everyone in c.overwrites else None) for c in channels}
+        self.assertEqual(after, before)
+
+    async def test_failed_restore_is_retried(self):
+        channels = [FakeChannel(1), FakeChannel(2)]
+        guild = FakeGuild(2000, channels)
+        manager = LockdownManager(FakeBot([guild]), rate=1000, store=MemoryStore())
+        await manager.lock(guild, channels=channels)
+
+        channels[1].fail = True
+        progress = await manager.restore(guild)
+        self.assertEqual(progress.failed, 1)
+        self.assertTrue(manager.is_locked(guild.id))
+        self.assertEqual(list(manager.snapshots[guild.id]), [2])
+
+        channels[1].fail = False
+        await manager.restore(guild)
+        self.assertFalse(manager.is_locked(guild.id))
+        self.assertNotIn(guild.default_role, channels[1].overwrites)
+
+    async def test_restored_after_duration(self):
+        channels = [FakeChannel(1), FakeChannel(2)]
+        guild = FakeGuild(4000, channels)
+        manager = LockdownManager(FakeBot([guild]), rate=1000, store=MemoryStore())
+
+        # バックグラウンドのロックダウンはタスクが保持され、期限に自動で解除される
+        task = manager.start_lock(guild, restore_after=0.05)
+        self.assertIs(manager.start_lock(guild, restore_after=0.05), task)
+        await task
+        self.assertTrue(manager.is_locked(guild.id))
+        self.assertNotIn(guild.id, manager._lock_tasks)
+        await asyncio.sleep(0.1)
+        self.assertFalse(manager.is_locked(guild.id))
+        self.assertNotIn(guild.default_role, channels[0].overwrites)
+
+        # 期限前に解除した場合は自動解除の予定も取り消される
+        await manager.lock(guild, restore_after=60)
+        await manager.restore(guild)
+        self.assertEqual(manager._restore_tasks, {})
+        manager.close()
+
+    async def test_restored_after_restart(self):
+        channels = [FakeChannel(1), FakeChannel(2)]
+        guild = FakeGuild(5000, channels)
+        channels[0].overwrites[guild.default_role] = discord.PermissionOverwrite(view_channel=False)
+        before = channels[0].overwrites_for(guild.default_role).pair()
+        store = MemoryStore()
+        manager = LockdownManager(FakeBot([guild]), rate=1000, store=store)
+        await manager.lock(guild, restore_after=60)
+        self.assertIn(guild.id, store.records)
+        manager.close()
+
+        # 再起動後は保存されたスナップショットから、残りの時間で自動解除される
+        snapshot, restore_at = store.records[guild.id]
+        store.records[guild.id] = (snapshot, restore_at - 59.95)
+        restarted = LockdownManager(FakeBot([guild]), rate=1000, store=store)
+        await restarted.start()
+        self.assertTrue(restarted.is_locked(guild.id))
+        await asyncio.sleep(0.15)
+        self.assertFalse(restarted.is_locked(guild.id))
+        self.assertEqual(channels[0].overwrites_for(guild.default_role).pair(), before)
+        self.assertNotIn(guild.default_role, channels[1].overwrites)
+        self.assertEqual(store.records, {})
+
+    async def test_departed_guild_is_forgotten(self):
+        guild = FakeGuild(6000, [FakeChannel(1)])
+        store = MemoryStore()
+        manager = LockdownManager(FakeBot(), rate=1000, store=store)
+        await manager.lock(guild, restore_after=0.01)
+        await asyncio.sleep(0.05)
+        self.assertFalse(manager.is_locked(guild.id))
+        self.assertEqual(store.records, {})
+
+    async def test_concurrent_within_budget(self):
+        channels = [FakeChannel(i, latency=0.05) for i in range(1, 41)]
+        guild = FakeGuild(3000, channels)
+        manager = LockdownManager(FakeBot(), rate=1000, concurrency=20, store=MemoryStore())
+        progress = await manager.lock(guild, channels=channels)
+        # 直列なら 40 * 0.05 = 2秒かかる
+        self.assertLess(progress.elapsed, 1.0)
+
+    async def test_rate_budget(self):
+        budget = RateBudget(rate=100, burst=10)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(30):
+            await budget.acquire()
+        # バースト10件の後、残り20件は100件/秒で補充される
+        self.assertGreaterEqual(loop.time() - start, 0.18)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import sys
+import os
+import asyncio
+import unittest
+
+# sys.pathにbot/src/modules/loggingを追加して、log_channelsをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+logging_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'logging')
+if logging_path not in sys.path:
+    sys.path.insert(0, logging_path)
+
+from log_channels import LogChannelCache
+
+
+class FakeChannel:
+    def __init__(self, channel_id, guild):
+        self.id = channel_id
+        self.guild = guild
+
+
+class FakeGuild:
+    def __init__(self, guild_id, channel_ids=(), fail_create=False):
+        self.id = guild_id
+        self.default_role = object()
+        self.me = object()
+        self.channels = {i: FakeChannel(i, self) for i in channel_ids}
+        self.created = 0
+        self.fail_create = fail_create
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def create_text_channel(self, name, overwrites=None, reason=None):
+        await asyncio.sleep(0.01)
+        if self.fail_create:
+            raise RuntimeError("missing permissions")
+        self.created += 1
+        channel = FakeChannel(10_000 + self.created, self)
+        self.channels[channel.id] = channel
+        return channel
+
+
+class MemoryLogChannelCache(LogChannelCache):
+    """guilds テーブルの代わりにメモリ上の {guild_id: log_channel_id} を使う"""
+
+    def __init__(self, rows, **kwargs):
+        super().__init__(**kwargs)
+        self.rows = dict(rows)
+        self.queries = 0
+
+    async def _fetch_all(self):
+        self.queries += 1
+        return dict(self.rows)
+
+    async def _fetch(self, guild_id):
+        self.queries += 1
+        await asyncio.sleep(0.01)
+        return self.rows.get(guild_id)
+
+    async def _store(self, guild_id, channel_id):
+        self.rows[guild_id] = channel_id
+
+
+class TestLogChannelCache(unittest.IsolatedAsyncioTestCase):
+    async def test_cached_lookup_does_not_query(self):
+        guild = FakeGuild(1, channel_ids=[5])
+        cache = MemoryLogChannelCache({1: 5})
+        self.assertEqual(await cache.load(), 1)
+        for _ in range(100):
+            self.assertEqual((await cache.get(guild)).id, 5)
+        self.assertEqual(cache.queries, 1)
+        self.assertEqual(cache.stats["hits"], 100)
+
+    async def test_concurrent_events_create_one_channel(self):
+        guild = FakeGuild(2)
+        cache = MemoryLogChannelCache({})
+        # ログチャンネルがない間のイベントは作成を待たずに None を受け取る
+        channels = await asyncio.gather(*(cache.get(guild) for _ in range(50)))
+        self.assertEqual(channels, [None] * 50)
+        self.assertEqual(guild.created, 0)
+        self.assertIn(2, cache.creating)
+
+        await cache.creating[2]
+        self.assertEqual(guild.created, 1)
+        self.assertEqual(cache.rows[2], 10_001)
+        self.assertEqual((await cache.get(guild)).id, 10_001)
+        self.assertEqual(cache.queries, 1)
+        self.assertEqual(cache.creating, {})
+
+    async def test_channel_delete_and_settings_change(self):
+        guild = FakeGuild(3, channel_ids=[7, 8])
+        cache = MemoryLogChannelCache({3: 7})
+        await cache.load()
+
+        # 他のチャンネルの削除は無視する
+        cache.on_channel_delete(guild.channels[8])
+        self.assertEqual(cache.channel_ids[3], 7)
+
+        # ログチャンネルが削除されたらデータベースを参照し直し、なければ作成する
+        deleted = guild.channels.pop(7)
+        cache.on_channel_delete(deleted)
+        self.assertNotIn(3, cache.channel_ids)
+        self.assertIsNone(await cache.get(guild))
+        await cache.creating[3]
+        self.assertEqual((await cache.get(guild)).id, 10_001)
+
+        cache.set(3, 8)
+        self.assertEqual((await cache.get(guild)).id, 8)
+
+    async def test_failed_creation_is_not_retried_immediately(self):
+        guild = FakeGuild(4, fail_create=True)
+        cache = MemoryLogChannelCache({}, retry_after=600, missing_ttl=0)
+        self.assertIsNone(await cache.get(guild))
+        await cache.creating[4]
+        guild.fail_create = False
+        self.assertIsNone(await cache.get(guild))
+        self.assertNotIn(4, cache.creating)
+        self.assertEqual(guild.created, 0)
+
+        cache.invalidate(4)
+        self.assertIsNone(await cache.get(guild))
+        await cache.creating[4]
+        self.assertIsNotNone(await cache.get(guild))
+
+    async def test_missing_channel_is_cached(self):
+        guild = FakeGuild(5)
+        cache = MemoryLogChannelCache({}, missing_ttl=300)
+        for _ in range(100):
+            self.assertIsNone(await cache.get(guild, create=False))
+        # 解決できなかったギルドは missing_ttl の間データベースを参照しない
+        self.assertEqual(cache.queries, 1)
+        self.assertEqual(cache.stats["missing_hits"], 99)
+
+        # 設定の変更で無効化されたら読み直す
+        guild.channels[9] = FakeChannel(9, guild)
+        cache.rows[5] = 9
+        cache.invalidate(5)
+        self.assertEqual((await cache.get(guild, create=False)).id, 9)
+        self.assertEqual(cache.queries, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import sys
+import os
+import asyncio
+import time
+import unittest
+import discord
+
+# sys.pathにbot/src/modules/loggingを追加して、log_deliveryをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+logging_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'logging')
+if logging_path not in sys.path:
+    sys.path.insert(0, logging_path)
+
+from log_delivery import LogDispatcher, PRIORITY_HIGH
+
+
+class FakeChannel:
+    def __init__(self, channel_id=1, latency=0.0):
+        self.id = channel_id
+        self.latency = latency
+        self.sent = []
+
+    async def send(self, content=None, embeds=None):
+        await asyncio.sleep(self.latency)
+        self.sent.append((time.monotonic(), content, list(embeds or [])))
+
+
+def make_embed(i):
+    embed = discord.Embed(title="メッセージ削除", description=f"内容 {i}")
+    embed.add_field(name="送信者", value=f"user{i}")
+    return embed
+
+
+async def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+class TestLogDispatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesces_embeds(self):
+        dispatcher = LogDispatcher(flush_interval=0.05, rate=100, per=1.0)
+        channel = FakeChannel()
+        for i in range(25):
+            dispatcher.enqueue(channel, make_embed(i))
+        await wait_until(lambda: dispatcher.stats["delivered"] == 25)
+
+        self.assertEqual([len(embeds) for _, _, embeds in channel.sent], [10, 10, 5])
+        self.assertEqual(channel.sent[0][2][0].description, "内容 0")
+        metrics = dispatcher.metrics()
+        self.assertEqual(metrics["messages"], 3)
+        self.assertGreater(metrics["max_lag"], 0)
+        await dispatcher.close()
+
+    async def test_priority_lane_and_digest_under_rate_limit(self):
+        # 0.5秒あたり2件に制限し、送信が追いつかない状態にする
+        dispatcher = LogDispatcher(flush_interval=0.05, rate=2, per=0.5, digest_threshold=30)
+        channel = FakeChannel()
+        for i in range(200):
+            dispatcher.enqueue(channel, make_embed(i))
+        dispatcher.enqueue(channel, content="⚠️ **レイド検出** ⚠️", priority=PRIORITY_HIGH)
+        await wait_until(lambda: dispatcher.stats["delivered"] == 201)
+
+        # 優先度の高い警告は最初に送られ、溜まった通常ログはダイジェストでまとめて送られる
+        self.assertEqual(channel.sent[0][1], "⚠️ **レイド検出** ⚠️")
+        self.assertGreater(dispatcher.stats["digests"], 0)
+        self.assertLess(len(channel.sent), 201 // 10)
+        self.assertIn("**メッセージ削除** | 内容 0 | 送信者: user0", channel.sent[1][1])
+        self.assertTrue(all(len(content or "") <= 2000 for _, content, _ in channel.sent))
+
+        # レート制限（0.5秒あたり2件）を超えて送信していない
+        times = [t for t, _, _ in channel.sent]
+        for i in range(2, len(times)):
+            self.assertGreaterEqual(times[i] - times[i - 2], 0.5 - 0.02)
+        await dispatcher.close()
+
+    async def test_overflow_drops_oldest_normal_logs(self):
+        dispatcher = LogDispatcher(flush_interval=10, max_pending=50)
+        channel = FakeChannel()
+        dispatcher.enqueue(channel, content="alert", priority=PRIORITY_HIGH)
+        for i in range(100):
+            dispatcher.enqueue(channel, make_embed(i))
+        outbox = dispatcher.outboxes[channel.id]
+        self.assertLessEqual(len(outbox), 50)
+        self.assertEqual(dispatcher.stats["dropped"], 51)
+        self.assertEqual(outbox.lanes[1][-1].embed.description, "内容 99")
+        await dispatcher.close()
+
+
+    async def test_flush_and_close_on_shutdown(self):
+        dispatcher = LogDispatcher(flush_interval=10, idle_timeout=60)
+        channel = FakeChannel()
+        for i in range(5):
+            dispatcher.enqueue(channel, make_embed(i))
+
+        # 終了前の flush は flush_interval を待たずに送信し、送信タスクも終了する
+        started = time.monotonic()
+        self.assertTrue(await dispatcher.flush(timeout=1.0))
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(dispatcher.stats["delivered"], 5)
+        self.assertEqual(dispatcher.outboxes, {})
+
+        # レート制限で送信しきれなかったログは close で破棄した件数として記録される
+        dispatcher = LogDispatcher(rate=1, per=10)
+        channel = FakeChannel(2)
+        for i in range(3):
+            dispatcher.enqueue(channel, content="x" * 1500)
+        self.assertFalse(await dispatcher.flush(timeout=0.1))
+        self.assertEqual(len(channel.sent), 1)
+        await dispatcher.close()
+        self.assertEqual(dispatcher.stats["dropped"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
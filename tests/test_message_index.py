@@ -0,0 +1,150 @@
+import sys
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+# sys.pathにbot/src/modules/loggingを追加して、message_indexをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+logging_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'logging')
+if logging_path not in sys.path:
+    sys.path.insert(0, logging_path)
+
+from message_index import MessageIndex, _Vocabulary, tokenize
+from message_store import CachedMessage, MessageStore
+
+WORDS = ["hello", "world", "raid", "spam", "テスト", "こんにちは", "荒らし", "ban", "Discord", "ログ"]
+
+
+def make_messages(count, seed=1):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+        # 到着順が少し前後する作成日時
+        created_at = 1_700_000_000.0 + i * 60 + rng.uniform(-90, 90)
+        messages.append(CachedMessage(
+            i + 1, 1, rng.randint(1, 20), f"user{i % 20}", 100 + rng.randint(0, 4), "general",
+            content, created_at
+        ))
+    return messages
+
+
+def brute_force(messages, term=None, author_id=None, channel_id=None, after=None, before=None):
+    """従来の find_messages と同じ条件の全件走査（新しい順）"""
+    results = [
+        m for m in messages
+        if not m.deleted
+        and (author_id is None or m.author_id == author_id)
+        and (channel_id is None or m.channel_id == channel_id)
+        and (after is None or m.created_at >= after)
+        and (before is None or m.created_at <= before)
+        and (term is None or term.lower() in m.content.lower())
+    ]
+    return sorted((m.id for m in results), key=lambda i: -messages[i - 1].created_at)
+
+
+class TestMessageIndex(unittest.TestCase):
+    def test_tokenize_cjk_ngrams(self):
+        self.assertEqual(tokenize("Hello, 世界のみんな"), ["hello", "世界", "界の", "のみ", "みん", "んな"])
+        self.assertEqual(tokenize("a 字"), ["a", "字"])
+
+    def test_matches_brute_force(self):
+        messages = make_messages(3000)
+        index = MessageIndex()
+        for message in messages:
+            index.add(message)
+        for message in messages[::7]:
+            message.deleted_at = message.created_at + 1
+            index.mark_deleted(1, message.id)
+
+        rng = random.Random(2)
+        queries = [
+            {}, {'author_id': 3}, {'channel_id': 102, 'author_id': 5},
+            {'term': 'raid'}, {'term': 'RAID sp'}, {'term': 'llo wor'}, {'term': 'こんにち'},
+            {'term': 'し'}, {'term': 'ログ'}, {'term': 'ban テスト'}, {'term': 'zzz'}, {'term': '!!'},
+        ]
+        for query in queries:
+            after = 1_700_000_000.0 + rng.randint(0, 100_000)
+            query = dict(query, after=after, before=after + rng.randint(1000, 60_000))
+            expected = brute_force(messages, **query)
+            candidates = index.search(1, **query)
+            # 検索語は候補の絞り込みなので、本文で確認してから比較する
+            term = query.get('term')
+            found = [i for i in candidates if term is None or term.lower() in messages[i - 1].content.lower()]
+            self.assertEqual(found, expected, query)
+
+    def test_vocabulary_matches_substrings(self):
+        rng = random.Random(3)
+        words = sorted({"".join(rng.choice("abcde") for _ in range(rng.randint(1, 8))) for _ in range(2000)})
+        words += ["荒らし", "し", "ログ"]
+        vocabulary = _Vocabulary(words)
+        for token in ("a", "cd", "abc", "eeee", "bad", "dcbae", "zz", "し", "らし"):
+            self.assertEqual(sorted(vocabulary.matching(token)), [w for w in sorted(words) if token in w], token)
+
+    def test_partial_terms_after_compaction(self):
+        index = MessageIndex()
+        index.add(CachedMessage(1, 1, 1, "user1", 1, "general", "raider", 1.0))
+        for i in range(2, 10):
+            index.add(CachedMessage(i, 1, 1, "user1", 1, "general", f"word{i}", float(i)))
+        # 行を詰めた後も部分一致で探せて、再び現れたトークンも見つかる
+        index.discard(1, range(2, 10))
+        self.assertEqual(list(index.search(1, term="rai")), [1])
+        index.add(CachedMessage(10, 1, 1, "user1", 1, "general", "word2 raider", 10.0))
+        self.assertEqual(list(index.search(1, term="rai")), [10, 1])
+        self.assertEqual(list(index.search(1, term="ord")), [10])
+
+    def test_report_aggregates_in_utc(self):
+        index = MessageIndex()
+        # 2023-11-15（水曜日）の 10時台に2件、23時台に1件
+        base = datetime(2023, 11, 15, tzinfo=timezone.utc).timestamp()
+        for i, (offset, author_id) in enumerate([(10.1, 1), (10.5, 1), (23.9, 2)]):
+            index.add(CachedMessage(i + 1, 1, author_id, f"user{author_id}", 7, "general", "x",
+                                    base + offset * 3600))
+        report = index.report(1, samples=2)
+        self.assertEqual(report['total'], 3)
+        self.assertEqual(report['hourly'][10], 2)
+        self.assertEqual(report['hourly'][23], 1)
+        self.assertEqual(report['daily'][2], 3)
+        self.assertEqual(report['top_authors'], [(1, "user1", 2), (2, "user2", 1)])
+        self.assertEqual(report['top_channels'], [(7, "general", 3)])
+        self.assertEqual(len(report['sample_ids']), 2)
+        self.assertEqual(index.report(1, author_id=2)['total'], 1)
+
+
+class TestIndexedMessageStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_search_covers_spill_edits_and_restart(self):
+        store = MessageStore(self.directory, max_per_guild=50, segment_bytes=40_000,
+                             max_generations=3, index=MessageIndex())
+        messages = make_messages(1500)
+        for message in messages:
+            store.add(message)
+        store.add(CachedMessage(10, 1, 1, "user1", 100, "general", "edited raid", messages[9].created_at))
+        store.mark_deleted(1, 11, 1_800_000_000.0)
+
+        # 古い世代は削除され、索引からも外れる
+        live = set(store.spill.index[1])
+        self.assertEqual(len(store.index), len(live))
+        results = store.search(1, term="raid", limit=10_000)
+        self.assertTrue(all("raid" in r.content.lower() and r.id in live for r in results))
+        self.assertEqual(len(store.search(1, limit=5)), 5)
+        self.assertEqual([r.id for r in store.search(1, term="edited")], [10] if 10 in live else [])
+        store.close()
+
+        reopened = MessageStore(self.directory, segment_bytes=40_000, max_generations=3, index=MessageIndex())
+        reopened.open()
+        self.assertEqual(len(reopened.index), len(live))
+        self.assertEqual([r.id for r in reopened.search(1, term="raid", limit=10_000)], [r.id for r in results])
+        reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import unittest
+
+# sys.pathにbot/src/modules/loggingを追加して、message_storeをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+logging_path = os.path.join(current_dir, '..', 'bot', 'src', 'modules', 'logging')
+if logging_path not in sys.path:
+    sys.path.insert(0, logging_path)
+
+from message_store import CachedMessage, MessageStore
+from message_index import MessageIndex
+
+
+def make_message(message_id, guild_id=1, content=None, created_at=None, author_id=None):
+    return CachedMessage(
+        message_id, guild_id, author_id or message_id % 10, f"user{message_id % 10}",
+        100 + message_id % 3, "general", content if content is not None else f"メッセージ {message_id}",
+        created_at if created_at is not None else 1_700_000_000.0 + message_id,
+        attachments=(("https://cdn.example/a.png", "a.png"),) if message_id % 5 == 0 else ()
+    )
+
+
+class TestMessageStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_budget_eviction_and_spill_lookup(self):
+        store = MessageStore(self.directory, max_bytes=200_000, max_per_guild=100_000)
+        store.open()
+        for i in range(5000):
+            store.add(make_message(i, guild_id=i % 3))
+
+        # メモリは予算内に収まり、追い出されたメッセージはスピルファイルから読める
+        self.assertLessEqual(store.used_bytes, 200_000)
+        self.assertLess(len(store), 5000)
+        self.assertNotIn(0, store.guilds.get(0, {}))
+        old = store.get(0, 0)
+        self.assertEqual(old.content, "メッセージ 0")
+        self.assertEqual(old.to_dict()['attachments'], [{'url': "https://cdn.example/a.png", 'filename': "a.png"}])
+        self.assertEqual(store.stats["spill_hits"], 1)
+
+        # 編集は新しい内容で上書きされ、削除フラグも記録される
+        store.add(make_message(3, guild_id=0, content="edited"))
+        self.assertEqual(store.get(0, 3).content, "edited")
+        store.mark_deleted(0, 6, 1_800_000_000.0)
+        self.assertTrue(store.get(0, 6).to_dict()['deleted'])
+
+        self.assertEqual(sum(1 for _ in store.iter_guild(1)), len([i for i in range(5000) if i % 3 == 1]))
+        store.close()
+
+        # 再起動後は索引だけを作り直し、内容はスピルファイルから読む
+        reopened = MessageStore(self.directory)
+        self.assertEqual(reopened.open(), 5000)
+        self.assertEqual(len(reopened), 0)
+        self.assertEqual(reopened.get(0, 3).content, "edited")
+        self.assertTrue(reopened.get(0, 6).deleted)
+        self.assertEqual(reopened.get(1, 4999).content, "メッセージ 4999")
+        reopened.close()
+
+    def test_per_guild_ring(self):
+        store = MessageStore(self.directory, max_per_guild=10)
+        for i in range(25):
+            store.add(make_message(i))
+        self.assertEqual(list(store.guilds[1]), list(range(15, 25)))
+        self.assertEqual(store.get(1, 2).content, "メッセージ 2")
+        store.close()
+
+    def test_rotation_and_expiry(self):
+        store = MessageStore(self.directory, segment_bytes=20_000, max_generations=3)
+        for i in range(1000):
+            store.add(make_message(i, created_at=float(i)))
+        self.assertEqual(len(store.spill.generations()), 3)
+        # 最も古い世代は削除されている
+        self.assertIsNone(store.spill.read(1, 0))
+        self.assertIsNotNone(store.get(1, 999))
+
+        # 全てのメッセージが期限より古い世代はファイルごと削除する
+        store.expire(cutoff=990.0)
+        self.assertEqual(len(store.spill.generations()), 1)
+        self.assertEqual(min(store.guilds[1]), 990)
+        store.close()
+
+    def test_truncated_tail_is_recovered(self):
+        store = MessageStore(self.directory)
+        for i in range(10):
+            store.add(make_message(i))
+        store.close()
+        path = os.path.join(self.directory, "messages.0.spill")
+        with open(path, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00partial')
+        reopened = MessageStore(self.directory)
+        self.assertEqual(reopened.open(), 10)
+        reopened.add(make_message(10))
+        self.assertEqual(reopened.get(1, 10).content, "メッセージ 10")
+        reopened.close()
+
+    def test_appends_are_flushed_in_batches(self):
+        store = MessageStore(self.directory)
+        store.spill.flush_interval = 3600
+        store.open()
+        for i in range(100):
+            store.add(make_message(i))
+        # 書き込みはバッファにたまっていて、まだファイルには書かれていない
+        path = os.path.join(self.directory, "messages.0.spill")
+        self.assertEqual(os.path.getsize(path), 0)
+        self.assertEqual(store.spill.stats["flushes"], 0)
+
+        # 書き込み前の位置を読む時は先にまとめて書き出す
+        self.assertEqual(store.spill.read(1, 5).content, "メッセージ 5")
+        self.assertEqual(store.spill.stats["flushes"], 1)
+        self.assertGreater(os.path.getsize(path), 0)
+
+        store.add(make_message(100))
+        store.close()
+        reopened = MessageStore(self.directory)
+        self.assertEqual(reopened.open(), 101)
+        self.assertEqual(reopened.get(1, 100).content, "メッセージ 100")
+        reopened.close()
+
+    def test_search_without_index(self):
+        store = MessageStore(self.directory, max_per_guild=5)
+        for i in range(20):
+            store.add(make_message(i, content="raid" if i % 4 == 0 else "hello"))
+        store.mark_deleted(1, 16, 1_800_000_000.0)
+        results = store.search(1, term="RAID", limit=3)
+        self.assertEqual([record.id for record in results], [12, 8, 4])
+        store.close()
+
+
+class SlowOpenStore(MessageStore):
+    """起動時の走査がテストから許可されるまで終わらない MessageStore"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def _load(self):
+        # add() がイベントループを止めていれば、ここでタイムアウトする
+        if not self.release.wait(timeout=5):
+            raise TimeoutError("add() blocked the event loop")
+        return super()._load()
+
+
+class TestMessageStoreOpenAsync(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        store = MessageStore(self.tmp.name)
+        for i in range(100):
+            store.add(make_message(i))
+        store.close()
+
+    async def asyncTearDown(self):
+        self.tmp.cleanup()
+
+    async def test_adds_during_open_are_buffered(self):
+        store = SlowOpenStore(self.tmp.name, index=MessageIndex())
+        opening = asyncio.create_task(store.open_async())
+        await asyncio.sleep(0)
+        self.assertTrue(store.loading)
+
+        # 走査中の追加・削除はメモリにだけ反映され、ループを止めない
+        store.add(make_message(100, content="起動中の投稿"))
+        store.add(make_message(5, content="起動中の編集"))
+        store.mark_deleted(1, 100, 1_800_000_000.0)
+        self.assertEqual(store.get(1, 5).content, "起動中の編集")
+        self.assertEqual([r.id for r in store.search(1, term="起動中")], [5])
+
+        store.release.set()
+        self.assertEqual(await opening, 100)
+        self.assertFalse(store.loading)
+        # 完了後にスピルファイルと索引へ書き込まれる
+        self.assertEqual(len(store.spill), 101)
+        self.assertTrue(store.spill.read(1, 100).deleted)
+        self.assertEqual(store.spill.read(1, 5).content, "起動中の編集")
+        self.assertEqual([r.id for r in store.search(1, term="起動中")], [5])
+        self.assertEqual(len(store.search(1, limit=1000)), 100)
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import sys
+import os
+import unittest
+from datetime import date, datetime
+
+# sys.pathにtestsを追加して、SQLite用の補助（リポジトリのルートも追加する）をインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+import sqlite_compat  # noqa: F401
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from bot.src.db.models import Base, Guild, GuildSettings
+from bot.src.db.partitions import (
+    PARTITIONED_TABLES, _purge, _retention_overrides, add_months, maintain_partitions, month_start,
+    parse_partition_name, partition_ddl, partition_name, plan_retention
+)
+
+
+class TestPartitionHelpers(unittest.TestCase):
+    def test_month_math(self):
+        self.assertEqual(month_start(datetime(2024, 2, 29, 23, 59)), date(2024, 2, 1))
+        self.assertEqual(add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+
+    def test_names_round_trip(self):
+        name = partition_name('audit_logs', date(2024, 5, 1))
+        self.assertEqual(name, 'audit_logs_p202405')
+        self.assertEqual(parse_partition_name('audit_logs', name), date(2024, 5, 1))
+        self.assertIsNone(parse_partition_name('spam_logs', name))
+        self.assertIsNone(parse_partition_name('audit_logs', 'audit_logs_default'))
+
+    def test_partition_ddl_bounds(self):
+        ddl = partition_ddl('spam_logs', date(2024, 12, 1))
+        self.assertIn("FROM ('2024-12-01') TO ('2025-01-01')", ddl)
+
+
+class TestPlanRetention(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime(2024, 7, 15)
+        # 2024年1月〜7月
+        self.partitions = {add_months(date(2024, 1, 1), i): f"audit_logs_p2024{i + 1:02d}" for i in range(7)}
+
+    def test_drops_whole_months_past_retention(self):
+        drop, purge = plan_retention(self.partitions, self.now, 90, {})
+        # 4/16 より前に終わる月（1〜3月）だけを丸ごと削除する
+        self.assertEqual(drop, ['audit_logs_p202401', 'audit_logs_p202402', 'audit_logs_p202403'])
+        self.assertEqual(purge, [])
+
+    def test_longer_guild_retention_keeps_partition(self):
+        drop, purge = plan_retention(self.partitions, self.now, 90, {1: 150})
+        # 最も長い保持期間（2/16 まで）に合わせて、1月だけを削除する
+        self.assertEqual(drop, ['audit_logs_p202401'])
+        # 2, 3月はギルド1以外の行を削除する
+        self.assertEqual(purge, [('audit_logs_p202402', [1], True), ('audit_logs_p202403', [1], True)])
+
+    def test_shorter_guild_retention_purges_rows(self):
+        drop, purge = plan_retention(self.partitions, self.now, 90, {2: 30})
+        self.assertEqual(len(drop), 3)
+        # 6/15 より前に終わる 4, 5月はギルド2の行だけを削除する
+        self.assertEqual(purge, [('audit_logs_p202404', [2], False), ('audit_logs_p202405', [2], False)])
+
+    def test_unlimited_retention(self):
+        drop, purge = plan_retention(self.partitions, self.now, None, {2: 30})
+        self.assertEqual(drop, [])
+        self.assertEqual([name for name, _, _ in purge], [f"audit_logs_p20240{i}" for i in range(1, 6)])
+
+
+class TestGuildRetention(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine('sqlite+aiosqlite://')
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # 内部IDと Discord のギルドIDが異なる2つのギルド（ギルド2は保持期間が長い）
+            await conn.execute(Guild.__table__.insert(), [
+                {'id': 1, 'discord_id': '111', 'name': 'one', 'owner_id': '1'},
+                {'id': 2, 'discord_id': '222', 'name': 'two', 'owner_id': '1'},
+            ])
+            await conn.execute(GuildSettings.__table__.insert(), [
+                {'guild_id': 1, 'log_retention_days': None}, {'guild_id': 2, 'log_retention_days': 150},
+            ])
+            # audit_logs の2月のパーティションの代わり（guild_id は guilds.id）
+            await conn.execute(text('CREATE TABLE "audit_logs_p202402" (id INTEGER, guild_id INTEGER)'))
+            await conn.execute(text('INSERT INTO "audit_logs_p202402" VALUES (1, 1), (2, 2), (3, 2), (4, NULL)'))
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    async def test_longer_retention_keeps_audit_rows(self):
+        overrides = await _retention_overrides(self.engine, PARTITIONED_TABLES['audit_logs'])
+        self.assertEqual(overrides, {2: 150})
+        partitions = {date(2024, 1, 1): 'audit_logs_p202401', date(2024, 2, 1): 'audit_logs_p202402'}
+        drop, purge = plan_retention(partitions, datetime(2024, 7, 15), 90, overrides)
+        self.assertEqual(drop, ['audit_logs_p202401'])
+        self.assertEqual(purge, [('audit_logs_p202402', [2], True)])
+
+        name, guild_ids, exclude = purge[0]
+        self.assertEqual(await _purge(self.engine, name, guild_ids, exclude, batch_size=1), 2)
+        async with self.engine.connect() as conn:
+            remaining = (await conn.execute(text('SELECT id FROM "audit_logs_p202402" ORDER BY id'))).scalars().all()
+        self.assertEqual(remaining, [2, 3])
+
+
+class TestMaintainPartitions(unittest.IsolatedAsyncioTestCase):
+    async def test_skips_databases_without_partitioning(self):
+        engine = create_async_engine('sqlite+aiosqlite://')
+        try:
+            self.assertEqual(await maintain_partitions(engine), {})
+        finally:
+            await engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import sys
+import os
+import asyncio
+import time
+import unittest
+from datetime import datetime, timedelta
+
+# sys.pathにbot/srcを追加して、PollServiceをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from modules.utility.poll_service import PollService, PollState, PollVotes
+
+
+class MemoryStore:
+    """polls テーブルの代わりにメモリ上に投票を保持する"""
+
+    def __init__(self, polls=()):
+        self.polls = {poll.message_id: poll for poll in polls}
+        self.saved = {}
+        self.deleted = []
+
+    async def create(self, poll):
+        self.polls[poll.message_id] = poll
+
+    async def save_votes(self, poll):
+        self.saved[poll.message_id] = poll.votes.to_bytes()
+
+    async def load(self):
+        return list(self.polls.values())
+
+    async def delete(self, message_id):
+        self.deleted.append(message_id)
+        self.polls.pop(message_id, None)
+
+
+class FakeMessage:
+    def __init__(self, message_id, channel):
+        self.id = message_id
+        self.channel = channel
+
+    async def edit(self, *, embed):
+        self.channel.edits.append((self.id, embed))
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.edits = []
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(message_id, self)
+
+
+class FakeBot:
+    def __init__(self, channels):
+        self.channels = {channel.id: channel for channel in channels}
+
+    async def wait_until_ready(self):
+        return
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+async def wait_until(condition, timeout=2.0):
+    """条件を満たすまで待つ（バックグラウンドのタスクの完了待ち）"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+class TestPollVotes(unittest.TestCase):
+    def test_single_and_multiple_choice(self):
+        votes = PollVotes(3)
+        self.assertTrue(votes.add(5, 0, exclusive=True))
+        self.assertFalse(votes.add(5, 0, exclusive=True))
+        # 単一選択では他の選択肢への投票を置き換える
+        self.assertTrue(votes.add(5, 2, exclusive=True))
+        self.assertEqual(votes.counts, [0, 0, 1])
+
+        self.assertTrue(votes.add(3, 0, exclusive=False))
+        self.assertTrue(votes.add(3, 1, exclusive=False))
+        self.assertEqual(votes.counts, [1, 1, 1])
+        self.assertEqual(list(votes.voter_ids), [3, 5])
+
+        self.assertFalse(votes.remove(3, 2))
+        self.assertTrue(votes.remove(3, 0))
+        self.assertTrue(votes.remove(3, 1))
+        self.assertEqual(votes.counts, [0, 0, 1])
+        self.assertEqual(len(votes), 1)
+
+    def test_round_trip(self):
+        votes = PollVotes(2)
+        for user_id in range(1000, 0, -1):
+            votes.add(user_id * 2 ** 40, user_id % 2, exclusive=False)
+        restored = PollVotes(2, *votes.to_bytes())
+        self.assertEqual(restored.counts, [500, 500])
+        self.assertEqual(list(restored.voter_ids), sorted(restored.voter_ids))
+        self.assertEqual(len(votes.to_bytes()[0]), 8000)
+
+
+class TestPollService(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await self.service.stop()
+
+    async def test_coalesces_edits_and_flushes_final_state(self):
+        channel = FakeChannel(1)
+        poll = PollState(10, 1, 1, "title", ["a", "b"], None, False)
+        store = MemoryStore([poll])
+        self.service = PollService(FakeBot([channel]), store=store, edit_interval=0.2)
+        await self.service.start()
+
+        for user_id in range(1, 301):
+            if await self.service.handle_vote(10, user_id, "1️⃣" if user_id % 3 else "2️⃣"):
+                self.service.schedule_update(10)
+            await asyncio.sleep(0)
+        await wait_until(lambda: not self.service._flush_tasks)
+
+        # 300票の反映が数回の編集にまとまる
+        self.assertLessEqual(len(channel.edits), 3)
+        fields = channel.edits[-1][1].fields
+        self.assertEqual([field.value for field in fields], ["投票数: 200", "投票数: 100"])
+        self.assertEqual(PollVotes(2, *store.saved[10]).counts, [200, 100])
+
+    async def test_restores_and_ends_expired_polls(self):
+        channel = FakeChannel(1)
+        votes = PollVotes(2)
+        votes.add(7, 0, exclusive=True)
+        expired = PollState(20, 1, 1, "done", None, datetime.utcnow() - timedelta(seconds=5), False, votes)
+        later = PollState(21, 1, 1, "soon", None, datetime.utcnow() + timedelta(seconds=0.2), False)
+        store = MemoryStore([expired, later])
+        self.service = PollService(FakeBot([channel]), store=store)
+        await self.service.start()
+
+        await wait_until(lambda: store.deleted == [20])
+        self.assertEqual(store.deleted, [20])
+        embed = channel.edits[0][1]
+        self.assertEqual(embed.fields[0].value, "投票数: 1 (100.0%)")
+        self.assertFalse(await self.service.handle_vote(20, 8, "✅"))
+
+        await wait_until(lambda: len(store.deleted) == 2)
+        self.assertEqual(store.deleted, [20, 21])
+        self.assertEqual(self.service.active_polls, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import sys
+import os
+import unittest
+
+# sys.pathにbot/srcを追加して、RaidDetectorをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from modules.moderation.raid_detection import RaidDetector
+
+
+class FakeBot:
+    pass
+
+
+class FakeGuild:
+    id = 1
+
+
+class FakeMember:
+    id = 2
+    guild = FakeGuild()
+
+
+class StubDetector(RaidDetector):
+    """データベースを使わず、各チェックの結果を指定できる RaidDetector"""
+
+    def __init__(self, detected):
+        super().__init__(FakeBot())
+        self.detected = set(detected)
+        self.logged = []
+
+    async def _raid_protection_enabled(self, guild_id):
+        return True
+
+    async def _check_account_age(self, member):
+        return "new_account" in self.detected
+
+    async def _check_join_rate(self, member):
+        return "mass_join" in self.detected
+
+    async def _check_join_cohort(self, member):
+        return "similar_accounts" in self.detected
+
+    async def _check_suspicious_patterns(self, member):
+        return "suspicious_pattern" in self.detected
+
+    async def _log_raid(self, member, detection_type, action):
+        self.logged.append((detection_type, action))
+
+
+class TestRaidDetectorActions(unittest.IsolatedAsyncioTestCase):
+    async def check(self, *detected):
+        return await StubDetector(detected).check_member_join(FakeMember())
+
+    async def test_mass_join_of_similar_accounts_locks_down(self):
+        # 類似した新規アカウントの大量参加はキックではなくロックダウン
+        self.assertEqual(
+            await self.check("new_account", "mass_join", "similar_accounts"),
+            (True, "mass_join", "lockdown")
+        )
+
+    async def test_most_severe_action_wins(self):
+        self.assertEqual(await self.check("similar_accounts"), (True, "similar_accounts", "kick"))
+        self.assertEqual(
+            await self.check("mass_join", "similar_accounts", "suspicious_pattern"),
+            (True, "suspicious_pattern", "ban")
+        )
+        self.assertEqual(await self.check(), (False, "", ""))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import sys
+import os
+import unittest
+
+# sys.pathにbot/srcを追加して、RaidProtectionをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from modules.moderation.raid_protection import RaidProtection
+
+
+class FakeLoop:
+    """バックグラウンドのタスクを起動しないイベントループの代わり"""
+
+    def create_task(self, coro):
+        coro.close()
+
+
+class FakeLockdown:
+    def __init__(self):
+        self.started = []
+
+    async def start(self):
+        pass
+
+    def start_lock(self, guild, reason="", restore_after=None):
+        self.started.append((guild.id, restore_after))
+
+
+class FakeBot:
+    def __init__(self):
+        self.loop = FakeLoop()
+        self.lockdown_manager = FakeLockdown()
+
+
+class FakeGuild:
+    id = 1
+
+
+class FakeMember:
+    def __init__(self, member_id):
+        self.id = member_id
+        self.guild = FakeGuild()
+
+
+class StubRaidProtection(RaidProtection):
+    """設定APIと通知を使わない RaidProtection"""
+
+    def __init__(self, bot, settings):
+        super().__init__(bot)
+        self.settings = settings
+
+    async def get_guild_settings(self, guild_id):
+        return dict(self._get_default_settings(), **self.settings)
+
+    async def _notify_raid_detected(self, guild, join_count):
+        pass
+
+
+class TestRaidProtectionLockdown(unittest.IsolatedAsyncioTestCase):
+    async def detect(self, settings):
+        bot = FakeBot()
+        protection = StubRaidProtection(bot, dict(settings, raidProtectionEnabled=True, joinThreshold=3))
+        for member_id in range(3):
+            await protection.process_member_join(FakeMember(member_id))
+        self.assertIn("1", protection.active_raids)
+        return bot.lockdown_manager.started
+
+    async def test_no_lockdown_by_default(self):
+        self.assertEqual(await self.detect({}), [])
+
+    async def test_lockdown_when_guild_enables_it(self):
+        self.assertEqual(await self.detect({"lockdownChannels": True}), [(1, 30 * 60)])
+
+
+if __name__ == '__main__':
+    unittest.main()
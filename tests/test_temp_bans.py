@@ -0,0 +1,174 @@
+import sys
+import os
+import asyncio
+import time
+import unittest
+import discord
+
+# sys.pathにbot/srcを追加して、TempBanSchedulerをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from modules.moderation.temp_bans import TempBanScheduler
+
+
+class MemoryStore:
+    """temp_bans テーブルの代わりにメモリ上に記録を保持する"""
+
+    def __init__(self, records=None):
+        self.records = {(g, u): e for e, g, u in (records or [])}
+
+    async def add(self, guild_id, user_ids, expires_at, reason=None):
+        for user_id in user_ids:
+            self.records[(guild_id, user_id)] = expires_at
+
+    async def load(self):
+        return sorted((e, g, u) for (g, u), e in self.records.items())
+
+    async def delete(self, keys):
+        for key in keys:
+            self.records.pop(key, None)
+
+
+class SlowLoadStore(MemoryStore):
+    """テストから許可されるまで load() が終わらないストア"""
+
+    def __init__(self, records=None):
+        super().__init__(records)
+        self.loaded = asyncio.Event()
+
+    async def load(self):
+        records = await super().load()
+        await self.loaded.wait()
+        return records
+
+
+class FakeGuild:
+    def __init__(self, guild_id, fail_ids=()):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+        self.unavailable = False
+        self.unbanned = []
+        self.fail_ids = set(fail_ids)
+
+    async def unban(self, user, *, reason=None):
+        if user.id in self.fail_ids:
+            raise discord.DiscordException("mocked failure")
+        self.unbanned.append(user.id)
+
+
+class FakeBot:
+    def __init__(self, guilds, ready=True):
+        self.loop = asyncio.get_event_loop()
+        self.guilds = {g.id: g for g in guilds}
+        self.ready = ready
+
+    def is_ready(self):
+        return self.ready
+
+    async def wait_until_ready(self):
+        return
+
+    def is_closed(self):
+        return False
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(guild_id)
+
+
+async def wait_until(condition, timeout=2.0):
+    """条件を満たすまで待つ（バックグラウンドの解除ループの完了待ち）"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+class TestTempBanScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_catch_up_and_schedule(self):
+        now = time.time()
+        guild = FakeGuild(1)
+        # 停止中に期限を過ぎた記録が250件、未来の記録が1件
+        store = MemoryStore([(now - 3600 + i, 1, i) for i in range(250)] + [(now + 3600, 1, 999)])
+        notified = []
+        bot = FakeBot([guild])
+        scheduler = TempBanScheduler(
+            bot, store=store, batch_size=100,
+            on_unban=lambda g, ids: notified.append(len(ids))
+        )
+        await scheduler.start()
+        await wait_until(lambda: sum(notified) == 250)
+
+        self.assertEqual(sorted(guild.unbanned), list(range(250)))
+        self.assertEqual(notified, [100, 100, 50])
+        self.assertEqual(scheduler.stats["caught_up"], 250)
+        self.assertEqual(list(store.records), [(1, 999)])
+        self.assertEqual(len(scheduler), 1)
+
+        # 新しい一時BANは次の期限まで待たずに起床して解除される
+        await scheduler.add(1, [500, 501], 0.05)
+        self.assertEqual(len(store.records), 3)
+        await wait_until(lambda: len(store.records) == 1)
+        self.assertIn(500, guild.unbanned)
+        self.assertIn(501, guild.unbanned)
+        self.assertEqual(list(store.records), [(1, 999)])
+
+        # 取り消した記録は解除されない
+        await scheduler.add(1, [600], 0.05)
+        self.assertTrue(await scheduler.cancel(1, 600))
+        await asyncio.sleep(0.1)
+        self.assertNotIn(600, guild.unbanned)
+        scheduler.stop()
+
+    async def test_failed_unban_is_retried_and_kept(self):
+        guild = FakeGuild(2, fail_ids={7})
+        store = MemoryStore()
+        scheduler = TempBanScheduler(FakeBot([guild]), store=store)
+        await scheduler.add(2, [7, 8], -1)
+        await scheduler.process_due(scheduler._pop_due(time.time()))
+
+        self.assertEqual(guild.unbanned, [8])
+        self.assertEqual(list(store.records), [(2, 7)])
+        self.assertEqual(scheduler.stats["failed"], 1)
+        self.assertGreater(scheduler.next_expiry(), time.time())
+
+    async def test_left_guild_is_dropped(self):
+        store = MemoryStore()
+        scheduler = TempBanScheduler(FakeBot([]), store=store)
+        await scheduler.add(3, [1], -1)
+        await scheduler.process_due(scheduler._pop_due(time.time()))
+        self.assertEqual(store.records, {})
+        self.assertIsNone(scheduler.next_expiry())
+
+    async def test_unavailable_guild_is_retried(self):
+        # 障害中のギルドと、再接続中でまだ読み込まれていないギルドの記録は消さない
+        guild = FakeGuild(5)
+        guild.unavailable = True
+        for bot, guild_id in ((FakeBot([guild]), 5), (FakeBot([], ready=False), 6)):
+            store = MemoryStore()
+            scheduler = TempBanScheduler(bot, store=store)
+            await scheduler.add(guild_id, [1], -1)
+            await scheduler.process_due(scheduler._pop_due(time.time()))
+            self.assertEqual(list(store.records), [(guild_id, 1)])
+            self.assertEqual(scheduler.stats["deferred"], 1)
+            self.assertGreater(scheduler.next_expiry(), time.time())
+        self.assertEqual(guild.unbanned, [])
+
+    async def test_add_during_load_is_kept(self):
+        store = SlowLoadStore([(time.time() + 3600, 4, 1)])
+        scheduler = TempBanScheduler(FakeBot([FakeGuild(4)]), store=store)
+        starting = asyncio.create_task(scheduler.start())
+        await asyncio.sleep(0)
+        # 読み込み中に登録された期限付きBANも解除の対象に残る
+        await scheduler.add(4, [2], 60)
+        store.loaded.set()
+        await starting
+
+        self.assertEqual(len(scheduler), 2)
+        self.assertAlmostEqual(scheduler.next_expiry(), time.time() + 60, delta=1)
+        scheduler.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import sys
+import os
+import asyncio
+import time
+import unittest
+from datetime import datetime, timedelta
+
+# sys.pathにbot/srcを追加して、TimerServiceをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from modules.utility.timer_service import PendingTimer, TimerService, next_occurrence
+
+
+class MemoryStore:
+    """timers テーブルの代わりにメモリ上にタイマーを保持する"""
+
+    def __init__(self, records=None):
+        self.timers = dict(records or [])
+        self.next_id = max(self.timers, default=0) + 1
+        self.completed = []
+
+    async def add(self, guild_id, channel_id, user_id, expires_at, message, is_recurring, interval):
+        timer_id = self.next_id
+        self.next_id += 1
+        self.timers[timer_id] = PendingTimer(expires_at, channel_id, message, interval if is_recurring else None)
+        return timer_id
+
+    async def load(self):
+        return list(self.timers.items())
+
+    async def complete(self, deleted_ids, rescheduled):
+        self.completed.append((list(deleted_ids), list(rescheduled)))
+        for timer_id in deleted_ids:
+            self.timers.pop(timer_id, None)
+        for timer_id, expires_at in rescheduled:
+            self.timers[timer_id] = self.timers[timer_id]._replace(expires_at=expires_at)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append((content, time.time()))
+
+
+class FakeBot:
+    def __init__(self, channels):
+        self.channels = channels
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+async def wait_until(condition, timeout=2.0):
+    """条件を満たすまで待つ（バックグラウンドのループの完了待ち）"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+class TestNextOccurrence(unittest.TestCase):
+    def test_skips_missed_occurrences_without_drift(self):
+        self.assertEqual(next_occurrence(100, 60, 50), 100)
+        self.assertEqual(next_occurrence(100, 60, 100), 160)
+        self.assertEqual(next_occurrence(100, 60, 100 + 60 * 1000 + 5), 100 + 60 * 1001)
+
+
+class TestTimerService(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await self.service.stop()
+
+    async def test_catch_up_in_batches(self):
+        now = time.time()
+        channel = FakeChannel()
+        # 停止中に期限を過ぎたタイマーが250件（うち1件は繰り返し）、未来のタイマーが1件
+        records = [(i, PendingTimer(now - 3600 + i, 1, f"m{i}", None)) for i in range(1, 250)]
+        records.append((250, PendingTimer(now - 3600, 1, "recurring", 600)))
+        records.append((251, PendingTimer(now + 3600, 1, "later", None)))
+        store = MemoryStore(records)
+        self.service = TimerService(FakeBot({1: channel}), store=store, batch_size=100)
+        await self.service.start()
+        await wait_until(lambda: len(store.completed) == 3)
+
+        self.assertEqual(len(channel.sent), 250)
+        self.assertEqual(self.service.stats["caught_up"], 250)
+        # 100件ずつのバッチで削除・次回の期限を保存する
+        self.assertEqual(len(store.completed), 3)
+        self.assertEqual(sorted(store.timers), [250, 251])
+        self.assertAlmostEqual(store.timers[250].expires_at, now + 600, delta=1)
+        self.assertEqual(len(self.service), 2)
+
+    async def test_fires_at_deadline(self):
+        channel = FakeChannel()
+        store = MemoryStore()
+        self.service = TimerService(FakeBot({1: channel}), store=store)
+        await self.service.start()
+
+        expires_at = datetime.utcnow() + timedelta(seconds=0.2)
+        timer_id = await self.service.create_timer(1, 1, 2, expires_at, "hello")
+        cancelled = await self.service.create_timer(1, 1, 2, expires_at, "cancelled")
+        await self.service.cancel_timer(cancelled)
+        await wait_until(lambda: timer_id not in store.timers)
+
+        self.assertEqual([content for content, _ in channel.sent], ["hello"])
+        deadline = (expires_at - datetime(1970, 1, 1)).total_seconds()
+        self.assertLess(abs(channel.sent[0][1] - deadline), 0.1)
+        self.assertNotIn(timer_id, store.timers)
+        self.assertNotIn(cancelled, store.timers)
+
+    async def test_many_pending_timers(self):
+        now = time.time()
+        store = MemoryStore([(i, PendingTimer(now + 3600 + i, 1, "m", None)) for i in range(1, 100_001)])
+        self.service = TimerService(FakeBot({}), store=store)
+        started = time.perf_counter()
+        await self.service.start()
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertEqual(len(self.service), 100_000)
+        self.assertAlmostEqual(self.service.next_expiry(), now + 3601)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import sys
+import os
+import asyncio
+import tempfile
+import unittest
+
+# sys.pathにtestsとbot/srcを追加して、TranslationServiceとスタブサーバーをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+for path in (current_dir, src_path):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from modules.utility.translation_service import MyMemoryBackend, TranslationBackend, TranslationService, normalize_text
+from translation_stub import TranslationStubServer
+
+
+class TestNormalizeText(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_text("  お知らせ　です \n\t次の行  "), "お知らせ です\n次の行")
+
+
+class TestTranslationBackend(unittest.TestCase):
+    def test_translate_is_required(self):
+        class NoTranslate(TranslationBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoTranslate()
+
+
+class TestTranslationService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, 'cache', 'translations.sqlite3')
+        self.server = await TranslationStubServer(latency=0.05).start()
+        self.service = self._service()
+
+    def _service(self, **kwargs):
+        return TranslationService(
+            None, backend=MyMemoryBackend(self.server.base_url), cache_path=self.cache_path, **kwargs
+        )
+
+    async def asyncTearDown(self):
+        await self.service.close()
+        await self.server.close()
+        self.tmp.cleanup()
+
+    async def test_cached_and_coalesced(self):
+        results = await asyncio.gather(
+            self.service.translate("hello", "ja"),
+            self.service.translate(" hello ", "ja"),
+            self.service.translate("hello", "ja", "en"),
+        )
+        self.assertEqual(results, ["[ja] hello"] * 3)
+        # 同時の同じ翻訳は1回のリクエストにまとまる（翻訳元が違うものは別）
+        self.assertEqual(self.server.requests, ["hello", "hello"])
+        self.assertEqual(self.service.stats["coalesced"], 1)
+
+        self.assertEqual(await self.service.translate("hello", "ja"), "[ja] hello")
+        self.assertEqual(self.service.stats["hits"], 1)
+        self.assertEqual(len(self.server.requests), 2)
+
+    async def test_original_text_is_sent(self):
+        text = "手順:\n```\nif x:\n    print(x)\n```"
+        self.assertEqual(await self.service.translate(text, "en"), "[en] " + text)
+        # キャッシュのキーは正規化したテキストだが、APIには書式を保ったまま送る
+        self.assertEqual(self.server.requests, [text])
+        self.assertEqual(await self.service.translate(text.replace("    ", "  "), "en"), "[en] " + text)
+        self.assertEqual(len(self.server.requests), 1)
+
+    async def test_disk_cache_survives_restart(self):
+        await self.service.translate("announcement", "en")
+        await self.service.close()
+
+        self.service = self._service()
+        self.assertEqual(await self.service.translate("announcement", "en"), "[en] announcement")
+        self.assertEqual(self.service.stats["disk_hits"], 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    async def test_reusable_after_close(self):
+        # コグの再読み込みでは同じサービスを閉じてから使い続ける
+        await self.service.translate("first", "en")
+        executor = self.service.disk_cache._executor
+        await self.service.close()
+        self.assertIsNone(self.service.disk_cache._executor)
+        self.assertTrue(executor._shutdown)
+
+        self.service._cache.clear()
+        self.assertEqual(await self.service.translate("first", "en"), "[en] first")
+        self.assertEqual(self.service.stats["disk_hits"], 1)
+        self.assertEqual(await self.service.translate("second", "en"), "[en] second")
+        self.assertEqual(len(self.server.requests), 2)
+
+    async def test_translate_many_bounded(self):
+        await self.service.close()
+        self.service = self._service(max_concurrency=4)
+        self.server.fail_texts.add("bad")
+        texts = [f"message {i % 20}" for i in range(60)] + ["bad"]
+        results = await self.service.translate_many(texts, "ja", return_exceptions=True)
+
+        self.assertEqual(results[:60], [f"[ja] message {i % 20}" for i in range(60)])
+        self.assertIsInstance(results[60], Exception)
+        self.assertEqual(len(self.server.requests), 21)
+        self.assertLessEqual(self.server.max_active, 4)
+
+        with self.assertRaises(ValueError):
+            await self.service.translate_many(["x"], "xx")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+import time
+import unittest
+
+# sys.pathにbot/srcを追加して、PendingVerificationQueueをインポート
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.join(current_dir, '..', 'bot', 'src')
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from modules.moderation.verification_queue import PendingVerificationQueue
+
+
+class MemoryStore:
+    """pending_verifications テーブルの代わりにメモリ上に記録を保持する"""
+
+    def __init__(self, records=None):
+        self.records = {(g, u): [c, e, a] for g, u, c, e, a in (records or [])}
+
+    async def save(self, guild_id, user_id, code, expires_at, attempts=0):
+        self.records[(guild_id, user_id)] = [code, expires_at, attempts]
+
+    async def update_attempts(self, guild_id, user_id, attempts):
+        self.records[(guild_id, user_id)][2] = attempts
+
+    async def load(self):
+        return sorted(((g, u, c, e, a) for (g, u), (c, e, a) in self.records.items()), key=lambda r: r[3])
+
+    async def delete(self, keys):
+        for key in keys:
+            self.records.pop(key, None)
+
+
+class TestPendingVerificationQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_expiry_order_and_persistence(self):
+        now = time.time()
+        store = MemoryStore()
+        queue = PendingVerificationQueue(store)
+        for i in range(10):
+            await queue.add("1", str(i), f"CODE{i}", now + 10 - i)
+        self.assertEqual(len(queue), 10)
+        self.assertEqual(queue.next_expiry(), now + 1)
+
+        # 認証に成功したユーザーと再発行したユーザーは古い期限では取り出されない
+        await queue.remove("1", "9")
+        await queue.add("1", "8", "NEW", now + 100)
+        self.assertEqual(queue.next_expiry(), now + 3)
+        self.assertEqual(store.records[(1, 8)], ["NEW", now + 100, 0])
+
+        self.assertEqual(await queue.record_attempt("1", "0"), 1)
+        self.assertEqual(store.records[(1, 0)][2], 1)
+
+        expired = queue.pop_expired(now + 5, limit=2)
+        self.assertEqual(expired, [("1", "7"), ("1", "6")])
+        expired += queue.pop_expired(now + 5)
+        self.assertEqual(expired, [("1", "7"), ("1", "6"), ("1", "5")])
+        # 削除は呼び出し側が処理した後にまとめて行う
+        self.assertIn((1, 7), store.records)
+        await queue.delete(expired)
+        self.assertNotIn((1, 7), store.records)
+        self.assertIsNone(queue.get("1", "7"))
+
+        # 再起動後に復元される
+        restored = PendingVerificationQueue(store)
+        self.assertEqual(await restored.load(), 6)
+        self.assertEqual(restored.get("1", "0"), {"code": "CODE0", "expires": now + 10, "attempts": 1})
+        self.assertEqual(restored.next_expiry(), now + 6)
+        self.assertEqual(len(restored.pop_expired(now + 1000)), 6)
+        self.assertEqual(restored.entries, {})
+
+    async def test_many_guilds(self):
+        now = time.time()
+        queue = PendingVerificationQueue(MemoryStore())
+        for i in range(1000):
+            await queue.add(str(i % 7), str(i), "X", now + (i * 37 % 1000))
+        expired = queue.pop_expired(now + 499.5, limit=10_000)
+        self.assertEqual(len(expired), 500)
+        self.assertEqual(len(queue), 500)
+        self.assertGreater(queue.next_expiry(), now + 499.5)
+
+    async def test_reregistered_entry_is_not_deleted(self):
+        now = time.time()
+        store = MemoryStore()
+        queue = PendingVerificationQueue(store)
+        await queue.add("1", "2", "OLD", now - 1)
+        expired = queue.pop_expired(now)
+        # 期限切れの処理中に再参加して新しい認証待ちが登録された
+        await queue.add("1", "2", "NEW", now + 300)
+        await queue.delete(expired)
+        self.assertEqual(store.records[(1, 2)][0], "NEW")
+        self.assertEqual(queue.get("1", "2")["code"], "NEW")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+MyMemory Translation API のローカルスタブサーバー（テスト・ベンチマーク用）
+
+/get に MyMemory と同じ形式で応答し、翻訳結果は "[{翻訳先}] {テキスト}" を返します。
+latency で応答の遅延（秒）を指定できます。
+"""
+import asyncio
+
+from aiohttp import web
+
+
+class TranslationStubServer:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.fail_texts = set()
+        self._runner = None
+        self.base_url = None
+
+    async def _handle(self, request):
+        text = request.query['q']
+        target = request.query['langpair'].split('|')[1]
+        self.requests.append(text)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        if text in self.fail_texts:
+            return web.json_response({'responseStatus': 429, 'responseData': {'translatedText': ''}})
+        return web.json_response({'responseStatus': 200, 'responseData': {'translatedText': f"[{target}] {text}"}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/get', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/get"
+        return self
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()